@@ -27,9 +27,15 @@ from the table.
 ____________________________________________________________________________"""
 
 import os 
+import sys
 from pathlib import Path
 import arcpy
 
+# Use the shared FluvialGeomorph modules in the tools folder
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+                             os.path.abspath(__file__))), "tools"))
+from FG_utils import *
+
 def JoinFromCSV(feature_dataset, fc, fc_field, csv_file, csv_field):
     # Set environment variables 
     arcpy.env.overwriteOutput = True
@@ -54,20 +60,19 @@ def JoinFromCSV(feature_dataset, fc, fc_field, csv_file, csv_field):
                                   out_feature_class = out_fc_path)
     arcpy.AddMessage("Created new fc")
     
-    # Join `table` to the new feature class
-    arcpy.management.JoinField(in_data = out_fc_path,
-                               in_field = fc_field,
-                               join_table = table_path,
-                               join_field = csv_field)
+    # Join the `table` fields that are not already in the new feature class
+    fc_fields = [f.name.lower() for f in arcpy.ListFields(out_fc_path)]
+    csv_fields = [f.name for f in arcpy.ListFields(table_path)
+                  if f.name.lower() not in fc_fields and 
+                     f.type not in SKIP_FIELD_TYPES and 
+                     f.name.lower() != csv_field.lower()]
+    join_table_fields(target = out_fc_path,
+                      target_field = fc_field,
+                      join_table = table_path,
+                      join_field = csv_field,
+                      fields = csv_fields)
     arcpy.AddMessage("Joined table to new fc")
     
-    # Delete duplicate fields
-    dup_fields = [f.name for f in arcpy.ListFields(dataset = out_fc_path, 
-                                                  wild_card = "*_1")]
-    arcpy.management.DeleteField(in_table = out_fc_path,
-                                 drop_field = dup_fields)
-    arcpy.AddMessage("Deleted duplicate fields")
-    
     
     # Cleanup
     arcpy.management.Delete(table_path)
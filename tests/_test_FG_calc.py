@@ -0,0 +1,60 @@
+""" This file tests the vectorized field calculations in FG_calc
+"""
+import pytest
+import numpy as np
+
+from FG_calc import *
+from fg_memory_tables import *
+
+# Define test parameters
+def points_table():
+    return make_table([("OBJECTID", "OID", 4), ("POINT_M", "Double", 8),
+                       ("POINT_M_uncalibrated", "Double", 8),
+                       ("Seq", "Integer", 4)],
+                      [(1, 1.5, 1.0, 1), (2, None, 2.0, 1),
+                       (3, 3.25, 3.0, 2)])
+
+# Test column arrays
+def test_column_array():
+    m = column_array([1.0, None], "Double")
+    assert m.dtype == np.float64 and np.isnan(m[1])
+    text = column_array(["a", None], "String")
+    assert list(text) == ["a", None]
+
+def test_evaluate_fields_uses_earlier_results():
+    columns = {"a": np.array([1.0, 2.0])}
+    results = evaluate_fields(columns, [("b", lambda c: c["a"] * 2),
+                                        ("c", lambda c: c["b"] + 1),
+                                        ("units", "m")], 2)
+    assert np.allclose(results["c"], [3.0, 5.0])
+    assert list(results["units"]) == ["m", "m"]
+
+def test_evaluate_fields_wrong_length():
+    with pytest.raises(ValueError):
+        evaluate_fields({}, [("b", lambda c: np.zeros(3))], 2)
+
+# Test calculating the fields of a table
+def test_calculate_fields_one_pass():
+    table = points_table()
+    calculate_fields(
+        table,
+        [("POINT_M", lambda c: np.where(np.isnan(c["POINT_M"]), 0,
+                                        c["POINT_M"])),
+         ("calibration_diff",
+          lambda c: c["POINT_M"] - c["POINT_M_uncalibrated"]),
+         ("POINT_M_units", "m")],
+        MemoryTables(),
+        inputs = ["POINT_M", "POINT_M_uncalibrated"],
+        new_fields = [FieldDef("calibration_diff", "Double", 8),
+                      FieldDef("POINT_M_units", "String", 1)])
+    rows = list(MemoryTables().search(table, ["POINT_M", "calibration_diff",
+                                              "POINT_M_units"]))
+    assert rows == [(1.5, 0.5, "m"), (0.0, -2.0, "m"), (3.25, 0.25, "m")]
+
+def test_calculate_fields_writes_nan_as_null():
+    table = points_table()
+    calculate_fields(table, [("Seq", lambda c: c["POINT_M"] * 2)],
+                     MemoryTables(), inputs = ["POINT_M"])
+    rows = list(MemoryTables().search(table, ["Seq"]))
+    # Integer fields are rounded, and missing values are written as None
+    assert rows == [(3,), (None,), (6,)]
@@ -0,0 +1,129 @@
+""" This file tests the array-based line geometry functions in FG_geometry
+"""
+import pytest
+import numpy as np
+
+from FG_geometry import *
+
+# Define test parameters
+# An L-shaped line 30 units long
+line_x = np.array([0.0, 10.0, 10.0])
+line_y = np.array([0.0,  0.0, 20.0])
+
+# Test cumulative distance
+def test_cumulative_distance():
+    dist = cumulative_distance(line_x, line_y)
+    assert np.allclose(dist, [0, 10, 30])
+
+def test_cumulative_distance_ignores_part_gaps():
+    x = np.array([0.0, 10.0, 50.0, 60.0])
+    y = np.zeros(4)
+    dist = cumulative_distance(x, y, part_starts = [2])
+    assert np.allclose(dist, [0, 10, 10, 20])
+
+# Test station points
+def test_station_points_spacing():
+    st_x, st_y, st_m = station_points(line_x, line_y, 4)
+    assert np.allclose(np.diff(st_m)[:-1], 4)
+    assert st_m[0] == 0
+    assert st_m[-1] == 30
+
+def test_station_points_on_line():
+    st_x, st_y, st_m = station_points(line_x, line_y, 4)
+    # Station 12 is on the second segment, 2 units north of the corner
+    assert st_x[3] == pytest.approx(10)
+    assert st_y[3] == pytest.approx(2)
+
+def test_station_points_measure_scaling():
+    st_x, st_y, st_m = station_points(line_x, line_y, 10,
+                                      m_from = 0, m_to = 3)
+    assert np.allclose(st_m, [0, 1, 2, 3])
+
+def test_station_points_bad_distance():
+    with pytest.raises(ValueError):
+        station_points(line_x, line_y, 0)
+
+# Test transects
+def test_transects_count_and_spacing():
+    xs = transects(line_x, line_y, 10, 5)
+    # Intervals 0-10, 10-20, 20-30
+    assert len(xs["x_mid"]) == 3
+    assert np.allclose(xs["x_mid"], [5, 10, 10])
+    assert np.allclose(xs["y_mid"], [0, 5, 15])
+
+def test_transects_perpendicular_left_to_right():
+    xs = transects(line_x, line_y, 10, 5)
+    # The first interval runs east, so transects run from north to south
+    assert xs["x_start"][0] == pytest.approx(5)
+    assert xs["y_start"][0] == pytest.approx(5)
+    assert xs["y_end"][0] == pytest.approx(-5)
+    assert xs["azimuth"][0] == pytest.approx(90)
+
+def test_transects_split_at_vertices():
+    xs = transects(line_x, line_y, None, 5, split_at_vertices = True)
+    assert np.allclose(xs["x_mid"], [5, 10])
+    assert np.allclose(xs["y_mid"], [0, 10])
+
+def test_transects_reuse_distance():
+    dist = cumulative_distance(line_x, line_y)
+    xs = transects(line_x, line_y, 10, 5, dist = dist)
+    assert np.allclose(xs["y_mid"], transects(line_x, line_y, 10, 5)["y_mid"])
+
+# Test locating points along a line
+def test_locate_points():
+    along, offset = locate_points(line_x, line_y,
+                                  np.array([4.0, 13.0, -2.0]),
+                                  np.array([1.0, 12.0, 0.0]))
+    assert np.allclose(along, [4, 22, 0])
+    assert np.allclose(offset, [1, 3, 2])
+
+# Test monotonic profiles
+def test_monotonic_profile_increasing():
+    profile = monotonic_profile(np.array([1.0, 3.0, 2.0, np.nan, 5.0]))
+    assert np.allclose(profile[[0, 1, 2, 4]], [1, 3, 3, 5])
+
+def test_monotonic_profile_decreasing():
+    profile = monotonic_profile(np.array([5.0, 2.0, 3.0, 1.0]))
+    assert np.allclose(profile, [5, 3, 3, 1])
+
+# Test distances with units
+def test_linear_distance():
+    assert linear_distance("25 Meters", 0.3048) == pytest.approx(25 / 0.3048)
+    assert linear_distance("10 Feet", 1.0) == pytest.approx(3.048)
+    assert linear_distance("7", 0.3048) == 7
+
+# Test locating points within a search radius
+def test_locate_points_within_matches_locate_points():
+    px = np.array([4.0, 13.0, -2.0, 30.0])
+    py = np.array([1.0, 12.0, 0.0, 30.0])
+    along, offset = locate_points_within(line_x, line_y, px, py, 3.5)
+    expected, expected_offset = locate_points(line_x, line_y, px, py)
+    assert np.allclose(along[:3], expected[:3])
+    assert np.allclose(offset[:3], expected_offset[:3])
+    # The last point is beyond the search radius
+    assert np.isnan(along[3])
+
+def test_locate_points_within_small_radius():
+    # Long diagonal segments with a radius far smaller than a segment
+    x = np.array([0.0, 1000.0, 2000.0])
+    y = np.array([0.0, 1000.0, 0.0])
+    px = np.array([500.0, 1500.0, 500.0])
+    py = np.array([500.0005, 500.0, 400.0])
+    along, offset = locate_points_within(x, y, px, py, 0.001)
+    expected, expected_offset = locate_points(x, y, px[:2], py[:2])
+    assert np.allclose(along[:2], expected)
+    assert np.allclose(offset[:2], expected_offset)
+    assert np.isnan(along[2])
+
+# Test route calibration
+def test_calibrate_measures_between_and_beyond():
+    m = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+    calibrated = calibrate_measures(m, np.array([3.0, 1.0]),
+                                    np.array([13.0, 10.0]))
+    # 1.5 units of measure per unit between the points, extrapolated
+    assert np.allclose(calibrated, [8.5, 10.0, 11.5, 13.0, 14.5])
+
+def test_calibrate_measures_one_or_no_points():
+    m = np.array([0.0, 1.0])
+    assert np.allclose(calibrate_measures(m, [1.0], [5.0]), [4.0, 5.0])
+    assert np.allclose(calibrate_measures(m, [], []), m)
@@ -0,0 +1,203 @@
+""" This file tests the array-based raster grid functions in FG_grid
+"""
+import pytest
+import numpy as np
+
+from FG_grid import *
+
+# Define test parameters
+# A 4 x 5 grid with 2 unit cells whose values increase by 1 to the east and
+# by 10 to the south. The upper left corner is at (100, 200).
+grid = np.arange(4)[:, None] * 10.0 + np.arange(5)[None, :]
+x_min, y_max, cell = 100.0, 200.0, 2.0
+
+# Test grid positions
+def test_grid_position_cell_center():
+    row, col = grid_position(np.array([103.0]), np.array([197.0]),
+                             x_min, y_max, cell, cell)
+    assert row[0] == pytest.approx(1)
+    assert col[0] == pytest.approx(1)
+
+# Test sampling
+def test_sample_grid_nearest():
+    row, col = grid_position(np.array([103.9]), np.array([195.1]),
+                             x_min, y_max, cell, cell)
+    assert sample_grid(grid, row, col, "NEAREST")[0] == 21
+
+def test_sample_grid_bilinear():
+    # Half way between the centers of cells (1, 1) and (2, 2)
+    row, col = grid_position(np.array([104.0]), np.array([196.0]),
+                             x_min, y_max, cell, cell)
+    assert sample_grid(grid, row, col, "BILINEAR")[0] == pytest.approx(16.5)
+
+def test_sample_grid_outside_is_nan():
+    row, col = grid_position(np.array([99.0, 120.0]), np.array([199.0, 199.0]),
+                             x_min, y_max, cell, cell)
+    assert np.isnan(sample_grid(grid, row, col)).all()
+
+def test_sample_grid_nodata_is_nan():
+    nodata_grid = grid.copy()
+    nodata_grid[1, 1] = np.nan
+    assert np.isnan(sample_grid(nodata_grid, np.array([1.5]),
+                                np.array([1.5]))[0])
+
+# Test blocks
+def test_block_ids():
+    block_row, block_col = block_ids(np.array([-0.3, 3.9, 4.0]),
+                                     np.array([0.0, 8.2, 1.0]), 4)
+    assert block_row.tolist() == [0, 0, 1]
+    assert block_col.tolist() == [0, 2, 0]
+
+# Test snapping
+def test_snap_to_max_finds_highest_cell():
+    fac = np.zeros((5, 5))
+    fac[2, 4] = 100
+    fac[0, 0] = 500
+    r, c, v = snap_to_max(fac, np.array([2.0]), np.array([2.0]), 2)
+    assert (r[0], c[0], v[0]) == (2, 4, 100)
+
+def test_snap_to_max_ties_choose_closest():
+    fac = np.ones((5, 5))
+    r, c, v = snap_to_max(fac, np.array([1.2]), np.array([3.4]), 2)
+    assert (r[0], c[0]) == (1, 3)
+
+def test_cell_count_to_sq_mile():
+    # 2589988.110336 one square meter cells is one square mile
+    assert cell_count_to_sq_mile(2589988.110336, 1, 1) == pytest.approx(1)
+    assert cell_count_to_sq_mile(1, 10, 10, 0.3048) == pytest.approx(
+                                    9.290304 / 2589988.110336)
+
+# Test cross tabulation
+def test_crosstab():
+    zone = np.array([[0, 1, 1], [2, 2, 1]])
+    cls = np.array([[11, 11, 42], [42, np.nan, 42]])
+    classes, counts = crosstab(zone, cls, 2)
+    assert classes.tolist() == [11, 42]
+    assert counts.tolist() == [[1, 0], [1, 2], [0, 1]]
+
+# Test statistics
+def test_block_statistics():
+    values = np.array([[1.0, 2.0, np.nan], [3.0, 4.0, 5.0]])
+    minimum, maximum, mean, std = block_statistics(values, block_size = 1)
+    assert (minimum, maximum) == (1, 5)
+    assert mean == pytest.approx(3)
+    assert std == pytest.approx(np.std([1, 2, 3, 4, 5]))
+
+# Test focal mean
+def test_focal_mean_matches_brute_force():
+    rng = np.random.default_rng(7)
+    values = rng.random((12, 15))
+    values[3, 4] = np.nan
+    radius = 3
+    mean = focal_mean(values, radius)
+    rows, cols = np.indices(values.shape)
+    for r in range(values.shape[0]):
+        for c in range(values.shape[1]):
+            inside = (rows - r) ** 2 + (cols - c) ** 2 <= radius ** 2
+            assert mean[r, c] == pytest.approx(np.nanmean(values[inside]))
+
+def test_focal_mean_all_nodata_is_nan():
+    values = np.full((4, 4), np.nan)
+    values[0, 0] = 1.0
+    mean = focal_mean(values, 1)
+    assert mean[0, 1] == 1.0
+    assert np.isnan(mean[3, 3])
+
+# Test slope
+def test_slope_degrees_plane():
+    # Rises 2 units over each 2 unit cell to the east: 45 degrees
+    slope = slope_degrees(grid * 0 + np.arange(5)[None, :] * 2.0, cell, cell)
+    assert slope[1:-1, 1:-1] == pytest.approx(45)
+
+def test_slope_degrees_z_factor_and_nodata():
+    plane = np.arange(5)[None, :] * 2.0 + np.zeros((4, 1))
+    plane[1, 1] = np.nan
+    slope = slope_degrees(plane, cell, cell, z_factor = 0.5)
+    assert np.isnan(slope[1, 1])
+    assert slope[2, 3] == pytest.approx(np.degrees(np.arctan(0.5)))
+    # The NoData neighbor is given the elevation of the center cell
+    assert slope[2, 2] < slope[2, 3]
+
+# Test majority filter
+def test_majority_filter_removes_single_cells():
+    banks = np.zeros((5, 5))
+    banks[2, 2] = 1
+    banks[0:2, 3:5] = 1
+    filtered = majority_filter(banks)
+    assert filtered[2, 2] == 0
+    # Corner block cells have at most three matching neighbors
+    assert filtered[0, 4] == 1
+
+def test_majority_filter_ties_and_contiguity():
+    # Four neighbors of value 1, but split into two runs around the cell
+    split = np.array([[1, 0, 1],
+                      [0, 0, 0],
+                      [1, 0, 1]], dtype = float)
+    assert majority_filter(split)[1, 1] == 0
+    # Four contiguous neighbors of value 1 against four of value 0 is a tie
+    tie = np.array([[1, 1, 1],
+                    [0, 0, 1],
+                    [0, 0, 0]], dtype = float)
+    assert majority_filter(tie)[1, 1] == 0
+    # Five contiguous neighbors of value 1
+    half = np.array([[1, 1, 1],
+                     [0, 0, 1],
+                     [0, 0, 1]], dtype = float)
+    assert majority_filter(half)[1, 1] == 1
+
+def test_water_surface_grid_nodata():
+    detrend = np.array([[99.0, 101.0], [np.nan, 100.0]])
+    banks = water_surface_grid(detrend, 100, 0)
+    assert banks[0, 0] == 1 and banks[0, 1] == 0 and banks[1, 1] == 0
+    assert np.isnan(banks[1, 0])
+
+# Test inverse distance weighting
+def brute_force_idw(px, py, pz, x, y, n_points, power):
+    d = np.hypot(x - px, y - py)
+    nearest = np.argsort(d)[:n_points]
+    if d[nearest[0]] == 0:
+        return pz[nearest[0]]
+    w = 1.0 / d[nearest] ** power
+    return (w * pz[nearest]).sum() / w.sum()
+
+def test_nearest_points_matches_brute_force():
+    rng = np.random.default_rng(3)
+    px, py = rng.random(200) * 100, rng.random(200) * 10
+    x, y = rng.random(50) * 100, rng.random(50) * 10
+    distance, index = nearest_points(px, py, x, y, 12)
+    for i in range(x.size):
+        d = np.hypot(x[i] - px, y[i] - py)
+        assert sorted(index[i]) == sorted(np.argsort(d)[:12])
+        assert np.allclose(np.sort(distance[i]), np.sort(d)[:12])
+
+def test_idw_points_at_point_and_few_points():
+    px, py = np.array([0.0, 10.0]), np.array([0.0, 0.0])
+    pz = np.array([1.0, 3.0])
+    values = idw_points(px, py, pz, [0.0, 5.0, 20.0], [0.0, 0.0, 0.0])
+    # Two points are used when fewer than 12 exist
+    assert np.allclose(values, [1.0, 2.0, brute_force_idw(px, py, pz, 20.0,
+                                                          0.0, 12, 2)])
+    assert np.isnan(idw_points([], [], [], [1.0], [1.0])).all()
+
+def test_idw_grid_within_mask():
+    rng = np.random.default_rng(5)
+    # Points along a line through the grid, with one NaN point ignored
+    px = np.linspace(100, 110, 30)
+    py = 195 + rng.random(30)
+    pz = rng.random(30) * 10
+    pz[4] = np.nan
+    mask = np.full(grid.shape, np.nan)
+    mask[1:3, 1:4] = 1
+    trend = idw_grid(mask, x_min, y_max, cell, cell, px, py, pz,
+                     block_size = 2)
+    valid = ~np.isnan(pz)
+    for r in range(mask.shape[0]):
+        for c in range(mask.shape[1]):
+            if np.isnan(mask[r, c]):
+                assert np.isnan(trend[r, c])
+            else:
+                x = x_min + (c + 0.5) * cell
+                y = y_max - (r + 0.5) * cell
+                assert trend[r, c] == pytest.approx(
+                    brute_force_idw(px[valid], py[valid], pz[valid], x, y,
+                                    12, 2), rel = 1e-6)
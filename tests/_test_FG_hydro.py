@@ -0,0 +1,294 @@
+""" This file tests the array-based hydrology functions in FG_hydro
+"""
+import pytest
+import numpy as np
+
+from FG_hydro import *
+
+# Define test parameters
+# A 3 x 4 grid draining east along the middle row and out of the grid at
+# cell (1, 3). The top and bottom rows drain south and north into it.
+fdr = np.array([[4,  4,  4,  4],
+                [1,  1,  1,  1],
+                [64, 64, 64, 64]])
+
+# Test downstream cells
+def test_d8_downstream():
+    downstream = d8_downstream(fdr)
+    assert downstream[0] == 4
+    assert downstream[4] == 5
+    assert downstream[8] == 4
+    # Flows off the grid
+    assert downstream[7] == -1
+
+def test_d8_downstream_nodata():
+    downstream = d8_downstream(np.array([[0, 1]]))
+    assert downstream[0] == -1
+
+# Test watershed labels
+def test_label_watersheds_single():
+    downstream = d8_downstream(fdr)
+    label = label_watersheds(downstream, [7], [10])
+    assert (label == 10).all()
+
+def test_label_watersheds_nested():
+    downstream = d8_downstream(fdr)
+    label = label_watersheds(downstream, [7, 5], [1, 2])
+    label = label.reshape(fdr.shape)
+    # Columns 0 and 1 drain to the upstream pour point at (1, 1)
+    assert (label[:, :2] == 2).all()
+    assert (label[:, 2:] == 1).all()
+
+def test_watershed_parents():
+    downstream = d8_downstream(fdr)
+    label = label_watersheds(downstream, [7, 5], [1, 2])
+    parents = watershed_parents(downstream, label, [7, 5])
+    assert parents.tolist() == [0, 1]
+
+def test_label_watersheds_long_path():
+    # A single row 1000 cells long draining east
+    downstream = d8_downstream(np.ones((1, 1000), dtype = int))
+    label = label_watersheds(downstream, [999], [3])
+    assert (label == 3).all()
+
+def test_d8_downstream_int32_labels():
+    downstream = d8_downstream(fdr)
+    assert downstream.dtype == np.int32
+    label = label_watersheds(downstream, [7], np.array([2], dtype = np.int32))
+    assert label.dtype == np.int32
+
+# Test accumulating nested watersheds
+def test_accumulate_nested():
+    # Watershed 3 is nested in 2, which is nested in 1
+    counts = np.array([[1, 0], [2, 5], [4, 1]])
+    totals = accumulate_nested(counts, [1, 2, 3], [0, 1, 2])
+    assert totals.tolist() == [[7, 6], [6, 6], [4, 1]]
+
+def test_accumulate_nested_siblings():
+    counts = np.array([[1], [2], [3]])
+    totals = accumulate_nested(counts, [1, 2, 3], [0, 1, 1])
+    assert totals.ravel().tolist() == [6, 2, 3]
+
+# Test independent sub-basins
+def test_watershed_roots():
+    roots = watershed_roots([1, 2, 3, 4], [0, 1, 2, 0])
+    assert roots.tolist() == [1, 1, 1, 4]
+
+def test_partition_basins():
+    group = partition_basins([1, 2, 3, 4], [10, 6, 5, 1], 2)
+    assert group.tolist() == [0, 1, 1, 0]
+
+def test_partition_basins_ties_are_deterministic():
+    group = partition_basins([7, 3, 5], [4, 4, 4], 3)
+    assert group.tolist() == [2, 0, 1]
+
+# Test depression filling
+# A 5 x 5 DEM with a two cell pit that spills over the cell at (1, 3) to the
+# outlet on the edge at (1, 4)
+pit_dem = np.array([[9., 9., 9., 9., 9.],
+                    [9., 5., 6., 5., 4.],
+                    [9., 2., 1., 7., 9.],
+                    [9., 6., 7., 7., 9.],
+                    [9., 9., 9., 9., 9.]])
+
+def relax_fill(dem):
+    # Fill by repeatedly lowering each cell to its lowest neighbor's level
+    padded = np.pad(dem, 1, mode = "constant", constant_values = -np.inf)
+    filled = np.full(padded.shape, np.inf)
+    filled[0, :] = filled[-1, :] = filled[:, 0] = filled[:, -1] = -np.inf
+    for i in range(dem.size):
+        low = np.full(dem.shape, np.inf)
+        for dr, dc in D8_OFFSETS:
+            low = np.minimum(low, filled[1 + dr:1 + dr + dem.shape[0],
+                                         1 + dc:1 + dc + dem.shape[1]])
+        filled[1:-1, 1:-1] = np.maximum(dem, low)
+    return filled[1:-1, 1:-1]
+
+def test_fill_depressions_pit():
+    filled = fill_depressions(pit_dem)
+    assert filled[2, 2] == 5
+    assert filled[2, 1] == 5
+    # Cells at or above the spill level are unchanged
+    assert filled[1, 3] == 5
+    assert filled[1, 2] == 6
+    assert (filled >= pit_dem).all()
+
+def test_fill_depressions_matches_relaxation():
+    dem = np.random.RandomState(1).rand(30, 40) * 10
+    assert np.array_equal(fill_depressions(dem), relax_fill(dem))
+
+def test_fill_depressions_nodata_drains():
+    dem = pit_dem.copy()
+    dem[1, 1] = np.nan
+    filled = fill_depressions(dem)
+    # The pit is next to NoData so it drains out
+    assert filled[2, 2] == 1
+    assert np.isnan(filled[1, 1])
+
+def test_fill_depressions_epsilon():
+    filled = fill_depressions(pit_dem, epsilon = 0.01)
+    assert filled[2, 2] == pytest.approx(5.01)
+    assert filled[2, 1] == pytest.approx(5.02)
+
+def test_fill_depressions_tiled_matches_untiled():
+    dem = np.random.RandomState(2).rand(37, 29) * 10
+    dem[10:14, 5:9] = np.nan
+    filled = np.empty(dem.shape)
+    floods = fill_depressions_tiled(dem, filled, tile_size = 8)
+    assert np.array_equal(filled, fill_depressions(dem), equal_nan = True)
+    # Some tiles must be flooded more than once
+    assert floods > 20
+
+def test_fill_depressions_tiled_epsilon():
+    dem = np.random.RandomState(3).rand(20, 20) * 10
+    filled = np.empty(dem.shape)
+    fill_depressions_tiled(dem, filled, tile_size = 6, epsilon = 0.001)
+    assert np.allclose(filled, fill_depressions(dem, epsilon = 0.001))
+
+def test_fill_depressions_tiled_float32_epsilon():
+    dem = (np.random.RandomState(4).rand(20, 20) * 10).astype(np.float32)
+    filled = np.empty(dem.shape, dtype = np.float32)
+    fill_depressions_tiled(dem, filled, tile_size = 6, epsilon = 0.001)
+    assert np.allclose(filled, fill_depressions(dem, epsilon = 0.001),
+                       atol = 1e-4)
+
+# Test D8 flow direction
+def test_d8_flow_direction_steepest():
+    dem = np.array([[5., 5., 5.],
+                    [5., 4., 3.],
+                    [5., 1., 5.]])
+    fdr = d8_flow_direction(dem)
+    # The center cell drops 3 to the south and 1 to the east
+    assert fdr[1, 1] == 4
+
+def test_d8_flow_direction_diagonal_distance():
+    dem = np.array([[9., 9., 9.],
+                    [9., 5., 9.],
+                    [9., 4.5, 3.8]])
+    # A drop of 1.2 over sqrt(2) cells to the southeast (0.85) is steeper
+    # than a drop of 0.5 to the south
+    assert d8_flow_direction(dem)[1, 1] == 2
+
+def test_d8_flow_direction_edges_flow_out():
+    dem = np.array([[1., 2., 3.],
+                    [1., 2., 3.],
+                    [1., 2., 3.]])
+    fdr = d8_flow_direction(dem)
+    assert fdr[1, 1] == 16
+    assert fdr[1, 0] == 16
+    assert fdr[0, 0] == 32
+    assert fdr[2, 2] == 16
+
+def test_d8_flow_direction_flats_drain():
+    dem = np.array([[9., 9., 9., 9., 9.],
+                    [9., 5., 5., 5., 4.],
+                    [9., 9., 9., 9., 9.]])
+    fdr = d8_flow_direction(dem)
+    assert fdr[1, 1:4].tolist() == [1, 1, 1]
+
+def test_d8_flow_direction_nodata():
+    dem = np.array([[5., 5., 5.],
+                    [np.nan, 3., 5.],
+                    [5., 5., 5.]])
+    fdr = d8_flow_direction(dem)
+    assert fdr[1, 0] == 0
+    assert fdr[1, 1] == 16
+
+def test_d8_flow_direction_ties_and_sinks():
+    # Known differences from arcpy.sa.FlowDirection (see _03a): ties take
+    # the first direction in the order E, SE, S, SW, W, NW, N, NE, and
+    # undrained sinks are 0
+    tie = np.array([[9., 9., 9.],
+                    [9., 5., 4.],
+                    [9., 4., 9.]])
+    assert d8_flow_direction(tie)[1, 1] == 1
+    sink = np.array([[9., 9., 9., 9.],
+                     [9., 1., 9., 9.],
+                     [9., 9., 9., 9.],
+                     [9., 9., 9., 9.]])
+    assert d8_flow_direction(sink)[1, 1] == 0
+
+# Test D8 flow accumulation
+def test_d8_flow_accumulation():
+    accum = d8_flow_accumulation(fdr)
+    # Every cell of the grid drains out through (1, 3)
+    assert accum[1, 3] == 11
+    assert accum[1, 0] == 2
+    assert accum[0, 0] == 0
+
+def test_d8_flow_accumulation_weights():
+    accum = d8_flow_accumulation(fdr, weights = np.full(fdr.shape, 2.0))
+    assert accum[1, 3] == 22
+
+def test_d8_flow_accumulation_matches_downstream_walk():
+    dem = fill_depressions(np.random.RandomState(5).rand(25, 30))
+    d8 = d8_flow_direction(dem)
+    downstream = d8_downstream(d8)
+    expected = np.zeros(d8.size)
+    for cell in range(d8.size):
+        nxt = downstream[cell]
+        while nxt >= 0:
+            expected[nxt] += 1
+            nxt = downstream[nxt]
+    assert np.array_equal(d8_flow_accumulation(d8).ravel(), expected)
+
+# Test D-infinity
+def plane(n_rows, n_cols, azimuth_deg, cell = 1.0):
+    # A plane that falls by 1 unit per unit distance toward a flow angle
+    # measured counter clockwise from east
+    a = np.radians(azimuth_deg)
+    rows, cols = np.indices((n_rows, n_cols))
+    x, y = cols * cell, -rows * cell
+    return -(x * np.cos(a) + y * np.sin(a))
+
+def test_dinf_flow_direction_plane_angle():
+    angle, slope = dinf_flow_direction(plane(6, 6, 30))
+    assert np.allclose(angle[1:-1, 1:-1], np.radians(30))
+    assert np.allclose(slope[1:-1, 1:-1], 1)
+
+def test_dinf_flow_direction_facets():
+    for azimuth in [0, 60, 135, 200, 290, 350]:
+        angle, slope = dinf_flow_direction(plane(5, 5, azimuth, 2.0),
+                                           2.0, 2.0)
+        assert angle[2, 2] == pytest.approx(np.radians(azimuth))
+
+def test_dinf_flow_direction_edges_without_downslope_are_nodata():
+    angle, slope = dinf_flow_direction(plane(4, 4, 0))
+    # The west edge drains east; the east edge has no downslope facet
+    assert angle[2, 0] == pytest.approx(0)
+    assert np.isnan(angle[2, 3])
+
+def test_dinf_contributing_area_plane():
+    # Flow due east: each cell receives the cells west of it in its row
+    angle, slope = dinf_flow_direction(plane(5, 6, 0, 2.0), 2.0, 2.0)
+    sca = dinf_contributing_area(angle, 2.0)
+    assert np.allclose(sca[2], 2.0 * np.arange(1, 7))
+
+def test_dinf_contributing_area_split():
+    # Flow at 22.5 degrees is split evenly between the east and northeast
+    angle = np.full((3, 3), np.nan)
+    angle[1, 1] = np.pi / 8
+    sca = dinf_contributing_area(angle)
+    assert sca[1, 2] == pytest.approx(1.5)
+    assert sca[0, 2] == pytest.approx(1.5)
+
+def test_dinf_contributing_area_conserves_flow():
+    dem = fill_depressions(np.random.RandomState(6).rand(30, 30), 1e-6)
+    angle, slope = dinf_flow_direction(dem)
+    sca = dinf_contributing_area(angle)
+    # The area of every cell ends in the cells that do not flow
+    assert sca[np.isnan(angle)].sum() == pytest.approx(dem.size)
+
+def test_dinf_tiled_matches_untiled():
+    dem = fill_depressions(np.random.RandomState(7).rand(40, 33), 1e-6)
+    angle, slope = dinf_flow_direction(dem)
+    sca = dinf_contributing_area(angle)
+    tiled_angle = np.empty(dem.shape)
+    tiled_slope = np.empty(dem.shape)
+    dinf_flow_direction_tiled(dem, tiled_angle, tiled_slope, tile_size = 9,
+                              halo = 2)
+    assert np.array_equal(tiled_angle, angle, equal_nan = True)
+    tiled_sca = np.empty(dem.shape)
+    sweeps = dinf_contributing_area_tiled(angle, tiled_sca, tile_size = 9)
+    assert np.allclose(tiled_sca, sca)
+    assert sweeps > 20
@@ -0,0 +1,61 @@
+""" This file tests the dictionary-based attribute join in FG_join
+"""
+import pytest
+
+from FG_join import *
+from fg_memory_tables import *
+
+# Define test parameters
+def xs_table():
+    return make_table([("OBJECTID", "OID", 4), ("Shape", "Geometry", 0),
+                       ("Seq", "Integer", 4), ("POINT_M", "Double", 8)],
+                      [(1, None, 1, 0.5), (2, None, 2, 1.5),
+                       (3, None, 3, 2.5)])
+
+def point_table():
+    return make_table([("OBJECTID", "OID", 4), ("Shape", "Geometry", 0),
+                       ("Seq", "Double", 8), ("POINT_M", "Double", 8),
+                       ("Z", "Double", 8), ("ReachName", "String", 5)],
+                      [(1, None, 1.0, 10.0, 100.0, "Reach 1"),
+                       (2, None, 3.0, 30.0, 300.0, "Reach 3"),
+                       (3, None, 3.0, 99.0, 999.0, "Reach 9")])
+
+# Test join keys and type coercion
+def test_join_key_matches_integer_and_float():
+    assert join_key(3) == join_key(3.0)
+    assert join_key(" A ") == "A"
+    assert join_key(float("nan")) is None
+
+def test_coerce_value():
+    assert coerce_value(2.6, "Integer") == 3
+    assert coerce_value("1.5", "Double") == 1.5
+    assert coerce_value(4.0, "String") == "4"
+    assert coerce_value("Reach 1", "String", 5) == "Reach"
+    assert coerce_value("x", "Double") is None
+
+def test_unique_field_names():
+    assert unique_field_names(["POINT_M", "Z", "z"],
+                              ["Seq", "point_m"]) == ["POINT_M_1", "Z",
+                                                      "z_1"]
+
+# Test joining tables
+def test_join_fields_selected():
+    xs, pts = xs_table(), point_table()
+    names = join_fields(xs, "Seq", pts, "Seq", MemoryTables(),
+                        fields = ["Z", "POINT_M"])
+    assert names == ["Z", "POINT_M_1"]
+    rows = list(MemoryTables().search(xs, ["Seq", "Z", "POINT_M_1"]))
+    # The first matching join row is used, and unmatched rows are None
+    assert rows == [(1, 100.0, 10.0), (2, None, None), (3, 300.0, 30.0)]
+
+def test_join_fields_all():
+    xs, pts = xs_table(), point_table()
+    names = join_fields(xs, "Seq", pts, "Seq", MemoryTables())
+    assert names == ["POINT_M_1", "Z", "ReachName"]
+    added = MemoryTables().fields(xs)[-1]
+    assert added == FieldDef("ReachName", "String", 5)
+
+def test_join_fields_missing_field():
+    with pytest.raises(ValueError):
+        join_fields(xs_table(), "Seq", point_table(), "Seq", MemoryTables(),
+                    fields = ["loop"])
@@ -0,0 +1,67 @@
+""" This file tests the scratch workspace manager in FG_scratch
+"""
+import os
+import pytest
+
+from FG_scratch import *
+
+# Define test parameters
+MB = 1024 ** 2
+
+def new_workspace(tmp_path, memory_bytes = 10 * MB):
+    deleted = []
+    scratch = ScratchWorkspace(memory_bytes = memory_bytes,
+                               root = str(tmp_path),
+                               delete = deleted.append,
+                               message = lambda m: None)
+    return scratch, deleted
+
+# Test routing datasets by the memory budget
+def test_path_routes_by_memory_budget(tmp_path):
+    scratch, deleted = new_workspace(tmp_path)
+    small = scratch.path("flowline_buffer", size = 6 * MB)
+    large = scratch.path("trend", size = 6 * MB)
+    assert small.startswith(MEMORY_WORKSPACE + os.sep)
+    assert os.path.dirname(large) == scratch.folder
+    assert scratch.memory_used == 6 * MB
+    # Datasets read by worker processes are always on disk
+    mask = scratch.path("banks_mask", on_disk = True)
+    assert os.path.dirname(mask) == scratch.folder
+
+def test_path_names_are_unique(tmp_path):
+    scratch, deleted = new_workspace(tmp_path, memory_bytes = 0)
+    first = scratch.path("xs_fc")
+    second = scratch.path("xs_fc")
+    assert first != second
+
+# Test cleanup
+def test_release_returns_budget(tmp_path):
+    scratch, deleted = new_workspace(tmp_path)
+    path = scratch.path("flowline_vertices", size = 8 * MB)
+    scratch.release(path)
+    assert deleted == [path]
+    assert scratch.memory_used == 0
+
+def test_cleanup_on_error(tmp_path):
+    deleted = []
+    with pytest.raises(RuntimeError):
+        with ScratchWorkspace(memory_bytes = 0, root = str(tmp_path),
+                              delete = deleted.append) as scratch:
+            a = scratch.path("a")
+            b = scratch.path("b")
+            folder = scratch.folder
+            raise RuntimeError("tool failed")
+    assert deleted == [b, a]
+    assert not os.path.exists(folder)
+
+def test_cleanup_continues_after_delete_error(tmp_path):
+    messages = []
+    def delete(path):
+        raise OSError("locked")
+    scratch = ScratchWorkspace(memory_bytes = 0, root = str(tmp_path),
+                               delete = delete, message = messages.append)
+    scratch.path("a")
+    scratch.path("b")
+    scratch.cleanup()
+    assert len(messages) == 2
+    assert scratch.folder is None
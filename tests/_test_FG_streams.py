@@ -0,0 +1,188 @@
+""" This file tests the stream network extraction functions in FG_streams
+"""
+import pytest
+import numpy as np
+
+from FG_streams import *
+
+# Define test parameters
+# A T shaped stream three cells wide: a channel along rows 2 - 4 joined by a
+# tributary down columns 3 - 5
+t_streams = np.zeros((12, 13), dtype = bool)
+t_streams[2:5, 0:13] = True
+t_streams[5:12, 3:6] = True
+
+def is_8_connected(cells):
+    # Flood fill from the first cell
+    cells = set(zip(*np.nonzero(cells)))
+    stack = [next(iter(cells))]
+    seen = set(stack)
+    while stack:
+        r, c = stack.pop()
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                n = (r + dr, c + dc)
+                if n in cells and n not in seen:
+                    seen.add(n)
+                    stack.append(n)
+    return seen == cells
+
+# Test threshold
+def test_threshold_streams_nodata():
+    sca = np.array([[1.0, 5.0], [np.nan, 4.0]])
+    np.testing.assert_array_equal(threshold_streams(sca, 4),
+                                  [[False, True], [False, True]])
+
+# Test thinning
+def test_thin_streams_one_cell_wide_and_connected():
+    skeleton = thin_streams(t_streams)
+    assert skeleton.sum() < t_streams.sum()
+    assert (skeleton <= t_streams).all()
+    assert is_8_connected(skeleton)
+    # No 2 x 2 blocks of skeleton cells remain
+    blocks = (skeleton[:-1, :-1] & skeleton[1:, :-1] &
+              skeleton[:-1, 1:] & skeleton[1:, 1:])
+    assert not blocks.any()
+
+def test_thin_streams_keeps_line():
+    line = np.zeros((5, 7), dtype = bool)
+    line[2, 1:6] = True
+    np.testing.assert_array_equal(thin_streams(line), line)
+
+# Test tracing
+def test_trace_streams_t_junction():
+    skeleton = thin_streams(t_streams)
+    segments = trace_streams(skeleton)
+    assert len(segments) == 3
+    count = neighbor_count(skeleton).ravel()
+    ends = [sorted([segment[0], segment[-1]],
+                   key = lambda cell: count[cell]) for segment in segments]
+    # Each segment runs from an endpoint to the same junction cell
+    assert [count[end[0]] for end in ends] == [1, 1, 1]
+    assert len(set(end[1] for end in ends)) == 1
+    assert count[ends[0][1]] >= 3
+    for segment in segments:
+        # Consecutive cells are 8-connected
+        rows, cols = np.divmod(segment, skeleton.shape[1])
+        assert (np.maximum(abs(np.diff(rows)), abs(np.diff(cols))) == 1).all()
+    # Every skeleton cell is in a segment
+    cells = np.unique(np.concatenate(segments))
+    np.testing.assert_array_equal(cells, np.flatnonzero(skeleton))
+
+def test_trace_streams_loop_and_edges():
+    # A ring of eight cells touching the edges of the grid
+    ring = np.array([[0, 1, 1, 0],
+                     [1, 0, 0, 1],
+                     [1, 0, 0, 1],
+                     [0, 1, 1, 0]], dtype = bool)
+    segments = trace_streams(ring)
+    assert len(segments) == 1
+    assert segments[0][0] == segments[0][-1]
+    assert len(segments[0]) == 9
+
+def test_trace_streams_ladder():
+    # Two diagonal streams one cell apart, joined by a tributary, so the
+    # cells between them form a ladder of junction cells
+    ladder = np.zeros((12, 14), dtype = bool)
+    for i in range(10):
+        ladder[1 + i, 1 + i] = True
+        ladder[1 + i, 3 + i] = True
+    ladder[0, 1:4] = True
+    skeleton = thin_streams(ladder)
+    segments = trace_streams(skeleton)
+    for segment in segments:
+        # Consecutive cells are 8-connected
+        rows, cols = np.divmod(segment, skeleton.shape[1])
+        assert (np.maximum(abs(np.diff(rows)), abs(np.diff(cols))) == 1).all()
+    # Every skeleton cell with a neighbor is in a segment
+    cells = np.unique(np.concatenate(segments))
+    np.testing.assert_array_equal(
+        cells, np.flatnonzero(skeleton & (neighbor_count(skeleton) > 0)))
+
+def test_cell_centers():
+    x, y = cell_centers(np.array([0, 7]), 5, 100.0, 200.0, 2.0, 2.0)
+    np.testing.assert_allclose(x, [101.0, 105.0])
+    np.testing.assert_allclose(y, [199.0, 197.0])
+
+# Test threshold sweeps
+def test_stream_levels():
+    sca = np.array([[50.0, 100.0, 499.0, 500.0, 5000.0, np.nan]])
+    levels = stream_levels(sca, [100, 500, 1000])
+    np.testing.assert_array_equal(levels, [[0, 1, 1, 2, 3, 0]])
+    # The network of each threshold is the cells with at least its level
+    for i, threshold in enumerate([100, 500, 1000]):
+        np.testing.assert_array_equal(levels >= i + 1,
+                                      threshold_streams(sca, threshold))
+
+def test_stream_levels_many_thresholds():
+    # More thresholds than a uint8 level can count
+    thresholds = np.arange(1.0, 301.0)
+    levels = stream_levels(np.array([[0.5, 255.0, 300.0]]), thresholds)
+    np.testing.assert_array_equal(levels, [[0, 255, 300]])
+    assert stream_levels(np.array([1.0]), [1.0]).dtype == np.uint8
+
+def test_split_segments_by_level():
+    levels = np.array([3, 1, 1, 2, 2, 3, 3, 1])
+    segment = np.arange(8)
+    pieces, piece_levels = split_segments([segment, np.array([0, 7])],
+                                          levels)
+    assert [p.tolist() for p in pieces] == [[0, 1, 2, 3], [3, 4, 5],
+                                            [5, 6, 7], [0, 7]]
+    assert piece_levels.tolist() == [1, 2, 3, 1]
+
+def test_sweep_network_filters_to_threshold():
+    # Contributing area increasing down a tributary and along the channel
+    sca = np.zeros((12, 13))
+    sca[2:5, :] = 1000 + np.arange(13) * 100
+    sca[5:12, 3:6] = np.arange(7, 0, -1)[:, None] * 100
+    levels = stream_levels(sca, [100, 1000])
+    pieces, piece_levels = split_segments(trace_streams(thin_streams(
+                                          levels > 0)), levels)
+    # The channel exists at both thresholds and the tributary only at the
+    # lower one
+    assert sorted(piece_levels.tolist()) == [1, 2, 2]
+    for piece, level in zip(pieces, piece_levels):
+        inner = sca.ravel()[piece[1:-1]]
+        assert ((inner >= 1000) == (level == 2)).all()
+
+# Test topology
+# Two headwater segments join into one, which joins a third headwater
+#   0 \
+#      2 -- 4
+#   1 /    /
+#         3
+topology_downstream = np.array([2, 2, 4, 4, -1])
+
+def test_orient_segments():
+    segments = [np.array([5, 6, 7]), np.array([9, 8])]
+    oriented, outlet = orient_segments(segments, np.array([1.0, 40.0]),
+                                       np.array([20.0, 30.0]))
+    assert [s.tolist() for s in oriented] == [[5, 6, 7], [8, 9]]
+    np.testing.assert_array_equal(outlet, [20.0, 40.0])
+
+def test_segment_topology():
+    segments = [np.array([0, 10, 20]), np.array([2, 11, 20]),
+                np.array([20, 30, 40]), np.array([44, 41, 40]),
+                np.array([40, 50])]
+    np.testing.assert_array_equal(segment_topology(segments),
+                                  topology_downstream)
+
+def test_segment_topology_braid_uses_highest_outlet():
+    segments = [np.array([0, 1]), np.array([1, 2]), np.array([1, 3])]
+    downstream = segment_topology(segments, np.array([1.0, 5.0, 9.0]))
+    assert downstream.tolist() == [2, -1, -1]
+
+def test_stream_order():
+    strahler, shreve = stream_order(topology_downstream)
+    assert strahler.tolist() == [1, 1, 2, 1, 2]
+    assert shreve.tolist() == [1, 1, 2, 1, 3]
+
+def test_stream_order_loop_is_zero():
+    # Segments 1 and 2 flow into each other
+    strahler, shreve = stream_order(np.array([1, 2, 1, -1]))
+    assert strahler.tolist() == [1, 0, 0, 1]
+    assert shreve.tolist() == [1, 0, 0, 1]
+
+def test_segment_lengths():
+    lengths = segment_lengths([np.array([0, 1, 8])], 6, 2.0, 3.0)
+    assert lengths[0] == pytest.approx(2.0 + np.hypot(2.0, 3.0))
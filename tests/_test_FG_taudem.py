@@ -0,0 +1,115 @@
+""" This file tests the TauDEM command runner in FG_taudem
+"""
+import os
+import sys
+import stat
+import pytest
+
+from FG_taudem import *
+
+# Define test parameters
+# A fake mpiexec that records each run in a log file, prints its arguments
+# and exits with the code given by the `-exit` argument
+fake_mpiexec = """#!{python}
+import sys
+with open(r"{log}", "a") as f:
+    f.write(" ".join(sys.argv[1:]) + "\\n")
+print("running " + sys.argv[3])
+sys.stderr.write("warning from " + sys.argv[3] + "\\n")
+if "-exit" in sys.argv:
+    sys.exit(int(sys.argv[sys.argv.index("-exit") + 1]))
+"""
+
+@pytest.fixture
+def mpiexec(tmp_path):
+    log = tmp_path / "runs.log"
+    path = tmp_path / "mpiexec"
+    path.write_text(fake_mpiexec.format(python = sys.executable, log = log))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path), log
+
+# Test commands
+def test_taudem_command():
+    cmd = taudem_command("pitremove", 4, ["-z", "dem.tif", "-fel", "fel.tif"])
+    assert cmd == ["mpiexec", "-n", "4", "pitremove",
+                   "-z", "dem.tif", "-fel", "fel.tif"]
+
+# Test running
+@pytest.mark.skipif(sys.platform == "win32", reason = "uses a shebang script")
+def test_run_taudem_runs_once(mpiexec):
+    path, log = mpiexec
+    messages = []
+    step = run_taudem(taudem_command("pitremove", 2, ["-z", "a b.tif"],
+                                     mpiexec = path),
+                      name = "PitRemove", message = messages.append)
+    assert log.read_text().splitlines() == ["-n 2 pitremove -z a b.tif"]
+    assert step.exit_code == 0
+    assert step.wall_time >= 0
+    assert "running pitremove" in messages
+    assert "warning from pitremove" in messages
+
+@pytest.mark.skipif(sys.platform == "win32", reason = "uses a shebang script")
+def test_run_taudem_fails_fast(mpiexec):
+    path, log = mpiexec
+    with pytest.raises(TauDEMError) as e:
+        run_taudem(taudem_command("AreaDinf", 1, ["-exit", "3"],
+                                  mpiexec = path),
+                   message = lambda m: None)
+    assert "exit code 3" in str(e.value)
+    assert "running AreaDinf" in str(e.value)
+
+def test_run_taudem_missing_executable():
+    with pytest.raises(TauDEMError):
+        run_taudem(["no_such_taudem_executable"], message = lambda m: None)
+
+# Test the cache
+def test_cache_key_depends_on_inputs_and_params():
+    key = cache_key("Threshold", [100], ["abc"])
+    assert key == cache_key("Threshold", [100], ["abc"])
+    assert key != cache_key("Threshold", [200], ["abc"])
+    assert key != cache_key("Threshold", [100], ["abd"])
+    assert key != cache_key("pitremove", [100], ["abc"])
+
+def test_file_digest(tmp_path):
+    a = tmp_path / "a.tif"
+    a.write_bytes(b"dem")
+    b = tmp_path / "b.tif"
+    b.write_bytes(b"dem")
+    assert file_digest(str(a)) == file_digest(str(b))
+
+def test_run_cached_step_skips_cached(tmp_path):
+    runs = []
+    def run(paths):
+        runs.append(1)
+        with open(paths["fel.tif"], "w") as f:
+            f.write("filled")
+    for i in range(2):
+        key, paths = run_cached_step(str(tmp_path), "pitremove", [], ["dem"],
+                                     ["fel.tif"], run, message = print)
+    assert len(runs) == 1
+    assert open(paths["fel.tif"]).read() == "filled"
+
+def test_run_cached_step_discards_failed_run(tmp_path):
+    def fail(paths):
+        open(paths["fel.tif"], "w").close()
+        raise TauDEMError("failed")
+    with pytest.raises(TauDEMError):
+        run_cached_step(str(tmp_path), "pitremove", [], ["dem"],
+                        ["fel.tif"], fail)
+    assert os.listdir(str(tmp_path)) == []
+
+def test_evict_cache_least_recently_used(tmp_path):
+    def run(paths):
+        with open(paths["out.tif"], "wb") as f:
+            f.write(b"x" * 100)
+    keys = []
+    for i in range(3):
+        key, paths = run_cached_step(str(tmp_path), "step", [i], [],
+                                     ["out.tif"], run, max_bytes = None)
+        complete = os.path.join(str(tmp_path), key, CACHE_COMPLETE)
+        os.utime(complete, (1000 + i, 1000 + i))
+        keys.append(key)
+    evicted = evict_cache(str(tmp_path), 250, keep = [keys[0]],
+                          message = lambda m: None)
+    assert evicted == [keys[1]]
+    assert sorted(os.listdir(str(tmp_path))) == sorted([keys[0], keys[2]])
@@ -0,0 +1,60 @@
+""" This file tests the tile scheduler in FG_tiles
+"""
+import functools
+import pytest
+import numpy as np
+
+from FG_grid import *
+from FG_tiles import *
+
+# Define test parameters
+# A random 90 x 70 elevation grid with a block of NoData cells, and a trend
+# surface that is NoData outside a band across the grid
+rng = np.random.default_rng(16)
+dem = rng.random((90, 70)) * 10 + np.arange(70)[None, :] * 0.5
+dem[40:44, 10:15] = np.nan
+trend = np.where(np.abs(np.arange(90)[:, None] - np.arange(70)[None, :]) < 20,
+                 dem * 0.9, np.nan)
+
+def read_grids(grids, row, col, n_rows, n_cols):
+    return [g[row:row + n_rows, col:col + n_cols] for g in grids]
+
+# Test tile windows
+def test_tile_windows_cover_grid_once():
+    covered = np.zeros((90, 70), dtype = int)
+    for tile in tile_windows(90, 70, 32, halo = 3):
+        covered[tile.row:tile.row + tile.n_rows,
+                tile.col:tile.col + tile.n_cols] += 1
+        assert tile.read_row == max(tile.row - 3, 0)
+        assert tile.read_row + tile.read_rows == min(tile.row + 32 + 3, 90)
+        assert tile.read_row + tile.inner_row == tile.row
+    assert (covered == 1).all()
+
+# Test running kernels over tiles
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_tiled_slope_matches_whole_grid(workers):
+    out = np.zeros(dem.shape, dtype = np.float32)
+    run_tiled(slope_degrees, functools.partial(read_grids, [dem]), out,
+              tile_size = 16, halo = 1, workers = workers,
+              kernel_args = (2.0, 2.0, 1.0))
+    expected = slope_degrees(dem, 2.0, 2.0, 1.0).astype(np.float32)
+    np.testing.assert_array_equal(out, expected)
+
+def test_run_tiled_detrend_matches_whole_grid():
+    out = np.zeros(dem.shape)
+    run_tiled(detrend_grid, functools.partial(read_grids, [dem, trend]), out,
+              tile_size = 25, halo = 12, kernel_args = (12,))
+    np.testing.assert_allclose(out, detrend_grid(dem, trend, 12),
+                               rtol = 1e-12, equal_nan = True)
+
+def test_run_tiled_water_surface_matches_whole_grid():
+    out = np.zeros(dem.shape)
+    run_tiled(water_surface_grid, functools.partial(read_grids, [dem]), out,
+              tile_size = 20, halo = 3, kernel_args = (20.0, 3))
+    np.testing.assert_array_equal(out, water_surface_grid(dem, 20.0, 3))
+
+def test_run_tiled_halo_too_small_differs():
+    out = np.zeros(dem.shape)
+    run_tiled(focal_mean, functools.partial(read_grids, [dem]), out,
+              tile_size = 20, halo = 0, kernel_args = (5,))
+    assert not np.allclose(out, focal_mean(dem, 5), equal_nan = True)
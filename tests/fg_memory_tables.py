@@ -0,0 +1,46 @@
+""" This module contains an in-memory stand-in for geodatabase tables, used to 
+test the table functions in FG_join and FG_calc without arcpy. 
+"""
+import contextlib
+
+from FG_join import FieldDef
+
+class MemoryTables(object):
+    """An in-memory stand-in for geodatabase tables: a table is a dictionary
+    of a list of FieldDef and a list of row lists."""
+    def fields(self, table):
+        return list(table["fields"])
+
+    def add_fields(self, table, fields):
+        table["fields"].extend(fields)
+        for row in table["rows"]:
+            row.extend([None] * len(fields))
+
+    def _index(self, table, names):
+        lookup = [f.name for f in table["fields"]]
+        return [lookup.index(name) for name in names]
+
+    def search(self, table, names):
+        index = self._index(table, names)
+        for row in table["rows"]:
+            yield tuple(row[i] for i in index)
+
+    @contextlib.contextmanager
+    def update(self, table, names):
+        index = self._index(table, names)
+        class Cursor(object):
+            def __iter__(cursor):
+                for row in table["rows"]:
+                    cursor.current = row
+                    yield [row[i] for i in index]
+            def updateRow(cursor, values):
+                for i, v in zip(index, values):
+                    cursor.current[i] = v
+        yield Cursor()
+
+
+def make_table(fields, rows):
+    """Returns a MemoryTables table from (name, type, length) field tuples and
+    row tuples."""
+    return {"fields": [FieldDef(*f) for f in fields],
+            "rows": [list(r) for r in rows]}
@@ -0,0 +1,147 @@
+"""____________________________________________________________________________
+Script Name:          FG_calc.py
+Description:          Contains a set of functions for calculating fields of a
+                      table from NumPy column arrays.
+Date:                 10/17/2026
+
+Usage:
+These functions do not depend on arcpy. The input fields of a table are read
+into NumPy arrays in one pass, the derived fields are calculated from the
+arrays with vectorized expressions, and every derived field is written back
+in one update pass. This replaces a sequence of
+`arcpy.management.CalculateField` calls, each of which evaluates its
+expression (or code block) row by row in its own pass over the table.
+
+Each expression is a (field name, function) pair. The function is called
+with a dictionary of the column arrays (the input fields and the fields
+calculated by earlier expressions) and returns an array or a single value
+for every row, e.g.:
+
+    [("calibration_diff", lambda c: c["POINT_M"] - c["POINT_M_uncalibrated"]),
+     ("POINT_M_units", "m")]
+
+A value that is not a function is used for every row. Missing numeric
+values are NaN in the arrays and are written as NULL.
+
+Tables are read and written through the table interface object described in
+FG_join.py (FG_utils.ArcpyTables is the arcpy version).
+
+Functions:
+column_array          -- Converts the values of a field to a NumPy array.
+evaluate_fields       -- Evaluates a list of field expressions on column
+                         arrays.
+calculate_fields      -- Calculates fields of a table from vectorized
+                         expressions with one read and one write pass.
+____________________________________________________________________________"""
+
+import numpy as np
+from FG_join import *
+
+NUMERIC_TYPES = INTEGER_TYPES + FLOAT_TYPES
+
+def column_array(values, field_type):
+    """
+    Converts the values of a field to a NumPy array.
+
+    Args:
+    values            -- (list) values of the field
+    field_type        -- (string) arcpy field type (e.g., "String",
+                         "Integer", "Double")
+
+    Returns:
+    numpy array. Numeric fields are float64 with missing values as NaN, other
+    fields are object arrays.
+    """
+    if field_type in NUMERIC_TYPES:
+        return np.array([np.nan if v is None else v for v in values],
+                        dtype = np.float64)
+    column = np.empty(len(values), dtype = object)
+    column[:] = values
+    return column
+
+
+def evaluate_fields(columns, expressions, n_rows):
+    """
+    Evaluates a list of field expressions on column arrays.
+
+    Args:
+    columns           -- (dictionary) of the column array of each input field
+    expressions       -- (list) of (field name, function or value) pairs,
+                         evaluated in order
+    n_rows            -- (int) number of rows
+
+    Returns:
+    dictionary of the column array of each calculated field
+    """
+    columns = dict(columns)
+    results = {}
+    for name, expression in expressions:
+        value = expression(columns) if callable(expression) else expression
+        if np.ndim(value) == 0:
+            column = np.empty(n_rows, dtype = object)
+            column[:] = [value] * n_rows
+            value = column
+        value = np.asarray(value)
+        if value.shape != (n_rows,):
+            raise ValueError("Expression of {} returned {} values for {} "
+                             "rows".format(name, value.size, n_rows))
+        columns[name] = value
+        results[name] = value
+    return results
+
+
+def calculate_fields(table, expressions, tables, inputs = (),
+                     new_fields = ()):
+    """
+    Calculates fields of a table from vectorized expressions with one read
+    and one write pass.
+
+    Args:
+    table             -- the table
+    expressions       -- (list) of (field name, function or value) pairs
+                         (see the module description)
+    tables            -- table interface object (see FG_join.py)
+    inputs            -- (list) names of the fields read into the column
+                         arrays. Names that are not fields of the table (e.g.,
+                         the "SHAPE@LENGTH" cursor token) are read as numbers.
+    new_fields        -- (list) of FieldDef of the calculated fields to add
+                         to the table if they do not exist
+
+    Returns:
+    dictionary of the column array of each calculated field
+    """
+    defs = {f.name.lower(): f for f in tables.fields(table)}
+    oid = next(f.name for f in defs.values() if f.type == "OID")
+    inputs = [name for name in inputs if name.lower() != oid.lower()]
+
+    # Read the input fields in one pass
+    rows = list(tables.search(table, [oid] + inputs))
+    oids = [row[0] for row in rows]
+    columns = {oid: np.array(oids, dtype = np.int64)}
+    for i, name in enumerate(inputs):
+        field = defs.get(name.lower())
+        columns[name] = column_array([row[i + 1] for row in rows],
+                                     field.type if field else "Double")
+
+    results = evaluate_fields(columns, expressions, len(rows))
+
+    # Add the missing fields
+    missing = [f for f in new_fields if f.name.lower() not in defs]
+    if missing:
+        tables.add_fields(table, missing)
+        defs.update({f.name.lower(): f for f in missing})
+
+    # Write the calculated fields in one pass
+    names = list(results)
+    types = [defs[name.lower()] for name in names]
+    values = [[coerce_value(v, f.type, f.length)
+               for v in results[name].tolist()]
+              for name, f in zip(names, types)]
+    position = {o: i for i, o in enumerate(oids)}
+    with tables.update(table, [oid] + names) as cursor:
+        for row in cursor:
+            i = position.get(row[0])
+            if i is None:
+                continue
+            cursor.updateRow([row[0]] + [column[i] for column in values])
+    return results
@@ -0,0 +1,450 @@
+"""____________________________________________________________________________
+Script Name:          FG_geometry.py
+Description:          Contains a set of NumPy functions for working with line
+                      geometry as coordinate arrays.
+Date:                 10/17/2026
+
+Usage:
+These functions do not depend on arcpy. Tools read feature geometry into
+coordinate arrays (see FG_utils.py), pass the arrays to these functions, and
+write the results back in a single cursor pass.
+
+Functions:
+cumulative_distance   -- Returns the distance along a line at each vertex.
+station_points        -- Returns the X, Y, and M values of regularly spaced
+                         stations along a line.
+transects             -- Returns the endpoints of transects placed
+                         perpendicular to a line at regular intervals.
+locate_points         -- Returns the distance along a line of the closest 
+                         location on the line to each point.
+monotonic_profile     -- Forces a profile of values along a line to increase 
+                         steadily in one direction.
+linear_distance       -- Converts a distance with a unit of measure (e.g., 
+                         "25 Meters") to the linear units of a coordinate 
+                         system.
+locate_points_within  -- Returns the distance along a line of each point 
+                         within a search radius of the line, using a grid 
+                         index of the line segments.
+calibrate_measures    -- Calibrates route measures to known measures at 
+                         calibration points by piecewise linear 
+                         interpolation.
+____________________________________________________________________________"""
+
+import numpy as np
+
+# The default XY tolerance of a projected coordinate system
+DEFAULT_XY_TOLERANCE = "0.001 Meters"
+
+# Length of each linear unit in meters
+LINEAR_UNITS = {"METERS":         1.0,
+                "KILOMETERS":     1000.0,
+                "MILES":          1609.344,
+                "NAUTICAL_MILES": 1852.0,
+                "FEET":           0.3048,
+                "US_SURVEY_FEET": 1200.0 / 3937.0}
+
+def cumulative_distance(x, y, part_starts = None):
+    """
+    Returns the distance along a line at each vertex.
+
+    Args:
+    x                 -- (numpy array) vertex x coordinates
+    y                 -- (numpy array) vertex y coordinates
+    part_starts       -- (list) indices of the first vertex of each part after
+                         the first in a multipart line. The gap between parts
+                         is not counted as distance along the line.
+
+    Returns:
+    numpy array of the cumulative distance at each vertex (in the linear
+    units of the coordinates). The first value is zero.
+    """
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    seg_length = np.hypot(np.diff(x), np.diff(y))
+    if part_starts is not None and len(part_starts) > 0:
+        seg_length[np.asarray(part_starts, dtype = np.int64) - 1] = 0.0
+    return np.concatenate(([0.0], np.cumsum(seg_length)))
+
+
+def station_points(x, y, station_distance, m_from = 0.0, m_to = None,
+                   part_starts = None):
+    """
+    Returns the X, Y, and M values of regularly spaced stations along a line.
+
+    Stations are placed every `station_distance` along the line beginning at
+    the first vertex. The last vertex is always included as a final station.
+    M-values increase linearly with distance along the line from `m_from` at
+    the first vertex to `m_to` at the last vertex, matching a route created
+    using two measure fields.
+
+    Args:
+    x                 -- (numpy array) vertex x coordinates
+    y                 -- (numpy array) vertex y coordinates
+    station_distance  -- (numeric) distance between stations (in the linear
+                         units of the coordinates)
+    m_from            -- (numeric) route measure at the first vertex
+    m_to              -- (numeric) route measure at the last vertex. If None,
+                         the measure is the distance along the line plus
+                         m_from.
+    part_starts       -- (list) indices of the first vertex of each part after
+                         the first in a multipart line.
+
+    Returns:
+    tuple of numpy arrays (station_x, station_y, station_m)
+    """
+    station_distance = float(station_distance)
+    if station_distance <= 0:
+        raise ValueError("station_distance must be greater than zero")
+
+    dist = cumulative_distance(x, y, part_starts)
+    length = dist[-1]
+
+    # Station positions along the line, always closing at the line end
+    stations = np.arange(0.0, length, station_distance)
+    if stations.size == 0 or stations[-1] < length:
+        stations = np.append(stations, length)
+
+    station_x = np.interp(stations, dist, x)
+    station_y = np.interp(stations, dist, y)
+
+    # Scale distance along the line to route measures
+    if m_to is None:
+        station_m = stations + m_from
+    elif length > 0:
+        station_m = m_from + stations * ((m_to - m_from) / length)
+    else:
+        station_m = np.full(stations.shape, float(m_from))
+
+    return station_x, station_y, station_m
+
+
+def transects(x, y, transect_spacing, transect_width,
+              split_at_vertices = False, part_starts = None, dist = None):
+    """
+    Returns the endpoints of transects placed perpendicular to a line.
+
+    The line is divided into intervals, either every `transect_spacing` along
+    the line or at each existing vertex. A transect is placed at the midpoint
+    of each interval, perpendicular to the chord from the start to the end of
+    the interval. Transects begin on the left side of the line (facing in the
+    direction the line is digitized) and end on the right side.
+
+    Args:
+    x                 -- (numpy array) vertex x coordinates
+    y                 -- (numpy array) vertex y coordinates
+    transect_spacing  -- (numeric) distance between transects along the line
+                         (in the linear units of the coordinates)
+    transect_width    -- (numeric) distance from the line to each end of the
+                         transect (in the linear units of the coordinates)
+    split_at_vertices -- (boolean) place a transect at the midpoint of each
+                         line segment rather than every transect_spacing
+    part_starts       -- (list) indices of the first vertex of each part after
+                         the first in a multipart line.
+    dist              -- (numpy array) cumulative distance at each vertex
+                         returned by `cumulative_distance`. Supply this to
+                         reuse the arc-length parameterization of a line
+                         across many layouts.
+
+    Returns:
+    dictionary of numpy arrays with the keys "x_start", "y_start", "x_end",
+    "y_end", "x_mid", "y_mid", and "azimuth" (degrees clockwise from north
+    of the interval chord)
+    """
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    if dist is None:
+        dist = cumulative_distance(x, y, part_starts)
+    length = dist[-1]
+
+    # Interval breaks along the line
+    if split_at_vertices:
+        breaks = np.unique(dist)
+    else:
+        transect_spacing = float(transect_spacing)
+        if transect_spacing <= 0:
+            raise ValueError("transect_spacing must be greater than zero")
+        breaks = np.arange(0.0, length, transect_spacing)
+        breaks = np.append(breaks, length)
+    breaks = breaks[np.concatenate(([True], np.diff(breaks) > 0))]
+    start, end = breaks[:-1], breaks[1:]
+    mid = (start + end) / 2.0
+
+    # Direction of each interval chord
+    dx = np.interp(end, dist, x) - np.interp(start, dist, x)
+    dy = np.interp(end, dist, y) - np.interp(start, dist, y)
+
+    # Use the direction of the segment containing the midpoint for intervals
+    # that begin and end at the same location (e.g., a closed loop)
+    flat = np.hypot(dx, dy) == 0
+    if flat.any():
+        seg = np.clip(np.searchsorted(dist, mid[flat]) - 1, 0, len(x) - 2)
+        dx[flat] = x[seg + 1] - x[seg]
+        dy[flat] = y[seg + 1] - y[seg]
+    chord = np.hypot(dx, dy)
+    chord[chord == 0] = 1.0
+    ux, uy = dx / chord, dy / chord
+
+    # Transects run from the left side to the right side of the line
+    x_mid = np.interp(mid, dist, x)
+    y_mid = np.interp(mid, dist, y)
+    width = float(transect_width)
+    return {"x_start": x_mid - uy * width,
+            "y_start": y_mid + ux * width,
+            "x_end":   x_mid + uy * width,
+            "y_end":   y_mid - ux * width,
+            "x_mid":   x_mid,
+            "y_mid":   y_mid,
+            "azimuth": np.degrees(np.arctan2(dx, dy)) % 360.0}
+
+
+def locate_points(x, y, px, py, part_starts = None, dist = None,
+                  chunk_size = 256):
+    """
+    Returns the distance along a line of the closest location on the line to
+    each point.
+
+    Each point is projected onto every segment of the line and the closest
+    projection is kept. Points are processed in chunks so memory use is
+    bounded by chunk_size times the number of segments.
+
+    Args:
+    x                 -- (numpy array) vertex x coordinates
+    y                 -- (numpy array) vertex y coordinates
+    px                -- (numpy array) point x coordinates
+    py                -- (numpy array) point y coordinates
+    part_starts       -- (list) indices of the first vertex of each part after
+                         the first in a multipart line.
+    dist              -- (numpy array) cumulative distance at each vertex
+                         returned by `cumulative_distance`
+    chunk_size        -- (int) number of points projected at a time
+
+    Returns:
+    tuple of numpy arrays (along, offset) of the distance along the line and
+    the distance from the line of each point
+    """
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    px = np.atleast_1d(np.asarray(px, dtype = np.float64))
+    py = np.atleast_1d(np.asarray(py, dtype = np.float64))
+    if dist is None:
+        dist = cumulative_distance(x, y, part_starts)
+
+    # Segment start points and vectors. Gaps between parts are not segments.
+    ax, ay = x[:-1], y[:-1]
+    vx, vy = np.diff(x), np.diff(y)
+    seg_len2 = vx * vx + vy * vy
+    is_gap = np.zeros(len(ax), dtype = bool)
+    if part_starts is not None and len(part_starts) > 0:
+        is_gap[np.asarray(part_starts, dtype = np.int64) - 1] = True
+    safe_len2 = np.where(seg_len2 > 0, seg_len2, 1.0)
+    seg_dist = np.diff(dist)
+
+    along = np.empty(len(px))
+    offset = np.empty(len(px))
+    for start in range(0, len(px), chunk_size):
+        cx = px[start:start + chunk_size, None]
+        cy = py[start:start + chunk_size, None]
+        t = np.clip(((cx - ax) * vx + (cy - ay) * vy) / safe_len2, 0.0, 1.0)
+        dx = ax + t * vx - cx
+        dy = ay + t * vy - cy
+        d2 = dx * dx + dy * dy
+        d2[:, is_gap] = np.inf
+        best = np.argmin(d2, axis = 1)
+        rows = np.arange(len(best))
+        along[start:start + chunk_size] = (dist[best] +
+                                           t[rows, best] * seg_dist[best])
+        offset[start:start + chunk_size] = np.sqrt(d2[rows, best])
+    return along, offset
+
+
+def monotonic_profile(values):
+    """
+    Forces a profile of values along a line to increase steadily in one
+    direction.
+
+    Drainage area can only increase downstream. The direction of increase is
+    taken from the ends of the profile, and each value is raised to the
+    largest value upstream of it. NaN values are ignored.
+
+    Args:
+    values            -- (numpy array) profile values ordered along the line
+
+    Returns:
+    numpy array of the monotonic profile values
+    """
+    values = np.asarray(values, dtype = np.float64)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return values.copy()
+    ends = values[valid]
+    filled = np.where(valid, values, -np.inf)
+    if ends[-1] >= ends[0]:
+        result = np.maximum.accumulate(filled)
+    else:
+        result = np.maximum.accumulate(filled[::-1])[::-1]
+    result[np.isneginf(result)] = np.nan
+    return result
+
+
+def linear_distance(text, meters_per_unit = 1.0):
+    """
+    Converts a distance with a unit of measure (e.g., "25 Meters") to the 
+    linear units of a coordinate system.
+
+    Args:
+    text              -- (string) a number optionally followed by a unit in
+                         LINEAR_UNITS (e.g., "25 Meters", "10 Feet", "3"). A
+                         number with no unit is in the linear units of the 
+                         coordinate system.
+    meters_per_unit   -- (numeric) length of the linear unit of the 
+                         coordinate system in meters
+
+    Returns:
+    float distance in the linear units of the coordinate system
+    """
+    words = str(text).split()
+    value = float(words[0])
+    unit = "_".join(words[1:]).upper()
+    if not unit or unit == "UNKNOWN":
+        return value
+    if unit not in LINEAR_UNITS and unit + "S" in LINEAR_UNITS:
+        unit = unit + "S"
+    if unit == "FOOT":
+        unit = "FEET"
+    return value * LINEAR_UNITS[unit] / meters_per_unit
+
+
+def locate_points_within(x, y, px, py, radius, part_starts = None, 
+                         dist = None):
+    """
+    Returns the distance along a line of each point within a search radius 
+    of the line, using a grid index of the line segments.
+
+    The line segments are indexed in a grid whose cells are the larger of 
+    the search radius and the median segment length, so a small radius does 
+    not register a segment in many cells. Each segment is sampled at steps 
+    of at most half a cell and indexed in the cell of each sample, so a 
+    segment is registered in about two cells per cell length. The closest 
+    location on a segment within `radius` of a point is then within two 
+    cells of the point, so each point is only projected onto the segments in 
+    the 5 x 5 cells around it rather than onto every segment of the line.
+
+    Args:
+    x                 -- (numpy array) vertex x coordinates
+    y                 -- (numpy array) vertex y coordinates
+    px                -- (numpy array) point x coordinates
+    py                -- (numpy array) point y coordinates
+    radius            -- (numeric) search radius (in the linear units of the 
+                         coordinates)
+    part_starts       -- (list) indices of the first vertex of each part after
+                         the first in a multipart line.
+    dist              -- (numpy array) cumulative distance at each vertex
+                         returned by `cumulative_distance`
+
+    Returns:
+    tuple of numpy arrays (along, offset) of the distance along the line and
+    the distance from the line of each point. Points farther than `radius` 
+    from the line are NaN.
+    """
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    px = np.atleast_1d(np.asarray(px, dtype = np.float64))
+    py = np.atleast_1d(np.asarray(py, dtype = np.float64))
+    radius = float(radius)
+    if dist is None:
+        dist = cumulative_distance(x, y, part_starts)
+    along = np.full(len(px), np.nan)
+    offset = np.full(len(px), np.nan)
+    if radius <= 0 or len(x) < 2:
+        return along, offset
+
+    # Index each segment in the grid cells of samples along it
+    keep = np.ones(len(x) - 1, dtype = bool)
+    if part_starts is not None and len(part_starts) > 0:
+        keep[np.asarray(part_starts, dtype = np.int64) - 1] = False
+    segs = np.flatnonzero(keep)
+    seg_len = np.hypot(x[segs + 1] - x[segs], y[segs + 1] - y[segs])
+    cell = max(radius, float(np.median(seg_len)) if segs.size else radius)
+    steps = np.ceil(seg_len / (cell / 2)).astype(np.int64) + 1
+    seg_of = np.repeat(segs, steps)
+    first = np.repeat(np.cumsum(steps) - steps, steps)
+    t = ((np.arange(seg_of.size) - first) / 
+         np.repeat(np.maximum(steps - 1, 1), steps))
+    sx = x[seg_of] + t * (x[seg_of + 1] - x[seg_of])
+    sy = y[seg_of] + t * (y[seg_of + 1] - y[seg_of])
+    x0, y0 = x.min(), y.min()
+    sc = np.floor((sx - x0) / cell).astype(np.int64)
+    sr = np.floor((sy - y0) / cell).astype(np.int64)
+    index = {}
+    for seg, r, c in set(zip(seg_of.tolist(), sr.tolist(), sc.tolist())):
+        index.setdefault((r, c), []).append(seg)
+
+    # Project each point onto the segments near it
+    pc = np.floor((px - x0) / cell).astype(np.int64)
+    pr = np.floor((py - y0) / cell).astype(np.int64)
+    for i in range(len(px)):
+        segs = [seg for r in range(pr[i] - 2, pr[i] + 3)
+                    for c in range(pc[i] - 2, pc[i] + 3)
+                    for seg in index.get((r, c), [])]
+        if not segs:
+            continue
+        segs = np.unique(segs)
+        vx, vy = x[segs + 1] - x[segs], y[segs + 1] - y[segs]
+        len2 = vx * vx + vy * vy
+        t = np.clip(((px[i] - x[segs]) * vx + (py[i] - y[segs]) * vy) / 
+                    np.where(len2 > 0, len2, 1.0), 0.0, 1.0)
+        d = np.hypot(x[segs] + t * vx - px[i], y[segs] + t * vy - py[i])
+        best = np.argmin(d)
+        if d[best] <= radius:
+            seg = segs[best]
+            along[i] = dist[seg] + t[best] * (dist[seg + 1] - dist[seg])
+            offset[i] = d[best]
+    return along, offset
+
+
+def calibrate_measures(m, cal_m, cal_measure):
+    """
+    Calibrates route measures to known measures at calibration points by 
+    piecewise linear interpolation.
+
+    This is the array equivalent of `arcpy.lr.CalibrateRoutes` using the 
+    "DISTANCE" method, interpolating between calibration points and 
+    extrapolating before the first and after the last. Measures between two 
+    calibration points are interpolated linearly by distance along the route. 
+    Measures beyond the end calibration points are extrapolated with the 
+    rate of the nearest pair of calibration points. With a single 
+    calibration point the measures are shifted to it.
+
+    Args:
+    m                 -- (numpy array) uncalibrated route measures of the 
+                         stations (proportional to distance along the route)
+    cal_m             -- (numpy array) uncalibrated route measures of the 
+                         calibration points
+    cal_measure       -- (numpy array) known measures of the calibration 
+                         points
+
+    Returns:
+    numpy array of the calibrated measure of each station. The measures are 
+    unchanged if there are no calibration points.
+    """
+    m = np.asarray(m, dtype = np.float64)
+    cal_m = np.asarray(cal_m, dtype = np.float64)
+    cal_measure = np.asarray(cal_measure, dtype = np.float64)
+    valid = ~(np.isnan(cal_m) | np.isnan(cal_measure))
+    cal_m, cal_measure = cal_m[valid], cal_measure[valid]
+    # Use the first calibration point at each route position
+    cal_m, first = np.unique(cal_m, return_index = True)
+    cal_measure = cal_measure[first]
+    if len(cal_m) == 0:
+        return m.copy()
+    if len(cal_m) == 1:
+        return m + (cal_measure[0] - cal_m[0])
+
+    calibrated = np.interp(m, cal_m, cal_measure)
+    before = m < cal_m[0]
+    rate = (cal_measure[1] - cal_measure[0]) / (cal_m[1] - cal_m[0])
+    calibrated[before] = cal_measure[0] + (m[before] - cal_m[0]) * rate
+    after = m > cal_m[-1]
+    rate = (cal_measure[-1] - cal_measure[-2]) / (cal_m[-1] - cal_m[-2])
+    calibrated[after] = cal_measure[-1] + (m[after] - cal_m[-1]) * rate
+    return calibrated
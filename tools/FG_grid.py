@@ -0,0 +1,676 @@
+"""____________________________________________________________________________
+Script Name:          FG_grid.py
+Description:          Contains a set of NumPy functions for working with
+                      raster grids as arrays.
+Date:                 10/17/2026
+
+Usage:
+These functions do not depend on arcpy. Grids are 2D numpy arrays whose first
+row is the top (north) row of the raster. NoData cells are represented as NaN
+in floating point grids. Rasters are read into grids and written back from
+grids by the functions in FG_raster.py.
+
+Functions:
+grid_position         -- Converts map coordinates to fractional row and column
+                         positions of a grid.
+sample_grid           -- Samples grid values at fractional row and column
+                         positions using nearest or bilinear resampling.
+block_ids             -- Assigns fractional row and column positions to the
+                         blocks of a grid.
+snap_to_max           -- Snaps positions to the highest valued cell within a
+                         search radius.
+cell_count_to_sq_mile -- Converts a count of grid cells to square miles.
+crosstab              -- Counts the cells of each class in each zone.
+block_statistics      -- Calculates the minimum, maximum, mean and standard
+                         deviation of a grid one block at a time.
+focal_mean            -- Calculates the mean of the cells within a circular
+                         neighborhood of each cell.
+slope_degrees         -- Calculates the slope of each cell of an elevation
+                         grid (in degrees).
+majority_filter       -- Replaces cells with the majority value of their
+                         eight neighbors.
+nearest_points        -- Finds the nearest points to each location.
+idw_points            -- Interpolates values at locations from the nearest
+                         points by inverse distance weighting.
+idw_grid              -- Interpolates the cells of a grid within a mask from
+                         points by inverse distance weighting.
+detrend_grid          -- Subtracts a smoothed trend surface from an elevation
+                         grid.
+water_surface_grid    -- Selects the cells below a detrended elevation and
+                         smooths the result.
+channel_slope_grid    -- Calculates the slope of the cells of an elevation
+                         grid within a mask.
+
+The last three are tile kernels (see FG_tiles.run_tiled). Each reads a halo of
+neighboring cells no wider than its neighborhood radius:
+detrend_grid          -- the focal mean radius
+water_surface_grid    -- 1 cell for each smoothing pass
+channel_slope_grid    -- 1 cell
+____________________________________________________________________________"""
+
+import numpy as np
+
+# Square meters in one square mile
+SQ_METERS_PER_SQ_MILE = 2589988.110336
+
+# Row and column offsets of the eight neighbors of a cell, in order around
+# the cell (clockwise from north)
+NEIGHBOR_RING = [(-1, 0), (-1, 1), (0, 1), (1, 1),
+                 (1, 0), (1, -1), (0, -1), (-1, -1)]
+
+# Largest number of location to point distances held in memory at once by
+# `nearest_points`
+MAX_DISTANCE_PAIRS = 4 * 1024 * 1024
+
+def grid_position(x, y, x_min, y_max, cell_width, cell_height):
+    """
+    Converts map coordinates to fractional row and column positions of a grid.
+
+    Positions are measured from the center of the upper left cell, so the
+    center of cell (row, col) has the position (row, col).
+
+    Args:
+    x                 -- (numpy array) point x coordinates
+    y                 -- (numpy array) point y coordinates
+    x_min             -- (numeric) left edge of the grid
+    y_max             -- (numeric) top edge of the grid
+    cell_width        -- (numeric) cell width
+    cell_height       -- (numeric) cell height
+
+    Returns:
+    tuple of numpy arrays (row, col)
+    """
+    col = (np.asarray(x, dtype = np.float64) - x_min) / cell_width - 0.5
+    row = (y_max - np.asarray(y, dtype = np.float64)) / cell_height - 0.5
+    return row, col
+
+
+def sample_grid(grid, row, col, method = "BILINEAR"):
+    """
+    Samples grid values at fractional row and column positions.
+
+    Positions outside the grid return NaN. Bilinear samples that touch a NaN
+    cell return NaN.
+
+    Args:
+    grid              -- (numpy array) 2D grid of values
+    row               -- (numpy array) fractional row positions
+    col               -- (numpy array) fractional column positions
+    method            -- (string) resampling method. One of "NEAREST" or
+                         "BILINEAR".
+
+    Returns:
+    numpy array of sampled values
+    """
+    grid = np.asarray(grid, dtype = np.float64)
+    row = np.asarray(row, dtype = np.float64)
+    col = np.asarray(col, dtype = np.float64)
+    n_rows, n_cols = grid.shape
+    values = np.full(row.shape, np.nan)
+
+    # Cells covering each position (the grid edge is half a cell from the
+    # center of the outermost cells)
+    inside = ((row >= -0.5) & (row < n_rows - 0.5) &
+              (col >= -0.5) & (col < n_cols - 0.5))
+
+    if method.upper() == "NEAREST":
+        r = np.floor(row[inside] + 0.5).astype(np.int64)
+        c = np.floor(col[inside] + 0.5).astype(np.int64)
+        values[inside] = grid[r, c]
+        return values
+
+    if method.upper() != "BILINEAR":
+        raise ValueError("method must be one of 'NEAREST' or 'BILINEAR'")
+
+    # Clamp positions to the cell centers of the grid so that points within
+    # half a cell of the edge use the edge cells
+    r = np.clip(row[inside], 0, n_rows - 1)
+    c = np.clip(col[inside], 0, n_cols - 1)
+    r0 = np.minimum(np.floor(r).astype(np.int64), max(n_rows - 2, 0))
+    c0 = np.minimum(np.floor(c).astype(np.int64), max(n_cols - 2, 0))
+    r1 = np.minimum(r0 + 1, n_rows - 1)
+    c1 = np.minimum(c0 + 1, n_cols - 1)
+    dr = r - r0
+    dc = c - c0
+    values[inside] = (grid[r0, c0] * (1 - dr) * (1 - dc) +
+                      grid[r0, c1] * (1 - dr) * dc +
+                      grid[r1, c0] * dr * (1 - dc) +
+                      grid[r1, c1] * dr * dc)
+    return values
+
+
+def block_ids(row, col, block_size):
+    """
+    Assigns fractional row and column positions to the blocks of a grid.
+
+    Args:
+    row               -- (numpy array) fractional row positions
+    col               -- (numpy array) fractional column positions
+    block_size        -- (int) number of rows and columns in each block
+
+    Returns:
+    tuple of numpy arrays (block_row, block_col)
+    """
+    block_row = np.floor(np.maximum(row, 0) / block_size).astype(np.int64)
+    block_col = np.floor(np.maximum(col, 0) / block_size).astype(np.int64)
+    return block_row, block_col
+
+
+def snap_to_max(grid, row, col, radius):
+    """
+    Snaps positions to the highest valued cell within a search radius.
+
+    All positions are snapped in one vectorized pass over the cells of a
+    circular search window. When several cells share the highest value, the
+    cell closest to the position is chosen. NaN cells are never chosen.
+
+    Args:
+    grid              -- (numpy array) 2D grid of values (e.g., flow
+                         accumulation)
+    row               -- (numpy array) fractional row positions
+    col               -- (numpy array) fractional column positions
+    radius            -- (numeric) search radius (in cells)
+
+    Returns:
+    tuple of numpy arrays (snap_row, snap_col, value) of the integer cell
+    position and value of the snapped cell. Positions with no valid cell in
+    the search window have the value NaN.
+    """
+    grid = np.asarray(grid, dtype = np.float64)
+    n_rows, n_cols = grid.shape
+    r = np.floor(np.asarray(row, dtype = np.float64) + 0.5).astype(np.int64)
+    c = np.floor(np.asarray(col, dtype = np.float64) + 0.5).astype(np.int64)
+
+    # Offsets of the cells in the search window, ordered from the center out
+    reach = int(np.floor(radius))
+    dr, dc = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+    dr, dc = dr.ravel(), dc.ravel()
+    dist = np.hypot(dr, dc)
+    keep = dist <= radius
+    order = np.argsort(dist[keep], kind = "stable")
+    dr, dc = dr[keep][order], dc[keep][order]
+
+    # Values of every candidate cell (positions by offsets)
+    cand_r = r[:, None] + dr[None, :]
+    cand_c = c[:, None] + dc[None, :]
+    valid = ((cand_r >= 0) & (cand_r < n_rows) &
+             (cand_c >= 0) & (cand_c < n_cols))
+    values = np.full(cand_r.shape, -np.inf)
+    values[valid] = grid[cand_r[valid], cand_c[valid]]
+    values[np.isnan(values)] = -np.inf
+
+    # The first maximum is the closest of the highest valued cells
+    best = np.argmax(values, axis = 1)
+    idx = np.arange(len(r))
+    value = values[idx, best]
+    value[np.isneginf(value)] = np.nan
+    return cand_r[idx, best], cand_c[idx, best], value
+
+
+def cell_count_to_sq_mile(cell_count, cell_width, cell_height,
+                          meters_per_unit = 1.0):
+    """
+    Converts a count of grid cells to square miles.
+
+    Args:
+    cell_count        -- (numeric or numpy array) number of cells
+    cell_width        -- (numeric) cell width (in linear units)
+    cell_height       -- (numeric) cell height (in linear units)
+    meters_per_unit   -- (numeric) meters per linear unit of the grid
+
+    Returns:
+    area in square miles
+    """
+    cell_area = (cell_width * meters_per_unit) * (cell_height * meters_per_unit)
+    return np.asarray(cell_count, dtype = np.float64) * (cell_area /
+                                                         SQ_METERS_PER_SQ_MILE)
+
+
+def crosstab(zone, cls, n_zones):
+    """
+    Counts the cells of each class in each zone.
+
+    The counts are calculated with a single `np.bincount` over the combined
+    zone and class codes.
+
+    Args:
+    zone              -- (numpy array) integer zone of each cell, from 0 (no
+                         zone) to n_zones
+    cls               -- (numpy array) class value of each cell. NaN cells
+                         are not counted.
+    n_zones           -- (int) number of zones
+
+    Returns:
+    tuple (classes, counts) of the sorted class values and a numpy array of
+    cell counts with a row for each zone (row 0 holds cells in no zone) and
+    a column for each class
+    """
+    zone = np.asarray(zone).ravel()
+    cls = np.asarray(cls, dtype = np.float64).ravel()
+    valid = ~np.isnan(cls)
+    classes, class_idx = np.unique(cls[valid], return_inverse = True)
+    codes = zone[valid].astype(np.int64) * len(classes) + class_idx
+    counts = np.bincount(codes, minlength = (n_zones + 1) * len(classes))
+    return classes, counts.reshape(n_zones + 1, len(classes))
+
+
+def block_statistics(grid, block_size = 4096):
+    """
+    Calculates the minimum, maximum, mean and standard deviation of a grid one
+    block at a time.
+
+    The count, sum and sum of squares of each block are combined, so grids
+    that do not fit in memory (e.g., a `np.memmap`) can be summarized.
+
+    Args:
+    grid              -- (numpy array) 2D grid of values. NaN cells are
+                         ignored.
+    block_size        -- (int) number of rows in each block
+
+    Returns:
+    tuple (minimum, maximum, mean, std). All are NaN if the grid has no
+    values.
+    """
+    count, total, squares = 0, 0.0, 0.0
+    minimum, maximum = np.inf, -np.inf
+    for row_start in range(0, grid.shape[0], block_size):
+        block = np.asarray(grid[row_start:row_start + block_size],
+                           dtype = np.float64)
+        block = block[~np.isnan(block)]
+        if block.size == 0:
+            continue
+        count += block.size
+        total += block.sum()
+        squares += np.square(block).sum()
+        minimum = min(minimum, block.min())
+        maximum = max(maximum, block.max())
+    if count == 0:
+        return np.nan, np.nan, np.nan, np.nan
+    mean = total / count
+    std = np.sqrt(max(squares / count - mean ** 2, 0.0))
+    return minimum, maximum, mean, std
+
+
+def focal_mean(grid, radius):
+    """
+    Calculates the mean of the cells within a circular neighborhood of each
+    cell.
+
+    This is the array equivalent of `arcpy.sa.FocalStatistics` with a
+    `NbrCircle(radius, "CELL")` neighborhood and the "Mean" statistic. A cell
+    is in the neighborhood if its center is within `radius` cells of the
+    center of the neighborhood. Each row of the circle is summed from the
+    cumulative sums of the grid rows, so the time is proportional to the
+    radius rather than its square.
+
+    Args:
+    grid              -- (numpy array) 2D grid of values. NaN cells are
+                         ignored.
+    radius            -- (int) radius of the neighborhood (in cells)
+
+    Returns:
+    float64 numpy array of the mean of each neighborhood. Cells with no
+    values in their neighborhood are NaN.
+    """
+    grid = np.asarray(grid, dtype = np.float64)
+    n_rows, n_cols = grid.shape
+    radius = int(radius)
+    valid = ~np.isnan(grid)
+
+    # Cumulative sums of each row, with a leading column of zeros
+    value_sums = np.pad(np.cumsum(np.where(valid, grid, 0.0), axis = 1),
+                        ((0, 0), (1, 0)))
+    count_sums = np.pad(np.cumsum(valid, axis = 1), ((0, 0), (1, 0)))
+
+    total = np.zeros(grid.shape)
+    count = np.zeros(grid.shape)
+    cols = np.arange(n_cols)
+    for dr in range(-radius, radius + 1):
+        # Half width of the circle in the row dr rows from its center
+        width = int(np.floor(np.sqrt(radius ** 2 - dr ** 2) + 1e-9))
+        left = np.clip(cols - width, 0, n_cols)
+        right = np.clip(cols + width + 1, 0, n_cols)
+        # Rows read, and the rows whose neighborhoods they are in
+        r0, r1 = max(dr, 0), n_rows + min(dr, 0)
+        if r0 >= r1:
+            continue
+        total[r0 - dr:r1 - dr] += (value_sums[r0:r1, right] -
+                                   value_sums[r0:r1, left])
+        count[r0 - dr:r1 - dr] += (count_sums[r0:r1, right] -
+                                   count_sums[r0:r1, left])
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        mean = total / count
+    mean[count == 0] = np.nan
+    return mean
+
+
+def slope_degrees(grid, cell_width, cell_height, z_factor = 1.0):
+    """
+    Calculates the slope of each cell of an elevation grid (in degrees).
+
+    This is the array equivalent of `arcpy.sa.Slope` with the "DEGREE"
+    output measurement. The slope is calculated from the 3 x 3 neighborhood
+    of each cell using the average maximum technique (Horn 1981). As with
+    `Slope`, NoData neighbors and neighbors outside the grid are given the
+    elevation of the center cell.
+
+    Args:
+    grid              -- (numpy array) 2D grid of elevations. NaN cells are
+                         NoData.
+    cell_width        -- (numeric) cell width
+    cell_height       -- (numeric) cell height
+    z_factor          -- (numeric) number of ground x,y units in one surface
+                         z unit
+
+    Returns:
+    float64 numpy array of slopes. NoData cells are NaN.
+    """
+    z = np.asarray(grid, dtype = np.float64)
+    n_rows, n_cols = z.shape
+    padded = np.pad(z, 1, constant_values = np.nan)
+
+    def neighbor(dr, dc):
+        values = padded[1 + dr:1 + dr + n_rows, 1 + dc:1 + dc + n_cols]
+        return np.where(np.isnan(values), z, values)
+
+    a, b, c = neighbor(-1, -1), neighbor(-1, 0), neighbor(-1, 1)
+    d, f = neighbor(0, -1), neighbor(0, 1)
+    g, h, i = neighbor(1, -1), neighbor(1, 0), neighbor(1, 1)
+    dz_dx = ((c + 2 * f + i) - (a + 2 * d + g)) / (8.0 * cell_width)
+    dz_dy = ((g + 2 * h + i) - (a + 2 * b + c)) / (8.0 * cell_height)
+    rise = float(z_factor) * np.hypot(dz_dx, dz_dy)
+    slope = np.degrees(np.arctan(rise))
+    slope[np.isnan(z)] = np.nan
+    return slope
+
+
+def majority_filter(grid):
+    """
+    Replaces cells with the majority value of their eight neighbors.
+
+    This is the array equivalent of one pass of `arcpy.sa.MajorityFilter`
+    with the "EIGHT" neighbors and "HALF" majority definition. A cell is
+    replaced by a value when at least half (four) of its neighbors have that
+    value, those neighbors are contiguous around the cell and they outnumber
+    the neighbors with the value of the cell (ties keep the value of the
+    cell).
+
+    Args:
+    grid              -- (numpy array) 2D grid of a few integer values, such
+                         as a 0/1 grid. NaN cells are NoData and are never
+                         replaced or used as a replacement.
+
+    Returns:
+    float64 numpy array of the filtered grid
+    """
+    grid = np.asarray(grid, dtype = np.float64)
+    n_rows, n_cols = grid.shape
+    padded = np.pad(grid, 1, constant_values = np.nan)
+    ring = np.stack([padded[1 + dr:1 + dr + n_rows, 1 + dc:1 + dc + n_cols]
+                     for dr, dc in NEIGHBOR_RING])
+    current = (ring == grid).sum(axis = 0)
+    filtered = grid.copy()
+    for value in np.unique(grid[~np.isnan(grid)]).tolist():
+        same = ring == value
+        count = same.sum(axis = 0)
+        # Number of separate runs of the value around the cell
+        runs = (same & ~np.roll(same, 1, axis = 0)).sum(axis = 0)
+        replace = ((grid != value) & ~np.isnan(grid) & (count >= 4) &
+                   (count > current) & (runs <= 1))
+        filtered[replace] = value
+    return filtered
+
+
+def nearest_points(px, py, x, y, n_points):
+    """
+    Finds the nearest points to each location.
+
+    The nearest points of the center of the locations are found first, in a
+    window around the center that is doubled until it holds them. By the
+    triangle inequality, the nearest points of every location are then 
+    within the distance of the farthest of them plus the diameter of the
+    locations from the center, so only the points within that circle are
+    candidates. Locations that are close together (e.g., a block of grid
+    cells) have few candidates, and the distances to the candidates are
+    calculated for a chunk of locations at a time.
+
+    Args:
+    px                -- (numpy array) point x coordinates
+    py                -- (numpy array) point y coordinates
+    x                 -- (numpy array) location x coordinates
+    y                 -- (numpy array) location y coordinates
+    n_points          -- (int) number of nearest points. Limited to the
+                         number of points.
+
+    Returns:
+    tuple of numpy arrays (distance, index) with one row for each location
+    and one unordered column for each of its nearest points
+    """
+    px = np.asarray(px, dtype = np.float64)
+    py = np.asarray(py, dtype = np.float64)
+    x = np.asarray(x, dtype = np.float64).ravel()
+    y = np.asarray(y, dtype = np.float64).ravel()
+    k = min(int(n_points), px.size)
+    if k == 0 or x.size == 0:
+        return (np.empty((x.size, 0)), np.empty((x.size, 0), dtype = np.int64))
+
+    # Already sorted points (e.g., from `idw_grid`) are sorted in linear time
+    order = np.argsort(px, kind = "stable")
+    sx, sy = px[order], py[order]
+
+    def within(center_x, center_y, radius):
+        # Indexes of the sorted points within a square around a center
+        lo = np.searchsorted(sx, center_x - radius, side = "left")
+        hi = np.searchsorted(sx, center_x + radius, side = "right")
+        inside = np.abs(sy[lo:hi] - center_y) <= radius
+        return lo + np.flatnonzero(inside)
+
+    # Distance to the k-th nearest point of the center, starting with the 
+    # expected spacing of k points
+    center_x, center_y = (x.min() + x.max()) / 2, (y.min() + y.max()) / 2
+    half = np.hypot(x.max() - x.min(), y.max() - y.min()) / 2
+    spread = max(sx[-1] - sx[0], sy.max() - sy.min())
+    window = max(spread * np.sqrt(k / px.size), 
+                 np.finfo(np.float64).eps * 
+                 max(1.0, abs(center_x), abs(center_y)))
+    while True:
+        near = within(center_x, center_y, window)
+        if near.size >= k:
+            kth = np.partition(np.hypot(sx[near] - center_x, 
+                                        sy[near] - center_y), k - 1)[k - 1]
+            if kth <= window or near.size == px.size:
+                break
+        window *= 2
+
+    # Candidate points within the circle that holds the nearest points of
+    # every location
+    radius = (2 * half + kth) * (1 + 1e-9)
+    candidates = within(center_x, center_y, radius)
+    cx, cy = sx[candidates], sy[candidates]
+    candidates = candidates[np.hypot(cx - center_x, cy - center_y) <= radius]
+    cx, cy = sx[candidates], sy[candidates]
+
+    distance = np.empty((x.size, k))
+    index = np.empty((x.size, k), dtype = np.int64)
+    chunk = max(MAX_DISTANCE_PAIRS // candidates.size, 1)
+    for start in range(0, x.size, chunk):
+        end = min(start + chunk, x.size)
+        d = np.hypot(x[start:end, None] - cx, y[start:end, None] - cy)
+        if k < candidates.size:
+            nearest = np.argpartition(d, k - 1, axis = 1)[:, :k]
+        else:
+            nearest = np.broadcast_to(np.arange(k), d.shape)
+        distance[start:end] = np.take_along_axis(d, nearest, axis = 1)
+        index[start:end] = order[candidates[nearest]]
+    return distance, index
+
+
+def idw_points(px, py, pz, x, y, n_points = 12, power = 2.0):
+    """
+    Interpolates values at locations from the nearest points by inverse
+    distance weighting.
+
+    This is the array equivalent of `arcpy.Idw_3d` with a "VARIABLE" search
+    radius of `n_points` points and no maximum distance. A location at a
+    point takes the value of the point.
+
+    Args:
+    px                -- (numpy array) point x coordinates
+    py                -- (numpy array) point y coordinates
+    pz                -- (numpy array) point values. NaN points are ignored.
+    x                 -- (numpy array) location x coordinates
+    y                 -- (numpy array) location y coordinates
+    n_points          -- (int) number of nearest points used for each
+                         location
+    power             -- (numeric) exponent of the inverse distance weights
+
+    Returns:
+    float64 numpy array of the value at each location. All values are NaN
+    if there are no points.
+    """
+    pz = np.asarray(pz, dtype = np.float64)
+    valid = ~np.isnan(pz)
+    px = np.asarray(px, dtype = np.float64)[valid]
+    py = np.asarray(py, dtype = np.float64)[valid]
+    pz = pz[valid]
+    x = np.asarray(x, dtype = np.float64).ravel()
+    if pz.size == 0:
+        return np.full(x.size, np.nan)
+
+    distance, index = nearest_points(px, py, x, y, n_points)
+    z = pz[index]
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        weight = 1.0 / distance ** power
+        values = (weight * z).sum(axis = 1) / weight.sum(axis = 1)
+
+    # Locations at a point take its value
+    closest = np.argmin(distance, axis = 1)
+    rows = np.arange(x.size)
+    at_point = distance[rows, closest] == 0
+    values[at_point] = z[rows, closest][at_point]
+    return values
+
+
+def idw_grid(mask, x_min, y_max, cell_width, cell_height, px, py, pz,
+             n_points = 12, power = 2.0, block_size = 16, out = None):
+    """
+    Interpolates the cells of a grid within a mask from points by inverse
+    distance weighting.
+
+    Only the cells of the mask are interpolated, one block at a time (see
+    `idw_points`), so the time is proportional to the area of the mask
+    rather than the grid. The points are sorted once, and each block finds
+    the nearest points of its cells among the points near the block.
+
+    Args:
+    mask              -- (numpy array) 2D grid that is NaN outside the mask
+    x_min             -- (numeric) left edge of the grid
+    y_max             -- (numeric) top edge of the grid
+    cell_width        -- (numeric) cell width
+    cell_height       -- (numeric) cell height
+    px                -- (numpy array) point x coordinates
+    py                -- (numpy array) point y coordinates
+    pz                -- (numpy array) point values. NaN points are ignored.
+    n_points          -- (int) number of nearest points used for each cell
+    power             -- (numeric) exponent of the inverse distance weights
+    block_size        -- (int) number of rows and columns in each block
+    out               -- (numpy array) 2D floating point output grid of the
+                         shape of the mask, such as a `np.memmap`. Defaults
+                         to a new float32 grid.
+
+    Returns:
+    the output grid, NaN outside the mask
+    """
+    if out is None:
+        out = np.empty(mask.shape, dtype = np.float32)
+    pz = np.asarray(pz, dtype = np.float64)
+    valid = ~np.isnan(pz)
+    px = np.asarray(px, dtype = np.float64)[valid]
+    order = np.argsort(px, kind = "stable")
+    px, pz = px[order], pz[valid][order]
+    py = np.asarray(py, dtype = np.float64)[valid][order]
+
+    n_rows, n_cols = mask.shape
+    for row in range(0, n_rows, block_size):
+        for col in range(0, n_cols, block_size):
+            block = ~np.isnan(np.asarray(mask[row:row + block_size,
+                                              col:col + block_size]))
+            values = np.full(block.shape, np.nan)
+            rows, cols = np.nonzero(block)
+            if rows.size:
+                x = x_min + (col + cols + 0.5) * cell_width
+                y = y_max - (row + rows + 0.5) * cell_height
+                values[rows, cols] = idw_points(px, py, pz, x, y,
+                                                n_points, power)
+            out[row:row + block.shape[0], col:col + block.shape[1]] = values
+    return out
+
+
+def detrend_grid(dem, trend, radius):
+    """
+    Subtracts a smoothed trend surface from an elevation grid.
+
+    The trend is smoothed with a circular focal mean, and the detrended
+    elevation is `dem - smoothed trend + 100`, as in the River Bathymetry
+    Toolkit. Cells outside the trend surface are NoData.
+
+    Args:
+    dem               -- (numpy array) 2D grid of elevations
+    trend             -- (numpy array) 2D grid of trend surface elevations.
+                         NaN outside the area to be detrended.
+    radius            -- (int) radius of the focal mean (in cells)
+
+    Returns:
+    float64 numpy array of detrended elevations
+    """
+    trend = np.asarray(trend, dtype = np.float64)
+    detrend = np.asarray(dem, dtype = np.float64) - focal_mean(trend, radius)
+    detrend += 100.0
+    detrend[np.isnan(trend)] = np.nan
+    return detrend
+
+
+def water_surface_grid(detrend, detrend_value, smoothing):
+    """
+    Selects the cells below a detrended elevation and smooths the result.
+
+    Cells below `detrend_value` are 1 and all other cells are 0. The grid is
+    then smoothed by `smoothing` passes of `majority_filter`.
+
+    Args:
+    detrend           -- (numpy array) 2D grid of detrended elevations
+    detrend_value     -- (numeric) detrended elevation of the water surface
+    smoothing         -- (int) number of majority filter passes
+
+    Returns:
+    float64 numpy array of 0 and 1. NoData cells are NaN.
+    """
+    detrend = np.asarray(detrend, dtype = np.float64)
+    with np.errstate(invalid = "ignore"):
+        banks = np.where(detrend >= float(detrend_value), 0.0, 1.0)
+    banks[np.isnan(detrend)] = np.nan
+    for i in range(int(smoothing)):
+        banks = majority_filter(banks)
+    return banks
+
+
+def channel_slope_grid(dem, mask, cell_width, cell_height, z_factor = 1.0):
+    """
+    Calculates the slope of the cells of an elevation grid within a mask.
+
+    As with an analysis mask, cells outside the mask are NoData before the
+    slope is calculated (see `slope_degrees`).
+
+    Args:
+    dem               -- (numpy array) 2D grid of elevations
+    mask              -- (numpy array) 2D grid that is NaN outside the mask
+    cell_width        -- (numeric) cell width
+    cell_height       -- (numeric) cell height
+    z_factor          -- (numeric) number of ground x,y units in one surface
+                         z unit
+
+    Returns:
+    float64 numpy array of slopes (in degrees)
+    """
+    dem = np.where(np.isnan(mask), np.nan, np.asarray(dem, dtype = np.float64))
+    return slope_degrees(dem, cell_width, cell_height, z_factor)
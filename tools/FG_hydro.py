@@ -0,0 +1,900 @@
+"""____________________________________________________________________________
+Script Name:          FG_hydro.py
+Description:          Contains a set of NumPy functions for hydrologic
+                      analysis of raster grids.
+Date:                 10/17/2026
+
+Usage:
+These functions do not depend on arcpy. Grids are 2D numpy arrays whose first
+row is the top (north) row of the raster (see FG_grid.py). Many functions
+work on the flattened (row major) cell index of a grid, so cell (row, col)
+has the index row * n_cols + col.
+
+D-infinity flow angles follow TauDEM (Tarboton, 1997): radians counter
+clockwise from east, from 0 to 2 pi.
+
+D8 flow directions use the ArcGIS encoding:
+
+    32  64  128
+    16   x    1
+     8   4    2
+
+Functions:
+cell_index_dtype      -- Returns the smallest integer type that holds the
+                         index of every cell of a grid.
+d8_downstream         -- Returns the index of the downstream cell of every
+                         cell of a D8 flow direction grid.
+label_watersheds      -- Labels the watershed of every pour point in one pass
+                         over a D8 flow direction grid.
+watershed_parents     -- Returns the next pour point downstream of each pour
+                         point (the nested watershed hierarchy).
+accumulate_nested     -- Adds the values of nested watersheds to every
+                         watershed downstream of them.
+watershed_roots       -- Returns the outermost watershed (independent
+                         sub-basin) that contains each watershed.
+partition_basins      -- Assigns independent sub-basins to groups of similar
+                         size for parallel processing.
+fill_depressions      -- Fills the depressions of a DEM grid by
+                         priority-flood.
+fill_depressions_tiled -- Fills the depressions of a DEM grid one tile at a
+                         time, for grids larger than memory.
+d8_flow_direction     -- Calculates D8 flow directions of a DEM grid using
+                         array shifts.
+d8_flow_accumulation  -- Calculates D8 flow accumulation by a topological
+                         sweep from the ridges downstream.
+dinf_flow_direction   -- Calculates D-infinity flow angles and slopes of a
+                         DEM grid from its triangular facets.
+dinf_contributing_area -- Calculates D-infinity specific catchment area by a
+                         topological sweep from the ridges downstream.
+dinf_flow_direction_tiled -- Calculates D-infinity flow angles and slopes one
+                         tile at a time, for grids larger than memory.
+dinf_contributing_area_tiled -- Calculates D-infinity specific catchment area
+                         one tile at a time, for grids larger than memory.
+____________________________________________________________________________"""
+
+import heapq
+from collections import deque
+import numpy as np
+
+# D-infinity facets: (row, col) offsets of the orthogonal (e1) and diagonal
+# (e2) corners of each triangular facet, and the multiple of pi / 2 (ac) and
+# sign (af) that convert the facet angle to the flow angle
+DINF_E1 = np.array([[0, 1], [-1, 0], [-1, 0], [0, -1],
+                    [0, -1], [1, 0], [1, 0], [0, 1]])
+DINF_E2 = np.array([[-1, 1], [-1, 1], [-1, -1], [-1, -1],
+                    [1, -1], [1, -1], [1, 1], [1, 1]])
+DINF_AC = np.array([0, 1, 1, 2, 2, 3, 3, 4])
+DINF_AF = np.array([1, -1, 1, -1, 1, -1, 1, -1])
+
+# (row, col) offsets of the neighbors counter clockwise from east
+DINF_OFFSETS = np.array([[0, 1], [-1, 1], [-1, 0], [-1, -1],
+                         [0, -1], [1, -1], [1, 0], [1, 1]])
+
+# ArcGIS D8 flow direction codes and the (row, col) offset of each direction
+D8_CODES = np.array([1, 2, 4, 8, 16, 32, 64, 128])
+D8_OFFSETS = np.array([[ 0,  1], [ 1,  1], [ 1,  0], [ 1, -1],
+                       [ 0, -1], [-1, -1], [-1,  0], [-1,  1]])
+
+def cell_index_dtype(n_cells):
+    """
+    Returns the smallest NumPy integer type that holds the flattened index of
+    every cell of a grid (int32 for grids of fewer than 2**31 cells).
+    """
+    return np.int32 if n_cells < np.iinfo(np.int32).max else np.int64
+
+
+def d8_downstream(fdr):
+    """
+    Returns the index of the downstream cell of every cell of a D8 flow
+    direction grid.
+
+    Args:
+    fdr               -- (numpy array) 2D grid of ArcGIS D8 flow direction
+                         codes. Cells with other values (e.g., 0 or NoData)
+                         do not flow.
+
+    Returns:
+    numpy array of the flattened index of the downstream cell of each cell
+    (int32 unless the grid has too many cells, see `cell_index_dtype`).
+    Cells that do not flow, or that flow off the grid, are -1.
+    """
+    fdr = np.asarray(fdr)
+    n_rows, n_cols = fdr.shape
+    flat = fdr.ravel()
+    downstream = np.full(fdr.size, -1, dtype = cell_index_dtype(fdr.size))
+    for code, (dr, dc) in zip(D8_CODES, D8_OFFSETS):
+        src = np.flatnonzero(flat == code)
+        r = src // n_cols + dr
+        c = src % n_cols + dc
+        on_grid = (r >= 0) & (r < n_rows) & (c >= 0) & (c < n_cols)
+        downstream[src[on_grid]] = r[on_grid] * n_cols + c[on_grid]
+    return downstream
+
+
+def label_watersheds(downstream, pour_cells, labels, max_iterations = 64):
+    """
+    Labels the watershed of every pour point in one pass over a D8 flow
+    direction grid.
+
+    Each cell is labeled with the first pour point found by following flow
+    downstream from the cell. Watersheds of pour points nested inside another
+    watershed are labeled with the upstream pour point, so each label covers
+    only the area draining to its pour point and not to any pour point
+    upstream of it. Labels are found for all cells at once by pointer jumping
+    along the downstream links, which takes a number of vectorized passes
+    proportional to the logarithm of the longest flow path.
+
+    Args:
+    downstream        -- (numpy array) downstream cell index of each cell
+                         returned by `d8_downstream`
+    pour_cells        -- (numpy array) flattened cell index of each pour point
+    labels            -- (numpy array) positive integer label of each pour
+                         point
+    max_iterations    -- (int) maximum number of pointer jumping passes
+
+    Returns:
+    numpy array of the label of each cell, of the integer type of `labels`.
+    Cells that do not drain to a pour point are 0.
+    """
+    labels = np.asarray(labels)
+    if not np.issubdtype(labels.dtype, np.integer):
+        labels = labels.astype(np.int64)
+    label = np.zeros(len(downstream), dtype = labels.dtype)
+    # Where several pour points share a cell the first one keeps the cell
+    pour_cells = np.asarray(pour_cells, dtype = np.int64)
+    label[pour_cells[::-1]] = labels[::-1]
+
+    nxt = downstream.copy()
+    nxt[label > 0] = -1
+    for i in range(max_iterations):
+        active = np.flatnonzero(nxt >= 0)
+        if active.size == 0:
+            break
+        target = nxt[active]
+        target_next = nxt[target]
+        # Take the label of the downstream cell once it is labeled
+        found = label[target] > 0
+        label[active[found]] = label[target[found]]
+        nxt[active[found]] = -1
+        # Otherwise jump to the downstream cell's downstream cell
+        nxt[active[~found]] = target_next[~found]
+    return label
+
+
+def watershed_parents(downstream, label, pour_cells):
+    """
+    Returns the next pour point downstream of each pour point.
+
+    The parent of a pour point is the label of the cell immediately
+    downstream of it, which is the watershed that it is nested in.
+
+    Args:
+    downstream        -- (numpy array) downstream cell index of each cell
+                         returned by `d8_downstream`
+    label             -- (numpy array) label of each cell returned by
+                         `label_watersheds`
+    pour_cells        -- (numpy array) flattened cell index of each pour point
+
+    Returns:
+    numpy array of the parent label of each pour point. Pour points that are
+    not nested are 0.
+    """
+    pour_cells = np.asarray(pour_cells, dtype = np.int64)
+    below = downstream[pour_cells]
+    parents = np.zeros(len(pour_cells), dtype = label.dtype)
+    flows = below >= 0
+    parents[flows] = label[below[flows]]
+    return parents
+
+
+def accumulate_nested(values, labels, parents):
+    """
+    Adds the values of nested watersheds to every watershed downstream of
+    them.
+
+    Values tabulated over the labels from `label_watersheds` describe only
+    the area draining directly to each pour point. This converts them to
+    values for the full watershed of each pour point without re-tabulating
+    the overlapping areas.
+
+    Args:
+    values            -- (numpy array) values of each watershed label, with a
+                         row for each label (e.g., landcover cell counts)
+    labels            -- (numpy array) label of each row of values
+    parents           -- (numpy array) parent label of each row returned by
+                         `watershed_parents` (0 if not nested)
+
+    Returns:
+    numpy array of the accumulated values
+    """
+    totals = np.array(values, dtype = np.float64, copy = True)
+    row = {label: i for i, label in enumerate(np.asarray(labels).tolist())}
+    parent_row = np.array([row.get(p, -1) for p in np.asarray(parents).tolist()],
+                          dtype = np.int64)
+
+    # Depth of each watershed in the hierarchy
+    depth = np.zeros(len(parent_row), dtype = np.int64)
+    up = parent_row.copy()
+    for i in range(len(parent_row)):
+        nested = up >= 0
+        if not nested.any():
+            break
+        depth[nested] += 1
+        up[nested] = parent_row[up[nested]]
+
+    # Add each watershed to its parent, most deeply nested first
+    for i in np.argsort(-depth, kind = "stable"):
+        if parent_row[i] >= 0:
+            totals[parent_row[i]] += totals[i]
+    return totals
+
+
+def watershed_roots(labels, parents):
+    """
+    Returns the outermost watershed (independent sub-basin) that contains each
+    watershed.
+
+    Watersheds with different roots do not overlap, so they can be processed
+    independently of each other.
+
+    Args:
+    labels            -- (numpy array) label of each watershed
+    parents           -- (numpy array) parent label of each watershed returned
+                         by `watershed_parents` (0 if not nested)
+
+    Returns:
+    numpy array of the root label of each watershed
+    """
+    labels = np.asarray(labels, dtype = np.int64)
+    row = {label: i for i, label in enumerate(labels.tolist())}
+    up = np.array([row.get(p, -1) for p in np.asarray(parents).tolist()],
+                  dtype = np.int64)
+    root = np.arange(len(labels))
+    for i in range(len(labels)):
+        nested = up[root] >= 0
+        if not nested.any():
+            break
+        root[nested] = up[root[nested]]
+    return labels[root]
+
+
+def partition_basins(roots, sizes, n_groups):
+    """
+    Assigns independent sub-basins to groups of similar size for parallel
+    processing.
+
+    Basins are assigned largest first to the group with the smallest total
+    size. Ties are broken by the basin label and group number, so the same
+    inputs always produce the same groups.
+
+    Args:
+    roots             -- (numpy array) label of each independent sub-basin
+    sizes             -- (numpy array) size of each sub-basin (e.g., number of
+                         cells)
+    n_groups          -- (int) number of groups
+
+    Returns:
+    numpy array of the group number of each sub-basin
+    """
+    roots = np.asarray(roots, dtype = np.int64)
+    sizes = np.asarray(sizes, dtype = np.float64)
+    group = np.zeros(len(roots), dtype = np.int64)
+    totals = np.zeros(max(int(n_groups), 1))
+    for i in np.lexsort((roots, -sizes)):
+        g = int(np.argmin(totals))
+        group[i] = g
+        totals[g] += sizes[i]
+    return group
+
+
+def _priority_flood(dem, seeds, epsilon = 0.0):
+    """
+    Floods a DEM grid inward from seed cells in order of elevation.
+
+    Args:
+    dem               -- (numpy array) 2D grid of elevations. NaN cells are
+                         NoData.
+    seeds             -- (numpy array) 2D grid of the fixed filled elevation
+                         of each seed cell. Other cells are NaN.
+    epsilon           -- (numeric) elevation added to each filled cell above
+                         the cell it was flooded from
+
+    Returns:
+    numpy array of the filled elevations. Cells not reached from a seed are
+    inf and NoData cells are NaN.
+    """
+    n_rows, n_cols = dem.shape
+    elev = dem.ravel().tolist()
+    filled = np.where(np.isnan(dem), np.nan, np.inf).ravel()
+    closed = (np.isnan(dem) | ~np.isnan(seeds)).ravel().tolist()
+
+    seed_cells = np.flatnonzero(~np.isnan(seeds.ravel()))
+    filled[seed_cells] = seeds.ravel()[seed_cells]
+    heap = list(zip(filled[seed_cells].tolist(), seed_cells.tolist()))
+    heapq.heapify(heap)
+    out = filled.tolist()
+    # Cells raised to the level of a depression's spill point are processed
+    # in first in, first out order without the cost of the heap
+    pit = deque()
+    offsets = D8_OFFSETS.tolist()
+    while heap or pit:
+        if pit:
+            c = pit.popleft()
+            level = out[c]
+        else:
+            level, c = heapq.heappop(heap)
+        r, col = divmod(c, n_cols)
+        for dr, dc in offsets:
+            nr = r + dr
+            nc = col + dc
+            if nr < 0 or nr >= n_rows or nc < 0 or nc >= n_cols:
+                continue
+            n = nr * n_cols + nc
+            if closed[n]:
+                continue
+            closed[n] = True
+            if elev[n] <= level:
+                out[n] = level + epsilon
+                if epsilon == 0:
+                    pit.append(n)
+                else:
+                    heapq.heappush(heap, (out[n], n))
+            else:
+                out[n] = elev[n]
+                heapq.heappush(heap, (out[n], n))
+    return np.array(out).reshape(dem.shape)
+
+
+def _edge_cells(valid):
+    """
+    Returns the valid cells of a grid on its edge or next to a NoData cell.
+    """
+    padded = np.pad(valid, 1, mode = "constant", constant_values = False)
+    n_rows, n_cols = valid.shape
+    edge = np.zeros(valid.shape, dtype = bool)
+    for dr, dc in D8_OFFSETS:
+        edge |= ~padded[1 + dr:1 + dr + n_rows, 1 + dc:1 + dc + n_cols]
+    return edge & valid
+
+
+def fill_depressions(dem, epsilon = 0.0):
+    """
+    Fills the depressions of a DEM grid by priority-flood.
+
+    Cells on the edge of the grid or next to NoData cells drain out of the
+    grid. Every other cell is raised to the lowest level from which it can
+    drain to one of these cells through its eight neighbors (Barnes et al.,
+    2014, Priority-Flood). With an epsilon of 0 the filled depressions are
+    flat, as with TauDEM pitremove and arcpy.sa.Fill. A positive epsilon
+    raises each filled cell above the cell it drains to, so that every cell
+    has a downslope neighbor.
+
+    Args:
+    dem               -- (numpy array) 2D grid of elevations. NaN cells are
+                         NoData.
+    epsilon           -- (numeric) elevation gradient added across filled
+                         cells. It must be large enough to change the
+                         elevations at the precision of the grid.
+
+    Returns:
+    numpy array of the filled elevations
+    """
+    dem = np.asarray(dem, dtype = np.float64)
+    seeds = np.where(_edge_cells(~np.isnan(dem)), dem, np.nan)
+    return _priority_flood(dem, seeds, epsilon)
+
+
+def fill_depressions_tiled(dem, filled, tile_size = 1024, epsilon = 0.0,
+                           max_floods = None):
+    """
+    Fills the depressions of a DEM grid one tile at a time, for grids larger
+    than memory.
+
+    The filled elevation of each cell is the lowest level from which it can
+    drain out of the grid, which depends only on its neighbors. Each tile is
+    flooded from its cells on the edge of the grid and from the current
+    filled elevations of the ring of cells around it. When the filled
+    elevations of a tile change, the tiles around it are flooded again. This
+    is repeated until no tile changes, which gives the same result as
+    `fill_depressions`. Only one tile and its ring are in memory at a time.
+
+    Args:
+    dem               -- (numpy array) 2D grid of elevations, such as a
+                         `np.memmap`. NaN cells are NoData.
+    filled            -- (numpy array) 2D floating point grid of the same
+                         shape to write the filled elevations to, such as a
+                         `np.memmap`
+    tile_size         -- (int) number of rows and columns in each tile
+    epsilon           -- (numeric) elevation gradient added across filled
+                         cells (see `fill_depressions`)
+    max_floods        -- (int) maximum number of tile floods. Defaults to 100
+                         times the number of tiles.
+
+    Returns:
+    (int) the number of tile floods
+    """
+    n_rows, n_cols = dem.shape
+    tiles = [(r, c) for r in range(0, n_rows, tile_size)
+                    for c in range(0, n_cols, tile_size)]
+    if max_floods is None:
+        max_floods = 100 * len(tiles)
+    for r, c in tiles:
+        tile = np.asarray(dem[r:r + tile_size, c:c + tile_size],
+                          dtype = np.float64)
+        filled[r:r + tile_size, c:c + tile_size] = np.where(np.isnan(tile),
+                                                            np.nan, np.inf)
+
+    # When a tile changes, the tiles around it are queued again because
+    # their rings changed
+    queue = deque(tiles)
+    queued = set(tiles)
+    floods = 0
+    while queue:
+        if floods >= max_floods:
+            raise RuntimeError("Depression filling did not converge")
+        r, c = queue.popleft()
+        queued.discard((r, c))
+        floods += 1
+
+        # The tile and the ring of cells around it
+        r0, c0 = max(r - 1, 0), max(c - 1, 0)
+        r1 = min(r + tile_size + 1, n_rows)
+        c1 = min(c + tile_size + 1, n_cols)
+        window = np.asarray(dem[r0:r1, c0:c1], dtype = np.float64)
+        level = np.asarray(filled[r0:r1, c0:c1], dtype = np.float64)
+        inner = np.zeros(window.shape, dtype = bool)
+        inner[r - r0:r - r0 + tile_size, c - c0:c - c0 + tile_size] = True
+
+        # Tile cells on the edge of the grid or next to NoData drain out at
+        # their elevation. Every neighbor of a tile cell is inside the
+        # window, so window edges are grid edges for the tile cells.
+        seeds = np.full(window.shape, np.nan)
+        drains = inner & _edge_cells(~np.isnan(window))
+        seeds[drains] = window[drains]
+        # Ring cells drain at their current filled elevation. Ring cells that
+        # are not reached yet are left out of the flood.
+        ring = ~inner & ~np.isnan(window) & np.isfinite(level)
+        seeds[ring] = level[ring]
+        flood_dem = np.where(inner | ring, window, np.nan)
+
+        result = _priority_flood(flood_dem, seeds, epsilon)[inner]
+        # Compare at the precision of the output grid so that rounding does
+        # not keep changing the tile
+        result = result.astype(filled.dtype)
+        if np.array_equal(result, level[inner].astype(filled.dtype),
+                          equal_nan = True):
+            continue
+        filled[r:r + tile_size, c:c + tile_size] = result.reshape(
+                                                min(tile_size, n_rows - r),
+                                                min(tile_size, n_cols - c))
+        for near in [(r + dr, c + dc) for dr in (-tile_size, 0, tile_size)
+                                      for dc in (-tile_size, 0, tile_size)]:
+            if (0 <= near[0] < n_rows and 0 <= near[1] < n_cols and
+                near != (r, c) and near not in queued):
+                queue.append(near)
+                queued.add(near)
+    return floods
+
+
+def _shift(grid, dr, dc, fill):
+    """
+    Returns the value of the (dr, dc) neighbor of every cell of a grid.
+    """
+    n_rows, n_cols = grid.shape
+    padded = np.pad(grid, 1, mode = "constant", constant_values = fill)
+    return padded[1 + dr:1 + dr + n_rows, 1 + dc:1 + dc + n_cols]
+
+
+def d8_flow_direction(dem, cell_width = 1.0, cell_height = 1.0):
+    """
+    Calculates D8 flow directions of a DEM grid using array shifts.
+
+    Each cell flows to the neighbor with the steepest drop (the elevation
+    difference divided by the distance between cell centers). Where several
+    neighbors share the steepest drop, the first in the order E, SE, S, SW, W,
+    NW, N, NE is used. Cells on the edge of the grid or next to NoData that
+    have no downslope neighbor flow out of the grid, as with the ArcGIS
+    "NORMAL" edge option. Cells in flat areas flow to an equal neighbor that
+    is closer to the edge of the flat where it drains. Cells in depressions
+    that do not drain are 0, so the DEM should be filled first (see
+    `fill_depressions`).
+
+    Args:
+    dem               -- (numpy array) 2D grid of elevations. NaN cells are
+                         NoData.
+    cell_width        -- (numeric) cell width
+    cell_height       -- (numeric) cell height
+
+    Returns:
+    numpy array (uint8) of ArcGIS D8 flow direction codes. NoData cells are 0.
+    """
+    dem = np.asarray(dem, dtype = np.float64)
+    valid = ~np.isnan(dem)
+    n_rows, n_cols = dem.shape
+    fdr = np.zeros(dem.shape, dtype = np.uint8)
+    best = np.zeros(dem.shape)
+    to_nodata = np.zeros(dem.shape, dtype = np.uint8)
+    for code, (dr, dc) in zip(D8_CODES, D8_OFFSETS):
+        neighbor = _shift(dem, dr, dc, np.nan)
+        drop = (dem - neighbor) / np.hypot(dr * cell_height, dc * cell_width)
+        steeper = valid & (drop > best)
+        fdr[steeper] = code
+        best[steeper] = drop[steeper]
+    # The first NoData neighbor, preferring E, S, W and N over the diagonals
+    for i in [0, 2, 4, 6, 1, 3, 5, 7]:
+        dr, dc = D8_OFFSETS[i]
+        nodata = (valid & (to_nodata == 0) &
+                  np.isnan(_shift(dem, dr, dc, 0.0)))
+        to_nodata[nodata] = D8_CODES[i]
+
+    # Edge cells without a downslope neighbor flow straight out of the grid
+    # (diagonally out of the corners). Cells next to NoData flow into it.
+    rows, cols = np.indices(dem.shape)
+    out_dr = np.where(rows == 0, -1, np.where(rows == n_rows - 1, 1, 0))
+    out_dc = np.where(cols == 0, -1, np.where(cols == n_cols - 1, 1, 0))
+    code_of = np.zeros((3, 3), dtype = np.uint8)
+    code_of[D8_OFFSETS[:, 0] + 1, D8_OFFSETS[:, 1] + 1] = D8_CODES
+    outward = code_of[out_dr + 1, out_dc + 1]
+    outward = np.where(outward > 0, outward, to_nodata)
+    edge = valid & (fdr == 0) & (outward > 0)
+    fdr[edge] = outward[edge]
+
+    # Flat cells flow to an equal neighbor one step closer to a drained
+    # cell. Fronts of newly drained cells grow into the flats one step at a
+    # time, so each flat cell is visited once.
+    elev = dem.ravel()
+    code = fdr.ravel()
+    undrained = valid.ravel() & (code == 0)
+    front = np.flatnonzero(valid.ravel() & (code > 0))
+    while front.size and undrained.any():
+        fr, fc = np.divmod(front, n_cols)
+        reached = []
+        for k, (dr, dc) in zip(D8_CODES, D8_OFFSETS):
+            # Cells n that flow in direction k to a front cell
+            nr, nc = fr - dr, fc - dc
+            inside = (nr >= 0) & (nr < n_rows) & (nc >= 0) & (nc < n_cols)
+            n = nr[inside] * n_cols + nc[inside]
+            step = undrained[n] & (elev[n] == elev[front[inside]])
+            n = n[step]
+            code[n] = k
+            undrained[n] = False
+            reached.append(n)
+        front = np.concatenate(reached)
+    return fdr
+
+
+def d8_flow_accumulation(fdr, weights = None):
+    """
+    Calculates D8 flow accumulation by a topological sweep from the ridges
+    downstream.
+
+    The number of upstream cells draining to each cell (its in-degree) is
+    counted once. Cells with no upstream cells form the first front. Each
+    front passes its accumulated flow to the cells downstream, and a cell
+    joins the next front once all of its upstream cells have passed their
+    flow to it. Every cell is visited once.
+
+    Args:
+    fdr               -- (numpy array) 2D grid of ArcGIS D8 flow direction
+                         codes
+    weights           -- (numpy array) 2D grid of the weight of each cell.
+                         Defaults to 1 for every cell.
+
+    Returns:
+    numpy array (float64) of the accumulated weight of the cells upstream of
+    each cell, not including the cell itself (as with
+    arcpy.sa.FlowAccumulation)
+    """
+    fdr = np.asarray(fdr)
+    downstream = d8_downstream(fdr)
+    if fdr.size < np.iinfo(np.int32).max:
+        downstream = downstream.astype(np.int32)
+    if weights is None:
+        weight = np.ones(fdr.size)
+    else:
+        weight = np.nan_to_num(np.asarray(weights, dtype = np.float64).ravel())
+    flows = downstream >= 0
+    in_degree = np.bincount(downstream[flows], minlength = fdr.size)
+    accum = np.zeros(fdr.size)
+
+    front = np.flatnonzero(in_degree == 0)
+    while front.size:
+        front = front[flows[front]]
+        target = downstream[front]
+        np.add.at(accum, target, accum[front] + weight[front])
+        np.subtract.at(in_degree, target, 1)
+        target = np.unique(target)
+        front = target[in_degree[target] == 0]
+    return accum.reshape(fdr.shape)
+
+
+def dinf_flow_direction(dem, cell_width = 1.0, cell_height = 1.0):
+    """
+    Calculates D-infinity flow angles and slopes of a DEM grid from its
+    triangular facets.
+
+    The slope of each of the eight triangular facets around each cell is
+    calculated for all cells at once from shifted copies of the DEM
+    (Tarboton, 1997). Each cell flows at the angle of the steepest facet.
+    Cells with no downslope facet, such as cells in flat areas, flow in the
+    D8 direction that drains the flat (see `d8_flow_direction`), so the DEM
+    should be filled first (see `fill_depressions`). Cells on the edge of the
+    grid without a downslope facet are NoData.
+
+    Args:
+    dem               -- (numpy array) 2D grid of elevations. NaN cells are
+                         NoData.
+    cell_width        -- (numeric) cell width
+    cell_height       -- (numeric) cell height
+
+    Returns:
+    tuple of numpy arrays (angle, slope). NoData cells are NaN.
+    """
+    dem = np.asarray(dem, dtype = np.float64)
+    angle = np.full(dem.shape, np.nan)
+    slope = np.zeros(dem.shape)
+    for e1, e2, ac, af in zip(DINF_E1, DINF_E2, DINF_AC, DINF_AF):
+        d1 = cell_width if e1[0] == 0 else cell_height
+        d2 = cell_height if e1[0] == 0 else cell_width
+        z1 = _shift(dem, e1[0], e1[1], np.nan)
+        z2 = _shift(dem, e2[0], e2[1], np.nan)
+        s1 = (dem - z1) / d1
+        s2 = (z1 - z2) / d2
+        r = np.arctan2(s2, s1)
+        s = np.hypot(s1, s2)
+        # Flow angles outside the facet are moved to its edges
+        below = r < 0
+        r[below] = 0
+        s[below] = s1[below]
+        above = r > np.arctan2(d2, d1)
+        r[above] = np.arctan2(d2, d1)
+        s[above] = (dem[above] - z2[above]) / np.hypot(d1, d2)
+        steeper = s > slope
+        slope[steeper] = s[steeper]
+        angle[steeper] = af * r[steeper] + ac * np.pi / 2
+    angle = np.mod(angle, 2 * np.pi)
+
+    # Cells without a downslope facet follow the D8 direction that drains
+    # the flat they are in
+    flat = ~np.isnan(dem) & np.isnan(angle)
+    if flat.any():
+        fdr = d8_flow_direction(dem, cell_width, cell_height)
+        rows, cols = np.indices(dem.shape)
+        for code, (dr, dc) in zip(D8_CODES, D8_OFFSETS):
+            inside = ((rows + dr >= 0) & (rows + dr < dem.shape[0]) &
+                      (cols + dc >= 0) & (cols + dc < dem.shape[1]))
+            to = flat & (fdr == code) & inside
+            angle[to] = np.mod(np.arctan2(-dr * cell_height,
+                                          dc * cell_width), 2 * np.pi)
+    slope[np.isnan(dem)] = np.nan
+    return angle, slope
+
+
+def _dinf_receivers(angle):
+    """
+    Returns the two cells that each cell of a D-infinity angle grid flows to
+    and the proportion of its flow that each receives.
+
+    Returns:
+    tuple (receiver_1, proportion_1, receiver_2, proportion_2) of flattened
+    cell indexes (-1 outside the grid or NoData) and proportions
+    """
+    n_rows, n_cols = angle.shape
+    rows, cols = np.indices(angle.shape)
+    valid = ~np.isnan(angle)
+    quarter = np.pi / 4
+    a = np.where(valid, angle, 0.0)
+    k = np.minimum(np.floor(a / quarter).astype(np.int64), 7)
+    p1 = 1 - (a - k * quarter) / quarter
+    result = []
+    for sector, p in ((k, p1), ((k + 1) % 8, 1 - p1)):
+        r = rows + DINF_OFFSETS[sector, 0]
+        c = cols + DINF_OFFSETS[sector, 1]
+        inside = valid & (r >= 0) & (r < n_rows) & (c >= 0) & (c < n_cols)
+        receiver = np.where(inside, r * n_cols + c, -1).ravel()
+        p = np.where(inside & (p > 1e-9), p, 0.0).ravel()
+        receiver[p == 0] = -1
+        result.extend([receiver, p])
+    return tuple(result)
+
+
+def _dinf_sweep(receivers, initial, active):
+    """
+    Accumulates flow down a D-infinity receiver graph in topological order.
+
+    Args:
+    receivers         -- tuple from `_dinf_receivers`
+    initial           -- (numpy array) flattened initial flow of each cell
+    active            -- (numpy array) flattened mask of the cells to sweep.
+                         Flow to other cells is dropped.
+
+    Returns:
+    numpy array of the flattened accumulated flow
+    """
+    r1, p1, r2, p2 = receivers
+    accum = np.array(initial, dtype = np.float64)
+    links = []
+    for receiver, p in ((r1, p1), (r2, p2)):
+        donor = np.flatnonzero(active & (receiver >= 0))
+        donor = donor[active[receiver[donor]]]
+        links.append((donor, receiver[donor], p[donor]))
+    in_degree = np.zeros(len(accum), dtype = np.int64)
+    for donor, receiver, p in links:
+        in_degree += np.bincount(receiver, minlength = len(accum))
+
+    # Outgoing links of each donor, sorted by donor
+    donor = np.concatenate([l[0] for l in links])
+    receiver = np.concatenate([l[1] for l in links])
+    share = np.concatenate([l[2] for l in links])
+    order = np.argsort(donor, kind = "stable")
+    donor, receiver, share = donor[order], receiver[order], share[order]
+    start = np.searchsorted(donor, np.arange(len(accum) + 1))
+
+    front = np.flatnonzero(active & (in_degree == 0))
+    while front.size:
+        # Links leaving the front
+        counts = start[front + 1] - start[front]
+        link = (np.repeat(start[front] - np.cumsum(counts) + counts, counts)
+                + np.arange(counts.sum()))
+        target = receiver[link]
+        np.add.at(accum, target, accum[donor[link]] * share[link])
+        np.subtract.at(in_degree, target, 1)
+        target = np.unique(target)
+        front = target[in_degree[target] == 0]
+    return accum
+
+
+def dinf_contributing_area(angle, cell_width = 1.0):
+    """
+    Calculates D-infinity specific catchment area by a topological sweep from
+    the ridges downstream.
+
+    Each cell contributes its own area divided by the contour width (the
+    cell width), as with TauDEM AreaDinf without edge contamination checking
+    (-nc). The flow of each cell is divided between the two cells on either
+    side of its flow angle in proportion to how close the angle is to each.
+    A cell passes on its flow once all of the cells flowing to it have.
+
+    Args:
+    angle             -- (numpy array) 2D grid of D-infinity flow angles (see
+                         `dinf_flow_direction`). NaN cells do not flow.
+    cell_width        -- (numeric) cell width
+
+    Returns:
+    numpy array of the specific catchment area of each cell. Cells with a
+    NaN angle receive flow but do not pass it on.
+    """
+    angle = np.asarray(angle, dtype = np.float64)
+    receivers = _dinf_receivers(angle)
+    active = np.ones(angle.size, dtype = bool)
+    initial = np.full(angle.size, float(cell_width))
+    return _dinf_sweep(receivers, initial, active).reshape(angle.shape)
+
+
+def dinf_flow_direction_tiled(dem, angle, slope, cell_width = 1.0,
+                              cell_height = 1.0, tile_size = 2048,
+                              halo = 64):
+    """
+    Calculates D-infinity flow angles and slopes one tile at a time, for
+    grids larger than memory.
+
+    The facets of a cell only use its eight neighbors, so each tile is
+    calculated from the tile and a ring of halo cells around it and gives
+    the same angles as `dinf_flow_direction`. Flat areas are drained within
+    the tile and its halo, so flats wider than the halo may drain
+    differently. Filling the DEM with an epsilon gradient removes flats (see
+    `fill_depressions`).
+
+    Args:
+    dem               -- (numpy array) 2D grid of elevations, such as a
+                         `np.memmap`. NaN cells are NoData.
+    angle             -- (numpy array) 2D floating point grid of the same
+                         shape to write the flow angles to
+    slope             -- (numpy array) 2D floating point grid of the same
+                         shape to write the slopes to
+    cell_width        -- (numeric) cell width
+    cell_height       -- (numeric) cell height
+    tile_size         -- (int) number of rows and columns in each tile
+    halo              -- (int) number of halo cells around each tile (at
+                         least 1)
+
+    Returns:
+    None
+    """
+    n_rows, n_cols = dem.shape
+    halo = max(int(halo), 1)
+    for r in range(0, n_rows, tile_size):
+        for c in range(0, n_cols, tile_size):
+            r0, c0 = max(r - halo, 0), max(c - halo, 0)
+            r1 = min(r + tile_size + halo, n_rows)
+            c1 = min(c + tile_size + halo, n_cols)
+            window = np.asarray(dem[r0:r1, c0:c1], dtype = np.float64)
+            a, s = dinf_flow_direction(window, cell_width, cell_height)
+            tile = (slice(r - r0, min(r + tile_size, n_rows) - r0),
+                    slice(c - c0, min(c + tile_size, n_cols) - c0))
+            angle[r:r + tile_size, c:c + tile_size] = a[tile]
+            slope[r:r + tile_size, c:c + tile_size] = s[tile]
+
+
+def dinf_contributing_area_tiled(angle, sca, cell_width = 1.0,
+                                 tile_size = 2048, max_sweeps = None):
+    """
+    Calculates D-infinity specific catchment area one tile at a time, for
+    grids larger than memory.
+
+    Each tile is swept from its own cells plus the current specific
+    catchment area flowing in from the ring of cells around it. When the flow
+    leaving a tile changes, the tiles it flows into are swept again, until
+    nothing changes. This gives the same result as `dinf_contributing_area`
+    (up to floating point rounding). Only one tile and its ring are in
+    memory at a time.
+
+    Args:
+    angle             -- (numpy array) 2D grid of D-infinity flow angles,
+                         such as a `np.memmap`
+    sca               -- (numpy array) 2D floating point grid of the same
+                         shape to write the specific catchment area to
+    cell_width        -- (numeric) cell width
+    tile_size         -- (int) number of rows and columns in each tile
+    max_sweeps        -- (int) maximum number of tile sweeps. Defaults to 100
+                         times the number of tiles.
+
+    Returns:
+    (int) the number of tile sweeps
+    """
+    n_rows, n_cols = angle.shape
+    tiles = [(r, c) for r in range(0, n_rows, tile_size)
+                    for c in range(0, n_cols, tile_size)]
+    if max_sweeps is None:
+        max_sweeps = 100 * len(tiles)
+    for r, c in tiles:
+        sca[r:r + tile_size, c:c + tile_size] = 0
+
+    queue = deque(tiles)
+    queued = set(tiles)
+    sweeps = 0
+    while queue:
+        if sweeps >= max_sweeps:
+            raise RuntimeError("Contributing area did not converge")
+        r, c = queue.popleft()
+        queued.discard((r, c))
+        sweeps += 1
+
+        # The tile and the ring of cells around it
+        r0, c0 = max(r - 1, 0), max(c - 1, 0)
+        r1 = min(r + tile_size + 1, n_rows)
+        c1 = min(c + tile_size + 1, n_cols)
+        window = np.asarray(angle[r0:r1, c0:c1], dtype = np.float64)
+        current = np.asarray(sca[r0:r1, c0:c1], dtype = np.float64).ravel()
+        inner = np.zeros(window.shape, dtype = bool)
+        inner[r - r0:r - r0 + tile_size, c - c0:c - c0 + tile_size] = True
+        inner = inner.ravel()
+
+        # Each tile cell starts with its own area plus the flow from the ring
+        receivers = _dinf_receivers(window)
+        initial = np.where(inner, float(cell_width), 0.0)
+        for receiver, p in zip(receivers[0::2], receivers[1::2]):
+            ring = np.flatnonzero(~inner & (receiver >= 0))
+            ring = ring[inner[receiver[ring]]]
+            np.add.at(initial, receiver[ring], current[ring] * p[ring])
+        result = _dinf_sweep(receivers, initial, inner)
+        result = result.astype(sca.dtype)
+        if np.array_equal(result[inner], current[inner].astype(sca.dtype)):
+            continue
+        shape = (min(tile_size, n_rows - r), min(tile_size, n_cols - c))
+        sca[r:r + tile_size, c:c + tile_size] = result[inner].reshape(shape)
+
+        # Sweep again the tiles that the cells of this tile flow into
+        rows, cols = np.divmod(np.concatenate([
+                         receivers[0][inner & (receivers[0] >= 0)],
+                         receivers[2][inner & (receivers[2] >= 0)]]),
+                         window.shape[1])
+        out = ~inner.reshape(window.shape)[rows, cols]
+        for near in set(zip(((rows[out] + r0) // tile_size *
+                             tile_size).tolist(),
+                            ((cols[out] + c0) // tile_size *
+                             tile_size).tolist())):
+            if near not in queued:
+                queue.append(near)
+                queued.add(near)
+    return sweeps
@@ -0,0 +1,224 @@
+"""____________________________________________________________________________
+Script Name:          FG_join.py
+Description:          Contains a set of functions for joining the fields of
+                      one table to another by the values of a key field.
+Date:                 10/17/2026
+
+Usage:
+These functions do not depend on arcpy. The join table is read once into a
+dictionary keyed on the join field, the joined fields are added to the
+target table in one step, and the target table is filled with a single
+update pass. This replaces `arcpy.management.JoinField`, which is slow on
+large tables.
+
+Tables are read and written through a table interface object with the
+methods:
+
+    fields(table)              -- list of FieldDef of the fields of a table
+    add_fields(table, fields)  -- adds a list of FieldDef to a table
+    search(table, names)       -- iterates over the rows of the named fields
+    update(table, names)       -- context manager yielding a cursor that
+                                  iterates over the rows of the named fields
+                                  and has an `updateRow(row)` method
+
+FG_utils.ArcpyTables is the arcpy version. Field types are the arcpy field
+types returned by `arcpy.ListFields` (e.g., "String", "Integer", "Double").
+
+Functions:
+join_key              -- Returns the dictionary key of a join field value.
+coerce_value          -- Converts a value to the type of a field.
+unique_field_names    -- Renames fields that already exist in a table by
+                         adding a numeric suffix.
+read_join_table       -- Reads the rows of a join table into a dictionary
+                         keyed on the join field.
+join_fields           -- Joins the fields of a join table to a target table
+                         by the values of a key field.
+____________________________________________________________________________"""
+
+import math
+import collections
+
+# Name, type and length of a field
+FieldDef = collections.namedtuple("FieldDef", ["name", "type", "length"])
+
+# Field types that are never joined
+SKIP_FIELD_TYPES = ("OID", "Geometry", "GlobalID", "Raster", "Blob")
+
+# Fields maintained by the geodatabase that are never joined
+SKIP_FIELD_NAMES = ("shape_length", "shape_area", "shape.len", "shape.area")
+
+INTEGER_TYPES = ("Integer", "SmallInteger", "BigInteger", "OID")
+FLOAT_TYPES = ("Double", "Single")
+
+def join_key(value):
+    """
+    Returns the dictionary key of a join field value.
+
+    Whole numbers are keyed as integers so that integer and floating point
+    join fields match (e.g., 3 and 3.0). Text is stripped of surrounding
+    spaces.
+
+    Args:
+    value             -- value of a join field
+
+    Returns:
+    key of the value, or None for a missing value
+    """
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            return int(value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def coerce_value(value, field_type, length = None):
+    """
+    Converts a value to the type of a field.
+
+    Args:
+    value             -- value to convert
+    field_type        -- (string) arcpy field type (e.g., "String",
+                         "Integer", "Double")
+    length            -- (int) length of a text field. Longer text is
+                         truncated.
+
+    Returns:
+    the converted value, or None for a missing value or a value that cannot
+    be converted
+    """
+    if value is None:
+        return None
+    try:
+        if field_type in INTEGER_TYPES:
+            if isinstance(value, float):
+                if math.isnan(value):
+                    return None
+                return int(round(value))
+            return int(value)
+        if field_type in FLOAT_TYPES:
+            value = float(value)
+            return None if math.isnan(value) else value
+        if field_type == "String":
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            value = str(value)
+            return value[:length] if length else value
+    except (TypeError, ValueError):
+        return None
+    return value
+
+
+def unique_field_names(names, existing):
+    """
+    Renames fields that already exist in a table by adding a numeric suffix
+    (e.g., "ReachName" becomes "ReachName_1").
+
+    Args:
+    names             -- (list) names of the fields to add
+    existing          -- (list) names of the fields in the table
+
+    Returns:
+    list of the names to add, in the same order as `names`
+    """
+    taken = set(n.lower() for n in existing)
+    unique = []
+    for name in names:
+        new_name = name
+        n = 0
+        while new_name.lower() in taken:
+            n += 1
+            new_name = "{}_{}".format(name, n)
+        taken.add(new_name.lower())
+        unique.append(new_name)
+    return unique
+
+
+def read_join_table(rows):
+    """
+    Reads the rows of a join table into a dictionary keyed on the join
+    field.
+
+    Args:
+    rows              -- iterable of rows whose first value is the join field
+                         value
+
+    Returns:
+    dictionary of the remaining values of each row keyed on `join_key` of
+    its join field value. The first row of each key is kept, as with
+    `arcpy.management.JoinField`.
+    """
+    table = {}
+    for row in rows:
+        key = join_key(row[0])
+        if key is not None and key not in table:
+            table[key] = tuple(row[1:])
+    return table
+
+
+def join_fields(target, target_field, join_table, join_field, tables,
+                fields = None):
+    """
+    Joins the fields of a join table to a target table by the values of a
+    key field.
+
+    The joined fields are added to the target table with the type and length
+    of the join table fields. A joined field with the name of an existing
+    target field is renamed with a numeric suffix. Target rows without a
+    matching join row are set to None.
+
+    Args:
+    target            -- the target table
+    target_field      -- (string) name of the key field of the target table
+    join_table        -- the join table
+    join_field        -- (string) name of the key field of the join table
+    tables            -- table interface object (see the module description)
+    fields            -- (list) names of the join table fields to join.
+                         Defaults to every field except the join field,
+                         object ID, geometry and geodatabase fields.
+
+    Returns:
+    list of the names of the fields added to the target table, in the order
+    of `fields`
+    """
+    join_defs = {f.name.lower(): f for f in tables.fields(join_table)}
+    if fields is None:
+        defs = [f for f in tables.fields(join_table)
+                if f.type not in SKIP_FIELD_TYPES and
+                   f.name.lower() not in SKIP_FIELD_NAMES and
+                   f.name.lower() != join_field.lower()]
+    else:
+        missing = [name for name in fields
+                   if name.lower() not in join_defs]
+        if missing:
+            raise ValueError("Fields not found in the join table: "
+                             "{}".format(", ".join(missing)))
+        defs = [join_defs[name.lower()] for name in fields]
+    if not defs:
+        return []
+
+    # Read the join table once
+    joined = read_join_table(tables.search(join_table,
+                                           [join_field] +
+                                           [f.name for f in defs]))
+
+    # Add the joined fields in one step
+    existing = [f.name for f in tables.fields(target)]
+    names = unique_field_names([f.name for f in defs], existing)
+    new_defs = [FieldDef(name, f.type, f.length)
+                for name, f in zip(names, defs)]
+    tables.add_fields(target, new_defs)
+
+    # Fill the joined fields in a single update pass
+    empty = (None,) * len(defs)
+    with tables.update(target, [target_field] + names) as cursor:
+        for row in cursor:
+            values = joined.get(join_key(row[0]), empty)
+            cursor.updateRow([row[0]] +
+                             [coerce_value(v, f.type, f.length)
+                              for v, f in zip(values, new_defs)])
+    return names
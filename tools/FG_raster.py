@@ -0,0 +1,845 @@
+"""____________________________________________________________________________
+Script Name:          FG_raster.py
+Description:          Contains a set of Python functions for reading rasters
+                      into NumPy grids and sampling rasters at points.
+Date:                 10/17/2026
+
+Usage:
+Rasters are read in blocks using `arcpy.RasterToNumPyArray`, so only the cells
+that are needed are loaded into memory. The array functions used on the
+blocks are in FG_grid.py.
+
+Functions:
+raster_info           -- Returns the grid properties of a raster.
+spatial_reference_key -- Returns a key that identifies a spatial reference.
+read_window           -- Reads a window of raster cells into a NumPy grid.
+write_grid            -- Writes a NumPy grid to a new raster aligned with an 
+                         existing raster.
+sample_raster         -- Samples a raster at point locations using windowed
+                         block reads.
+snap_raster           -- Snaps points to the highest valued raster cell within
+                         a snap distance using windowed block reads.
+write_statistics      -- Sets the statistics of a raster from the NumPy grid 
+                         that was written to it.
+read_memmap           -- Reads a raster block by block into a memory-mapped
+                         NumPy grid on disk.
+write_blocks          -- Writes a NumPy grid (or memory-mapped grid) to a 
+                         raster one block at a time.
+fill_raster           -- Fills the depressions of a DEM raster by 
+                         priority-flood.
+dinf_raster           -- Calculates D-infinity flow angle, slope and specific
+                         catchment area rasters from a filled DEM raster.
+export_tif            -- Exports a raster to an uncompressed, tiled GeoTIFF,
+                         reusing the source if it already is one.
+tabulate_zones        -- Counts the cells of each class raster value in each 
+                         zone of a zone grid using block reads.
+read_windows          -- Reads the same window of several aligned rasters.
+tile_raster           -- Runs a NumPy kernel over the tiles of one or more 
+                         aligned rasters across a process pool and writes 
+                         the result to a new raster.
+write_segments        -- Writes segments of grid cells to a new polyline 
+                         feature class through cell centers.
+sample_surfaces       -- Samples one or more rasters at the locations of a
+                         point feature class and writes every value field in
+                         a single update pass.
+idw_raster            -- Interpolates the cells of a mask raster from a point
+                         feature class by inverse distance weighting.
+____________________________________________________________________________"""
+
+import os
+import shutil
+import tempfile
+import functools
+import collections
+import multiprocessing
+import numpy as np
+import arcpy
+from FG_grid import *
+from FG_hydro import *
+from FG_tiles import *
+from FG_streams import *
+
+# Largest grid (in cells) that is filled in memory by `fill_raster`
+MAX_MEMORY_CELLS = 4096 * 4096
+
+# Raster pixel type of each NumPy data type
+PIXEL_TYPES = {"float32": "32_BIT_FLOAT", "float64": "64_BIT",
+               "int32": "32_BIT_SIGNED", "int16": "16_BIT_SIGNED",
+               "uint8": "8_BIT_UNSIGNED"}
+
+RasterInfo = collections.namedtuple("RasterInfo",
+                                    ["x_min", "y_max",
+                                     "cell_width", "cell_height",
+                                     "n_rows", "n_cols",
+                                     "nodata", "spatial_reference"])
+
+def raster_info(raster):
+    """
+    Returns the grid properties of a raster.
+
+    Args:
+    raster            -- Path to a raster or an arcpy Raster object
+
+    Returns:
+    RasterInfo named tuple (x_min, y_max, cell_width, cell_height, n_rows,
+    n_cols, nodata, spatial_reference)
+    """
+    ras = arcpy.Raster(raster) if isinstance(raster, str) else raster
+    return RasterInfo(x_min = ras.extent.XMin,
+                      y_max = ras.extent.YMax,
+                      cell_width = ras.meanCellWidth,
+                      cell_height = ras.meanCellHeight,
+                      n_rows = ras.height,
+                      n_cols = ras.width,
+                      nodata = ras.noDataValue,
+                      spatial_reference = ras.spatialReference)
+
+
+def spatial_reference_key(spatial_reference):
+    """
+    Returns a key that identifies a spatial reference.
+
+    Spatial references are compared by their factory code (WKID) and their
+    full definition string, since different spatial references can share a
+    name.
+
+    Args:
+    spatial_reference -- arcpy SpatialReference object
+
+    Returns:
+    tuple (factoryCode, exportToString())
+    """
+    return (spatial_reference.factoryCode, 
+            spatial_reference.exportToString())
+
+
+def read_window(raster, info, row_start, col_start, n_rows, n_cols):
+    """
+    Reads a window of raster cells into a NumPy grid.
+
+    The window is clipped to the raster. NoData cells are returned as NaN.
+
+    Args:
+    raster            -- Path to a raster or an arcpy Raster object
+    info              -- RasterInfo of the raster (see `raster_info`)
+    row_start         -- (int) first row of the window
+    col_start         -- (int) first column of the window
+    n_rows            -- (int) number of rows in the window
+    n_cols            -- (int) number of columns in the window
+
+    Returns:
+    tuple (grid, row_start, col_start) of the float64 grid and the position
+    of its upper left cell in the raster after clipping
+    """
+    row_end = min(row_start + n_rows, info.n_rows)
+    col_end = min(col_start + n_cols, info.n_cols)
+    row_start = max(row_start, 0)
+    col_start = max(col_start, 0)
+    lower_left = arcpy.Point(info.x_min + col_start * info.cell_width,
+                             info.y_max - row_end * info.cell_height)
+    block = arcpy.RasterToNumPyArray(in_raster = raster,
+                                     lower_left_corner = lower_left,
+                                     ncols = col_end - col_start,
+                                     nrows = row_end - row_start)
+    grid = block.astype(np.float64)
+    if info.nodata is not None:
+        grid[block == info.nodata] = np.nan
+    return grid, row_start, col_start
+
+
+def write_grid(grid, info, out_raster, nodata = None, row_start = 0, 
+               col_start = 0):
+    """
+    Writes a NumPy grid to a new raster aligned with an existing raster.
+
+    Args:
+    grid              -- (numpy array) 2D grid of values
+    info              -- RasterInfo of the raster the grid was read from (see
+                         `raster_info`)
+    out_raster        -- Path to the output raster
+    nodata            -- value of NoData cells in the grid. NaN cells of
+                         floating point grids are always written as NoData.
+    row_start         -- (int) row of the raster at the top of the grid
+    col_start         -- (int) column of the raster at the left of the grid
+
+    Returns:
+    path to the output raster
+    """
+    n_rows, n_cols = grid.shape
+    lower_left = arcpy.Point(info.x_min + col_start * info.cell_width,
+                             info.y_max - (row_start + n_rows) * 
+                             info.cell_height)
+    if nodata is None and np.issubdtype(grid.dtype, np.floating):
+        nodata = np.nan
+    out = arcpy.NumPyArrayToRaster(in_array = grid,
+                                   lower_left_corner = lower_left,
+                                   x_cell_size = info.cell_width,
+                                   y_cell_size = info.cell_height,
+                                   value_to_nodata = nodata)
+    out.save(out_raster)
+    arcpy.management.DefineProjection(out_raster, info.spatial_reference)
+    return out_raster
+
+
+def write_statistics(raster, grid):
+    """
+    Sets the statistics of a raster from the NumPy grid that was written to 
+    it.
+
+    The statistics are calculated from the grid in memory (see 
+    FG_grid.block_statistics), so the raster is not read again by 
+    `CalculateStatistics`.
+
+    Args:
+    raster            -- Path to a single band raster
+    grid              -- (numpy array) 2D grid of the raster values. NaN cells
+                         are NoData.
+
+    Returns:
+    tuple (minimum, maximum, mean, std)
+    """
+    stats = block_statistics(grid)
+    arcpy.SetRasterProperties_management(
+                    in_raster = raster, 
+                    statistics = "1 {} {} {} {}".format(*stats))
+    return stats
+
+
+def read_memmap(raster, info, path, block_size = 2048, dtype = np.float32):
+    """
+    Reads a raster block by block into a memory-mapped NumPy grid on disk.
+
+    Args:
+    raster            -- Path to a raster or an arcpy Raster object
+    info              -- RasterInfo of the raster (see `raster_info`)
+    path              -- Path to the file backing the grid
+    block_size        -- (int) number of rows and columns in each block read
+    dtype             -- NumPy floating point data type of the grid
+
+    Returns:
+    `np.memmap` of the raster with NoData cells as NaN
+    """
+    grid = np.memmap(path, dtype = dtype, mode = "w+", 
+                     shape = (info.n_rows, info.n_cols))
+    for row_start in range(0, info.n_rows, block_size):
+        for col_start in range(0, info.n_cols, block_size):
+            block, r, c = read_window(raster, info, row_start, col_start, 
+                                      block_size, block_size)
+            grid[r:r + block.shape[0], c:c + block.shape[1]] = block
+    grid.flush()
+    return grid
+
+
+def write_blocks(grid, info, out_raster, block_size = 4096):
+    """
+    Writes a NumPy grid (or memory-mapped grid) to a raster one block at a 
+    time.
+
+    Grids that fit in one block are written directly. Larger grids are 
+    written as one temporary raster per block in the "memory" workspace, 
+    which are then mosaicked to the output raster, so only one block is 
+    copied into memory at a time.
+
+    Args:
+    grid              -- (numpy array) 2D grid of values covering the raster
+    info              -- RasterInfo of the raster (see `raster_info`)
+    out_raster        -- Path to the output raster
+    block_size        -- (int) number of rows and columns in each block
+
+    Returns:
+    path to the output raster
+    """
+    n_rows, n_cols = grid.shape
+    if n_rows <= block_size and n_cols <= block_size:
+        return write_grid(np.asarray(grid), info, out_raster)
+    
+    blocks = []
+    for row_start in range(0, n_rows, block_size):
+        for col_start in range(0, n_cols, block_size):
+            block = os.path.join("memory", "block_{}_{}".format(row_start, 
+                                                                col_start))
+            write_grid(np.array(grid[row_start:row_start + block_size, 
+                                     col_start:col_start + block_size]), 
+                       info, block, row_start = row_start, 
+                       col_start = col_start)
+            blocks.append(block)
+    arcpy.MosaicToNewRaster_management(
+                    input_rasters = blocks, 
+                    output_location = os.path.dirname(out_raster), 
+                    raster_dataset_name_with_extension = 
+                        os.path.basename(out_raster), 
+                    coordinate_system_for_the_raster = info.spatial_reference, 
+                    pixel_type = PIXEL_TYPES[grid.dtype.name], 
+                    cellsize = info.cell_width, 
+                    number_of_bands = 1)
+    for block in blocks:
+        arcpy.Delete_management(block)
+    return out_raster
+
+
+def fill_raster(dem, out_raster, epsilon = 0.0, tile_size = 2048):
+    """
+    Fills the depressions of a DEM raster by priority-flood.
+
+    DEMs of up to MAX_MEMORY_CELLS cells are filled in memory with 
+    FG_hydro.fill_depressions. Larger DEMs are read into a memory-mapped grid
+    in a temporary folder and filled one tile at a time with 
+    FG_hydro.fill_depressions_tiled. Both give the same result.
+
+    Args:
+    dem               -- Path to the DEM raster
+    out_raster        -- Path to the output filled DEM raster
+    epsilon           -- (numeric) elevation gradient added across filled 
+                         cells so that they drain (0 for flat fills, as with 
+                         TauDEM pitremove and arcpy.sa.Fill)
+    tile_size         -- (int) number of rows and columns in each tile of 
+                         large DEMs
+
+    Returns:
+    path to the output raster
+    """
+    info = raster_info(dem)
+    if info.n_rows * info.n_cols <= MAX_MEMORY_CELLS:
+        grid, row_start, col_start = read_window(dem, info, 0, 0, 
+                                                 info.n_rows, info.n_cols)
+        filled = fill_depressions(grid, epsilon).astype(np.float32)
+        return write_grid(filled, info, out_raster)
+    
+    folder = tempfile.mkdtemp(prefix = "fill_")
+    try:
+        grid = read_memmap(dem, info, os.path.join(folder, "dem.dat"), 
+                           tile_size)
+        filled = np.memmap(os.path.join(folder, "filled.dat"), 
+                           dtype = np.float32, mode = "w+", 
+                           shape = grid.shape)
+        floods = fill_depressions_tiled(grid, filled, tile_size, epsilon)
+        arcpy.AddMessage("    Filled {} tiles".format(floods))
+        write_blocks(filled, info, out_raster)
+        del grid, filled
+    finally:
+        shutil.rmtree(folder, ignore_errors = True)
+    return out_raster
+
+
+def dinf_raster(fel, ang_raster, slp_raster, sca_raster, tile_size = 2048):
+    """
+    Calculates D-infinity flow angle, slope and specific catchment area 
+    rasters from a filled DEM raster.
+
+    DEMs of up to MAX_MEMORY_CELLS cells are calculated in memory with 
+    FG_hydro.dinf_flow_direction and dinf_contributing_area. Larger DEMs are 
+    read into a memory-mapped grid in a temporary folder and calculated one 
+    tile at a time with dinf_flow_direction_tiled and 
+    dinf_contributing_area_tiled. The method follows TauDEM DinfFlowDir and 
+    AreaDinf (with -nc), but the outputs have not been checked against 
+    TauDEM and differ from it on flats: cells with no downslope facet flow 
+    in the D8 direction that drains the flat (see FG_hydro.d8_flow_direction), 
+    whereas TauDEM routes flats toward lower terrain and away from higher 
+    terrain (Garbrecht and Martz, 1997). 
+
+    Args:
+    fel               -- Path to the filled DEM raster
+    ang_raster        -- Path to the output flow angle raster
+    slp_raster        -- Path to the output slope raster
+    sca_raster        -- Path to the output specific catchment area raster
+    tile_size         -- (int) number of rows and columns in each tile of 
+                         large DEMs
+
+    Returns:
+    tuple of the paths to the output rasters (ang, slp, sca)
+    """
+    info = raster_info(fel)
+    if info.n_rows * info.n_cols <= MAX_MEMORY_CELLS:
+        dem, row_start, col_start = read_window(fel, info, 0, 0, 
+                                                info.n_rows, info.n_cols)
+        angle, slope = dinf_flow_direction(dem, info.cell_width, 
+                                           info.cell_height)
+        sca = dinf_contributing_area(angle, info.cell_width)
+        sca[np.isnan(dem)] = np.nan
+        write_grid(angle.astype(np.float32), info, ang_raster)
+        write_grid(slope.astype(np.float32), info, slp_raster)
+        write_grid(sca.astype(np.float32), info, sca_raster)
+        return ang_raster, slp_raster, sca_raster
+    
+    folder = tempfile.mkdtemp(prefix = "dinf_")
+    try:
+        dem = read_memmap(fel, info, os.path.join(folder, "fel.dat"), 
+                          tile_size)
+        grids = {}
+        for name in ["ang", "slp", "sca"]:
+            grids[name] = np.memmap(os.path.join(folder, name + ".dat"), 
+                                    dtype = np.float32, mode = "w+", 
+                                    shape = dem.shape)
+        dinf_flow_direction_tiled(dem, grids["ang"], grids["slp"], 
+                                  info.cell_width, info.cell_height, 
+                                  tile_size)
+        sweeps = dinf_contributing_area_tiled(grids["ang"], grids["sca"], 
+                                              info.cell_width, tile_size)
+        arcpy.AddMessage("    Swept {} tiles".format(sweeps))
+        for row_start in range(0, info.n_rows, tile_size):
+            rows = slice(row_start, row_start + tile_size)
+            grids["sca"][rows][np.isnan(dem[rows])] = np.nan
+        write_blocks(grids["ang"], info, ang_raster)
+        write_blocks(grids["slp"], info, slp_raster)
+        write_blocks(grids["sca"], info, sca_raster)
+        del dem, grids
+    finally:
+        shutil.rmtree(folder, ignore_errors = True)
+    return ang_raster, slp_raster, sca_raster
+
+
+def export_tif(raster, out_tif, tile_size = 256):
+    """
+    Exports a raster to an uncompressed, tiled GeoTIFF.
+
+    Tools such as TauDEM only read uncompressed GeoTIFFs. The raster is 
+    copied in a single pass with compression turned off for the copy only, 
+    and without building pyramids or statistics. If the source is already an 
+    uncompressed GeoTIFF it is used as is and nothing is copied.
+
+    Args:
+    raster            -- Path to the source raster
+    out_tif           -- Path to the output .tif file
+    tile_size         -- (int) number of rows and columns in each tile
+
+    Returns:
+    path to the GeoTIFF. This is the path of the source raster when it was 
+    reused, so check it against `out_tif` before deleting it.
+    """
+    desc = arcpy.Describe(raster)
+    path = desc.catalogPath
+    if (os.path.splitext(path)[1].lower() in (".tif", ".tiff") and 
+        str(getattr(desc, "compressionType", "")).upper() == "NONE"):
+        return path
+    
+    with arcpy.EnvManager(compression = "NONE", 
+                          tileSize = "{0} {0}".format(tile_size), 
+                          pyramid = "NONE", 
+                          rasterStatistics = "NONE"):
+        arcpy.CopyRaster_management(in_raster = raster, 
+                                    out_rasterdataset = out_tif, 
+                                    format = "TIFF")
+    return out_tif
+
+
+def sample_raster(raster, x, y, method = "BILINEAR", block_size = 1024):
+    """
+    Samples a raster at point locations using windowed block reads.
+
+    The raster is divided into blocks of `block_size` rows and columns. Only
+    blocks that contain points are read. Each block is read with a one cell
+    halo so bilinear samples at block edges are exact.
+
+    Args:
+    raster            -- Path to a raster or an arcpy Raster object
+    x                 -- (numpy array) point x coordinates (in the coordinate
+                         system of the raster)
+    y                 -- (numpy array) point y coordinates
+    method            -- (string) resampling method. One of "NEAREST" or
+                         "BILINEAR".
+    block_size        -- (int) number of rows and columns in each block read
+
+    Returns:
+    numpy array of sampled values. Points outside the raster or on NoData
+    cells are NaN.
+    """
+    info = raster_info(raster)
+    row, col = grid_position(x, y, info.x_min, info.y_max,
+                             info.cell_width, info.cell_height)
+    values = np.full(row.shape, np.nan)
+    inside = ((row >= -0.5) & (row < info.n_rows - 0.5) &
+              (col >= -0.5) & (col < info.n_cols - 0.5))
+    if not inside.any():
+        return values
+
+    # Group the points by the block that contains them
+    idx = np.flatnonzero(inside)
+    block_row, block_col = block_ids(row[idx], col[idx], block_size)
+    keys = block_row * (info.n_cols // block_size + 1) + block_col
+    order = np.argsort(keys, kind = "stable")
+    split = np.flatnonzero(np.diff(keys[order])) + 1
+    for group in np.split(idx[order], split):
+        br, bc = block_ids(row[group[:1]], col[group[:1]], block_size)
+        grid, row0, col0 = read_window(raster, info,
+                                       int(br[0]) * block_size - 1,
+                                       int(bc[0]) * block_size - 1,
+                                       block_size + 2, block_size + 2)
+        values[group] = sample_grid(grid, row[group] - row0,
+                                    col[group] - col0, method)
+    return values
+
+
+def snap_raster(raster, x, y, snap_distance, block_size = 1024):
+    """
+    Snaps points to the highest valued raster cell within a snap distance.
+
+    This is the array equivalent of `arcpy.sa.SnapPourPoint` followed by 
+    `arcpy.sa.Sample` for many points at once. Only raster blocks that contain 
+    points are read, each with a halo wide enough for the snap distance.
+
+    Args:
+    raster            -- Path to a raster or an arcpy Raster object (e.g., a
+                         flow accumulation raster)
+    x                 -- (numpy array) point x coordinates (in the coordinate
+                         system of the raster)
+    y                 -- (numpy array) point y coordinates
+    snap_distance     -- (numeric) search distance (in map units)
+    block_size        -- (int) number of rows and columns in each block read
+
+    Returns:
+    tuple of numpy arrays (snap_x, snap_y, value) of the snapped cell center
+    and its value. Points with no valid cell within the snap distance are NaN.
+    """
+    info = raster_info(raster)
+    row, col = grid_position(x, y, info.x_min, info.y_max,
+                             info.cell_width, info.cell_height)
+    radius = float(snap_distance) / info.cell_width
+    halo = int(np.ceil(radius)) + 1
+    snap_row = np.full(row.shape, np.nan)
+    snap_col = np.full(row.shape, np.nan)
+    values = np.full(row.shape, np.nan)
+    inside = ((row >= -0.5) & (row < info.n_rows - 0.5) &
+              (col >= -0.5) & (col < info.n_cols - 0.5))
+
+    # Group the points by the block that contains them
+    idx = np.flatnonzero(inside)
+    block_row, block_col = block_ids(row[idx], col[idx], block_size)
+    keys = block_row * (info.n_cols // block_size + 1) + block_col
+    order = np.argsort(keys, kind = "stable")
+    split = np.flatnonzero(np.diff(keys[order])) + 1
+    for group in np.split(idx[order], split):
+        if group.size == 0:
+            continue
+        br, bc = block_ids(row[group[:1]], col[group[:1]], block_size)
+        br, bc = br[0], bc[0]
+        grid, row0, col0 = read_window(raster, info,
+                                       int(br) * block_size - halo,
+                                       int(bc) * block_size - halo,
+                                       block_size + 2 * halo,
+                                       block_size + 2 * halo)
+        r, c, v = snap_to_max(grid, row[group] - row0, col[group] - col0,
+                              radius)
+        snap_row[group] = r + row0
+        snap_col[group] = c + col0
+        values[group] = v
+
+    snap_x = info.x_min + (snap_col + 0.5) * info.cell_width
+    snap_y = info.y_max - (snap_row + 0.5) * info.cell_height
+    return snap_x, snap_y, values
+
+
+def tabulate_zones(zone_grid, zone_info, class_raster, n_zones, 
+                   block_size = 2048):
+    """
+    Counts the cells of each class raster value in each zone of a zone grid.
+
+    The class raster is read block by block over the extent of the zones, so 
+    memory use is bounded by the block size. Each class raster cell is 
+    assigned the zone of the zone grid cell at its center, so the rasters do 
+    not need to share a cell size.
+
+    Args:
+    zone_grid         -- (numpy array) 2D grid of integer zones from 0 (no 
+                         zone) to n_zones
+    zone_info         -- RasterInfo of the zone grid (see `raster_info`)
+    class_raster      -- Path to a categorical (integer) raster, such as the 
+                         NLCD
+    n_zones           -- (int) number of zones
+    block_size        -- (int) number of rows and columns in each block read
+
+    Returns:
+    tuple (classes, counts) of the class values and a numpy array of cell 
+    counts with a row for each zone (row 0 holds cells in no zone) and a 
+    column for each class
+    """
+    info = raster_info(class_raster)
+    
+    # Extent of the zones in map units
+    zone_rows = np.flatnonzero(zone_grid.any(axis = 1))
+    zone_cols = np.flatnonzero(zone_grid.any(axis = 0))
+    counts = {}
+    if zone_rows.size == 0:
+        return np.array([]), np.zeros((n_zones + 1, 0), dtype = np.int64)
+    x0 = zone_info.x_min + zone_cols[0] * zone_info.cell_width
+    x1 = zone_info.x_min + (zone_cols[-1] + 1) * zone_info.cell_width
+    y1 = zone_info.y_max - zone_rows[0] * zone_info.cell_height
+    y0 = zone_info.y_max - (zone_rows[-1] + 1) * zone_info.cell_height
+    
+    # Class raster rows and columns covering the zones
+    r0, c0 = grid_position(x0, y1, info.x_min, info.y_max, 
+                           info.cell_width, info.cell_height)
+    r1, c1 = grid_position(x1, y0, info.x_min, info.y_max, 
+                           info.cell_width, info.cell_height)
+    r0, c0 = max(int(np.floor(r0)), 0), max(int(np.floor(c0)), 0)
+    r1 = min(int(np.ceil(r1)) + 1, info.n_rows)
+    c1 = min(int(np.ceil(c1)) + 1, info.n_cols)
+    
+    for row_start in range(r0, r1, block_size):
+        for col_start in range(c0, c1, block_size):
+            grid, br, bc = read_window(class_raster, info, row_start, 
+                                       col_start, 
+                                       min(block_size, r1 - row_start), 
+                                       min(block_size, c1 - col_start))
+            # Zone of each class cell center
+            rows, cols = np.indices(grid.shape)
+            x = info.x_min + (cols + bc + 0.5) * info.cell_width
+            y = info.y_max - (rows + br + 0.5) * info.cell_height
+            zr, zc = grid_position(x, y, zone_info.x_min, zone_info.y_max, 
+                                   zone_info.cell_width, 
+                                   zone_info.cell_height)
+            zone = sample_grid(zone_grid, zr, zc, "NEAREST")
+            zone = np.nan_to_num(zone, nan = 0).astype(np.int64)
+            classes, block_counts = crosstab(zone, grid, n_zones)
+            for j, value in enumerate(classes.tolist()):
+                counts[value] = counts.get(value, 0) + block_counts[:, j]
+    
+    classes = np.array(sorted(counts))
+    table = np.zeros((n_zones + 1, len(classes)), dtype = np.int64)
+    for j, value in enumerate(classes.tolist()):
+        table[:, j] = counts[value]
+    return classes, table
+
+
+def read_windows(rasters, infos, row_start, col_start, n_rows, n_cols):
+    """
+    Reads the same window of several aligned rasters.
+
+    This is the tile reader of `tile_raster`. It is called in worker 
+    processes, so the rasters are paths and their RasterInfo do not include 
+    a spatial reference.
+
+    Args:
+    rasters           -- (list) paths to rasters with the same extent and 
+                         cell size
+    infos             -- (list) RasterInfo of each raster
+    row_start         -- (int) first row of the window
+    col_start         -- (int) first column of the window
+    n_rows            -- (int) number of rows in the window
+    n_cols            -- (int) number of columns in the window
+
+    Returns:
+    list of float64 grids of the window, one for each raster
+    """
+    return [read_window(raster, info, row_start, col_start, n_rows, 
+                        n_cols)[0]
+            for raster, info in zip(rasters, infos)]
+
+
+def tile_raster(kernel, rasters, out_raster, halo, kernel_args = (), 
+                tile_size = 2048, workers = None):
+    """
+    Runs a NumPy kernel over the tiles of one or more aligned rasters across 
+    a process pool and writes the result to a new raster.
+
+    Each worker reads its own tile of the rasters with a halo of `halo` 
+    cells, so no raster is read whole. The tool declares the halo as the 
+    neighborhood radius of its kernel (e.g., 1 for a 3 x 3 slope). The tile 
+    results are stitched into a memory-mapped grid in a temporary folder, 
+    which is written to the output raster one block at a time with its 
+    statistics.
+
+    Args:
+    kernel            -- (function) top level NumPy function called with the 
+                         tile grid of each raster followed by `kernel_args` 
+                         (see FG_tiles.run_tiled), for example 
+                         FG_grid.channel_slope_grid
+    rasters           -- (list) paths to rasters with the same extent and 
+                         cell size as the first raster. The workers read the 
+                         rasters, so they cannot be in the "memory" 
+                         workspace.
+    out_raster        -- Path to the output raster
+    halo              -- (int) neighborhood radius of the kernel (in cells)
+    kernel_args       -- (tuple) additional arguments of the kernel
+    tile_size         -- (int) number of rows and columns in each tile
+    workers           -- (int) number of worker processes. Defaults to one 
+                         less than the number of CPUs.
+
+    Returns:
+    path to the output float32 raster
+    """
+    if not workers:
+        workers = max(multiprocessing.cpu_count() - 1, 1)
+    rasters = [arcpy.Describe(raster).catalogPath for raster in rasters]
+    info = raster_info(rasters[0])
+    infos = [raster_info(raster)._replace(spatial_reference = None) 
+             for raster in rasters]
+    read = functools.partial(read_windows, rasters, infos)
+    
+    folder = tempfile.mkdtemp(prefix = "tiles_")
+    try:
+        grid = np.memmap(os.path.join(folder, "out.dat"), 
+                         dtype = np.float32, mode = "w+", 
+                         shape = (info.n_rows, info.n_cols))
+        run_tiled(kernel, read, grid, tile_size, int(halo), workers, 
+                  kernel_args)
+        grid.flush()
+        write_blocks(grid, info, out_raster)
+        write_statistics(out_raster, grid)
+        del grid
+    finally:
+        shutil.rmtree(folder, ignore_errors = True)
+    return out_raster
+
+
+def write_segments(segments, info, out_fc, fields = (), values = ()):
+    """
+    Writes segments of grid cells to a new polyline feature class through 
+    cell centers.
+
+    Each segment (e.g., from FG_streams.trace_streams) becomes one polyline 
+    whose vertices are the centers of its cells. All polylines are written 
+    with a single insert cursor.
+
+    Args:
+    segments          -- (list) of numpy arrays of flat cell indices (row * 
+                         n_cols + col)
+    info              -- RasterInfo of the grid (see `raster_info`)
+    out_fc            -- Path to the output polyline feature class
+    fields            -- (list) of (field_name, field_type) pairs of fields 
+                         to add, for example [("ReachName", "TEXT")]
+    values            -- (list) of the field values of each segment, in the 
+                         order of the fields with a value. Fields with no 
+                         value are left NULL.
+
+    Returns:
+    path to the output feature class
+    """
+    arcpy.CreateFeatureclass_management(
+                    out_path = os.path.dirname(out_fc), 
+                    out_name = os.path.basename(out_fc), 
+                    geometry_type = "POLYLINE", 
+                    spatial_reference = info.spatial_reference)
+    for field_name, field_type in fields:
+        arcpy.AddField_management(in_table = out_fc, 
+                                  field_name = field_name, 
+                                  field_type = field_type)
+    
+    n_values = len(values[0]) if len(values) else 0
+    value_fields = [field_name for field_name, field_type in fields][:n_values]
+    with arcpy.da.InsertCursor(out_fc, ["SHAPE@"] + value_fields) as cursor:
+        for i, segment in enumerate(segments):
+            x, y = cell_centers(segment, info.n_cols, info.x_min, info.y_max, 
+                                info.cell_width, info.cell_height)
+            line = arcpy.Polyline(arcpy.Array([arcpy.Point(px, py) 
+                                               for px, py in zip(x.tolist(), 
+                                                                 y.tolist())]), 
+                                  info.spatial_reference)
+            row = [line] + (list(values[i]) if n_values else [])
+            cursor.insertRow(row)
+    return out_fc
+
+
+def sample_surfaces(points, surfaces, method = "BILINEAR"):
+    """
+    Samples one or more rasters at the locations of a point feature class.
+
+    Point coordinates are read once, each raster is sampled using windowed
+    block reads, and all of the value fields are written in a single update
+    cursor pass. Points are projected to the coordinate system of each
+    raster when they differ. Points outside a raster or on NoData cells are
+    set to NULL.
+
+    Args:
+    points            -- Path to a point feature class
+    surfaces          -- (list) of (field_name, raster) pairs, for example
+                         [("DEM_Z", dem), ("Detrend_DEM_Z", detrend_dem)]
+    method            -- (string) resampling method. One of "NEAREST" or
+                         "BILINEAR".
+
+    Outputs:
+    a double field for each surface written to the points feature class
+    """
+    # Add the value fields
+    field_names = [f.name for f in arcpy.ListFields(points)]
+    for field_name, raster in surfaces:
+        if field_name not in field_names:
+            arcpy.AddField_management(in_table = points,
+                                      field_name = field_name,
+                                      field_type = "DOUBLE")
+
+    # Read point coordinates, once for each raster coordinate system
+    coords = {}
+    columns = []
+    for field_name, raster in surfaces:
+        sr = raster_info(raster).spatial_reference
+        sr_key = spatial_reference_key(sr)
+        if sr_key not in coords:
+            xy = [row for row in arcpy.da.SearchCursor(
+                                     points, ["OID@", "SHAPE@X", "SHAPE@Y"],
+                                     spatial_reference = sr)]
+            xy = np.array(xy, dtype = np.float64).reshape(-1, 3)
+            coords[sr_key] = xy
+        xy = coords[sr_key]
+        columns.append(sample_raster(raster, xy[:, 1], xy[:, 2], method))
+        arcpy.AddMessage("Sampled {}".format(arcpy.Describe(raster).baseName))
+
+    # Write all value fields in one pass
+    oids = next(iter(coords.values()))[:, 0].astype(np.int64)
+    position = dict(zip(oids.tolist(), range(len(oids))))
+    values = np.column_stack(columns)
+    fields = ["OID@"] + [field_name for field_name, raster in surfaces]
+    with arcpy.da.UpdateCursor(points, fields) as cursor:
+        for row in cursor:
+            sample = values[position[row[0]]]
+            cursor.updateRow([row[0]] + [None if np.isnan(v) else float(v)
+                                         for v in sample])
+
+
+def idw_raster(points, z_field, mask, template, out_raster, n_points = 12, 
+               power = 2.0):
+    """
+    Interpolates the cells of a mask raster from a point feature class by 
+    inverse distance weighting.
+
+    This replaces `arcpy.Idw_3d` with a "VARIABLE" search radius followed by
+    an analysis mask. Only the cells within the mask are interpolated (see
+    FG_grid.idw_grid), so the time is proportional to the area of the mask
+    rather than the extent of the output raster. Grids of more than 
+    MAX_MEMORY_CELLS cells are held in memory-mapped grids in a temporary 
+    folder.
+
+    Args:
+    points            -- Path to a point feature class
+    z_field           -- (string) name of the field of the point values
+    mask              -- Path to a raster aligned with `template` that is 
+                         NoData outside the cells to interpolate
+    template          -- Path to the raster that sets the extent, cell size
+                         and coordinate system of the output raster
+    out_raster        -- Path to the output raster
+    n_points          -- (int) number of nearest points used for each cell
+    power             -- (numeric) exponent of the inverse distance weights
+
+    Returns:
+    path to the output float32 raster, NoData outside the mask
+    """
+    info = raster_info(template)
+    xyz = [row for row in arcpy.da.SearchCursor(
+                                points, ["SHAPE@X", "SHAPE@Y", z_field],
+                                spatial_reference = info.spatial_reference)
+           if row[2] is not None]
+    xyz = np.array(xyz, dtype = np.float64).reshape(-1, 3)
+
+    # Read the mask cells at the positions of the template cells
+    mask_info = info._replace(nodata = raster_info(mask).nodata)
+    folder = tempfile.mkdtemp(prefix = "idw_")
+    try:
+        if info.n_rows * info.n_cols <= MAX_MEMORY_CELLS:
+            grid = read_window(mask, mask_info, 0, 0, 
+                               info.n_rows, info.n_cols)[0]
+            trend = np.empty(grid.shape, dtype = np.float32)
+        else:
+            grid = read_memmap(mask, mask_info, 
+                               os.path.join(folder, "mask.dat"))
+            trend = np.memmap(os.path.join(folder, "idw.dat"), 
+                              dtype = np.float32, mode = "w+", 
+                              shape = grid.shape)
+        idw_grid(grid, info.x_min, info.y_max, 
+                 info.cell_width, info.cell_height, 
+                 xyz[:, 0], xyz[:, 1], xyz[:, 2], 
+                 n_points = n_points, power = power, out = trend)
+        write_blocks(trend, info, out_raster)
+        write_statistics(out_raster, trend)
+        del grid, trend
+    finally:
+        shutil.rmtree(folder, ignore_errors = True)
+    return out_raster
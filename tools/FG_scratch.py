@@ -0,0 +1,174 @@
+"""____________________________________________________________________________
+Script Name:          FG_scratch.py
+Description:          Contains a scratch workspace manager for the
+                      intermediate datasets of a tool run.
+Date:                 10/17/2026
+
+Usage:
+This module does not depend on arcpy. A tool opens one ScratchWorkspace per
+run and asks it for the path of each intermediate dataset along with an
+estimate of its size. Datasets are placed in the in-memory workspace while
+the total estimated size of the in-memory datasets is within the memory
+budget, and in a per-run temporary folder on disk otherwise. Datasets that
+are read by worker processes (which cannot see the in-memory workspace of
+the tool) are always placed on disk.
+
+Every dataset is deleted and the temporary folder is removed when the
+workspace is closed, including when the tool fails, so that no intermediate
+datasets are left behind in the project geodatabase.
+
+    with scratch_workspace() as scratch:
+        buffer = scratch.path("flowline_buffer", size = 10 * 1024 ** 2)
+        arcpy.Buffer_analysis(flowline, buffer, "10 Meters")
+
+The functions that delete datasets and create the scratch geodatabase are
+passed to the workspace (see FG_utils.scratch_workspace for the arcpy
+version).
+
+Functions:
+ScratchWorkspace      -- Routes the intermediate datasets of a tool run to the
+                         in-memory workspace or to a temporary folder and
+                         deletes them when the run ends.
+____________________________________________________________________________"""
+
+import os
+import uuid
+import shutil
+import tempfile
+
+# Name of the in-memory workspace
+MEMORY_WORKSPACE = "memory"
+
+# Default limit of the total estimated size of in-memory datasets (in bytes),
+# set in megabytes by the FG_SCRATCH_MEMORY_MB environment variable
+SCRATCH_MEMORY_BYTES = int(float(os.environ.get("FG_SCRATCH_MEMORY_MB", 512)) 
+                           * 1024 ** 2)
+
+# Name of the geodatabase created in the temporary folder
+SCRATCH_GDB = "scratch.gdb"
+
+class ScratchWorkspace(object):
+    """
+    Routes the intermediate datasets of a tool run to the in-memory workspace
+    or to a temporary folder and deletes them when the run ends.
+
+    Args:
+    memory_bytes      -- (int) limit of the total estimated size of the
+                         in-memory datasets (in bytes). 0 places every dataset
+                         on disk.
+    root              -- (string) folder in which the temporary folder is
+                         created. Defaults to the system temporary folder.
+    delete            -- (function) called with the path of each dataset to
+                         delete it. Errors are reported and ignored.
+    create_gdb        -- (function) called with (folder, name) to create a
+                         geodatabase for the datasets on disk. None places
+                         them in the folder itself.
+    message           -- (function) function called with each message
+    prefix            -- (string) prefix of the temporary folder name
+    """
+    def __init__(self, memory_bytes = SCRATCH_MEMORY_BYTES, root = None,
+                 delete = None, create_gdb = None, message = print,
+                 prefix = "fg_scratch_"):
+        self.memory_bytes = memory_bytes
+        self.root = root
+        self.delete = delete
+        self.create_gdb = create_gdb
+        self.message = message
+        self.prefix = prefix
+        self.run_id = uuid.uuid4().hex[:8]
+        self.memory_used = 0
+        self.folder = None
+        self.workspace = None
+        self.datasets = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+        return False
+
+    def disk_workspace(self):
+        """
+        Returns the workspace of the datasets on disk, creating the temporary
+        folder (and its geodatabase) on first use.
+        """
+        if self.workspace is None:
+            if self.root and not os.path.isdir(self.root):
+                os.makedirs(self.root)
+            self.folder = tempfile.mkdtemp(prefix = self.prefix,
+                                           dir = self.root or None)
+            if self.create_gdb is not None:
+                self.create_gdb(self.folder, SCRATCH_GDB)
+                self.workspace = os.path.join(self.folder, SCRATCH_GDB)
+            else:
+                self.workspace = self.folder
+        return self.workspace
+
+    def path(self, name, size = 0, on_disk = False):
+        """
+        Returns the path of a new intermediate dataset.
+
+        Args:
+        name          -- (string) base name of the dataset
+        size          -- (int) estimated size of the dataset (in bytes)
+        on_disk       -- (boolean) place the dataset on disk regardless of
+                         its size (e.g., a raster read by worker processes)
+
+        Returns:
+        string path to the dataset, in the in-memory workspace or in the
+        temporary folder
+        """
+        size = max(int(size), 0)
+        in_memory = (not on_disk and self.memory_bytes > 0 and
+                     self.memory_used + size <= self.memory_bytes)
+        if in_memory:
+            # The in-memory workspace is shared by every run in the process
+            path = os.path.join(MEMORY_WORKSPACE,
+                                "{}_{}".format(name, self.run_id))
+            self.memory_used += size
+        else:
+            path = os.path.join(self.disk_workspace(), name)
+        # Names are unique within a run
+        n = 1
+        base = path
+        while path in self.datasets:
+            n += 1
+            path = "{}_{}".format(base, n)
+        self.datasets[path] = size if in_memory else 0
+        return path
+
+    def release(self, path):
+        """
+        Deletes an intermediate dataset before the end of the run and returns
+        its size to the memory budget.
+
+        Args:
+        path          -- (string) path returned by `path`
+        """
+        if path not in self.datasets:
+            return
+        self.memory_used -= self.datasets.pop(path)
+        self._delete(path)
+
+    def cleanup(self):
+        """
+        Deletes every intermediate dataset and removes the temporary folder.
+        """
+        for path in reversed(list(self.datasets)):
+            self._delete(path)
+        self.datasets = {}
+        self.memory_used = 0
+        if self.folder is not None:
+            shutil.rmtree(self.folder, ignore_errors = True)
+            self.folder = None
+            self.workspace = None
+
+    def _delete(self, path):
+        if self.delete is None:
+            return
+        try:
+            self.delete(path)
+        except Exception as e:
+            self.message("Scratch dataset not deleted: {} ({})".format(path,
+                                                                       e))
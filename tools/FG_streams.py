@@ -0,0 +1,508 @@
+"""____________________________________________________________________________
+Script Name:          FG_streams.py
+Description:          Contains a set of NumPy functions for extracting stream
+                      networks from contributing area grids.
+Date:                 10/17/2026
+
+Usage:
+These functions do not depend on arcpy. A contributing area grid is
+thresholded into a grid of stream cells, thinned to a skeleton one cell wide
+and traced into segments of 8-connected cells between junctions and
+endpoints. The segments are written to a polyline feature class by the
+Stream Network tool.
+
+Functions:
+threshold_streams     -- Selects the cells whose contributing area is at or
+                         above a threshold.
+thin_streams          -- Thins a grid of stream cells to a skeleton one cell
+                         wide.
+neighbor_count        -- Counts the 8-connected neighbors of each stream cell.
+trace_streams         -- Traces a stream skeleton into segments of cells
+                         between junctions and endpoints.
+stream_levels         -- Assigns each cell the number of stream thresholds
+                         that its contributing area reaches.
+level_dtype           -- Returns the smallest integer type that holds every
+                         stream level of a number of thresholds.
+split_segments        -- Splits segments where the stream level of their
+                         cells changes.
+orient_segments       -- Orders the cells of each segment downstream.
+segment_topology      -- Finds the downstream segment of each segment.
+stream_order          -- Calculates the Strahler and Shreve order of each
+                         segment.
+segment_lengths       -- Calculates the length of each segment.
+cell_centers          -- Converts flat cell indices to the map coordinates
+                         of cell centers.
+____________________________________________________________________________"""
+
+from collections import deque
+import numpy as np
+from FG_grid import *
+
+# Row and column offsets of the eight neighbors of a cell, counter-clockwise
+# from east, in the order of the bits of a neighborhood code
+CODE_OFFSETS = [(0, 1), (-1, 1), (-1, 0), (-1, -1),
+                (0, -1), (1, -1), (1, 0), (1, 1)]
+
+def _thin_tables():
+    """
+    Returns the lookup tables of the two sub-iterations of Guo-Hall thinning,
+    indexed by the neighborhood code of a cell.
+    """
+    first = np.zeros(256, dtype = bool)
+    second = np.zeros(256, dtype = bool)
+    for code in range(256):
+        # x[1] .. x[8] are the neighbors counter-clockwise from east
+        x = [None] + [(code >> i) & 1 for i in range(8)] + [code & 1]
+        crossings = sum(1 for k in range(1, 5)
+                        if not x[2 * k - 1] and (x[2 * k] or x[2 * k + 1]))
+        n1 = sum(x[2 * k - 1] | x[2 * k] for k in range(1, 5))
+        n2 = sum(x[2 * k] | x[2 * k + 1] for k in range(1, 5))
+        if crossings != 1 or not 2 <= min(n1, n2) <= 3:
+            continue
+        first[code] = ((x[2] | x[3] | (1 - x[8])) & x[1]) == 0
+        second[code] = ((x[6] | x[7] | (1 - x[4])) & x[5]) == 0
+    return first, second
+
+THIN_TABLES = _thin_tables()
+
+
+def _neighborhood_codes(cells):
+    """
+    Returns the 8-bit code of the stream neighbors of each cell.
+    """
+    n_rows, n_cols = cells.shape
+    padded = np.pad(cells, 1)
+    codes = np.zeros(cells.shape, dtype = np.uint8)
+    for bit, (dr, dc) in enumerate(CODE_OFFSETS):
+        codes |= (padded[1 + dr:1 + dr + n_rows, 1 + dc:1 + dc + n_cols]
+                  .astype(np.uint8) << bit)
+    return codes
+
+
+def threshold_streams(sca, threshold):
+    """
+    Selects the cells whose contributing area is at or above a threshold.
+
+    This is the array equivalent of TauDEM `Threshold`.
+
+    Args:
+    sca               -- (numpy array) 2D grid of contributing area. NaN
+                         cells are NoData.
+    threshold         -- (numeric) contributing area that initiates a stream
+
+    Returns:
+    boolean numpy array of stream cells
+    """
+    with np.errstate(invalid = "ignore"):
+        return np.asarray(sca) >= float(threshold)
+
+
+def thin_streams(cells, max_iterations = None):
+    """
+    Thins a grid of stream cells to a skeleton one cell wide.
+
+    Stream cells are removed from the edges of the streams by the two
+    sub-iterations of the Guo-Hall parallel thinning algorithm until no
+    more cells can be removed. Cells are only removed if they do not break
+    the 8-connectivity of the streams or shorten their ends, so the
+    skeleton has the same connectivity as the input, as with
+    `arcpy.sa.Thin` with "SHARP" corners.
+
+    Args:
+    cells             -- (numpy array) 2D boolean grid of stream cells
+    max_iterations    -- (int) maximum number of iterations. None to thin
+                         until the skeleton is one cell wide.
+
+    Returns:
+    boolean numpy array of the skeleton cells
+    """
+    skeleton = np.array(cells, dtype = bool)
+    iteration = 0
+    while max_iterations is None or iteration < max_iterations:
+        removed = 0
+        for table in THIN_TABLES:
+            remove = skeleton & table[_neighborhood_codes(skeleton)]
+            removed += np.count_nonzero(remove)
+            skeleton &= ~remove
+        iteration += 1
+        if removed == 0:
+            break
+    return skeleton
+
+
+def neighbor_count(cells):
+    """
+    Counts the 8-connected neighbors of each stream cell.
+
+    Args:
+    cells             -- (numpy array) 2D boolean grid of stream cells
+
+    Returns:
+    int numpy array of the number of stream neighbors of each cell (0 for
+    cells that are not stream cells)
+    """
+    n_rows, n_cols = cells.shape
+    padded = np.pad(np.asarray(cells, dtype = np.int8), 1)
+    count = np.zeros(cells.shape, dtype = np.int8)
+    for dr, dc in CODE_OFFSETS:
+        count += padded[1 + dr:1 + dr + n_rows, 1 + dc:1 + dc + n_cols]
+    return np.where(cells, count, 0)
+
+
+def trace_streams(skeleton):
+    """
+    Traces a stream skeleton into segments of cells between junctions and
+    endpoints.
+
+    Nodes are skeleton cells that do not have exactly two neighbors
+    (endpoints and junctions). Each segment is a walk of 8-connected cells
+    from a node to the next node. Closed loops with no nodes are traced from
+    their first cell back to it. Isolated single cells are skipped.
+
+    Thinning can leave a junction as a cluster of adjacent junction cells,
+    with each branch reaching a different cell of the cluster. A compact
+    cluster, with a cell adjacent to all of its other cells, is collapsed to
+    that cell (the one with the most neighbors), and segments that end at
+    another cell of the cluster are extended to it, so all of the segments
+    at a junction share its end cell. Larger clusters, such as the ladder of
+    junction cells between two streams running side by side one cell apart,
+    are not collapsed: their cells stay nodes linked by two cell segments,
+    so every step of a segment is to an 8-connected neighbor.
+
+    Args:
+    skeleton          -- (numpy array) 2D boolean grid of skeleton cells (see
+                         `thin_streams`)
+
+    Returns:
+    list of segments, each an int64 numpy array of the flat indices of its
+    cells in order (row * n_cols + col)
+    """
+    n_rows, n_cols = skeleton.shape
+    count = neighbor_count(skeleton)
+    is_stream = np.pad(np.asarray(skeleton, dtype = bool), 1).ravel()
+    is_node = np.pad((count != 2) & skeleton, 1).ravel()
+    # Cells are traced on the grid padded by one cell, so neighbors of edge
+    # cells never wrap around to the next row
+    width = n_cols + 2
+    offsets = [dr * width + dc for dr, dc in CODE_OFFSETS]
+    visited = np.zeros(is_stream.size, dtype = bool)
+    node_links = set()
+
+    # Collapse each compact 8-connected cluster of junction cells to one cell
+    padded_count = np.pad(count, 1).ravel()
+    adjacent = set(offsets) | {0}
+    junction = {}
+    for cell in np.flatnonzero(padded_count >= 3).tolist():
+        if cell in junction:
+            continue
+        cluster, stack = [cell], [cell]
+        junction[cell] = cell
+        while stack:
+            current = stack.pop()
+            for offset in offsets:
+                nxt = current + offset
+                if padded_count[nxt] >= 3 and nxt not in junction:
+                    junction[nxt] = cell
+                    cluster.append(nxt)
+                    stack.append(nxt)
+        centers = [c for c in cluster
+                   if all(m - c in adjacent for m in cluster)]
+        for member in cluster:
+            junction[member] = member
+        if centers:
+            center = max(centers, key = lambda c: (padded_count[c], -c))
+            for member in cluster:
+                junction[member] = center
+
+    def walk(start, first):
+        # Cells between nodes have exactly two neighbors, so each step goes
+        # to the neighbor that is not the previous cell
+        path = [start]
+        prev, cell = start, first
+        while True:
+            path.append(cell)
+            if is_node[cell] or cell == start:
+                return path
+            visited[cell] = True
+            for offset in offsets:
+                if is_stream[cell + offset] and cell + offset != prev:
+                    prev, cell = cell, cell + offset
+                    break
+
+    segments = []
+    nodes = np.flatnonzero(is_node & is_stream)
+    for node in nodes.tolist():
+        for offset in offsets:
+            nxt = node + offset
+            if not is_stream[nxt] or visited[nxt]:
+                continue
+            if is_node[nxt]:
+                if junction.get(node, node) == junction.get(nxt, nxt):
+                    # Cells of the same junction
+                    continue
+                # Adjacent nodes are linked by a two cell segment
+                link = (min(node, nxt), max(node, nxt))
+                if link in node_links:
+                    continue
+                node_links.add(link)
+                segments.append([node, nxt])
+                continue
+            segments.append(walk(node, nxt))
+
+    # Closed loops have no nodes
+    for cell in np.flatnonzero(is_stream & ~visited & ~is_node).tolist():
+        if visited[cell]:
+            continue
+        visited[cell] = True
+        for offset in offsets:
+            if is_stream[cell + offset]:
+                segments.append(walk(cell, cell + offset))
+                break
+
+    # Extend the ends of segments to the collapsed cell of their junction
+    for segment in segments:
+        if junction.get(segment[0], segment[0]) != segment[0]:
+            segment.insert(0, junction[segment[0]])
+        if junction.get(segment[-1], segment[-1]) != segment[-1]:
+            segment.append(junction[segment[-1]])
+
+    return [_unpad(np.array(segment, dtype = np.int64), width, n_cols)
+            for segment in segments]
+
+
+def _unpad(index, width, n_cols):
+    """
+    Converts flat indices of the padded grid to flat indices of the grid.
+    """
+    return (index // width - 1) * n_cols + (index % width - 1)
+
+
+def stream_levels(sca, thresholds):
+    """
+    Assigns each cell the number of stream thresholds that its contributing
+    area reaches.
+
+    A cell with level k is a stream cell for each of the k lowest thresholds,
+    so the networks of all of the thresholds are found in one pass over the
+    grid: the network of threshold i (counting from 1) is the cells with
+    level >= i.
+
+    Args:
+    sca               -- (numpy array) 2D grid of contributing area. NaN
+                         cells are NoData.
+    thresholds        -- (list) stream thresholds, in increasing order
+
+    Returns:
+    numpy array of stream levels (0 for cells below every threshold), of the
+    smallest unsigned integer type that holds the number of thresholds (see
+    `level_dtype`)
+    """
+    sca = np.nan_to_num(np.asarray(sca, dtype = np.float64), nan = -np.inf)
+    return np.searchsorted(np.asarray(thresholds, dtype = np.float64), sca,
+                           side = "right").astype(level_dtype(len(thresholds)))
+
+
+def level_dtype(n_thresholds):
+    """
+    Returns the smallest unsigned integer type that holds every stream level
+    of `n_thresholds` thresholds (uint8 for fewer than 256 thresholds).
+    """
+    return np.min_scalar_type(n_thresholds)
+
+
+def split_segments(segments, levels):
+    """
+    Splits segments where the stream level of their cells changes.
+
+    Contributing area only increases downstream, so a stream segment is
+    usually split where it reaches a higher threshold. Each piece ends at
+    the first cell of the next piece, so the pieces stay connected.
+
+    Args:
+    segments          -- (list) of numpy arrays of flat cell indices (see
+                         `trace_streams`)
+    levels            -- (numpy array) stream level of each cell (see
+                         `stream_levels`)
+
+    Returns:
+    tuple (pieces, piece_levels) of the list of pieces and the stream level
+    of each piece
+    """
+    levels = np.asarray(levels).ravel()
+    pieces, piece_levels = [], []
+    for segment in segments:
+        cell_levels = levels[segment]
+        # The end cells of a segment are nodes shared with other segments,
+        # so the levels of a segment are those of its inner cells
+        inner = cell_levels[1:-1]
+        if inner.size == 0:
+            pieces.append(segment)
+            piece_levels.append(int(cell_levels.min()))
+            continue
+        breaks = (np.flatnonzero(np.diff(inner)) + 2).tolist()
+        starts = [0] + breaks
+        ends = breaks + [len(segment) - 1]
+        for start, end in zip(starts, ends):
+            pieces.append(segment[start:end + 1])
+            piece_levels.append(int(cell_levels[max(start, 1)]))
+    return pieces, np.array(piece_levels, dtype = np.int64)
+
+
+def orient_segments(segments, first_values, last_values):
+    """
+    Orders the cells of each segment downstream.
+
+    Contributing area increases downstream, so a segment is reversed when
+    its first cell has a higher contributing area than its last cell.
+
+    Args:
+    segments          -- (list) of numpy arrays of flat cell indices (see
+                         `trace_streams`)
+    first_values      -- (numpy array) contributing area of the first cell of
+                         each segment. NaN is lower than any value.
+    last_values       -- (numpy array) contributing area of the last cell of
+                         each segment
+
+    Returns:
+    tuple (segments, outlet_values) of the list of oriented segments and the
+    contributing area of the last (outlet) cell of each segment
+    """
+    first_values = np.nan_to_num(np.asarray(first_values, dtype = np.float64),
+                                 nan = -np.inf)
+    last_values = np.nan_to_num(np.asarray(last_values, dtype = np.float64),
+                                nan = -np.inf)
+    reverse = first_values > last_values
+    oriented = [segment[::-1] if rev else segment
+                for segment, rev in zip(segments, reverse.tolist())]
+    outlet_values = np.where(reverse, first_values, last_values)
+    outlet_values[np.isinf(outlet_values)] = np.nan
+    return oriented, outlet_values
+
+
+def segment_topology(segments, outlet_values = None):
+    """
+    Finds the downstream segment of each segment.
+
+    The downstream segment of a segment is a segment that starts at its last
+    (outlet) cell. When several segments start there (e.g., a braid), the one
+    with the highest outlet contributing area is used.
+
+    Args:
+    segments          -- (list) of numpy arrays of flat cell indices ordered
+                         downstream (see `orient_segments`)
+    outlet_values     -- (numpy array) contributing area of the outlet cell
+                         of each segment
+
+    Returns:
+    int64 numpy array of the index of the downstream segment of each segment
+    (-1 for segments that do not flow into another segment)
+    """
+    if outlet_values is None:
+        outlet_values = np.zeros(len(segments))
+    outlet_values = np.nan_to_num(np.asarray(outlet_values,
+                                             dtype = np.float64),
+                                  nan = -np.inf)
+    starts = {}
+    for i, segment in enumerate(segments):
+        first = int(segment[0])
+        if (first not in starts or 
+            outlet_values[i] > outlet_values[starts[first]]):
+            starts[first] = i
+    downstream = np.full(len(segments), -1, dtype = np.int64)
+    for i, segment in enumerate(segments):
+        j = starts.get(int(segment[-1]), -1)
+        if j != i:
+            downstream[i] = j
+    return downstream
+
+
+def stream_order(downstream):
+    """
+    Calculates the Strahler and Shreve order of each segment.
+
+    Segments are visited from the headwaters down, each once all of its
+    upstream segments are done. Headwater segments have order 1. The Shreve
+    order of a segment is the sum of the Shreve orders of its upstream
+    segments. The Strahler order is the highest upstream Strahler order,
+    plus one when two or more upstream segments share it.
+
+    Args:
+    downstream        -- (numpy array) index of the downstream segment of
+                         each segment, -1 for none (see `segment_topology`)
+
+    Returns:
+    tuple of int64 numpy arrays (strahler, shreve). Segments in a loop of
+    segments cannot be ordered and are 0.
+    """
+    downstream = np.asarray(downstream, dtype = np.int64)
+    n = len(downstream)
+    n_upstream = np.bincount(downstream[downstream >= 0], minlength = n)
+    remaining = n_upstream.copy()
+    strahler = np.zeros(n, dtype = np.int64)
+    shreve = np.zeros(n, dtype = np.int64)
+    max_upstream = np.zeros(n, dtype = np.int64)
+    max_count = np.zeros(n, dtype = np.int64)
+    queue = deque(np.flatnonzero(n_upstream == 0).tolist())
+    while queue:
+        i = queue.popleft()
+        if n_upstream[i] == 0:
+            strahler[i] = 1
+            shreve[i] = 1
+        else:
+            strahler[i] = max_upstream[i] + (max_count[i] >= 2)
+        j = downstream[i]
+        if j < 0:
+            continue
+        shreve[j] += shreve[i]
+        if strahler[i] > max_upstream[j]:
+            max_upstream[j] = strahler[i]
+            max_count[j] = 1
+        elif strahler[i] == max_upstream[j]:
+            max_count[j] += 1
+        remaining[j] -= 1
+        if remaining[j] == 0:
+            queue.append(j)
+    shreve[strahler == 0] = 0
+    return strahler, shreve
+
+
+def segment_lengths(segments, n_cols, cell_width, cell_height):
+    """
+    Calculates the length of each segment.
+
+    Args:
+    segments          -- (list) of numpy arrays of flat cell indices
+    n_cols            -- (int) number of columns in the grid
+    cell_width        -- (numeric) cell width
+    cell_height       -- (numeric) cell height
+
+    Returns:
+    float64 numpy array of the length of each segment through its cell
+    centers (in map units)
+    """
+    lengths = np.zeros(len(segments))
+    for i, segment in enumerate(segments):
+        row, col = np.divmod(np.asarray(segment, dtype = np.int64), n_cols)
+        lengths[i] = np.hypot(np.diff(row) * cell_height,
+                              np.diff(col) * cell_width).sum()
+    return lengths
+
+
+def cell_centers(index, n_cols, x_min, y_max, cell_width, cell_height):
+    """
+    Converts flat cell indices to the map coordinates of cell centers.
+
+    Args:
+    index             -- (numpy array) flat cell indices (row * n_cols + col)
+    n_cols            -- (int) number of columns in the grid
+    x_min             -- (numeric) left edge of the grid
+    y_max             -- (numeric) top edge of the grid
+    cell_width        -- (numeric) cell width
+    cell_height       -- (numeric) cell height
+
+    Returns:
+    tuple of numpy arrays (x, y)
+    """
+    row, col = np.divmod(np.asarray(index, dtype = np.int64), n_cols)
+    return (x_min + (col + 0.5) * cell_width,
+            y_max - (row + 0.5) * cell_height)
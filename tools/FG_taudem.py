@@ -0,0 +1,258 @@
+"""____________________________________________________________________________
+Script Name:          FG_taudem.py
+Description:          Contains a set of functions for running TauDEM commands.
+Date:                 10/17/2026
+
+Usage:
+These functions do not depend on arcpy. Each TauDEM command is launched once
+with mpiexec and its output is passed line by line to a message function
+(e.g., arcpy.AddMessage) while the command runs. The exit code and the wall
+clock and CPU time of each step are recorded, and a failed step raises a
+TauDEMError so that later steps are not run on missing or partial outputs.
+
+The outputs of TauDEM steps can be kept in a content-addressed cache folder.
+Each step is identified by a key hashed from the step name, its parameters and
+the keys of its inputs (the key of an input file is the hash of its bytes), so
+a step is only run again when its inputs or parameters change. Each cached
+step is a subfolder named for its key. The least recently used steps are
+deleted when the cache grows beyond its size limit.
+
+Functions:
+taudem_command        -- Builds the argument list of an mpiexec TauDEM
+                         command.
+run_taudem            -- Runs a command once, streaming its output, and
+                         returns the exit code and timings of the step.
+file_digest           -- Returns the hash of the bytes of a file.
+cache_key             -- Returns the cache key of a step from its name,
+                         parameters and input keys.
+run_cached_step       -- Runs a step only if its outputs are not already in
+                         the cache.
+evict_cache           -- Deletes the least recently used cached steps until
+                         the cache is within its size limit.
+____________________________________________________________________________"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import subprocess
+from collections import namedtuple, deque
+
+# Exit code, wall clock time and CPU time (in seconds) of a TauDEM step
+TauDEMStep = namedtuple("TauDEMStep", ["name", "command", "exit_code",
+                                       "wall_time", "cpu_time"])
+
+# Name of the TauDEM cache folder, stored in the folder above the geodatabase
+TAUDEM_CACHE_FOLDER = "taudem_cache"
+
+# Default size limit of the TauDEM cache (in bytes)
+TAUDEM_CACHE_BYTES = 10 * 1024 ** 3
+
+# File written to a cached step folder once all of its outputs are complete
+CACHE_COMPLETE = ".complete"
+
+class TauDEMError(Exception):
+    """Raised when a TauDEM command cannot be started or fails."""
+    pass
+
+
+def taudem_command(tool, processes, args, mpiexec = "mpiexec"):
+    """
+    Builds the argument list of an mpiexec TauDEM command.
+
+    Args:
+    tool              -- (string) TauDEM executable name (e.g., "pitremove")
+    processes         -- (int) number of MPI processes
+    args              -- (list) TauDEM arguments (e.g., ["-z", demfile,
+                         "-fel", felfile])
+    mpiexec           -- (string) MPI launcher executable
+
+    Returns:
+    list of command line arguments
+    """
+    return [mpiexec, "-n", str(processes), tool] + [str(a) for a in args]
+
+
+def run_taudem(command, name = None, message = print, tail_lines = 20):
+    """
+    Runs a command once, streaming its output, and returns the exit code and
+    timings of the step.
+
+    The command is run without a shell. Standard output and standard error are
+    merged and passed to `message` one line at a time as they are written.
+
+    Args:
+    command           -- (list) command line arguments (see `taudem_command`)
+    name              -- (string) name of the step used in messages. Defaults
+                         to the executable name.
+    message           -- (function) function called with each message
+    tail_lines        -- (int) number of output lines included in the error
+                         raised when the command fails
+
+    Returns:
+    TauDEMStep of the step. The cpu_time is the user and system time of the
+    finished child processes, which is not reported on Windows (None).
+
+    Raises:
+    TauDEMError if the command cannot be started or exits with a non-zero
+    exit code
+    """
+    if name is None:
+        name = os.path.basename(command[0])
+    message("\nTauDEM command: {}".format(subprocess.list2cmdline(command)))
+
+    tail = deque(maxlen = tail_lines)
+    start_wall = time.perf_counter()
+    start_cpu = os.times()
+    try:
+        process = subprocess.Popen(command, stdout = subprocess.PIPE,
+                                   stderr = subprocess.STDOUT,
+                                   universal_newlines = True, bufsize = 1)
+    except OSError as e:
+        raise TauDEMError("{} could not be started: {}".format(name, e))
+    with process:
+        for line in process.stdout:
+            line = line.rstrip()
+            tail.append(line)
+            message(line)
+        exit_code = process.wait()
+    wall_time = time.perf_counter() - start_wall
+    end_cpu = os.times()
+    cpu_time = None
+    if sys.platform != "win32":
+        cpu_time = ((end_cpu.children_user - start_cpu.children_user) +
+                    (end_cpu.children_system - start_cpu.children_system))
+
+    step = TauDEMStep(name, command, exit_code, wall_time, cpu_time)
+    message("{} exit code: {}, wall time: {:.1f} s, CPU time: {}".format(
+            name, exit_code, wall_time,
+            "n/a" if cpu_time is None else "{:.1f} s".format(cpu_time)))
+    if exit_code != 0:
+        raise TauDEMError("{} failed with exit code {}:\n{}".format(
+                          name, exit_code, "\n".join(tail)))
+    return step
+
+
+def file_digest(path, chunk_size = 1024 * 1024):
+    """
+    Returns the hash of the bytes of a file.
+
+    Args:
+    path              -- (string) path to the file
+    chunk_size        -- (int) number of bytes read at a time
+
+    Returns:
+    string of the hex SHA-1 digest
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(step, params = (), inputs = ()):
+    """
+    Returns the cache key of a step from its name, parameters and input keys.
+
+    Args:
+    step              -- (string) step name (e.g., "pitremove")
+    params            -- (list) parameters that change the outputs of the step
+    inputs            -- (list) keys of the inputs of the step (see
+                         `file_digest`)
+
+    Returns:
+    string of the hex SHA-1 digest
+    """
+    digest = hashlib.sha1(step.encode("utf-8"))
+    for value in list(params) + ["|"] + list(inputs):
+        digest.update(b"\0" + str(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def run_cached_step(cache_dir, step, params, inputs, outputs, run,
+                    message = print, max_bytes = TAUDEM_CACHE_BYTES):
+    """
+    Runs a step only if its outputs are not already in the cache.
+
+    Args:
+    cache_dir         -- (string) path to the cache folder
+    step              -- (string) step name
+    params            -- (list) parameters that change the outputs of the step
+    inputs            -- (list) keys of the inputs of the step
+    outputs           -- (list) file names of the outputs of the step
+    run               -- (function) called with a dictionary of the path of
+                         each output name to create the outputs
+    message           -- (function) function called with each message
+    max_bytes         -- (int) size limit of the cache (in bytes). None for no
+                         limit.
+
+    Returns:
+    tuple (key, paths) of the step key and a dictionary of the cached path of
+    each output name
+    """
+    key = cache_key(step, params, inputs)
+    folder = os.path.join(cache_dir, key)
+    paths = {name: os.path.join(folder, name) for name in outputs}
+    complete = os.path.join(folder, CACHE_COMPLETE)
+
+    if os.path.exists(complete) and all(map(os.path.exists, paths.values())):
+        # Mark the step as recently used
+        os.utime(complete, None)
+        message("{} outputs found in cache: {}".format(step, key))
+        return key, paths
+
+    # Discard any partial outputs of an earlier failed run
+    shutil.rmtree(folder, ignore_errors = True)
+    os.makedirs(folder)
+    try:
+        run(paths)
+    except Exception:
+        shutil.rmtree(folder, ignore_errors = True)
+        raise
+    with open(complete, "w") as f:
+        f.write(step + "\n")
+    if max_bytes is not None:
+        evict_cache(cache_dir, max_bytes, keep = [key], message = message)
+    return key, paths
+
+
+def evict_cache(cache_dir, max_bytes, keep = (), message = print):
+    """
+    Deletes the least recently used cached steps until the cache is within its
+    size limit.
+
+    Args:
+    cache_dir         -- (string) path to the cache folder
+    max_bytes         -- (int) size limit of the cache (in bytes)
+    keep              -- (list) keys of steps that are never deleted
+    message           -- (function) function called with each message
+
+    Returns:
+    list of the keys of the deleted steps
+    """
+    steps = []
+    for key in os.listdir(cache_dir):
+        folder = os.path.join(cache_dir, key)
+        if not os.path.isdir(folder):
+            continue
+        complete = os.path.join(folder, CACHE_COMPLETE)
+        used = os.path.getmtime(complete) if os.path.exists(complete) else 0
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, dirs, names in os.walk(folder)
+                   for name in names)
+        steps.append((used, key, size))
+
+    total = sum(size for used, key, size in steps)
+    evicted = []
+    for used, key, size in sorted(steps):
+        if total <= max_bytes:
+            break
+        if key in keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, key), ignore_errors = True)
+        total -= size
+        evicted.append(key)
+        message("Evicted cached step: {}".format(key))
+    return evicted
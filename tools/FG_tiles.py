@@ -0,0 +1,122 @@
+"""____________________________________________________________________________
+Script Name:          FG_tiles.py
+Description:          Contains a set of functions for running NumPy kernels
+                      over the tiles of a raster grid across a process pool.
+Date:                 10/17/2026
+
+Usage:
+These functions do not depend on arcpy. A grid is split into tiles, and each
+tile is read together with a halo of neighboring cells wide enough for the
+neighborhood of the kernel (e.g., 1 cell for a 3 x 3 slope, 50 cells for a
+50 cell focal mean). The kernel is run on each tile and halo, and only the
+tile part of its result is stitched into the output grid. Tiles are
+independent, so they can run in any order and in parallel.
+
+Kernels and readers are passed to worker processes, so they must be defined
+at the top level of a module (or be a `functools.partial` of one).
+
+Functions:
+tile_windows          -- Splits a grid into tiles with a halo.
+run_tiled             -- Runs a kernel over the tiles of a grid and stitches
+                         the results into an output grid.
+____________________________________________________________________________"""
+
+import os
+import sys
+import collections
+import multiprocessing
+import numpy as np
+
+# Position of a tile in the grid, the window read for it (the tile plus its
+# halo, clipped to the grid) and the position of the tile in the window
+Tile = collections.namedtuple("Tile", ["row", "col", "n_rows", "n_cols",
+                                       "read_row", "read_col",
+                                       "read_rows", "read_cols",
+                                       "inner_row", "inner_col"])
+
+def tile_windows(n_rows, n_cols, tile_size, halo = 0):
+    """
+    Splits a grid into tiles with a halo.
+
+    Args:
+    n_rows            -- (int) number of rows in the grid
+    n_cols            -- (int) number of columns in the grid
+    tile_size         -- (int) number of rows and columns in each tile
+    halo              -- (int) number of neighboring cells read around each
+                         tile
+
+    Returns:
+    list of Tile
+    """
+    tiles = []
+    for row in range(0, n_rows, tile_size):
+        for col in range(0, n_cols, tile_size):
+            r0, c0 = max(row - halo, 0), max(col - halo, 0)
+            r1 = min(row + tile_size + halo, n_rows)
+            c1 = min(col + tile_size + halo, n_cols)
+            tiles.append(Tile(row, col,
+                              min(tile_size, n_rows - row),
+                              min(tile_size, n_cols - col),
+                              r0, c0, r1 - r0, c1 - c0,
+                              row - r0, col - c0))
+    return tiles
+
+
+def _run_tile(task):
+    """
+    Reads a tile and its halo, runs the kernel and returns the tile part of
+    the result. Runs in a worker process.
+    """
+    kernel, read, tile, kernel_args = task
+    windows = read(tile.read_row, tile.read_col,
+                   tile.read_rows, tile.read_cols)
+    result = kernel(*(list(windows) + list(kernel_args)))
+    return tile, result[tile.inner_row:tile.inner_row + tile.n_rows,
+                        tile.inner_col:tile.inner_col + tile.n_cols]
+
+
+def run_tiled(kernel, read, out, tile_size = 2048, halo = 0, workers = 1,
+              kernel_args = ()):
+    """
+    Runs a kernel over the tiles of a grid and stitches the results into an
+    output grid.
+
+    Args:
+    kernel            -- (function) called with the windows returned by
+                         `read` followed by `kernel_args`. Returns a grid of
+                         the same shape as the windows.
+    read              -- (function) called with (row, col, n_rows, n_cols)
+                         of a window. Returns a list of the input grids of
+                         the window (e.g., a block of each input raster).
+    out               -- (numpy array) 2D output grid, such as a `np.memmap`.
+                         Its shape sets the tiles.
+    tile_size         -- (int) number of rows and columns in each tile
+    halo              -- (int) neighborhood radius of the kernel (in cells)
+    workers           -- (int) number of worker processes. 1 runs the tiles
+                         in this process.
+    kernel_args       -- (tuple) additional arguments of the kernel
+
+    Returns:
+    the output grid
+    """
+    tiles = tile_windows(out.shape[0], out.shape[1], tile_size, halo)
+    tasks = [(kernel, read, tile, tuple(kernel_args)) for tile in tiles]
+    workers = min(int(workers), len(tasks))
+    if workers <= 1:
+        results = map(_run_tile, tasks)
+        for tile, result in results:
+            out[tile.row:tile.row + tile.n_rows,
+                tile.col:tile.col + tile.n_cols] = result
+        return out
+
+    # Geoprocessing tools run inside ArcGIS Pro, so workers must be started
+    # with the Python interpreter instead of sys.executable
+    if sys.platform == "win32":
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix,
+                                                    "python.exe"))
+    with multiprocessing.Pool(processes = workers) as pool:
+        # Tiles do not overlap, so results are stitched as they finish
+        for tile, result in pool.imap_unordered(_run_tile, tasks):
+            out[tile.row:tile.row + tile.n_rows,
+                tile.col:tile.col + tile.n_cols] = result
+    return out
@@ -6,63 +6,91 @@ Date:                 05/22/2020
 
 Functions:
 line_route_points     -- Converts an input line feature class into a route, 
-                         densifies its vertices, and ctreates a point feature 
-                         class in the feature_dataset.  
+                         places station points along it, and creates a point 
+                         feature class in the feature_dataset.  
 add_elevation         -- Adds elevation fields to the input feature class.
+line_parts            -- Returns the vertices of each polyline part as arrays.
+join_parts            -- Joins polyline part arrays into single arrays.
+add_field_like        -- Adds a field using the definition of another field.
+raster_fingerprint    -- Returns a string that changes when the content of a 
+                         raster changes.
+drainage_area_profile -- Builds (or reads the cached) drainage area profile 
+                         of each reach of a flowline.
+drainage_area_at      -- Interpolates drainage area from the drainage area 
+                         profiles at point locations.
+dataset_bytes         -- Returns a rough estimate of the size of a dataset.
+scratch_workspace     -- Returns a ScratchWorkspace for the intermediate 
+                         datasets of a tool run.
+ArcpyTables           -- Reads and writes geodatabase tables for the join 
+                         functions in FG_join.
+join_table_fields     -- Joins the fields of a join table to a target table 
+                         by the values of a key field in one update pass.
+calculate_table_fields -- Calculates fields of a table from vectorized 
+                         expressions with one read and one write pass.
 ____________________________________________________________________________"""
 
 import os
+import hashlib
+import numpy as np
 import arcpy
+from FG_geometry import *
+from FG_raster import *
+from FG_scratch import *
+from FG_join import *
+from FG_calc import *
 
-def add_elevation(points, dem = "", detrend_dem = ""):
+# Rough size of a row of a feature class or table (in bytes), used to 
+# estimate the size of intermediate datasets
+SCRATCH_ROW_BYTES = 4096
+
+def add_elevation(points, dem = "", detrend_dem = "", method = "BILINEAR"):
     """
     Adds elevation fields to the input feature class.
     
-    Writes all outputs to the environment workspace. 
+    All surfaces are sampled with a single shared sampler that reads only the 
+    raster blocks containing points and writes every elevation field in one 
+    update pass (see FG_raster.sample_surfaces). 
     
     Args:             
     points            -- Path to a point feature class
     dem               -- Path to the digital elevation model (DEM)
     detrend_dem       -- Path to the detrended digital elevation model (DEM)
+    method            -- (string) resampling method. One of "NEAREST" or 
+                         "BILINEAR".
     
     Outputs:
     elevation attributes written to the input feature class
     """
-    # Add elevations to the `points` feature class
+    surfaces = []
     if dem:
-        arcpy.AddSurfaceInformation_3d(in_feature_class = points, 
-                                       in_surface = dem, 
-                                       out_property = "Z", 
-                                       z_factor = 1.0)
-        # Change `Z` field name to `DEM_Z`
-        arcpy.AlterField_management(in_table = points, 
-                                   field = "Z", 
-                                   new_field_name = "DEM_Z")
-        arcpy.AddMessage("Added DEM elevations")
+        surfaces.append(("DEM_Z", dem))
     else:
-        arcypy.AddMessage("Error: DEM not supplied")
+        arcpy.AddMessage("Error: DEM not supplied")
     
-    # Add detrended elevations to the `points` feature class
     if detrend_dem:
-        arcpy.AddSurfaceInformation_3d(in_feature_class = points, 
-                                       in_surface = detrend_dem, 
-                                       out_property = "Z", 
-                                       z_factor = 1.0)
-        # Change `Z` field name to `Detrend_DEM_Z`
-        arcpy.AlterField_management(in_table = points, 
-                                    field = "Z", 
-                                    new_field_name = "Detrend_DEM_Z")
-        arcpy.AddMessage("Added Detrended DEM elevations")
+        surfaces.append(("Detrend_DEM_Z", detrend_dem))
     else: 
         arcpy.AddMessage("Warning: Detrended DEM not supplied")
+    
+    # Add elevations to the `points` feature class
+    if surfaces:
+        sample_surfaces(points, surfaces, method)
+    if dem:
+        arcpy.AddMessage("Added DEM elevations")
+    if detrend_dem:
+        arcpy.AddMessage("Added Detrended DEM elevations")
 
 
 
 def line_route_points(feature_dataset, line, station_distance, 
-                      route_id_field, fields):
+                      route_id_field, fields, out_feature_class = None):
     """
-    Converts an input line feature class into a route, densifies its vertices, 
-    and ctreates a point feature class in the feature_dataset. 
+    Converts an input line feature class into a route, places station points 
+    along it, and creates a point feature class in the feature_dataset. 
+    
+    Station X, Y, and M values are calculated for each route in a single 
+    vectorized pass (see FG_geometry.station_points) and written with one 
+    insert cursor. M-values are in units meters. 
     
     Writes all outputs to the specified feature_dataset. 
     
@@ -75,104 +103,74 @@ def line_route_points(feature_dataset, line, station_distance,
     fields            -- (string) a list of fields from the line feature class
                          to join to the output line_points feature class (e.g., 
                          ["bank","ReachName"]). 
+    out_feature_class -- Path to the output point feature class (e.g., a 
+                         scratch dataset). Defaults to <line>_points in the 
+                         feature_dataset.
     
     Outputs:
     <line>_points     -- a point feature class named the same as the line 
                          input feature class written to the feature_dataset
     """
     # Set line name
-    line_name = arcpy.Describe(line).baseName
-    
-    # Add a field to hold the linear referencing route `from_measure`
-    # Check if the field already exists and if not add it
-    field_names = [f.name for f in arcpy.ListFields(line)]
-    if "from_measure" not in field_names:
-        arcpy.AddField_management(in_table = line, 
-                                  field_name = "from_measure", 
-                                  field_type = "DOUBLE")
-    
-    # Set the value of the line `from_measure` to zero in units meters
-    arcpy.CalculateField_management(in_table = line, 
-                                    field = "from_measure", 
-                                    expression = "0", 
-                                    expression_type = "PYTHON_9.3")
-
-    # Add a field to hold the linear referencing route `to_measure`
-    if "to_measure" not in field_names:
-        arcpy.AddField_management(in_table = line, 
-                                  field_name = "to_measure", 
-                                  field_type = "DOUBLE")
+    desc = arcpy.Describe(line)
+    line_name = desc.baseName
+    spatial_ref = desc.spatialReference
+    meters_per_unit = spatial_ref.metersPerUnit if spatial_ref.metersPerUnit else 1.0
+    fields = [f for f in fields if f != route_id_field]
     
-    # Set the value of the line `to_measure` to the length of the 
-    # line in units meters
-    arcpy.CalculateField_management(in_table = line, 
-                                    field = "to_measure", 
-                                    expression = "!shape.length@meters!", 
-                                    expression_type = "PYTHON_9.3")
-    arcpy.AddMessage("Added route 'from_measure' and 'to_measure' fields to " 
+    # Read the line vertices and attributes of each route. Lines sharing a 
+    # route identifier are combined into a single route. 
+    routes = {}
+    attributes = {}
+    with arcpy.da.SearchCursor(line, 
+                               ["SHAPE@", route_id_field] + fields) as cursor:
+        for row in cursor:
+            if row[0] is None:
+                continue
+            route = routes.setdefault(row[1], [])
+            route.extend(line_parts(row[0]))
+            attributes.setdefault(row[1], row[2:])
+    arcpy.AddMessage("Read " + str(len(routes)) + " routes from " 
                      + str(line_name))
     
-    # Densify vertices of the line feature class using the Densify tool. 
-    line_densify_name = line_name + "_densify"
-    line_densify = os.path.join(feature_dataset, line_densify_name)
-    arcpy.CopyFeatures_management(in_features = line, 
-                                  out_feature_class = line_densify)
-    arcpy.Densify_edit(in_features = line_densify, 
-                       densification_method = "DISTANCE", 
-                       distance = station_distance)
-
-    # Convert the line feature class to a route
-    line_densify_route_name = line_name + "_densify_route"
-    line_densify_route = os.path.join(feature_dataset, line_densify_route_name)
-    arcpy.CreateRoutes_lr(in_line_features = line_densify, 
-                          route_id_field = route_id_field, 
-                          out_feature_class = line_densify_route, 
-                          measure_source = "TWO_FIELDS", 
-                          from_measure_field = "from_measure", 
-                          to_measure_field = "to_measure")
-    arcpy.AddMessage("Converted " + str(line_name) + " to a route")
-
-    # Convert line feature vertices to points
-    line_points_name = line_name + "_points"
-    line_points = os.path.join(feature_dataset, line_points_name)
-    arcpy.FeatureVerticesToPoints_management(
-                     in_features = line_densify_route, 
-                     out_feature_class = line_points)
-    arcpy.AddMessage("Converted " + str(line_name) + " to points")
+    # Create the output point feature class
+    line_points = out_feature_class or os.path.join(feature_dataset, 
+                                                     line_name + "_points")
+    if arcpy.Exists(line_points):
+        arcpy.Delete_management(line_points)
+    arcpy.CreateFeatureclass_management(
+                                    out_path = os.path.dirname(line_points), 
+                                    out_name = os.path.basename(line_points), 
+                                    geometry_type = "POINT", 
+                                    has_m = "ENABLED", 
+                                    spatial_reference = spatial_ref)
+    line_fields = {f.name: f for f in arcpy.ListFields(line)}
+    add_field_like(line_points, line_fields[route_id_field])
+    for name in ["POINT_X", "POINT_Y", "POINT_M"]:
+        arcpy.AddField_management(in_table = line_points, 
+                                  field_name = name, 
+                                  field_type = "DOUBLE")
+    for name in fields:
+        add_field_like(line_points, line_fields[name])
     
-    # Add x, y, z, and m values to the `line_points` feature class
-    arcpy.AddGeometryAttributes_management(
-                     Input_Features = line_points, 
-                     Geometry_Properties = "POINT_X_Y_Z_M", 
-                                           Length_Unit = "METERS")
-    
-    # Set the first m-value for each line to zero. The `create route`
-    # tool sets the first record to NULL. 
-    mNull_wc = """{0} IS NULL""".format(
-        arcpy.AddFieldDelimiters(line_points, "POINT_M"))
-    
-    with arcpy.da.UpdateCursor(line_points, "POINT_M", 
-                               where_clause = mNull_wc) as cursor:
-         for row in cursor:
-             row[0] = 0
-             cursor.updateRow(row)
-    
-    # Delete un-needed fields
-    arcpy.DeleteField_management(in_table = line_points, 
-                                 drop_field = ["ORIG_FID","POINT_Z"])
-    
-    # Join fields from the `line` to the `line_points` feature class
-    arcpy.JoinField_management(
-               in_data = line_points, 
-               in_field = route_id_field, 
-               join_table = line, 
-               join_field = route_id_field,
-               fields = fields)
-    arcpy.AddMessage("Joined fields from " + str(line_name))
-    
-    # Cleanup
-    arcpy.Delete_management(in_data = line_densify)
-    arcpy.Delete_management(in_data = line_densify_route)
+    # Calculate the stations of each route and write them in one pass
+    out_fields = (["SHAPE@", route_id_field, "POINT_X", "POINT_Y", "POINT_M"] 
+                  + fields)
+    with arcpy.da.InsertCursor(line_points, out_fields) as cursor:
+        for route_id, parts in routes.items():
+            x, y, part_starts = join_parts(parts)
+            length = cumulative_distance(x, y, part_starts)[-1]
+            st_x, st_y, st_m = station_points(
+                                   x, y, station_distance, 
+                                   m_from = 0.0, 
+                                   m_to = length * meters_per_unit, 
+                                   part_starts = part_starts)
+            attrs = tuple(attributes[route_id])
+            for px, py, pm in zip(st_x.tolist(), st_y.tolist(), 
+                                  st_m.tolist()):
+                point = arcpy.PointGeometry(arcpy.Point(px, py, None, pm), 
+                                            spatial_ref, False, True)
+                cursor.insertRow((point, route_id, px, py, pm) + attrs)
     
     arcpy.AddMessage("Converted " + str(line_name) + " to points")
     
@@ -180,6 +178,282 @@ def line_route_points(feature_dataset, line, station_distance,
     return line_points
 
 
+def line_parts(geometry):
+    """
+    Returns the vertices of each part of a polyline geometry as a list of 
+    (x, y) numpy array pairs. 
+    
+    Args:
+    geometry          -- an arcpy Polyline geometry
+    
+    Returns:
+    list of tuples of numpy arrays (x, y), one per part
+    """
+    parts = []
+    for part in geometry:
+        coords = [(p.X, p.Y) for p in part if p is not None]
+        if len(coords) < 2:
+            continue
+        xy = np.array(coords, dtype = np.float64)
+        parts.append((xy[:, 0], xy[:, 1]))
+    return parts
+
+
+def join_parts(parts):
+    """
+    Joins the parts returned by `line_parts` into single coordinate arrays. 
+    
+    Args:
+    parts             -- list of tuples of numpy arrays (x, y)
+    
+    Returns:
+    tuple (x, y, part_starts) where part_starts lists the index of the first 
+    vertex of each part after the first
+    """
+    x = np.concatenate([p[0] for p in parts])
+    y = np.concatenate([p[1] for p in parts])
+    part_starts = np.cumsum([len(p[0]) for p in parts])[:-1]
+    return x, y, part_starts
+
+
+# Map arcpy.Field.type values to AddField field_type keywords
+FIELD_TYPES = {"String":       "TEXT", 
+               "Integer":      "LONG", 
+               "SmallInteger": "SHORT", 
+               "BigInteger":   "BIGINTEGER", 
+               "Double":       "DOUBLE", 
+               "Single":       "FLOAT", 
+               "Date":         "DATE", 
+               "GUID":         "GUID", 
+               "OID":          "LONG"}
+
+def add_field_like(table, field, field_name = None):
+    """
+    Adds a field to a table using the type and length of an existing field. 
+    
+    Args:
+    table             -- Path to the table or feature class
+    field             -- an arcpy Field object to copy the definition of
+    field_name        -- (string) name of the new field. Defaults to the name 
+                         of `field`.
+    """
+    arcpy.AddField_management(in_table = table, 
+                              field_name = field_name or field.name, 
+                              field_type = FIELD_TYPES.get(field.type, "TEXT"), 
+                              field_length = field.length 
+                                             if field.type == "String" 
+                                             else None)
+
+
+def geodatabase_of(dataset):
+    """
+    Returns the path to the geodatabase (or folder) containing a dataset. 
+    
+    Args:
+    dataset           -- Path to a feature class or table
+    """
+    path = arcpy.Describe(dataset).path
+    if arcpy.Describe(path).dataType == "FeatureDataset":
+        path = os.path.dirname(path)
+    return path
+
+
+def raster_fingerprint(raster):
+    """
+    Returns a string that changes when the content of a raster changes. 
+    
+    Rasters stored as files (e.g., GeoTIFF) are identified by the size and 
+    modification time of the file. Geodatabase rasters are identified by 
+    their grid properties and statistics, which are rewritten with the 
+    raster. 
+    
+    Args:
+    raster            -- Path to a raster
+    
+    Returns:
+    string fingerprint, or None if the raster has no statistics to identify 
+    its content
+    """
+    path = arcpy.Describe(raster).catalogPath
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return "|".join([path, str(stat.st_size), str(stat.st_mtime_ns)])
+    info = raster_info(path)
+    try:
+        stats = [arcpy.management.GetRasterProperties(
+                                        path, prop).getOutput(0) 
+                 for prop in ("MINIMUM", "MAXIMUM", "MEAN", "STD")]
+    except arcpy.ExecuteError:
+        return None
+    return "|".join([path] + [str(v) for v in info[:7]] + stats)
+
+
+def drainage_area_profile(flowline, flow_accum, snap_distance, 
+                          station_distance = None):
+    """
+    Builds the drainage area profile of each reach of a flowline, or reads 
+    the profiles from the cache table saved with the flowline. 
+    
+    The flowline features are grouped by `ReachName` (a flowline without the 
+    field is one reach). Stations are placed along each reach, snapped to the 
+    cell of highest flow accumulation within snap_distance, and converted to 
+    square miles in one pass (see FG_raster.snap_raster). Each reach profile 
+    is forced to increase steadily downstream. The profiles are saved to the 
+    table `<flowline>_drainage_profile` in the flowline's geodatabase. The 
+    table is reused as long as the content of the flow accumulation raster 
+    (see `raster_fingerprint`), the snap distance, and the flowline vertices 
+    of every reach are unchanged, so no raster is read. 
+    
+    Args:
+    flowline          -- Path to the flowline feature class
+    flow_accum        -- Path to the flow accumulation raster
+    snap_distance     -- (numeric) distance each station is snapped to find 
+                         the cell of highest flow accumulation (in map units)
+    station_distance  -- (numeric) distance between profile stations (in the 
+                         linear units of the flow accumulation raster). 
+                         Defaults to the raster cell size. 
+    
+    Returns:
+    dictionary keyed on ReachName of dictionaries with the reach vertex 
+    arrays ("x", "y", "part_starts", "dist") and the profile arrays 
+    ("distance", "area") in the coordinate system of the flow accumulation 
+    raster
+    """
+    info = raster_info(flow_accum)
+    
+    # Read the flowline vertices of each reach in the coordinate system of 
+    # the raster
+    field_names = [f.name for f in arcpy.ListFields(flowline)]
+    reach_field = "ReachName" if "ReachName" in field_names else "OID@"
+    reach_parts = {}
+    with arcpy.da.SearchCursor(flowline, [reach_field, "SHAPE@"], 
+                               spatial_reference = info.spatial_reference
+                               ) as cursor:
+        for row in cursor:
+            reach = row[0] if reach_field == "ReachName" else None
+            if row[1] is not None:
+                reach_parts.setdefault(reach, []).extend(line_parts(row[1]))
+    
+    # Key the cache on the raster content, snap distance and the flowline 
+    # vertices of every reach
+    raster_key = raster_fingerprint(flow_accum)
+    digest = hashlib.sha1("|".join([str(raster_key), 
+                                    str(float(snap_distance)), 
+                                    str(station_distance)]).encode("utf-8"))
+    profiles = {}
+    for reach in sorted(reach_parts, key = str):
+        x, y, part_starts = join_parts(reach_parts[reach])
+        dist = cumulative_distance(x, y, part_starts)
+        profiles[reach] = {"x": x, "y": y, "part_starts": part_starts, 
+                           "dist": dist}
+        digest.update(str(reach).encode("utf-8"))
+        digest.update(np.ascontiguousarray(x).tobytes())
+        digest.update(np.ascontiguousarray(y).tobytes())
+        digest.update(np.ascontiguousarray(part_starts).tobytes())
+    cache_alias = "drainage profile " + digest.hexdigest()[:16]
+    
+    # Reuse the cached profiles when their inputs are unchanged
+    profile_table = os.path.join(geodatabase_of(flowline), 
+                                 arcpy.Describe(flowline).baseName + 
+                                 "_drainage_profile")
+    if (raster_key is not None and arcpy.Exists(profile_table) and 
+            arcpy.Describe(profile_table).aliasName == cache_alias):
+        cached = arcpy.da.TableToNumPyArray(profile_table, 
+                                            ["ReachName", 
+                                             "flowline_distance", 
+                                             "Watershed_Area_SqMile"], 
+                                            null_value = {"ReachName": ""})
+        for reach, profile in profiles.items():
+            rows = cached["ReachName"] == ("" if reach is None else reach)
+            profile["distance"] = cached["flowline_distance"][rows]
+            profile["area"] = cached["Watershed_Area_SqMile"][rows]
+        arcpy.AddMessage("Read cached drainage area profiles")
+        return profiles
+    
+    # Snap stations along each reach to the flow accumulation raster
+    if not station_distance:
+        station_distance = info.cell_width
+    for reach, profile in profiles.items():
+        st_x, st_y, st_m = station_points(profile["x"], profile["y"], 
+                                          station_distance, 
+                                          part_starts = profile["part_starts"])
+        snap_x, snap_y, cell_count = snap_raster(flow_accum, st_x, st_y, 
+                                                 float(snap_distance))
+        area = cell_count_to_sq_mile(cell_count, info.cell_width, 
+                                     info.cell_height, 
+                                     info.spatial_reference.metersPerUnit)
+        keep = ~np.isnan(area)
+        profile["distance"] = st_m[keep]
+        profile["area"] = monotonic_profile(area[keep])
+    
+    # Save the profiles with the flowline
+    if arcpy.Exists(profile_table):
+        arcpy.Delete_management(profile_table)
+    n_stations = sum(len(p["distance"]) for p in profiles.values())
+    length = max([len(str(reach)) for reach in profiles] + [1])
+    out = np.zeros(n_stations, 
+                   dtype = [("ReachName", "U{}".format(length)), 
+                            ("flowline_distance", np.float64), 
+                            ("Watershed_Area_SqMile", np.float64)])
+    start = 0
+    for reach, profile in profiles.items():
+        end = start + len(profile["distance"])
+        out["ReachName"][start:end] = "" if reach is None else reach
+        out["flowline_distance"][start:end] = profile["distance"]
+        out["Watershed_Area_SqMile"][start:end] = profile["area"]
+        start = end
+    arcpy.da.NumPyArrayToTable(out, profile_table)
+    arcpy.AlterAliasName(profile_table, cache_alias)
+    arcpy.AddMessage("Built drainage area profiles of {} reaches from {} "
+                     "stations".format(len(profiles), n_stations))
+    return profiles
+
+
+def drainage_area_at(profiles, px, py, reach_names = None):
+    """
+    Interpolates drainage area from the drainage area profiles at point 
+    locations. 
+    
+    Each point is located on the flowline of its reach and the drainage area 
+    is linearly interpolated from the reach profile at that distance along 
+    the reach. 
+    
+    Args:
+    profiles          -- (dictionary) returned by `drainage_area_profile`
+    px                -- (numpy array) point x coordinates (in the coordinate 
+                         system of the flow accumulation raster)
+    py                -- (numpy array) point y coordinates
+    reach_names       -- (list) ReachName of each point. By default each 
+                         point uses the reach nearest to it. 
+    
+    Returns:
+    numpy array of drainage areas in square miles
+    """
+    px = np.asarray(px, dtype = np.float64)
+    py = np.asarray(py, dtype = np.float64)
+    area = np.full(px.shape, np.nan)
+    nearest = np.full(px.shape, np.inf)
+    if reach_names is not None:
+        reach_names = np.array(reach_names, dtype = object)
+    for reach, profile in profiles.items():
+        if len(profile["distance"]) == 0:
+            continue
+        if reach_names is None or reach is None:
+            points = np.arange(px.size)
+        else:
+            points = np.flatnonzero(reach_names == reach)
+        if points.size == 0:
+            continue
+        along, offset = locate_points(profile["x"], profile["y"], 
+                                      px[points], py[points], 
+                                      profile["part_starts"], profile["dist"])
+        closer = offset < nearest[points]
+        nearest[points[closer]] = offset[closer]
+        area[points[closer]] = np.interp(along[closer], profile["distance"], 
+                                         profile["area"])
+    return area
+
+
 def repair_until_fixed (in_dataset, null_setting):
     """
     Repairs geometry in a vector feature class until all geometry errors
@@ -201,3 +475,134 @@ def repair_until_fixed (in_dataset, null_setting):
         arcpy.AddMessage("Messages:")
         arcpy.AddMessage(result.getMessages())
         max_severity = result.maxSeverity
+
+
+def dataset_bytes(dataset, factor = 1.0):
+    """
+    Returns a rough estimate of the size of a dataset, used to place 
+    intermediate datasets derived from it in a ScratchWorkspace. 
+    
+    Args:
+    dataset           -- Path to a raster, feature class or table
+    factor            -- (numeric) ratio of the size of the intermediate 
+                         dataset to the size of `dataset` (e.g., 4 for a 
+                         line densified to a quarter of its vertex spacing)
+    
+    Returns:
+    int estimated size (in bytes)
+    """
+    desc = arcpy.Describe(dataset)
+    if desc.dataType in ("RasterDataset", "RasterLayer", "RasterBand"):
+        info = raster_info(dataset)
+        size = info.n_rows * info.n_cols * 4
+    else:
+        size = int(arcpy.management.GetCount(dataset).getOutput(0)) * \
+               SCRATCH_ROW_BYTES
+    return int(size * factor)
+
+
+def scratch_workspace(memory_bytes = SCRATCH_MEMORY_BYTES):
+    """
+    Returns a ScratchWorkspace for the intermediate datasets of a tool run. 
+    
+    Datasets on disk are placed in a geodatabase in a temporary folder in the 
+    arcpy scratch folder. 
+    
+    Args:
+    memory_bytes      -- (int) limit of the total estimated size of the 
+                         in-memory datasets (in bytes)
+    
+    Returns:
+    FG_scratch.ScratchWorkspace to use as a context manager
+    """
+    def delete(path):
+        if arcpy.Exists(path):
+            arcpy.management.Delete(path)
+    
+    def create_gdb(folder, name):
+        arcpy.management.CreateFileGDB(folder, name)
+    
+    return ScratchWorkspace(memory_bytes = memory_bytes, 
+                            root = arcpy.env.scratchFolder, 
+                            delete = delete, 
+                            create_gdb = create_gdb, 
+                            message = arcpy.AddMessage)
+
+
+class ArcpyTables(object):
+    """
+    Reads and writes geodatabase tables for the join functions in FG_join. 
+    """
+    def fields(self, table):
+        return [FieldDef(f.name, f.type, f.length) 
+                for f in arcpy.ListFields(table)]
+    
+    def add_fields(self, table, fields):
+        if fields:
+            arcpy.management.AddFields(
+                    in_table = table, 
+                    field_description = [[f.name, 
+                                          FIELD_TYPES.get(f.type, "TEXT"), 
+                                          f.name, 
+                                          f.length if f.type == "String" 
+                                          else None] 
+                                         for f in fields])
+    
+    def search(self, table, names):
+        with arcpy.da.SearchCursor(table, names) as cursor:
+            for row in cursor:
+                yield row
+    
+    def update(self, table, names):
+        return arcpy.da.UpdateCursor(table, names)
+
+
+def join_table_fields(target, target_field, join_table, join_field, 
+                      fields = None):
+    """
+    Joins the fields of a join table to a target table by the values of a key
+    field in one update pass. 
+    
+    This is a faster replacement for `arcpy.management.JoinField` (see 
+    FG_join.join_fields). 
+    
+    Args:
+    target            -- Path to the target table or feature class
+    target_field      -- (string) name of the key field of the target table
+    join_table        -- Path to the join table, feature class or table view
+    join_field        -- (string) name of the key field of the join table
+    fields            -- (list) names of the join table fields to join. 
+                         Defaults to every field except the join field, object
+                         ID, geometry and geodatabase fields. 
+    
+    Returns:
+    list of the names of the fields added to the target table
+    """
+    return join_fields(target, target_field, join_table, join_field, 
+                       ArcpyTables(), fields)
+
+
+def calculate_table_fields(table, expressions, inputs = (), new_fields = ()):
+    """
+    Calculates fields of a table from vectorized expressions with one read 
+    and one write pass. 
+    
+    This is a faster replacement for a sequence of 
+    `arcpy.management.CalculateField` calls (see FG_calc.calculate_fields). 
+    
+    Args:
+    table             -- Path to the table or feature class (or a layer of 
+                         its selected rows)
+    expressions       -- (list) of (field name, function or value) pairs. 
+                         Each function is called with a dictionary of the 
+                         column arrays and returns an array or a single value.
+    inputs            -- (list) names of the fields (or cursor tokens, e.g., 
+                         "SHAPE@LENGTH") read into the column arrays
+    new_fields        -- (list) of FG_join.FieldDef of the calculated fields 
+                         to add to the table if they do not exist
+    
+    Returns:
+    dictionary of the column array of each calculated field
+    """
+    return calculate_fields(table, expressions, ArcpyTables(), inputs, 
+                            new_fields)
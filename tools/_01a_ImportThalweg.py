@@ -26,6 +26,7 @@ ____________________________________________________________________________"""
  
 import os
 import arcpy
+from FG_utils import *
 
 def ImportThalweg(feature_dataset, thalweg, thalweg_srs, reach_name):
     # Set environment variables 
@@ -35,43 +36,32 @@ def ImportThalweg(feature_dataset, thalweg, thalweg_srs, reach_name):
     # List parameter values
     arcpy.AddMessage("Workspace: {}".format(arcpy.env.workspace))
     
-    # Convert .csv to geodatabase table
-    thalweg_table = os.path.join(os.path.dirname(feature_dataset), 
-                                 "thalweg_table")
-    arcpy.conversion.ExportTable(in_table = thalweg, 
-                                 out_table = thalweg_table)
+    with scratch_workspace() as scratch:
+        # Convert .csv to geodatabase table
+        thalweg_table = scratch.path("thalweg_table", 
+                                     size = dataset_bytes(thalweg))
+        arcpy.conversion.ExportTable(in_table = thalweg, 
+                                     out_table = thalweg_table)
     
-    # Convert geodatabase table to point feature class
-    thalweg_points = os.path.join(feature_dataset, "thalweg_points")
-    arcpy.management.XYTableToPoint(in_table = thalweg_table,
-                                     out_feature_class = thalweg_points,
-                                     x_field = "Easting",
-                                     y_field = "Northing",
-                                     z_field = "Elevation",
-                                     coordinate_system = thalweg_srs)
-    
-    # Add the `ReachName` field
-    # Check if the field already exists and if not add it
-    field_names = [f.name for f in arcpy.ListFields(thalweg_points)]
-    if "ReachName" not in field_names:
-        arcpy.AddField_management(in_table = thalweg_points, 
-                                  field_name = "ReachName", 
-                                  field_type = "TEXT")
-    
-    expression = '"{}"'.format(str(reach_name))
-    arcpy.management.CalculateField(in_table = thalweg_points, 
-                                    field = "ReachName", 
-                                    expression = expression, 
-                                    expression_type = "PYTHON_9.3")
-    
-    # Return
-    arcpy.SetParameter(4, thalweg_points)
-    
-    # Cleanup
-    arcpy.management.Delete(in_data = thalweg_table)
-    arcpy.AddMessage("Temp datasets deleted")
+        # Convert geodatabase table to point feature class
+        thalweg_points = os.path.join(feature_dataset, "thalweg_points")
+        arcpy.management.XYTableToPoint(in_table = thalweg_table,
+                                         out_feature_class = thalweg_points,
+                                         x_field = "Easting",
+                                         y_field = "Northing",
+                                         z_field = "Elevation",
+                                         coordinate_system = thalweg_srs)
     
+        # Add the `ReachName` field if it does not exist and set its value
+        calculate_table_fields(
+            thalweg_points, 
+            [("ReachName", str(reach_name))], 
+            new_fields = [FieldDef("ReachName", "String", 255)])
     
+        # Return
+        arcpy.SetParameter(4, thalweg_points)
+
+
 def main():
     # Call the function with command line parameters
     ImportThalweg(feature_dataset, thalweg, thalweg_srs, reach_name)
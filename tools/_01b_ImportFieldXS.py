@@ -28,6 +28,7 @@ ____________________________________________________________________________"""
  
 import os
 import arcpy
+from FG_utils import *
 
 def ImportFieldXS(feature_dataset, field_xs_csv, field_xs_srs, reach_name):
     # Set environment variables 
@@ -37,43 +38,32 @@ def ImportFieldXS(feature_dataset, field_xs_csv, field_xs_srs, reach_name):
     # List parameter values
     arcpy.AddMessage("Workspace: {}".format(arcpy.env.workspace))
     
-    # Convert .csv to geodatabase table
-    field_xs_table = os.path.join(os.path.dirname(feature_dataset), 
-                                 "field_xs_table")
-    arcpy.conversion.ExportTable(in_table  = field_xs_csv, 
-                                 out_table = field_xs_table)
+    with scratch_workspace() as scratch:
+        # Convert .csv to geodatabase table
+        field_xs_table = scratch.path("field_xs_table", 
+                                      size = dataset_bytes(field_xs_csv))
+        arcpy.conversion.ExportTable(in_table  = field_xs_csv, 
+                                     out_table = field_xs_table)
     
-    # Convert geodatabase table to point feature class
-    field_xs_points = os.path.join(feature_dataset, "field_xs_points")
-    arcpy.management.XYTableToPoint(in_table = field_xs_table,
-                                     out_feature_class = field_xs_points,
-                                     x_field = "Easting",
-                                     y_field = "Northing",
-                                     z_field = "Elevation",
-                                     coordinate_system = field_xs_srs)
-    
-    # Add the `ReachName` field
-    # Check if the field already exists and if not add it
-    field_names = [f.name for f in arcpy.ListFields(field_xs_points)]
-    if "ReachName" not in field_names:
-        arcpy.AddField_management(in_table = field_xs_points, 
-                                  field_name = "ReachName", 
-                                  field_type = "TEXT")
-    
-    expression = '"{}"'.format(str(reach_name))
-    arcpy.management.CalculateField(in_table = field_xs_points, 
-                                    field = "ReachName", 
-                                    expression = expression, 
-                                    expression_type = "PYTHON_9.3")
-    
-    # Return
-    arcpy.SetParameter(4, field_xs_points)
-    
-    # Cleanup
-    arcpy.management.Delete(in_data = field_xs_table)
-    arcpy.AddMessage("Temp datasets deleted")
+        # Convert geodatabase table to point feature class
+        field_xs_points = os.path.join(feature_dataset, "field_xs_points")
+        arcpy.management.XYTableToPoint(in_table = field_xs_table,
+                                         out_feature_class = field_xs_points,
+                                         x_field = "Easting",
+                                         y_field = "Northing",
+                                         z_field = "Elevation",
+                                         coordinate_system = field_xs_srs)
     
+        # Add the `ReachName` field if it does not exist and set its value
+        calculate_table_fields(
+            field_xs_points, 
+            [("ReachName", str(reach_name))], 
+            new_fields = [FieldDef("ReachName", "String", 255)])
     
+        # Return
+        arcpy.SetParameter(4, field_xs_points)
+
+
 def main():
     # Call the function with command line parameters
     ImportFieldXS(feature_dataset, field_xs_csv, field_xs_srs, reach_name)
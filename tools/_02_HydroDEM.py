@@ -21,6 +21,7 @@ ____________________________________________________________________________"""
 
 import os
 import arcpy
+from FG_utils import *
 
 def BurnCutlines(output_workspace, cutlines, dem, widen_cells):
     # Check out the extension license 
@@ -57,49 +58,47 @@ def BurnCutlines(output_workspace, cutlines, dem, widen_cells):
             oidList.append(id)
     arcpy.AddMessage("Cutline OIDs: {}".format(oidList))
     
-    # Convert cutlines to raster
-    cutline_ras = os.path.join(output_workspace, "cutline_ras")
-    OID = arcpy.Describe(cutlines).OIDFieldName
-    arcpy.PolylineToRaster_conversion(
-                       in_features = cutlines, 
-                       value_field = OID, 
-                       out_rasterdataset = cutline_ras, 
-                       cellsize = cellsize)
+    with scratch_workspace() as scratch:
+        # Convert cutlines to raster
+        cutline_ras = scratch.path("cutline_ras", size = dataset_bytes(dem))
+        OID = arcpy.Describe(cutlines).OIDFieldName
+        arcpy.PolylineToRaster_conversion(
+                           in_features = cutlines, 
+                           value_field = OID, 
+                           out_rasterdataset = cutline_ras, 
+                           cellsize = cellsize)
     
-    # Increase width of each cutline
-    if int(widen_cells) > 0:
-      arcpy.AddMessage("Expanding cutlines...")
-      cutline_ras = arcpy.sa.Expand(cutline_ras, int(widen_cells), oidList)
+        # Increase width of each cutline
+        if int(widen_cells) > 0:
+          arcpy.AddMessage("Expanding cutlines...")
+          cutline_ras = arcpy.sa.Expand(cutline_ras, int(widen_cells), oidList)
     
-    # Determine the minimum elevation along each cutline
-    arcpy.AddMessage("Calculating minumum elevation for each cutline...")
-    cutline_min = arcpy.sa.ZonalStatistics(in_zone_data = cutline_ras, 
-                                           zone_field = "VALUE", 
-                                           in_value_raster = dem, 
-                                           statistics_type = "MINIMUM")
+        # Determine the minimum elevation along each cutline
+        arcpy.AddMessage("Calculating minumum elevation for each cutline...")
+        cutline_min = arcpy.sa.ZonalStatistics(in_zone_data = cutline_ras, 
+                                               zone_field = "VALUE", 
+                                               in_value_raster = dem, 
+                                               statistics_type = "MINIMUM")
                                     
-    # Con operation to burn cutline_ext into DEM
-    arcpy.AddMessage("Burning cutlines into DEM...")
-    dem_hydro = arcpy.sa.Con(arcpy.sa.IsNull(cutline_min), 
-                             dem, 
-                             cutline_min)
+        # Con operation to burn cutline_ext into DEM
+        arcpy.AddMessage("Burning cutlines into DEM...")
+        dem_hydro = arcpy.sa.Con(arcpy.sa.IsNull(cutline_min), 
+                                 dem, 
+                                 cutline_min)
     
-    # Save dem_hydro to the output_workspace
-    dem_hydro_path = os.path.join(output_workspace, "dem_hydro")
-    arcpy.CopyRaster_management(in_raster = dem_hydro, 
-                                out_rasterdataset = dem_hydro_path)
-    arcpy.AddMessage("Saved hydro modified DEM.")
+        # Save dem_hydro to the output_workspace
+        dem_hydro_path = os.path.join(output_workspace, "dem_hydro")
+        arcpy.CopyRaster_management(in_raster = dem_hydro, 
+                                    out_rasterdataset = dem_hydro_path)
+        arcpy.AddMessage("Saved hydro modified DEM.")
     
-    # Calculate raster statistics and build pyramids
-    arcpy.CalculateStatistics_management(dem_hydro_path)
-    arcpy.BuildPyramids_management(dem_hydro_path)
-    arcpy.AddMessage("Calculated raster statistics and pyramids.")
+        # Calculate raster statistics and build pyramids
+        arcpy.CalculateStatistics_management(dem_hydro_path)
+        arcpy.BuildPyramids_management(dem_hydro_path)
+        arcpy.AddMessage("Calculated raster statistics and pyramids.")
     
-    # Return
-    arcpy.SetParameter(4, dem_hydro_path)
-    
-    # Cleanup
-    arcpy.Delete_management(in_data = cutline_ras)
+        # Return
+        arcpy.SetParameter(4, dem_hydro_path)
 
 
 def main():
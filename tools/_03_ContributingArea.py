@@ -15,18 +15,33 @@ processes (long)      -- The number of stripes that the DEM will be divided
                          will be spawned to evaluate each of the stripes. It is 
                          recommended to use no more than the number of cores on 
                          your computer. 
+fill_method (str)     -- The pit filling method. One of "pitremove" (TauDEM) 
+                         or "priority_flood" (in process, see 
+                         FG_raster.fill_raster). Python only; the toolbox 
+                         tool uses "pitremove". 
+dinf_method (str)     -- The D-infinity method. One of "TauDEM" (DinfFlowDir 
+                         and AreaDinf) or "numpy" (in process, see 
+                         FG_raster.dinf_raster, which routes flats 
+                         differently from TauDEM). Python only; the toolbox 
+                         tool uses "TauDEM". 
 
 Outputs:
 contrib_area          -- a TauDEM contributing area raster. Units are the 
                          linear units of the input DEM. ESRI refers to this as 
                          a flow accumulation raster. 
+taudem_cache          -- a folder of cached TauDEM outputs (dem_fel.tif, 
+                         dem_ang.tif, dem_slp.tif, sca.tif) stored in the 
+                         folder above the output_workspace. Steps whose DEM 
+                         and parameters are unchanged are not run again. 
 ____________________________________________________________________________"""
  
 import os
-import subprocess
 import arcpy
+from FG_raster import *
+from FG_taudem import *
 
-def ContributingArea(output_workspace, dem, processes):
+def ContributingArea(output_workspace, dem, processes, 
+                     fill_method = "pitremove", dinf_method = "TauDEM"):
     # Set environment variables 
     arcpy.env.overwriteOutput = True
     arcpy.env.workspace = output_workspace
@@ -37,68 +52,86 @@ def ContributingArea(output_workspace, dem, processes):
     arcpy.AddMessage("Processes: {}".format(str(processes)))
         
     # Export DEM to dem.tif file for use by TauDEM ____________________________
-    # TauDEM needs an uncompressed dem. Create in GDB because CopyRaster 
-    # cannot control compression when exporting to .tif
-    arcpy.env.compression = "NONE"
-    dem_nocompression = os.path.join(output_workspace,
-                                     os.path.basename(dem) + "_nocompression")
-    arcpy.CopyRaster_management(in_raster = dem, 
-                                out_rasterdataset = dem_nocompression)
-    arcpy.AddMessage("Uncompressed DEM created")
-    
-    # Create .tif version of dem (TauDEM only accepts .tif input). Stored at 
-    # the folder above the output_workspace
-    demfile = os.path.join(os.path.dirname(output_workspace), 
-                           "dem.tif")
-    arcpy.CopyRaster_management(in_raster = dem_nocompression, 
-                                out_rasterdataset = demfile)
-    arcpy.AddMessage("Temporary `dem.tif` created")
+    # TauDEM only accepts uncompressed .tif input. Stored at the folder above 
+    # the output_workspace. A DEM that already is an uncompressed .tif is used 
+    # directly.
+    demfile = export_tif(dem, os.path.join(os.path.dirname(output_workspace), 
+                                           "dem.tif"))
+    arcpy.AddMessage("TauDEM DEM: {}".format(demfile))
         
+    # TauDEM steps are cached by the hash of the DEM and their parameters, 
+    # so they are only run again when the DEM changes
+    cache_dir = os.path.join(os.path.dirname(output_workspace), 
+                             TAUDEM_CACHE_FOLDER)
+    dem_key = file_digest(demfile)
+    steps = []
+    
     # TauDEM Remove pits - PitRemove __________________________________________
-    # output elevation with pits filled
-    felfile = os.path.join(os.path.dirname(output_workspace), "dem_fel.tif")
-    # Construct the taudem command line
-    cmd = 'mpiexec -n ' + str(processes) + ' pitremove -z ' + '"' + demfile + '"' + ' -fel ' + '"' + felfile + '"'
-    arcpy.AddMessage("\nTauDEM command: " + cmd)
-    # Submit command to operating system
-    os.system(cmd)
-    # Capture contents of shell and print it to the arcgis dialog box
-    process = subprocess.Popen(cmd, shell = True, stdout = subprocess.PIPE)
-    arcpy.AddMessage('\nProcess started:\n')
-    for line in process.stdout.readlines():
-        arcpy.AddMessage(line)
+    # output elevation with pits filled. The "priority_flood" fill_method 
+    # fills in process, without starting MPI, and gives the same result. Each
+    # fill method is cached as its own step.
+    if fill_method not in ("pitremove", "priority_flood"):
+        raise ValueError("Unknown fill_method: {}".format(fill_method))
+    def pitremove(out):
+        if fill_method == "priority_flood":
+            with arcpy.EnvManager(compression = "NONE"):
+                fill_raster(demfile, out["dem_fel.tif"])
+            return
+        cmd = taudem_command("pitremove", processes, 
+                             ["-z", demfile, "-fel", out["dem_fel.tif"]])
+        # Run once, streaming output to the arcgis dialog box
+        steps.append(run_taudem(cmd, "PitRemove", arcpy.AddMessage))
+    fel_key, fel = run_cached_step(cache_dir, fill_method, [], [dem_key], 
+                                   ["dem_fel.tif"], pitremove, 
+                                   arcpy.AddMessage)
+    felfile = fel["dem_fel.tif"]
     arcpy.AddMessage("Pits Removed Calculated")
         
-    # TauDEM D Infinity flow direction - DinfFlowDir __________________________
-    # output flow direction (ang) and slope (slp) rasters
-    angfile = os.path.join(os.path.dirname(output_workspace), "dem_ang.tif")
-    slpfile = os.path.join(os.path.dirname(output_workspace), "dem_slp.tif")
-    # Construct command 
-    cmd = 'mpiexec -n ' + str(processes) + ' DinfFlowDir -fel ' + '"' + felfile + '"' + ' -ang ' + '"' + angfile + '"' + ' -slp ' + '"' + slpfile + '"'
-    arcpy.AddMessage("\nTauDEM command: " + cmd)
-    # Submit command to operating system
-    os.system(cmd)
-    # Capture contents of shell and print it to the arcgis dialog box
-    process = subprocess.Popen(cmd, shell = True, stdout = subprocess.PIPE)
-    arcpy.AddMessage('\nProcess started:\n')
-    for line in process.stdout.readlines():
-        arcpy.AddMessage(line)
-    arcpy.AddMessage("Flow Direction Calculated")
+    if dinf_method == "numpy":
+        # D-infinity flow direction and contributing area in process __________
+        # output flow direction (ang), slope (slp) and specific area (sca)
+        # rasters in one pass, without MPI or intermediate GeoTIFFs
+        def dinf(out):
+            with arcpy.EnvManager(compression = "NONE"):
+                dinf_raster(felfile, out["dem_ang.tif"], out["dem_slp.tif"], 
+                            out["sca.tif"])
+        sca_key, sca = run_cached_step(cache_dir, "dinf_raster", [], 
+                                       [fel_key], 
+                                       ["dem_ang.tif", "dem_slp.tif", 
+                                        "sca.tif"], 
+                                       dinf, arcpy.AddMessage)
+        scafile = sca["sca.tif"]
+        arcpy.AddMessage("Flow Direction Calculated")
+    else:
+        # TauDEM D Infinity flow direction - DinfFlowDir ______________________
+        # output flow direction (ang) and slope (slp) rasters
+        def dinfflowdir(out):
+            cmd = taudem_command("DinfFlowDir", processes, 
+                                 ["-fel", felfile, 
+                                  "-ang", out["dem_ang.tif"], 
+                                  "-slp", out["dem_slp.tif"]])
+            steps.append(run_taudem(cmd, "DinfFlowDir", arcpy.AddMessage))
+        ang_key, ang = run_cached_step(cache_dir, "DinfFlowDir", [], 
+                                       [fel_key], 
+                                       ["dem_ang.tif", "dem_slp.tif"], 
+                                       dinfflowdir, arcpy.AddMessage)
+        angfile = ang["dem_ang.tif"]
+        arcpy.AddMessage("Flow Direction Calculated")
 
-    # TauDEM D-infinity Contributing Area - AreaDinf __________________________
-    # output specific area (sca) 
-    scafile = os.path.join(os.path.dirname(output_workspace), "sca.tif")
-    # Construct command
-    # No outlet file, weight file, or edge contanimation checking
-    cmd = 'mpiexec -n ' + str(processes) + ' AreaDinf -ang ' + '"' + angfile + '"' + ' -sca ' + '"' + scafile + '"' + ' -nc '
-    arcpy.AddMessage("\nTauDEM command: " + cmd)
-    # Submit command to operating system
-    os.system(cmd)
-    # Capture contents of shell and print it to the arcgis dialog box
-    process = subprocess.Popen(cmd, shell = True, stdout = subprocess.PIPE)
-    arcpy.AddMessage('\nProcess started:\n')
-    for line in process.stdout.readlines():
-        arcpy.AddMessage(line)
+        # TauDEM D-infinity Contributing Area - AreaDinf ______________________
+        # output specific area (sca) 
+        # No outlet file, weight file, or edge contanimation checking
+        def areadinf(out):
+            cmd = taudem_command("AreaDinf", processes, 
+                                 ["-ang", angfile, "-sca", out["sca.tif"], 
+                                  "-nc"])
+            steps.append(run_taudem(cmd, "AreaDinf", arcpy.AddMessage))
+        sca_key, sca = run_cached_step(cache_dir, "AreaDinf", ["-nc"], 
+                                       [ang_key], ["sca.tif"], areadinf, 
+                                       arcpy.AddMessage)
+        scafile = sca["sca.tif"]
+    arcpy.AddMessage("TauDEM wall time: {:.1f} s".format(
+                     sum(step.wall_time for step in steps)))
 
     # Copy contributing area raster to output_workspace
     contributing_area = os.path.join(output_workspace, "contributing_area")
@@ -111,12 +144,8 @@ def ContributingArea(output_workspace, dem, processes):
     arcpy.SetParameter(3, contributing_area)
     
     # Cleanup
-    arcpy.Delete_management(in_data = dem_nocompression)
-    arcpy.Delete_management(in_data = demfile)
-    arcpy.Delete_management(in_data = felfile)
-    arcpy.Delete_management(in_data = angfile)
-    arcpy.Delete_management(in_data = slpfile)
-    arcpy.Delete_management(in_data = scafile)
+    if demfile != arcpy.Describe(dem).catalogPath:
+        arcpy.Delete_management(in_data = demfile)
     arcpy.AddMessage("Temp datasets deleted")
 
 def main():
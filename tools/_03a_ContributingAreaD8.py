@@ -12,10 +12,40 @@ The ESRI Watershed tool requires a flow direction raster to be calculated using
 the D8 method. Therefore, this tool is intentended to be used prior to the 
 FluvialGeomorph Point Watershed tool. 
 
+Sinks are filled with arcpy.sa.Fill. The "priority_flood" fill_method fills 
+sinks in process instead (see FG_raster.fill_raster), but its flood is a 
+Python loop of several seconds per million cells, so it is only suited to 
+small DEMs. 
+
+Flow direction and flow accumulation are calculated with arcpy.sa 
+FlowDirection and FlowAccumulation, so the flow direction raster is the one 
+the ESRI Watershed tool expects. The "numpy" d8_method calculates them in 
+memory instead (see FG_hydro.d8_flow_direction and d8_flow_accumulation) for 
+DEMs of up to MAX_MEMORY_CELLS cells. It has not been checked against ArcGIS 
+output, and is known to differ from FlowDirection where: 
+  - several neighbors share the steepest drop (the first in the order E, SE, 
+    S, SW, W, NW, N, NE is used; FlowDirection uses its own lookup), 
+  - cells are flat (they flow breadth-first toward the nearest drained cell; 
+    FlowDirection enlarges the neighborhood), 
+  - cells are in undrained sinks (code 0; FlowDirection writes the sum of 
+    the tied directions). 
+Its flow direction raster is 8-bit unsigned with NoData 255. 
+
 Parameters:
 output_workspace      -- Path to the output workspace. 
 dem_hydro             -- Path to the hydro modified digital elevation model (DEM). 
 processes             -- The number of processes to use for parallel processing.
+                         Sets the parallel processing factor of the arcpy.sa
+                         tools. 
+fill_method (str)     -- The sink filling method. One of "Fill" 
+                         (arcpy.sa.Fill, the default) or "priority_flood" 
+                         (in process, see FG_raster.fill_raster). Python 
+                         only; the toolbox tool uses "Fill". 
+d8_method (str)       -- The flow direction and accumulation method. One of 
+                         "FlowDirection" (arcpy.sa, the default) or "numpy" 
+                         (in memory, for DEMs of up to MAX_MEMORY_CELLS 
+                         cells). Python only; the toolbox tool uses 
+                         "FlowDirection". 
 
 Outputs:
 flow_direction_D8     -- A flow direction raster using the D8 method (integer 
@@ -23,10 +53,15 @@ flow_direction_D8     -- A flow direction raster using the D8 method (integer
 ____________________________________________________________________________"""
  
 import os
+import numpy as np
 import arcpy
 from arcpy.sa import *
+from FG_raster import *
+from FG_hydro import *
+from FG_utils import *
 
-def StudyAreaWatershed(output_workspace, dem_hydro, processes):
+def StudyAreaWatershed(output_workspace, dem_hydro, processes, 
+                       fill_method = "Fill", d8_method = "FlowDirection"):
     # Check out the ArcGIS Spatial Analyst extension license
     arcpy.CheckOutExtension("Spatial")
 
@@ -43,36 +78,62 @@ def StudyAreaWatershed(output_workspace, dem_hydro, processes):
                      "{}".format(arcpy.Describe(dem_hydro).baseName))
     arcpy.AddMessage("processes: {}".format(processes))
     
-    # Fill sinks
-    arcpy.AddMessage("Beginning filling sinks...")
-    dem_fill = arcpy.sa.Fill(in_surface_raster = dem_hydro)
-    arcpy.AddMessage("Fill sinks complete.")
-    
-    # Calculate D8 flow direction (suitable for input into the Watershed tool)
-    arcpy.AddMessage("Beginning flow direction...")
-    flow_dir_d8 = arcpy.sa.FlowDirection(in_surface_raster = dem_fill, 
-                                         flow_direction_type = "D8")
+    info = raster_info(dem_hydro)
+    in_memory = (d8_method == "numpy" and 
+                 info.n_rows * info.n_cols <= MAX_MEMORY_CELLS)
     flow_direction_d8 = os.path.join(output_workspace, "flow_direction_d8")
-    flow_dir_d8.save(flow_direction_d8)
+    flow_accumulation_d8 = os.path.join(output_workspace, "flow_accumulation_d8")
     
-    # Calculate raster statistics and build pyramids
-    arcpy.AddMessage("    Calculating statistics...")
-    arcpy.CalculateStatistics_management(flow_direction_d8)
-    arcpy.AddMessage("    Building pyraminds...")
-    arcpy.BuildPyramids_management(flow_direction_d8)
-    arcpy.AddMessage("Flow direction complete.")
+    with scratch_workspace() as scratch:
+        # Fill sinks
+        arcpy.AddMessage("Beginning filling sinks...")
+        if fill_method == "priority_flood":
+            dem_fill = scratch.path("dem_fill", on_disk = True)
+            fill_raster(dem_hydro, dem_fill)
+        else:
+            dem_fill = arcpy.sa.Fill(in_surface_raster = dem_hydro)
+        arcpy.AddMessage("Fill sinks complete.")
+        
+        # Calculate D8 flow direction (suitable for input into the Watershed 
+        # tool)
+        arcpy.AddMessage("Beginning flow direction...")
+        if in_memory:
+            dem, row_start, col_start = read_window(dem_fill, info, 0, 0, 
+                                                    info.n_rows, info.n_cols)
+            nodata = np.isnan(dem)
+            fdr = d8_flow_direction(dem, info.cell_width, info.cell_height)
+            del dem
+            write_grid(np.where(nodata, 255, fdr).astype(np.uint8), info, 
+                       flow_direction_d8, nodata = 255)
+            arcpy.AddMessage("    Setting statistics...")
+            write_statistics(flow_direction_d8, 
+                             np.where(nodata, np.nan, fdr))
+        else:
+            flow_dir_d8 = arcpy.sa.FlowDirection(in_surface_raster = dem_fill, 
+                                                 flow_direction_type = "D8")
+            flow_dir_d8.save(flow_direction_d8)
+            arcpy.AddMessage("    Calculating statistics...")
+            arcpy.CalculateStatistics_management(flow_direction_d8)
+        arcpy.AddMessage("    Building pyraminds...")
+        arcpy.BuildPyramids_management(flow_direction_d8)
+        arcpy.AddMessage("Flow direction complete.")
     
     # Calculate flow accumulation
     arcpy.AddMessage("Beginning flow accumulation...")
-    flow_accum_d8 = arcpy.sa.FlowAccumulation(flow_dir_d8, 
-                                              data_type = "FLOAT", 
-                                              flow_direction_type = "D8")
-    flow_accumulation_d8 = os.path.join(output_workspace, "flow_accumulation_d8")
-    flow_accum_d8.save(flow_accumulation_d8)
-    
-    # Calculate raster statistics and build pyramids
-    arcpy.AddMessage("    Calculating statistics...")
-    arcpy.CalculateStatistics_management(flow_accumulation_d8)
+    if in_memory:
+        flow_accum = d8_flow_accumulation(fdr).astype(np.float32)
+        del fdr
+        flow_accum[nodata] = np.nan
+        write_grid(flow_accum, info, flow_accumulation_d8)
+        arcpy.AddMessage("    Setting statistics...")
+        write_statistics(flow_accumulation_d8, flow_accum)
+    else:
+        flow_accum_d8 = arcpy.sa.FlowAccumulation(flow_direction_d8, 
+                                                  data_type = "FLOAT", 
+                                                  flow_direction_type = "D8")
+        flow_accum_d8.save(flow_accumulation_d8)
+        arcpy.AddMessage("    Calculating statistics...")
+        arcpy.CalculateStatistics_management(flow_accumulation_d8)
     arcpy.AddMessage("    Building pyraminds...")
     arcpy.BuildPyramids_management(flow_accumulation_d8)
     arcpy.AddMessage("Flow accumulation complete.")
@@ -5,39 +5,72 @@ Description:          Creates a synthetic flow network from a contributing
 Date:                 05/11/2020
 
 Usage:
-This tool requires TauDEM (http://hydrology.usu.edu/taudem/taudem5/) to be 
-installed before running this tool. 
-
 For best results in deriving a synthetic stream network, this tool uses the 
 D-Infinity method for calculating flow accumulation. 
 
 The contributing area used in the tool must be calculated using the D-infinity 
 method used in the Contributing Area tool. 
 
+The stream network is extracted in memory without writing intermediate 
+rasters. The contributing area raster is read block by block and thresholded 
+(as with TauDEM Threshold), the stream cells are thinned to a skeleton one 
+cell wide (as with arcpy.sa.Thin) and the skeleton is traced into polylines 
+by walking 8-connected cells between junctions and endpoints (see 
+FG_streams.py). 
+
+From Python, several thresholds can be given (a list, or a string of values 
+separated by semicolons) to sweep the stream network in one run. The 
+threshold parameter of the toolbox tool is a single long value, so the tool 
+runs one threshold. The contributing area is read once and each cell 
+is assigned the number of thresholds it reaches. The network of the lowest 
+threshold is thinned and traced, and its segments are split where their 
+level changes. Each segment is tagged in the `max_threshold` field with the 
+highest threshold at which it still exists, so the network of any threshold 
+is selected with `max_threshold >= threshold`.
+
+The segments are oriented downstream by their contributing area and linked 
+where one segment ends at the start of another. A topology table is written 
+with a row for each segment (joined to the stream network by `SegmentID`): 
+the downstream and upstream segment IDs, the Strahler and Shreve stream 
+order, the segment length (in map units) and the D-Infinity specific 
+catchment area at the segment outlet cell (`SCA_outlet`, in the units of the 
+contributing area raster). From Python, a D8 flow accumulation raster (in 
+cells, aligned with the contributing area raster) can also be given to add 
+the drainage area at the outlet cell in square miles (`DA_sq_mile_outlet`). 
+The `UpstreamIDs` text field is as wide as the longest list of upstream 
+segment IDs. 
+
 Parameters:
 feature_dataset       -- Path to the feature dataset
 contrib_area          -- Path to the D-Infinity contributing area raster 
                          created by the Contributing Area tool. 
 threshold (long)      -- Flow accumulation threshold to initiate a stream 
                          expressed in the units of the source DEM used to 
-                         accumulate the flow.
-processes (long)      -- The number of stripes that the domain will be divided
-                         into and the number of MPI parallel processes that will
-                         be spawned to evaluate each of the stripes.
+                         accumulate the flow. From Python, a list of 
+                         thresholds (or a string of thresholds separated by 
+                         semicolons) sweeps the network for each threshold.
+processes (long)      -- Not used. The stream network is no longer extracted
+                         by TauDEM. Kept so that existing models still run.
+flow_accumulation     -- Path to a D8 flow accumulation raster (in cells) in 
+                         the coordinate system of the contributing area 
+                         raster (optional). Python only; the toolbox tool 
+                         does not write `DA_sq_mile_outlet`.
 
 Outputs:
 stream_network        -- a new polyline feature class of the synthetic stream
                          network
+stream_network_topology -- a new table of the topology of the stream network
+                         segments
 ____________________________________________________________________________"""
  
 import os
-import subprocess
+import numpy as np
 import arcpy
+from FG_raster import *
+from FG_streams import *
 
-def StreamNetwork(feature_dataset, contrib_area, threshold, processes):
-    # Check out the ArcGIS Spatial Analyst extension license
-    arcpy.CheckOutExtension("Spatial")
-    
+def StreamNetwork(feature_dataset, contrib_area, threshold, processes = None, 
+                  block_size = 2048, flow_accumulation = None):
     # Set environment variables 
     arcpy.env.overwriteOutput = True
     arcpy.env.workspace = os.path.dirname(feature_dataset)
@@ -47,72 +80,132 @@ def StreamNetwork(feature_dataset, contrib_area, threshold, processes):
     arcpy.AddMessage("Contributing Area: " 
                      "{}".format(arcpy.Describe(contrib_area).baseName))
     arcpy.AddMessage("Threshold: {}".format(str(threshold)))
-    arcpy.AddMessage("Processes: {}".format(str(processes)))
+    if flow_accumulation:
+        arcpy.AddMessage("Flow accumulation: " 
+                         "{}".format(arcpy.Describe(flow_accumulation).baseName))
     
-    # Convert the GDB contrib_area raster to .tif _____________________________
-    # TauDEM needs an uncompressed raster. Create in GDB because CopyRaster 
-    # cannot control compression when exporting to .tif
-    arcpy.env.compression = "NONE"
-    contrib_area_nocompression = os.path.join(arcpy.env.workspace,
-                            os.path.basename(contrib_area) + "_nocompression")
-    arcpy.CopyRaster_management(in_raster = contrib_area, 
-                                out_rasterdataset = contrib_area_nocompression)
-    arcpy.AddMessage("Uncompressed contrib_area created")
-    contrib_area_tif = os.path.join(os.path.dirname(arcpy.env.workspace), 
-                                    "contrib_area.tif")
-    arcpy.CopyRaster_management(in_raster = contrib_area_nocompression, 
-                                out_rasterdataset = contrib_area_tif)
-    arcpy.AddMessage("Uncompressed contrib_area_tif created")
-
-    # TauDEM Stream definition by threshold - Threshold _______________________
-    # output thresholded stream raster
-    stream_grid = os.path.join(os.path.dirname(arcpy.env.workspace), 
-                               "stream_grid.tif")
-    # Construct command
-    cmd = 'mpiexec -n ' + str(processes) + ' Threshold -ssa ' + '"' + contrib_area_tif + '"' + ' -src ' + '"' + stream_grid + '"' + ' -thresh ' + str(threshold)
-    arcpy.AddMessage("\nTauDEM command: " + cmd)
-    # Submit command to operating system
-    os.system(cmd)
-    # Capture contents of shell and print it to the arcgis dialog box
-    process = subprocess.Popen(cmd, shell = True, stdout = subprocess.PIPE)
-    arcpy.AddMessage('\nProcess started:\n')
-    for line in process.stdout.readlines():
-        arcpy.AddMessage(line)
+    if isinstance(threshold, (list, tuple)):
+        thresholds = sorted(set(float(t) for t in threshold))
+    else:
+        thresholds = sorted(set(float(t) for t in str(threshold).split(";") 
+                                if t.strip()))
+    
+    # Stream definition by threshold __________________________________________
+    # Read the contributing area one block at a time, keeping only the 
+    # stream level of each cell (the number of thresholds it reaches)
+    info = raster_info(contrib_area)
+    if flow_accumulation:
+        fac_info = raster_info(flow_accumulation)
+        if (spatial_reference_key(fac_info.spatial_reference) != 
+            spatial_reference_key(info.spatial_reference)):
+            raise ValueError("flow_accumulation must be in the coordinate "
+                             "system of contrib_area")
+    levels = np.zeros((info.n_rows, info.n_cols), 
+                      dtype = level_dtype(len(thresholds)))
+    for row_start in range(0, info.n_rows, block_size):
+        for col_start in range(0, info.n_cols, block_size):
+            sca, r, c = read_window(contrib_area, info, row_start, col_start, 
+                                    block_size, block_size)
+            levels[r:r + sca.shape[0], 
+                   c:c + sca.shape[1]] = stream_levels(sca, thresholds)
+    for i, t in enumerate(thresholds):
+        arcpy.AddMessage("Stream cells at threshold {}: {}".format(
+                         t, np.count_nonzero(levels > i)))
 
-    # Thin stream network - arcpy.sa.Thin _____________________________________
-    stream_thin = arcpy.sa.Thin(in_raster = stream_grid, 
-                                corners = "SHARP")
-    stream_thin_path = os.path.join(os.path.dirname(arcpy.env.workspace), 
-                                    "stream_thin.tif")
-    arcpy.CopyRaster_management(in_raster = stream_thin, 
-                                out_rasterdataset = stream_thin_path)
+    # Thin stream network _____________________________________________________
+    skeleton = thin_streams(levels > 0)
+    arcpy.AddMessage("Thinned stream network")
+    
+    # Trace stream segments ___________________________________________________
+    # split where the highest threshold of their cells changes
+    segments, segment_levels = split_segments(trace_streams(skeleton), 
+                                              levels)
+    del skeleton, levels
+    # Every piece is traced from stream cells, so reaches the lowest threshold
+    assert (segment_levels >= 1).all()
+    max_threshold = np.array(thresholds)[segment_levels - 1]
+    
+    # Stream network topology _________________________________________________
+    # Orient the segments downstream using the contributing area at their ends
+    ends = np.array([[segment[0], segment[-1]] for segment in segments], 
+                    dtype = np.int64).reshape(-1, 2)
+    x, y = cell_centers(ends.ravel(), info.n_cols, info.x_min, info.y_max, 
+                        info.cell_width, info.cell_height)
+    end_sca = sample_raster(contrib_area, x, y, "NEAREST").reshape(-1, 2)
+    segments, outlet_sca = orient_segments(segments, end_sca[:, 0], 
+                                           end_sca[:, 1])
+    downstream = segment_topology(segments, outlet_sca)
+    strahler, shreve = stream_order(downstream)
+    if flow_accumulation:
+        # Drainage area of the D8 flow accumulation at each outlet cell
+        outlets = np.array([segment[-1] for segment in segments], 
+                           dtype = np.int64)
+        x, y = cell_centers(outlets, info.n_cols, info.x_min, info.y_max, 
+                            info.cell_width, info.cell_height)
+        outlet_area = cell_count_to_sq_mile(
+                          sample_raster(flow_accumulation, x, y, "NEAREST"), 
+                          fac_info.cell_width, fac_info.cell_height, 
+                          fac_info.spatial_reference.metersPerUnit)
+    lengths = segment_lengths(segments, info.n_cols, info.cell_width, 
+                              info.cell_height)
+    arcpy.AddMessage("Calculated stream network topology")
+    
+    # Segment IDs start at 1; 0 is no segment
+    segment_id = np.arange(1, len(segments) + 1)
+    downstream_id = np.where(downstream >= 0, downstream + 1, 0)
+    upstream_ids = [[] for segment in segments]
+    for i, j in enumerate(downstream.tolist()):
+        if j >= 0:
+            upstream_ids[j].append(str(i + 1))
     
     # Convert raster stream to polyline _______________________________________
-    # output vector stream network
+    # output vector stream network, tagged with the highest threshold of 
+    # each segment
     stream_network = os.path.join(feature_dataset, "stream_network")
-    # Convert the `stream_thin` raster to a polyline
-    arcpy.RasterToPolyline_conversion(in_raster = stream_thin_path, 
-                                      out_polyline_features = stream_network)
-    arcpy.AddMessage("Stream network created")
+    write_segments(segments, info, stream_network, 
+                   fields = [("SegmentID", "LONG"), 
+                             ("max_threshold", "DOUBLE"), 
+                             ("ReachName", "TEXT")], 
+                   values = list(zip(segment_id.tolist(), 
+                                     max_threshold.tolist())))
+    arcpy.AddMessage("Stream network created: {} segments".format(
+                     len(segments)))
     
-    # Add the `ReachName` field
-    # Check if the field already exists and if not add it
-    field_names = [f.name for f in arcpy.ListFields(stream_network)]
-    if "ReachName" not in field_names:
-        arcpy.AddField_management(in_table = stream_network, 
-                                  field_name = "ReachName", 
-                                  field_type = "TEXT")
+    # Write the topology table, with the UpstreamIDs text field as wide as 
+    # its longest value so no IDs are truncated
+    upstream_text = [";".join(ids) for ids in upstream_ids]
+    upstream_width = max([len(text) for text in upstream_text] + [1])
+    fields = [("SegmentID", np.int32), 
+              ("DownstreamID", np.int32), 
+              ("UpstreamIDs", "U{}".format(upstream_width)), 
+              ("Strahler", np.int32), 
+              ("Shreve", np.int32), 
+              ("Length", np.float64), 
+              ("SCA_outlet", np.float64), 
+              ("max_threshold", np.float64)]
+    if flow_accumulation:
+        fields.append(("DA_sq_mile_outlet", np.float64))
+    topology = np.zeros(len(segments), dtype = fields)
+    topology["SegmentID"] = segment_id
+    topology["DownstreamID"] = downstream_id
+    topology["UpstreamIDs"] = upstream_text
+    topology["Strahler"] = strahler
+    topology["Shreve"] = shreve
+    topology["Length"] = lengths
+    topology["SCA_outlet"] = outlet_sca
+    topology["max_threshold"] = max_threshold
+    if flow_accumulation:
+        topology["DA_sq_mile_outlet"] = outlet_area
+    topology_table = os.path.join(arcpy.env.workspace, 
+                                  "stream_network_topology")
+    if arcpy.Exists(topology_table):
+        arcpy.Delete_management(topology_table)
+    arcpy.da.NumPyArrayToTable(topology, topology_table)
+    arcpy.AddMessage("Stream network topology table created")
     
     # Return
     arcpy.SetParameter(4, stream_network)
     
-    # Cleanup
-    arcpy.Delete_management(in_data = contrib_area_nocompression)
-    arcpy.Delete_management(in_data = contrib_area_tif)
-    arcpy.Delete_management(in_data = stream_grid)
-    arcpy.Delete_management(in_data = stream_thin_path)
-    arcpy.AddMessage("Temp datasets deleted")
-    
     
 def main():
     # Call the StreamNetwork function with command line parameters
@@ -126,4 +219,3 @@ if __name__ == "__main__":
     processes        = arcpy.GetParameterAsText(3)
 
     main()
-
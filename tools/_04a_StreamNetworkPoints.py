@@ -10,6 +10,14 @@ relatively homogeneous segments based on drainage area.
 
 Drainage area will be in the units of the flow accumulation model. 
 
+The points are built in a single pass. The vertices of each stream network 
+line are read once and measured from the end of the line (in kilometers, as 
+a route with from_measure = length and to_measure = 0). The flow 
+accumulation and the DEM are sampled at the vertices using windowed block 
+reads (see FG_raster.sample_raster), the flow accumulation cell counts are 
+converted to square miles for any linear unit of the flow accumulation 
+raster, and all points are written with one insert cursor. 
+
 Parameters:
 feature_dataset       -- Path to the feature dataset
 stream_network        -- Path to the edited stream network feature class
@@ -23,19 +31,20 @@ stream_network_points -- a new point feature class of synthetic stream
 ____________________________________________________________________________"""
  
 import os
+import numpy as np
 import arcpy
-from arcpy.sa import *
+from FG_geometry import *
+from FG_raster import *
+from FG_utils import *
 
 def StreamNetworkPoints(feature_dataset, stream_network, flow_accum, dem):
-    # Check out the extension license 
-    arcpy.CheckOutExtension("Spatial")
-    
     # Set environment variables 
     arcpy.env.overwriteOutput = True
     arcpy.env.workspace = os.path.dirname(feature_dataset)
     
-    # Get spatial reference of FAC
-    spatial_ref = arcpy.Describe(flow_accum).spatialReference
+    # Get spatial reference of the stream network and FAC
+    spatial_ref = arcpy.Describe(stream_network).spatialReference
+    fac_info = raster_info(flow_accum)
     
     # List parameter values
     arcpy.AddMessage("Workspace: {}".format(arcpy.env.workspace))
@@ -46,122 +55,82 @@ def StreamNetworkPoints(feature_dataset, stream_network, flow_accum, dem):
     arcpy.AddMessage("Digital Elevation Model: "
                      "{}".format(arcpy.Describe(dem).baseName))
     
-    ## Convert stream_network fc to a route
-    # Add a field to hold the linear referencing route `from_measure`
-    # Check if the field already exists and if not add it
-    field_names = [f.name for f in arcpy.ListFields(stream_network)]
-    if "from_measure" not in field_names:
-        arcpy.AddField_management(in_table = stream_network, 
-                                  field_name = "from_measure", 
-                                  field_type = "DOUBLE")
-
-    # Set the value of the cross section `from_measure` to zero in units meters
-    arcpy.CalculateField_management(in_table = stream_network, 
-                                    field = "from_measure", 
-                                    expression = "!shape.length@kilometers!", 
-                                    expression_type = "PYTHON_9.3")
-
-    # Add a field to hold the linear referencing route `to_measure`
-    if "to_measure" not in field_names:
-        arcpy.AddField_management(in_table = stream_network, 
-                                  field_name = "to_measure", 
-                                  field_type = "DOUBLE")
-
-    # Set the value of the cross section `to_measure` to the length of the 
-    # stream_network in units kilometers
-    arcpy.CalculateField_management(in_table = stream_network, 
-                                    field = "to_measure", 
-                                    expression = "0", 
-                                    expression_type = "PYTHON_9.3")
-    
-    # Convert stream_network fc into a route
-    stream_network_route = os.path.join(feature_dataset, "stream_network_route")
-    arcpy.CreateRoutes_lr(in_line_features = stream_network, 
-                          route_id_field = "ReachName", 
-                          out_feature_class = stream_network_route, 
-                          measure_source = "TWO_FIELDS", 
-                          from_measure_field = "from_measure", 
-                          to_measure_field = "to_measure")
-    arcpy.AddMessage("Stream network route created")
-    
-    # Convert stream network feature vertices to points
-    stream_network_points = os.path.join(feature_dataset, "stream_network_points")
-    arcpy.FeatureVerticesToPoints_management(in_features = stream_network_route, 
-                                    out_feature_class = stream_network_points)
+    ## Convert the stream_network vertices to route points
+    def read_routes(sr):
+        # Vertices and M-values of each line, grouped by route (`ReachName`)
+        meters_per_unit = sr.metersPerUnit if sr.metersPerUnit else 1.0
+        routes = {}
+        with arcpy.da.SearchCursor(stream_network, ["SHAPE@", "ReachName"], 
+                                   spatial_reference = sr) as cursor:
+            for row in cursor:
+                if row[0] is None or not line_parts(row[0]):
+                    continue
+                x, y, part_starts = join_parts(line_parts(row[0]))
+                dist = cumulative_distance(x, y, part_starts)
+                # M-values decrease from the length of the line to zero (km)
+                m = (dist[-1] - dist) * meters_per_unit / 1000.0
+                routes.setdefault(row[1], []).append((x, y, m))
+        lines = [(r, line) for r in sorted(routes, 
+                                           key = lambda r: (r is None, r))
+                 for line in routes[r]]
+        rid = [r for r, line in lines for v in line[0]]
+        x, y, m = [np.concatenate([line[i] for r, line in lines]) 
+                   for i in range(3)]
+        return rid, x, y, m
+    rid, x, y, m = read_routes(spatial_ref)
     arcpy.AddMessage("Converted the stream network to points")
-
-    # Add x, y, z, and m values to the `cross_section_points` feature class
-    arcpy.AddGeometryAttributes_management(
-                                    Input_Features = stream_network_points, 
-                                    Geometry_Properties = "POINT_X_Y_Z_M", 
-                                    Length_Unit = "KILOMETERS")
-
-    # Set the first m-value for each stream network to zero. The `create route`
-    # tool sets it to NULL. 
-    arcpy.CalculateField_management(in_table = stream_network_points, 
-                                    field = "POINT_M", 
-                                    expression = "setNull2Zero(!POINT_M!)", 
-                                    code_block = """def setNull2Zero(m):
-                                                        if m is None: 
-                                                            return 0
-                                                        else:
-                                                            return m""",
-                                    expression_type = "PYTHON_9.3")
-
-    # Delete un-needed fields
-    arcpy.DeleteField_management(in_table = stream_network_points, 
-                                 drop_field = ["ORIG_FID","POINT_Z"])
-    arcpy.AddMessage("Added stream network route lengths")
     
-    # Add flow accumulation values to the stream_network_points fc
-    arcpy.sa.ExtractMultiValuesToPoints(
-                                  in_point_features = stream_network_points, 
-                                  in_rasters = [flow_accum], 
-                                  bilinear_interpolate_values = "NONE")
-    # Add a field to to the stream_network_points fc to hold watershed area
-    # Check if the field already exists and if not add it
-    field_names = [f.name for f in arcpy.ListFields(stream_network_points)]
-    if "Watershed_Area_SqMile" not in field_names:
-        arcpy.AddField_management(in_table = stream_network_points, 
-                                  field_name = "Watershed_Area_SqMile", 
-                                  field_type = "DOUBLE")
+    ## Sample the flow accumulation and the DEM at the points
+    surfaces = []
+    for raster in [flow_accum, dem]:
+        sr = raster_info(raster).spatial_reference
+        if spatial_reference_key(sr) == spatial_reference_key(spatial_ref):
+            px, py = x, y
+        else:
+            rid_sr, px, py, m_sr = read_routes(sr)
+        surfaces.append(sample_raster(raster, px, py, "NEAREST"))
+    cell_count, z = surfaces
+    
     # Convert flow accumulation cell counts to area in square miles
-    cell_size = str(arcpy.GetRasterProperties_management(flow_accum, 
-                                                         "CELLSIZEX"))
-    # Expression to convert sq m to sq mi: 1 sq m = 0.0000003861 sq mile
-    meters_sqmi = ("((float({0}) * float({0})) * 0.0000003861) * "
-                  "!{1}!".format(cell_size, arcpy.Describe(flow_accum).baseName))
-
-    if spatial_ref.linearUnitName == "Meter":
-        arcpy.CalculateField_management(in_table = stream_network_points, 
-                                        field = "Watershed_Area_SqMile", 
-                                        expression = meters_sqmi, 
-                                        expression_type = "PYTHON_9.3")
-    else:
-        # Error
-        arcpy.AddError("    Watershed linear unit not recognized." 
-                       " Area not calculated")
-    # Delete un-needed fields
-    arcpy.DeleteField_management(in_table = stream_network_points, 
-                                 drop_field = [arcpy.Describe(flow_accum).baseName])
+    area = cell_count_to_sq_mile(cell_count, fac_info.cell_width, 
+                                 fac_info.cell_height, 
+                                 fac_info.spatial_reference.metersPerUnit)
     arcpy.AddMessage("Added stream network drainage area")
-    
-    # Add elevation values to the stream_network_points fc
-    arcpy.sa.ExtractMultiValuesToPoints(
-                      in_point_features = stream_network_points, 
-                      in_rasters = [dem], 
-                      bilinear_interpolate_values = "NONE")
-    arcpy.AlterField_management(in_table = stream_network_points, 
-                                field = arcpy.Describe(dem).baseName, 
-                                new_field_name = "Z",
-                                new_field_alias = "Z")
     arcpy.AddMessage("Added stream network elevations")
     
+    ## Write the stream_network_points in one pass
+    stream_network_points = os.path.join(feature_dataset, 
+                                         "stream_network_points")
+    if arcpy.Exists(stream_network_points):
+        arcpy.Delete_management(stream_network_points)
+    arcpy.CreateFeatureclass_management(
+                            out_path = feature_dataset, 
+                            out_name = "stream_network_points", 
+                            geometry_type = "POINT", 
+                            has_m = "ENABLED", 
+                            spatial_reference = spatial_ref)
+    network_fields = {f.name: f for f in arcpy.ListFields(stream_network)}
+    add_field_like(stream_network_points, network_fields["ReachName"])
+    for name in ["POINT_X", "POINT_Y", "POINT_M", "Watershed_Area_SqMile", 
+                 "Z"]:
+        arcpy.AddField_management(in_table = stream_network_points, 
+                                  field_name = name, 
+                                  field_type = "DOUBLE")
+    out_fields = ["SHAPE@", "ReachName", "POINT_X", "POINT_Y", "POINT_M", 
+                  "Watershed_Area_SqMile", "Z"]
+    with arcpy.da.InsertCursor(stream_network_points, out_fields) as cursor:
+        for r, px, py, pm, pa, pz in zip(rid, x.tolist(), y.tolist(), 
+                                         m.tolist(), area.tolist(), 
+                                         z.tolist()):
+            point = arcpy.PointGeometry(arcpy.Point(px, py, None, pm), 
+                                        spatial_ref, False, True)
+            cursor.insertRow((point, r, px, py, pm, 
+                              None if np.isnan(pa) else pa, 
+                              None if np.isnan(pz) else pz))
+    arcpy.AddMessage("Added stream network route lengths")
+    
     # Return
     arcpy.SetParameter(4, stream_network_points)
-    
-    # Cleanup
-    arcpy.Delete_management(in_data = stream_network_route)    
 
 
 def main():
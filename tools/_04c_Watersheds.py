@@ -19,6 +19,20 @@ feature class, the area of each landcover class (in the linear units of the
 landcover raster) will be calculated in a field named for the landcover class 
 integer value. 
 
+All points are snapped to the flow accumulation raster first. The D8 flow 
+direction raster is read block by block into an 8-bit grid, and every 
+watershed is then labeled with the int32 zone number of its point in a 
+single pass over it (see FG_hydro.label_watersheds) and converted to 
+polygons once. Watersheds 
+nested inside the watershed of another point are recorded in the 
+`parent_gridcode` field, which holds the `gridcode` of the next point 
+downstream. Each output polygon is the full watershed of its point. 
+
+Landcover is tabulated by reading the landcover raster block by block and 
+counting the cells of each class under each watershed label with 
+`np.bincount` (see FG_raster.tabulate_zones). The counts of nested watersheds 
+are then added to the watersheds downstream of them. 
+
 Parameters:
 feature_dataset       -- Path to the feature dataset.
 points                -- Path to the points feature class.
@@ -40,7 +54,14 @@ watershed.
 ____________________________________________________________________________"""
  
 import os
+import numpy as np
 import arcpy
+from FG_raster import *
+from FG_hydro import *
+from FG_utils import *
+
+# Number of rows and columns of the flow direction raster read at a time
+FDR_BLOCK_SIZE = 2048
 
 def PointLandcover(feature_dataset, points, point_ID_field, 
                    flow_accumulation, flow_direction_d8, snap_distance, 
@@ -55,10 +76,6 @@ def PointLandcover(feature_dataset, points, point_ID_field,
     if landcover:
         LC = arcpy.Raster(landcover)
     
-    # Get landcover cell size
-    if landcover:
-        lc_cell_size = arcpy.Describe(LC).meanCellHeight
-    
     # Set environment variables
     arcpy.env.overwriteOutput = True
     arcpy.env.workspace = os.path.dirname(feature_dataset)
@@ -77,100 +94,160 @@ def PointLandcover(feature_dataset, points, point_ID_field,
     if landcover:
         arcpy.AddMessage("Landcover: {}".format(arcpy.Describe(LC).baseName))
     
-    # Iterate through `points` fc and calculate watershed landcover area
+    # Read all points in the coordinate system of the flow direction raster
+    fdr_info = raster_info(FDR)
     sql_postfix = "ORDER BY {}".format(point_ID_field)
-    with arcpy.da.UpdateCursor(in_table = points,
-                               field_names = [point_ID_field],
-                               sql_clause = (None, sql_postfix)) as cursor:
-        for row in cursor:
-            # Create a feature layer from the points feature class
-            # for the current point
-            OID = "\"{0}\" = '{1}'".format(point_ID_field, str(row[0]))
-            arcpy.AddMessage("Creating point: {}".format(str(OID)))
-            arcpy.MakeFeatureLayer_management(in_features = points,
-                                              out_layer = "point",
-                                              where_clause = OID)
-            arcpy.AddMessage("    Created point: {}".format(str(row[0])))
-
-            # Snap pour point to flow accumulation raster
-            
-            snapPour = arcpy.sa.SnapPourPoint(in_pour_point_data = "point",
-                                              in_accumulation_raster = FAC,
-                                              snap_distance = snap_distance)
-            arcpy.AddMessage("    Snap pour point complete")
-
-            # Create watershed raster
-            watershed = arcpy.sa.Watershed(in_flow_direction_raster = FDR,
-                                           in_pour_point_data = snapPour,
-                                           pour_point_field = "Value")
-
-            # Convert watershed to polygon
-            watershed_name = "watershed_{}".format(str(row[0]).replace(" ", "_"))
-            out_poly = os.path.join(feature_dataset, watershed_name)
-            arcpy.RasterToPolygon_conversion(in_raster = watershed,
-                                             out_polygon_features = out_poly)
-            arcpy.AddMessage("    Delineate watershed complete")
-
-            # Tabulate landcover area
-            if landcover:
-                table_name = "lc_table_{}".format(str(row[0]).replace(" ", "_"))
-                out_table = os.path.join(feature_dataset, table_name)
-                arcpy.sa.TabulateArea(in_zone_data = watershed,
-                                      zone_field = "Value",
-                                      in_class_data = LC,
-                                      class_field = "Value",
-                                      out_table = out_table,
-                                      processing_cell_size = lc_cell_size)
-                arcpy.AddMessage("    Tabulate landcover area complete")
-            
-    # Merge tabulate landcover area tables
-    if landcover:
-        lc_tables = arcpy.ListTables(wild_card = "lc_table_*")
-        arcpy.AddMessage("landcover tables: {}".format(str(lc_tables)))
-        lc_table = os.path.join(arcpy.env.workspace, "lc_table")
-        arcpy.Merge_management(inputs = lc_tables, 
-                               output = lc_table)
-        # Delete landcover lc_tables
-        for table in lc_tables:
-            arcpy.Delete_management(table)
-        arcpy.AddMessage("Merged landcover area tables")
-    
-    # Merge watershed polygons
-    watershed_fcs = arcpy.ListFeatureClasses("watershed_*")
-    arcpy.AddMessage("Watershed polygons: {}".format(str(watershed_fcs)))
+    pts = [row for row in arcpy.da.SearchCursor(
+                              points, ["OID@", "SHAPE@X", "SHAPE@Y"], 
+                              sql_clause = (None, sql_postfix), 
+                              spatial_reference = fdr_info.spatial_reference)]
+    pts = np.array(pts, dtype = np.float64).reshape(-1, 3)
+    oids = pts[:, 0].astype(np.int64)
+    
+    # Snap all pour points to the flow accumulation raster
+    snap_x, snap_y, fac_value = snap_raster(FAC, pts[:, 1], pts[:, 2], 
+                                            float(snap_distance))
+    arcpy.AddMessage("Snap pour points complete")
+    
+    # Locate the snapped pour points on the flow direction grid
+    row, col = grid_position(snap_x, snap_y, fdr_info.x_min, fdr_info.y_max, 
+                             fdr_info.cell_width, fdr_info.cell_height)
+    row = np.floor(row + 0.5)
+    col = np.floor(col + 0.5)
+    valid = ((row >= 0) & (row < fdr_info.n_rows) & 
+             (col >= 0) & (col < fdr_info.n_cols))
+    for oid in oids[~valid]:
+        arcpy.AddWarning("    Point {} could not be snapped to the flow "
+                         "accumulation raster".format(oid))
+    oids = oids[valid]
+    pour_cells = (row[valid] * fdr_info.n_cols + col[valid]).astype(np.int64)
+    
+    # Read the D8 codes one block at a time into a uint8 grid
+    codes = np.zeros((fdr_info.n_rows, fdr_info.n_cols), dtype = np.uint8)
+    for r in range(0, fdr_info.n_rows, FDR_BLOCK_SIZE):
+        for c in range(0, fdr_info.n_cols, FDR_BLOCK_SIZE):
+            block, r0, c0 = read_window(FDR, fdr_info, r, c, 
+                                        FDR_BLOCK_SIZE, FDR_BLOCK_SIZE)
+            codes[r0:r0 + block.shape[0], 
+                  c0:c0 + block.shape[1]] = np.nan_to_num(block, nan = 0)
+            del block
+    downstream = d8_downstream(codes)
+    shape = codes.shape
+    del codes
+    
+    # Label every watershed in one pass over the flow direction grid. Cells 
+    # are labeled with the int32 zone number of their point (its position in 
+    # the sorted point IDs plus 1), so the labels are also the zones for 
+    # tabulating landcover.
+    zone_labels = np.unique(oids)
+    zone_number = (np.searchsorted(zone_labels, oids) + 1).astype(np.int32)
+    label = label_watersheds(downstream, pour_cells, zone_number)
+    parent_number = watershed_parents(downstream, label, pour_cells)
+    del downstream
+    label = label.reshape(shape)
+    parents = np.where(parent_number > 0, 
+                       zone_labels[np.maximum(parent_number, 1) - 1], 0)
+    arcpy.AddMessage("Delineate watersheds complete")
+    
+    # Points that snapped to the same cell share the first point's watershed
+    first_label = {}
+    for oid, cell in zip(oids.tolist(), pour_cells.tolist()):
+        first_label.setdefault(cell, oid)
+    same_as = {oid: first_label[cell] 
+               for oid, cell in zip(oids.tolist(), pour_cells.tolist())}
+    
+    with scratch_workspace() as scratch:
+        # Convert the labeled watersheds to polygons in one pass
+        grid_bytes = fdr_info.n_rows * fdr_info.n_cols * 4
+        watershed_labels = scratch.path("watershed_labels", size = grid_bytes)
+        write_grid(label, fdr_info, watershed_labels, nodata = 0)
+        watershed_parts = scratch.path("watershed_parts", size = grid_bytes)
+        arcpy.RasterToPolygon_conversion(in_raster = watershed_labels,
+                                         out_polygon_features = watershed_parts, 
+                                         simplify = "NO_SIMPLIFY")
+        incremental = {}
+        with arcpy.da.SearchCursor(watershed_parts, 
+                                   ["gridcode", "SHAPE@"]) as cursor:
+            for gridcode, shape in cursor:
+                oid = int(zone_labels[gridcode - 1])
+                if oid in incremental:
+                    incremental[oid] = incremental[oid].union(shape)
+                else:
+                    incremental[oid] = shape
+    
+    # Build each full watershed from its own area and the watersheds nested 
+    # in it, working from the most deeply nested watersheds downstream
+    parent = dict(zip(oids.tolist(), parents.tolist()))
+    def depth(oid):
+        d = 0
+        while parent.get(oid, 0) > 0 and d < len(parent):
+            oid = parent[oid]
+            d += 1
+        return d
+    full = {}
+    for oid in sorted(first_label.values(), key = depth, reverse = True):
+        shape = full.get(oid, incremental.get(oid))
+        full[oid] = shape
+        up = parent[oid]
+        if up > 0 and shape is not None:
+            base = full.get(up, incremental.get(up))
+            full[up] = shape if base is None else base.union(shape)
+    
+    # Write the watersheds feature class in one pass
     watersheds = os.path.join(feature_dataset, "watersheds")
-    arcpy.Merge_management(inputs = watershed_fcs,
-                           output = watersheds)
+    if arcpy.Exists(watersheds):
+        arcpy.Delete_management(watersheds)
+    arcpy.CreateFeatureclass_management(
+                    out_path = feature_dataset, 
+                    out_name = "watersheds", 
+                    geometry_type = "POLYGON", 
+                    spatial_reference = fdr_info.spatial_reference)
+    arcpy.AddField_management(watersheds, "gridcode", "LONG")
+    arcpy.AddField_management(watersheds, "parent_gridcode", "LONG")
+    with arcpy.da.InsertCursor(watersheds, ["SHAPE@", "gridcode", 
+                                            "parent_gridcode"]) as cursor:
+        for oid in oids.tolist():
+            shape = full.get(same_as[oid])
+            if shape is None:
+                arcpy.AddWarning("    Point {} has no watershed".format(oid))
+                continue
+            cursor.insertRow((shape, oid, parent[same_as[oid]]))
+    arcpy.AddMessage("Created watershed polygons")
     
-    # Delete watershed FCs
-    for fc in watershed_fcs:
-        arcpy.Delete_management(fc)
-    arcpy.AddMessage("Merged watershed polygons")
+    # Tabulate landcover area for all watersheds from the watershed labels
+    if landcover:
+        classes, counts = tabulate_zones(label, fdr_info, LC, 
+                                         len(zone_labels))
+        # Each full watershed is its own area plus its nested watersheds
+        zone_parents = np.array([parent[oid] for oid in zone_labels.tolist()])
+        lc_counts = accumulate_nested(counts[1:], zone_labels, zone_parents)
+        lc_info = raster_info(LC)
+        lc_area = lc_counts * (lc_info.cell_width * lc_info.cell_height)
+        arcpy.AddMessage("Tabulate landcover area complete")
+    del label
     
     # Add point_ID_field to watersheds
-    arcpy.MakeTableView_management(in_table = points, 
-                                   out_view = "points_table")
-    
-    arcpy.JoinField_management(in_data = watersheds,
-                               in_field = "gridcode",
-                               join_table = "points_table",
-                               join_field = "OBJECTID")
+    join_table_fields(target = watersheds,
+                      target_field = "gridcode",
+                      join_table = points,
+                      join_field = arcpy.Describe(points).OIDFieldName)
     arcpy.AddMessage("Added points fields to watersheds fc")
     
-    # Join Landcover table to watersheds
+    # Write the landcover area fields to watersheds in one pass
     if landcover:
-        arcpy.JoinField_management(in_data = watersheds,
-                                   in_field = "gridcode",
-                                   join_table = lc_table,
-                                   join_field = "VALUE")
+        lc_fields = ["VALUE_{}".format(int(c)) for c in classes.tolist()]
+        for field in lc_fields:
+            arcpy.AddField_management(watersheds, field, "DOUBLE")
+        zone_row = {oid: i for i, oid in enumerate(zone_labels.tolist())}
+        with arcpy.da.UpdateCursor(watersheds, 
+                                   ["gridcode"] + lc_fields) as cursor:
+            for row in cursor:
+                areas = lc_area[zone_row[same_as[row[0]]]]
+                cursor.updateRow([row[0]] + areas.tolist())
         arcpy.AddMessage("Added landcover fields to watersheds fc")
     
     # Return
     arcpy.SetParameter(7, watersheds)
-    
-    # Clean up
-    if landcover:
-        arcpy.Delete_management(in_data = lc_table)
 
 
 def main():
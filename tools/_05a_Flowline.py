@@ -29,6 +29,7 @@ ____________________________________________________________________________"""
 
 import os
 import arcpy
+from FG_utils import *
 
 def CleanFlowline(feature_dataset, stream_network, smooth_tolerance):
     # Set environment variables 
@@ -40,32 +41,31 @@ def CleanFlowline(feature_dataset, stream_network, smooth_tolerance):
     arcpy.AddMessage("Stream Network: "
                      "{}".format(arcpy.Describe(stream_network).baseName))
     
-    # Dissolve by `ReachName` field
-    stream_network_dissolve = os.path.join(feature_dataset, 
-                                           "stream_network_dissolve")
-    arcpy.management.Dissolve(in_features = stream_network, 
-                              out_feature_class = stream_network_dissolve,  
-                              dissolve_field = ["ReachName"], 
-                              unsplit_lines = "DISSOLVE_LINES")
+    with scratch_workspace() as scratch:
+        # Dissolve by `ReachName` field
+        stream_network_dissolve = scratch.path(
+                                      "stream_network_dissolve", 
+                                      size = dataset_bytes(stream_network))
+        arcpy.management.Dissolve(in_features = stream_network, 
+                                  out_feature_class = stream_network_dissolve,  
+                                  dissolve_field = ["ReachName"], 
+                                  unsplit_lines = "DISSOLVE_LINES")
     
-    arcpy.AddMessage("Stream Network Dissolved")
+        arcpy.AddMessage("Stream Network Dissolved")
     
-    # Smooth the stream network
-    flowline = os.path.join(feature_dataset, "flowline")
-    arcpy.cartography.SmoothLine(in_features = stream_network_dissolve, 
-                                 out_feature_class = flowline, 
-                                 algorithm = "PAEK", 
-                                 tolerance = smooth_tolerance)
+        # Smooth the stream network
+        flowline = os.path.join(feature_dataset, "flowline")
+        arcpy.cartography.SmoothLine(in_features = stream_network_dissolve, 
+                                     out_feature_class = flowline, 
+                                     algorithm = "PAEK", 
+                                     tolerance = smooth_tolerance)
     
-    arcpy.AddMessage("Stream Network Smoothed")
+        arcpy.AddMessage("Stream Network Smoothed")
     
-    # Return
-    arcpy.SetParameter(3, flowline)
-    
-    # Cleanup
-    arcpy.management.Delete(in_data = stream_network_dissolve)
+        # Return
+        arcpy.SetParameter(3, flowline)
+
 
-    
 def main():
     CleanFlowline(feature_dataset, stream_network, smooth_tolerance)
     
@@ -20,6 +20,16 @@ end of the flowline.
 The station distance parameter is specified in the linear units of the 
 flowline feature class.
 
+The route measures are calculated from the flowline vertices in one pass. The 
+uncalibrated measure of each station is `km_to_mouth` plus its distance along 
+the flowline (in kilometers), as a route with from_measure = km_to_mouth and 
+to_measure = length + km_to_mouth. Calibration points are projected onto the 
+flowline with the same `ReachName` using a grid index of the flowline 
+segments bounded by the search radius, and the calibrated measures are 
+interpolated between them (see FG_geometry.calibrate_measures). POINT_M, 
+POINT_M_uncalibrated and calibration_diff are calculated for all stations at 
+once and written with one insert cursor.
+
 Parameters:
 feature_dataset       -- Path to the feature dataset
 flowline              -- Path to the flowline feature class
@@ -44,7 +54,11 @@ search_radius         -- Limits how far a calibration point can be from a route
                          by specifying the distance and its unit of measure 
                          (e.g., "25 Meters"). If the units of measure are 
                          not specified, the same units as the coordinate system 
-                         of the route feature class will be used.
+                         of the route feature class will be used. If no 
+                         radius is specified, as with CalibrateRoutes, only 
+                         calibration points coincident with the route (within 
+                         the XY tolerance of the flowline, or the default 
+                         0.001 Meters when it has none) are used.
 
 Outputs:
 flowline_points        -- a flowline_points feature class
@@ -52,7 +66,11 @@ ____________________________________________________________________________"""
  
 import os
 from datetime import datetime
+import numpy as np
 import arcpy
+from FG_geometry import *
+from FG_raster import *
+from FG_utils import *
 
 def FlowlinePoints(feature_dataset, flowline, dem, km_to_mouth, 
                    station_distance, 
@@ -77,172 +95,129 @@ def FlowlinePoints(feature_dataset, flowline, dem, km_to_mouth,
         arcpy.AddMessage("measure_field: {}".format(str(measure_field)))
         arcpy.AddMessage("search_radius: {}".format(str(search_radius)))
     
-    # Add fields to hold the linear referencing route from and to measures
-    field_names = [f.name for f in arcpy.ListFields(flowline)]
-    if "from_measure" not in field_names:
-        arcpy.management.AddField(in_table = flowline, 
-                                  field_name = "from_measure", 
-                                  field_type = "DOUBLE")
-                                  
-    if "to_measure" not in field_names:
-        arcpy.management.AddField(in_table = flowline, 
-                                  field_name = "to_measure", 
-                                  field_type = "DOUBLE")
-                                  
-    arcpy.AddMessage("Added required fields to flowline.")
-                                  
-    # Set the value of the flowline `from_measure` to the input parameter 
-    # `km_to_mouth` in units kilometers
-    arcpy.management.CalculateField(in_table = flowline, 
-                                    field = "from_measure", 
-                                    expression = km_to_mouth, 
-                                    expression_type = "PYTHON3")
-
-    # Set the value of the flowline `to_measure` to the length of the flowline
-    # in units kilometers plus the value of km_to_mouth 
-    expression = "!shape.length@kilometers! + {}".format(str(km_to_mouth))
-    arcpy.management.CalculateField(in_table = flowline, 
-                                    field = "to_measure", 
-                                    expression = expression, 
-                                    expression_type = "PYTHON3")
-    arcpy.AddMessage("Calculated flowline from and to measures.")
-
-    # Set the station distance
-    if int(station_distance) == 0:
-        # If station_distance is zero, use original flowline vertices unchanged
-        arcpy.management.CopyFeatures(in_features = flowline, 
-                                      out_feature_class = "flowline_vertices")
-        arcpy.AddMessage("Vertices of flowline not changed.")
-    else:
-        # Simplify the flowline (speeds processing)
-        arcpy.cartography.SimplifyLine(in_features = flowline, 
-                                       out_feature_class = "flowline_simplify",
-                                       algorithm = "POINT_REMOVE", 
-                                       tolerance = "1 Feet")
-        arcpy.AddMessage("Simplified flowline.")
+    spatial_ref = arcpy.Describe(flowline).spatialReference
+    meters_per_unit = spatial_ref.metersPerUnit if spatial_ref.metersPerUnit \
+                      else 1.0
+    km_to_mouth = float(km_to_mouth)
+
+    with scratch_workspace() as scratch:
+        # Set the station distance
+        if float(station_distance) == 0:
+            # If station_distance is zero, use original flowline vertices unchanged
+            flowline_vertices = flowline
+            arcpy.AddMessage("Vertices of flowline not changed.")
+        else:
+            # Simplify the flowline (speeds processing)
+            flowline_simplify = scratch.path("flowline_simplify", 
+                                             size = dataset_bytes(flowline))
+            arcpy.cartography.SimplifyLine(in_features = flowline, 
+                                           out_feature_class = flowline_simplify,
+                                           algorithm = "POINT_REMOVE", 
+                                           tolerance = "1 Feet")
+            arcpy.AddMessage("Simplified flowline.")
         
-        # Set the station distance by densifying vertices to station_distance
-        arcpy.management.CopyFeatures(in_features = "flowline_simplify", 
-                                      out_feature_class = "flowline_vertices")
-        arcpy.edit.Densify(in_features = "flowline_vertices", 
-                           densification_method = "DISTANCE", 
-                           distance = station_distance)
-        arcpy.AddMessage("Densified verticies of flowline to station_distance.")
-    
-    # Convert the flowline to a route
-    arcpy.lr.CreateRoutes(in_line_features = "flowline_vertices", 
-                          route_id_field = "ReachName", 
-                          out_feature_class = "flowline_route", 
-                          measure_source = "TWO_FIELDS", 
-                          from_measure_field = "from_measure", 
-                          to_measure_field = "to_measure")
-    arcpy.AddMessage("Converted flowline to route.")
-
-    if not calibration_points:
-        arcpy.AddMessage("No flowline_route calibration required.")
-
-        # Convert flowline_route vertices to flowline_points
-        flowline_points = os.path.join(feature_dataset, "flowline_points")
-        arcpy.management.FeatureVerticesToPoints(
-                             in_features = "flowline_route", 
-                             out_feature_class = flowline_points)
-        arcpy.AddMessage("Converted flowline_route to flowline_points.")
-    
-        # Add x, y, and m values to the `flowline_points` feature class
-        arcpy.management.CalculateGeometryAttributes(
-                              in_features = flowline_points, 
-                              geometry_property = [["POINT_X", "POINT_X"], 
-                                                   ["POINT_Y", "POINT_Y"],
-                                                   ["POINT_M", "POINT_M"]],
-                              length_unit = "METERS")
-        arcpy.AddMessage("Calculated flowline_points X, Y, and M attributes.")
+            # Set the station distance by densifying vertices to station_distance
+            flowline_vertices = scratch.path("flowline_vertices", 
+                                             size = dataset_bytes(flowline))
+            arcpy.management.CopyFeatures(in_features = flowline_simplify, 
+                                          out_feature_class = flowline_vertices)
+            arcpy.edit.Densify(in_features = flowline_vertices, 
+                               densification_method = "DISTANCE", 
+                               distance = station_distance)
+            arcpy.AddMessage("Densified verticies of flowline to station_distance.")
     
-        # Calculate the m-values for the uncalibrated route
-        arcpy.management.AddField(in_table = flowline_points, 
-                                  field_name = "POINT_M_uncalibrated", 
-                                  field_type = "DOUBLE")
-        arcpy.management.CalculateField(in_table = flowline_points, 
-                                        field = "POINT_M_uncalibrated", 
-                                        expression = "!POINT_M!", 
-                                        expression_type = "PYTHON3")
-        arcpy.AddMessage("Calculated m-values for the uncalibrated route.")
-
+        # Read the vertices of each flowline. The uncalibrated route measures 
+        # increase from km_to_mouth at the start of the line (in kilometers). 
+        lines = []
+        with arcpy.da.SearchCursor(flowline_vertices, 
+                                   ["SHAPE@", "ReachName"]) as cursor:
+            for row in cursor:
+                if row[0] is None or not line_parts(row[0]):
+                    continue
+                x, y, part_starts = join_parts(line_parts(row[0]))
+                dist = cumulative_distance(x, y, part_starts)
+                lines.append((row[1], x, y, part_starts, dist))
+        arcpy.AddMessage("Converted flowline to route.")
+
+    # Read the calibration points of each route
+    calibration = {}
     if calibration_points:
         arcpy.AddMessage("flowline_route calibration required.")
-        
-        # Calibrate flowline_route using calibration points
-        arcpy.lr.CalibrateRoutes(in_route_features = "flowline_route", 
-                                 route_id_field = "ReachName", 
-                                 in_point_features = calibration_points,
-                                 point_id_field = point_id_field,
-                                 measure_field = measure_field,
-                                 out_feature_class = "flowline_route_calibrate",
-                                 calibrate_method = "DISTANCE",
-                                 search_radius = search_radius)
-        arcpy.AddMessage("Calibrated flowline_route using calibration_points.")
-        
-        # Convert flowline_route vertices to flowline_points
-        flowline_points = os.path.join(feature_dataset, "flowline_points")
-        arcpy.management.FeatureVerticesToPoints(
-                             in_features = "flowline_route_calibrate", 
-                             out_feature_class = flowline_points)
-        arcpy.AddMessage("Converted flowline_route_calibrate to flowline_points.")
-        
-        # Add x, y, and m values to the `flowline_points` feature class
-        arcpy.management.CalculateGeometryAttributes(
-                             in_features = flowline_points, 
-                             geometry_property = [["POINT_X", "POINT_X"], 
-                                                  ["POINT_Y", "POINT_Y"],
-                                                  ["POINT_M", "POINT_M"]],
-                             length_unit = "METERS")
-        arcpy.AddMessage("Calculated flowline_points X, Y, and M attributes.")
-        
-        # Calculate the m-value for the uncalibrated route
-        fl_pts_uncalibrated = os.path.join(arcpy.env.workspace, 
-                                           "fl_pts_uncalibrated")
-        arcpy.lr.LocateFeaturesAlongRoutes(
-                 in_features = flowline_points, 
-                 in_routes = "flowline_route", 
-                 route_id_field = "ReachName", 
-                 radius_or_tolerance = station_distance, 
-                 out_table = fl_pts_uncalibrated, 
-                 out_event_properties = "ReachName POINT POINT_M_uncalibrated")
-        arcpy.AddMessage("Calculated m-values for the uncalibrated route.")
-    
-        arcpy.management.JoinField(in_data = flowline_points, 
-                                   in_field = "OBJECTID", 
-                                   join_table = fl_pts_uncalibrated, 
-                                   join_field = "OBJECTID",
-                                   fields = ["POINT_M_uncalibrated"])
-        arcpy.AddMessage("Uncalibrated m-value joined to flowline_points.")
+        if search_radius:
+            radius = linear_distance(search_radius, meters_per_unit)
+        else:
+            # Coincident points only, as the CalibrateRoutes default
+            radius = (spatial_ref.XYTolerance or 
+                      linear_distance(DEFAULT_XY_TOLERANCE, meters_per_unit))
+        with arcpy.da.SearchCursor(calibration_points, 
+                                   ["SHAPE@XY", point_id_field, 
+                                    measure_field],
+                                   spatial_reference = spatial_ref) as cursor:
+            for (px, py), route_id, measure in cursor:
+                if px is None or measure is None:
+                    continue
+                calibration.setdefault(str(route_id), []).append(
+                                                      (px, py, measure))
+    else:
+        arcpy.AddMessage("No flowline_route calibration required.")
 
-    # Delete un-needed fields
-    arcpy.management.DeleteField(in_table = flowline_points, 
-                                 drop_field = ["ORIG_FID"])
-    
-    # Calculate difference between calibrated and uncalibrated m-values
-    arcpy.management.AddField(in_table = flowline_points, 
-                              field_name = "calibration_diff", 
-                              field_type = "DOUBLE")
-    arcpy.management.CalculateField(
-                          in_table = flowline_points, 
-                          field = "calibration_diff", 
-                          expression = "!POINT_M! - !POINT_M_uncalibrated!", 
-                          expression_type = "PYTHON3")
+    # Calculate the calibrated and uncalibrated m-values of all stations
+    stations = []
+    n_calibrated = 0
+    for route_id, x, y, part_starts, dist in lines:
+        m_uncalibrated = km_to_mouth + dist * meters_per_unit / 1000.0
+        m = m_uncalibrated
+        points = calibration.get(str(route_id))
+        if points:
+            px, py, measure = [np.array(v, dtype = np.float64) 
+                               for v in zip(*points)]
+            along, offset = locate_points_within(x, y, px, py, radius, 
+                                                 part_starts, dist)
+            cal_m = km_to_mouth + along * meters_per_unit / 1000.0
+            m = calibrate_measures(m_uncalibrated, cal_m, measure)
+            n_calibrated += int(np.count_nonzero(~np.isnan(along)))
+        stations.append((route_id, x, y, m, m_uncalibrated))
+    if calibration_points:
+        arcpy.AddMessage("Calibrated flowline_route using {} "
+                         "calibration_points.".format(n_calibrated))
+    arcpy.AddMessage("Calculated m-values for the uncalibrated route.")
     arcpy.AddMessage("Calculated calibration difference.")
 
+    # Write the flowline_points in one pass
+    flowline_points = os.path.join(feature_dataset, "flowline_points")
+    if arcpy.Exists(flowline_points):
+        arcpy.management.Delete(flowline_points)
+    arcpy.management.CreateFeatureclass(out_path = feature_dataset, 
+                                        out_name = "flowline_points", 
+                                        geometry_type = "POINT", 
+                                        has_m = "ENABLED", 
+                                        spatial_reference = spatial_ref)
+    flowline_fields = {f.name: f for f in arcpy.ListFields(flowline)}
+    add_field_like(flowline_points, flowline_fields["ReachName"])
+    for name in ["POINT_X", "POINT_Y", "POINT_M", "POINT_M_uncalibrated", 
+                 "calibration_diff"]:
+        arcpy.management.AddField(in_table = flowline_points, 
+                                  field_name = name, 
+                                  field_type = "DOUBLE")
+    out_fields = ["SHAPE@", "ReachName", "POINT_X", "POINT_Y", "POINT_M", 
+                  "POINT_M_uncalibrated", "calibration_diff"]
+    with arcpy.da.InsertCursor(flowline_points, out_fields) as cursor:
+        for route_id, x, y, m, m_uncalibrated in stations:
+            diff = m - m_uncalibrated
+            for px, py, pm, pu, pd in zip(x.tolist(), y.tolist(), m.tolist(),
+                                          m_uncalibrated.tolist(), 
+                                          diff.tolist()):
+                point = arcpy.PointGeometry(arcpy.Point(px, py, None, pm), 
+                                            spatial_ref, False, True)
+                cursor.insertRow((point, route_id, px, py, pm, pu, pd))
+    arcpy.AddMessage("Converted flowline_route to flowline_points.")
+
     # Add elevations to the `flowline_points` feature class
-    arcpy.ddd.AddSurfaceInformation(in_feature_class = flowline_points, 
-                                    in_surface = dem, 
-                                    out_property = "Z",
-                                    z_factor = 1.0)
+    sample_surfaces(flowline_points, [("Z", dem)])
     arcpy.AddMessage("Added DEM elevation to flowline_points.")
     
     # Return
     arcpy.SetParameter(9, flowline_points)
-    
-    # Cleanup
-    #arcpy.management.Delete(fl_pts_uncalibrated)
     return
     
 def main():
@@ -7,6 +7,15 @@ Usage:
 This tool is based on the detrending method used in the River Bathymetry 
 Toolkit (RBT) http://essa.com/tools/river-bathymetry-toolkit-rbt/. 
 
+The trend raster is interpolated from the flowline_points by inverse 
+distance weighting (IDW) of the nearest TREND_IDW_POINTS points, only for the 
+cells within the flowline buffer (see FG_raster.idw_raster). 
+
+The trend raster is smoothed and subtracted from the DEM one tile at a time 
+by a pool of worker processes (see FG_raster.tile_raster). Each tile is read 
+with a halo of TREND_SMOOTH_RADIUS cells, the radius of the smoothing 
+neighborhood.
+
 Parameters:
 feature_dataset (str) -- Path to the feature dataset.
 flowline (str)        -- Path to the flowline feature class.
@@ -16,6 +25,8 @@ buffer_distance (int) -- Distance the flowline_points feature class will be
                          buffered to define the extent of the output 
                          detrended DEM. Units are defined by the coordinate 
                          system of the DEM. 
+workers (int)         -- Number of worker processes. Defaults to one less 
+                         than the number of CPUs.
 
 Outputs:
 detrend               -- a new detrended DEM
@@ -25,8 +36,17 @@ import os
 from datetime import datetime
 import arcpy
 from arcpy.sa import *
+from FG_raster import *
+from FG_utils import *
+
+# Radius of the circular neighborhood used to smooth the trend (in cells)
+TREND_SMOOTH_RADIUS = 50
+
+# Number of nearest flowline_points used to interpolate each trend cell
+TREND_IDW_POINTS = 12
 
-def DetrendDEM(feature_dataset, flowline, flowline_points, dem, buffer_distance):
+def DetrendDEM(feature_dataset, flowline, flowline_points, dem, buffer_distance,
+               workers = None):
     # Check out the extension license 
     arcpy.CheckOutExtension("3D")
     arcpy.CheckOutExtension("Spatial")
@@ -49,62 +69,58 @@ def DetrendDEM(feature_dataset, flowline, flowline_points, dem, buffer_distance)
     arcpy.AddMessage("DEM: {}".format(arcpy.Describe(dem).baseName))
     arcpy.AddMessage("Buffer Distance: {}".format(str(buffer_distance)))
     
-    # Buffer the flowline_points
-    flowline_buffer = os.path.join(feature_dataset, "flowline_buffer")
-    arcpy.Buffer_analysis(in_features = flowline, 
-                          out_feature_class = flowline_buffer, 
-                          buffer_distance_or_field = buffer_distance, 
-                          line_side = "FULL", 
-                          line_end_type = "ROUND", 
-                          dissolve_option = "ALL")
-    arcpy.AddMessage("Buffering flowline complete.")
+    with scratch_workspace() as scratch:
+        # Buffer the flowline_points
+        flowline_buffer = scratch.path("flowline_buffer", 
+                                       size = dataset_bytes(flowline))
+        arcpy.Buffer_analysis(in_features = flowline, 
+                              out_feature_class = flowline_buffer, 
+                              buffer_distance_or_field = buffer_distance, 
+                              line_side = "FULL", 
+                              line_end_type = "ROUND", 
+                              dissolve_option = "ALL")
+        arcpy.AddMessage("Buffering flowline complete.")
 
-    # Set the environment mask to the flowline_buffer to clip all rasters
-    arcpy.AddMessage("Setting mask to flowline_buffer...")
-    arcpy.env.mask = flowline_buffer
-    arcpy.AddMessage("Setting mask to flowline_buffer complete.")
+        # Convert the flowline_buffer to a mask raster aligned with the DEM
+        buffer_mask = scratch.path("buffer_mask", size = dataset_bytes(dem))
+        arcpy.conversion.PolygonToRaster(
+                    in_features = flowline_buffer, 
+                    value_field = arcpy.Describe(flowline_buffer).OIDFieldName, 
+                    out_rasterdataset = buffer_mask, 
+                    cell_assignment = "CELL_CENTER", 
+                    cellsize = dem)
+        arcpy.AddMessage("Created flowline_buffer mask.")
     
-    # Create the trend raster
-    arcpy.AddMessage("Creating trend raster...")
-    trend = os.path.join(arcpy.env.workspace, "trend")
-    arcpy.Idw_3d(in_point_features = flowline_points, 
-                 z_field = "Z", 
-                 out_raster = trend, 
-                 power = 2, 
-                 search_radius = "VARIABLE")
+        # Create the trend raster within the flowline_buffer mask
+        arcpy.AddMessage("Creating trend raster...")
+        # The trend raster is read by the tile workers, so it is on disk
+        trend = scratch.path("trend", on_disk = True)
+        idw_raster(points = flowline_points, 
+                   z_field = "Z", 
+                   mask = buffer_mask, 
+                   template = dem, 
+                   out_raster = trend, 
+                   n_points = TREND_IDW_POINTS, 
+                   power = 2)
+        scratch.release(buffer_mask)
     
-    arcpy.AddMessage("Created trend raster.")
+        arcpy.AddMessage("Created trend raster.")
     
-    # Smooth the trend raster
-    trend_smooth = arcpy.sa.FocalStatistics(
-                             in_raster = trend, 
-                             neighborhood = arcpy.sa.NbrCircle(50, "CELL"), 
-                             statistics_type = "Mean")
-    trend_smooth_path = os.path.join(arcpy.env.workspace, "trend_smooth")
-    arcpy.CopyRaster_management(in_raster = trend_smooth, 
-                                out_rasterdataset = trend_smooth_path)
-    arcpy.AddMessage("Smoothed trend raster.")
+        # Smooth the trend raster and create the detrended raster
+        detrend_path = os.path.join(arcpy.env.workspace, "detrend")
+        tile_raster(detrend_grid, [dem, trend], detrend_path, 
+                    halo = TREND_SMOOTH_RADIUS, 
+                    kernel_args = (TREND_SMOOTH_RADIUS,), 
+                    workers = workers)
+        arcpy.AddMessage("Created detrended raster.")
     
-    # Create the detrended raster
-    detrend = (Raster(dem) - Raster(trend_smooth_path)) + float(100)
-    detrend_path = os.path.join(arcpy.env.workspace, "detrend")
-    arcpy.CopyRaster_management(in_raster = detrend, 
-                                out_rasterdataset = detrend_path)
-    arcpy.AddMessage("Created detrended raster.")
+        # Build pyramids (statistics were set when the raster was written)
+        arcpy.BuildPyramids_management(detrend_path)
+        arcpy.AddMessage("Calculated raster statistics and pyramids.")
     
-    # Calculate raster statistics and build pyramids
-    arcpy.CalculateStatistics_management(detrend_path)
-    arcpy.BuildPyramids_management(detrend_path)
-    arcpy.AddMessage("Calculated raster statistics and pyramids.")
-    
-    # Return
-    arcpy.SetParameter(5, detrend_path)
-    
-    # Cleanup
-    arcpy.Delete_management(in_data = flowline_buffer)
-    arcpy.Delete_management(in_data = trend)
-    arcpy.Delete_management(in_data = trend_smooth_path)
-        
+        # Return
+        arcpy.SetParameter(5, detrend_path)
+
 
 def main():
     # Call the DetrendDEM function with command line parameters
@@ -11,6 +11,11 @@ Toolkit (RBT) http://essa.com/tools/river-bathymetry-toolkit-rbt/.
 This tool produces a polygon representing the area innundated by the 
 detrended elevation value specified. 
 
+The cells below the detrended elevation value are selected and smoothed one 
+tile at a time by a pool of worker processes (see FG_raster.tile_raster). 
+Each smoothing pass is a majority filter of the eight neighbors of a cell, so 
+each tile is read with a halo of MAJORITY_FILTER_RADIUS cells for each pass.
+
 Parameters:
 feature_dataset       -- Path to the feature dataset.
 detrend_dem           -- Path to the detrended digital elevation model (DEM).
@@ -18,6 +23,8 @@ detrend_value         -- Detrended elevation value used to define the
                          innundated area. All raster values below this value
                          will be extracted to a polygon. 
 smoothing             -- Smoothing factor (0, no smoothing - 5, high smoothing)
+workers               -- Number of worker processes. Defaults to one less 
+                         than the number of CPUs.
 
 Outputs:
 banks                 -- a new polygon feature class representing the area 
@@ -28,8 +35,14 @@ import os
 import string
 import arcpy
 from arcpy.sa import *
+from FG_raster import *
+from FG_utils import *
+
+# Radius of the neighborhood of one majority filter pass (in cells)
+MAJORITY_FILTER_RADIUS = 1
 
-def BankfullPolygon(feature_dataset, detrend_dem, detrend_value, smoothing):
+def BankfullPolygon(feature_dataset, detrend_dem, detrend_value, smoothing,
+                    workers = None):
     # Check out the extension license 
     arcpy.CheckOutExtension("Spatial")
     
@@ -49,38 +62,37 @@ def BankfullPolygon(feature_dataset, detrend_dem, detrend_value, smoothing):
     arcpy.AddMessage("Detrend Value: {}".format(str(detrend_value)))
     arcpy.AddMessage("Smoothing: {}".format(str(smoothing)))
             
-    # Select cells less than detrend_value
-    arcpy.AddMessage("Selecting cells <= {}".format(str(detrend_value)))
-    banks = Con(detrend_dem, 0, 1, "value >= " + str(detrend_value))
-
-    # Smooth the banks raster
-    arcpy.AddMessage("Smoothing banks raster")
-    i = 1
-    while i <= int(smoothing):
-        banks = MajorityFilter(banks, number_neighbors = "EIGHT", 
-                                      majority_definition = "HALF")
-        arcpy.AddMessage("Completed majority filter: {}".format(str(i)))
-        i += 1
+    with scratch_workspace() as scratch:
+        # Select cells less than detrend_value and smooth the banks raster
+        arcpy.AddMessage("Selecting cells <= {}".format(str(detrend_value)))
+        arcpy.AddMessage("Smoothing banks raster")
+        banks_path = scratch.path("banks_smooth", on_disk = True)
+        tile_raster(water_surface_grid, [detrend_dem], banks_path, 
+                    halo = int(smoothing) * MAJORITY_FILTER_RADIUS, 
+                    kernel_args = (float(detrend_value), int(smoothing)), 
+                    workers = workers)
+        banks = Int(banks_path)
+        arcpy.AddMessage("Completed majority filter: {}".format(str(smoothing)))
     
-    # Clean the edges of the banks
-    arcpy.AddMessage("Cleaning bank boundaries")
-    banks_clean = BoundaryClean(banks, sort_type = "DESCEND", 
-                                number_of_runs = "TWO_WAY")
-    arcpy.AddMessage("Bank boundaries cleaned")
+        # Clean the edges of the banks
+        arcpy.AddMessage("Cleaning bank boundaries")
+        banks_clean = BoundaryClean(banks, sort_type = "DESCEND", 
+                                    number_of_runs = "TWO_WAY")
+        arcpy.AddMessage("Bank boundaries cleaned")
     
-    # Convert the banks raster to a polygon
-    banks_raw_name = "banks_raw_" + str(detrend_value).replace(".", "_")
-    banks_raw = os.path.join(feature_dataset, banks_raw_name)
-    arcpy.RasterToPolygon_conversion(
-              in_raster = banks_clean, 
-              out_polygon_features = banks_raw,
-              simplify = "SIMPLIFY",
-              raster_field = "VALUE")
-    arcpy.AddMessage("Created water surface area feature class: " + 
-                     banks_raw)
+        # Convert the banks raster to a polygon
+        banks_raw_name = "banks_raw_" + str(detrend_value).replace(".", "_")
+        banks_raw = os.path.join(feature_dataset, banks_raw_name)
+        arcpy.RasterToPolygon_conversion(
+                  in_raster = banks_clean, 
+                  out_polygon_features = banks_raw,
+                  simplify = "SIMPLIFY",
+                  raster_field = "VALUE")
+        arcpy.AddMessage("Created water surface area feature class: " + 
+                         banks_raw)
     
-    # Return
-    arcpy.SetParameter(4, banks_raw)
+        # Return
+        arcpy.SetParameter(4, banks_raw)
 
 
 def main():
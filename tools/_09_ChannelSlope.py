@@ -4,6 +4,10 @@ Description:          Calculates the slope within a stream channel.
 Date:                 05/14/2020
 
 Usage:
+The banks polygon is converted to a mask raster aligned with the DEM, and the 
+slope is calculated one tile at a time by a pool of worker processes (see 
+FG_raster.tile_raster). The slope of a cell depends on its eight neighbors, so 
+each tile is read with a halo of SLOPE_RADIUS cells.
 
 Parameters:
 feature_dataset (str) -- Path to the feature_dataset.
@@ -26,6 +30,8 @@ z_factor              -- Number of ground x,y units in one surface z unit. The
                          if your z units are feet and your x,y units are meters, 
                          you would use a z-factor of 0.3048 to convert your 
                          z units from feet to meters (1 foot = 0.3048 meter).
+workers               -- Number of worker processes. Defaults to one less 
+                         than the number of CPUs.
 
 Outputs:
 channel_slope         -- a new channel slope raster
@@ -34,8 +40,13 @@ ____________________________________________________________________________"""
 import os
 import arcpy
 from arcpy.sa import *
+from FG_raster import *
+from FG_utils import *
 
-def ChannelSlope(feature_dataset, dem, banks_poly, z_factor):
+# Radius of the neighborhood used to calculate slope (in cells)
+SLOPE_RADIUS = 1
+
+def ChannelSlope(feature_dataset, dem, banks_poly, z_factor, workers = None):
     # Check out the extension license 
     arcpy.CheckOutExtension("Spatial")
     
@@ -56,23 +67,30 @@ def ChannelSlope(feature_dataset, dem, banks_poly, z_factor):
                      "{}".format(arcpy.Describe(banks_poly).baseName))
     arcpy.AddMessage("z-factor: {}".format(z_factor))
     
-    # Set the environment mask to the banks_poly to clip results to channel
-    arcpy.env.mask = banks_poly
-    
-    # Calculate slope raster
-    arcpy.AddMessage("Calculating channel slope...")
-    channel_slope = arcpy.sa.Slope(in_raster = dem, 
-                                   output_measurement = "DEGREE", 
-                                   z_factor = z_factor)
+    with scratch_workspace() as scratch:
+        # Convert the banks_poly to a mask raster to clip results to channel
+        # The mask is read by the tile workers, so it is on disk
+        banks_mask = scratch.path("banks_mask", on_disk = True)
+        oid_field = arcpy.Describe(banks_poly).OIDFieldName
+        arcpy.PolygonToRaster_conversion(in_features = banks_poly, 
+                                         value_field = oid_field, 
+                                         out_rasterdataset = banks_mask)
     
-    channel_slope_path = os.path.join(arcpy.env.workspace, "channel_slope")
-    arcpy.CopyRaster_management(in_raster = channel_slope, 
-                                out_rasterdataset = channel_slope_path)
+        # Calculate slope raster
+        arcpy.AddMessage("Calculating channel slope...")
+        info = raster_info(dem)
+        channel_slope_path = os.path.join(arcpy.env.workspace, 
+                                          "channel_slope")
+        tile_raster(channel_slope_grid, [dem, banks_mask], channel_slope_path, 
+                    halo = SLOPE_RADIUS, 
+                    kernel_args = (info.cell_width, info.cell_height, 
+                                   float(z_factor)), 
+                    workers = workers)
     
-    arcpy.AddMessage("Created slope raster")
+        arcpy.AddMessage("Created slope raster")
     
-    # Return
-    arcpy.SetParameter(4, channel_slope_path)
+        # Return
+        arcpy.SetParameter(4, channel_slope_path)
 
 
 def main():
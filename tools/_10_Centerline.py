@@ -23,6 +23,7 @@ ____________________________________________________________________________"""
 import os
 import arcpy
 from arcpy.sa import *
+from FG_utils import *
 
 def Centerline(feature_dataset, dem, banks_poly, smooth_tolerance):
     # Check out the extension license 
@@ -46,43 +47,41 @@ def Centerline(feature_dataset, dem, banks_poly, smooth_tolerance):
     # Set the environment mask to the banks_poly to clip results to channel
     arcpy.env.mask = banks_poly
     
-    # Convert the banks polygon to raster
-    banks_path = os.path.join(arcpy.env.workspace, "banks")
-    arcpy.PolygonToRaster_conversion(in_features = banks_poly, 
-                                     value_field = "gridcode", 
-                                     out_rasterdataset = banks_path)
-    arcpy.AddMessage("Converted the banks polygon to a raster.")
+    with scratch_workspace() as scratch:
+        # Convert the banks polygon to raster
+        banks_path = scratch.path("banks", size = dataset_bytes(dem))
+        arcpy.PolygonToRaster_conversion(in_features = banks_poly, 
+                                         value_field = "gridcode", 
+                                         out_rasterdataset = banks_path)
+        arcpy.AddMessage("Converted the banks polygon to a raster.")
     
-    # Thin the banks raster
-    stream = arcpy.sa.Thin(in_raster = "banks", 
-                           background_value = "ZERO", 
-                           filter = "FILTER", 
-                           corners = "ROUND")
-    arcpy.AddMessage("Used the Thin tool on the banks raster.")
+        # Thin the banks raster
+        stream = arcpy.sa.Thin(in_raster = banks_path, 
+                               background_value = "ZERO", 
+                               filter = "FILTER", 
+                               corners = "ROUND")
+        arcpy.AddMessage("Used the Thin tool on the banks raster.")
     
-    # Convert the synthetic stream to a centerline feature class
-    cl_raw_path = os.path.join(feature_dataset, "centerline_raw")
-    arcpy.RasterToPolyline_conversion(in_raster = stream, 
-                                      out_polyline_features = cl_raw_path,
-                                      background_value = "ZERO",
-                                      minimum_dangle_length = 10,
-                                      simplify = "SIMPLIFY")
-    arcpy.AddMessage("Convert thinned raster stream to a polyline.")
+        # Convert the synthetic stream to a centerline feature class
+        cl_raw_path = scratch.path("centerline_raw", 
+                                   size = dataset_bytes(banks_poly))
+        arcpy.RasterToPolyline_conversion(in_raster = stream, 
+                                          out_polyline_features = cl_raw_path,
+                                          background_value = "ZERO",
+                                          minimum_dangle_length = 10,
+                                          simplify = "SIMPLIFY")
+        arcpy.AddMessage("Convert thinned raster stream to a polyline.")
     
-    # Smooth centerline
-    centerline_path = os.path.join(feature_dataset, "centerline")
-    arcpy.SmoothLine_cartography(in_features = cl_raw_path, 
-                                 out_feature_class = centerline_path, 
-                                 algorithm = "PAEK", 
-                                 tolerance = smooth_tolerance)
-    arcpy.AddMessage("Smoothed centerline")
+        # Smooth centerline
+        centerline_path = os.path.join(feature_dataset, "centerline")
+        arcpy.SmoothLine_cartography(in_features = cl_raw_path, 
+                                     out_feature_class = centerline_path, 
+                                     algorithm = "PAEK", 
+                                     tolerance = smooth_tolerance)
+        arcpy.AddMessage("Smoothed centerline")
     
-    # Return
-    arcpy.SetParameter(4, centerline_path)
-    
-    # Cleanup
-    arcpy.Delete_management(in_data = banks_path)
-    arcpy.Delete_management(in_data = cl_raw_path)
+        # Return
+        arcpy.SetParameter(4, centerline_path)
 
 
 def main():
@@ -17,6 +17,7 @@ ____________________________________________________________________________"""
 
 import os
 import arcpy
+from FG_utils import *
 
 def XSField(feature_dataset, field_xs_points):
     # Set environment variables 
@@ -38,22 +39,16 @@ def XSField(feature_dataset, field_xs_points):
                                   Transfer_Fields = ["ReachName"])
     arcpy.AddMessage("Converted field_xs_points to a field_xs line.")
     
-    # Create `Seq` field
-    arcpy.management.AddField(in_table = field_xs, 
-                              field_name = "Seq", field_type = "SHORT")
-    arcpy.management.CalculateField(in_table = field_xs, 
-                                    field = "Seq", 
-                                    expression = "!OBJECTID!", 
-                                    expression_type = "PYTHON3")
+    # Create the `Seq` field and fix field names (AlterField is broke) in 
+    # one pass
+    calculate_table_fields(
+        field_xs, 
+        [("Seq", lambda c: c["OBJECTID"]), 
+         ("ReachName", lambda c: c["START_ReachName"])], 
+        inputs = ["START_ReachName"], 
+        new_fields = [FieldDef("Seq", "SmallInteger", 2), 
+                      FieldDef("ReachName", "String", 255)])
     arcpy.AddMessage("Added Sequence field.")
-    
-    # Fix field names (AlterField is broke)
-    arcpy.management.AddField(in_table = field_xs, 
-                              field_name = "ReachName", 
-                              field_type = "TEXT")
-    arcpy.management.CalculateField(in_table = field_xs, 
-                                    field = "ReachName", 
-                                    expression = "!START_ReachName!")
     arcpy.management.DeleteField(in_table = field_xs, 
                                  drop_field = "START_ReachName")
     arcpy.AddMessage("Fixed field names")
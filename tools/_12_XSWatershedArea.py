@@ -13,8 +13,13 @@ called `Seq` (long) that uniquely identifies each cross section.
 This tool also adds the stream `ReachName` field from the flowline feature 
 class.
 
-This tool runs much faster if the regional flow accumulation raster is clipped 
-to the flowline extent. 
+The watershed area of each cross section is interpolated from the drainage 
+area profile of its reach along the flowline (see 
+FG_utils.drainage_area_profile). The profiles are built once from the flow 
+accumulation raster by snapping stations along each reach to the cell of 
+highest flow accumulation within the snap distance. They are cached in the 
+`<flowline>_drainage_profile` table, so re-running this tool for a new cross 
+section layout does not read the raster. 
 
 Parameters:
 feature_dataset       -- Path to the feature dataset
@@ -31,13 +36,12 @@ cross_section feature class.
 ____________________________________________________________________________"""
 
 import os
+import numpy as np
 import arcpy
+from FG_utils import *
 
 def XSWatershedArea(feature_dataset, cross_section, flowline, flow_accum,
                     snap_distance):
-    # Check out the ArcGIS Spatial Analyst extension license
-    arcpy.CheckOutExtension("Spatial")
-
     # Set environment variables
     arcpy.env.overwriteOutput = True
     arcpy.env.workspace = os.path.dirname(feature_dataset)
@@ -57,6 +61,10 @@ def XSWatershedArea(feature_dataset, cross_section, flowline, flow_accum,
 
     # Get spatial reference of FAC
     spatial_ref = arcpy.Describe(FAC).spatialReference
+    if spatial_ref.type != "Projected":
+        arcpy.AddError("    Watershed linear unit not recognized."
+                       " Area not calculated")
+        return
 
     # Check if the ReachName field exists in the cross_section fc. If so delete
     # it so that it can be updated. It must be deleted so that it does not get
@@ -66,11 +74,45 @@ def XSWatershedArea(feature_dataset, cross_section, flowline, flow_accum,
         arcpy.management.DeleteField(in_table = cross_section,
                                      drop_field = ["ReachName"])
 
-    # Intersect cross_section with flowline
-    xs_flowline_pt = os.path.join(feature_dataset, "xs_flowline_pt")
-    arcpy.analysis.Intersect(in_features = [cross_section, flowline],
-                             out_feature_class = xs_flowline_pt,
-                             output_type = "POINT")
+    with scratch_workspace() as scratch:
+        # Intersect cross_section with flowline
+        xs_flowline_pt = scratch.path("xs_flowline_pt", 
+                                      size = dataset_bytes(cross_section))
+        arcpy.analysis.Intersect(in_features = [cross_section, flowline],
+                                 out_feature_class = xs_flowline_pt,
+                                 output_type = "POINT")
+
+        # Read the intersection points of all cross sections
+        seqs, reach_names, xs_x, xs_y = [], [], [], []
+        with arcpy.da.SearchCursor(xs_flowline_pt,
+                                   ["Seq", "ReachName", "SHAPE@X", "SHAPE@Y"],
+                                   explode_to_points = True,
+                                   spatial_reference = spatial_ref) as cursor:
+            for row in cursor:
+                seqs.append(row[0])
+                reach_names.append(row[1])
+                xs_x.append(row[2])
+                xs_y.append(row[3])
+
+    # Interpolate the watershed area of each point from the drainage area 
+    # profile of the flowline. The profile is built from the flow 
+    # accumulation raster on the first run and read from its cache after. 
+    profiles = drainage_area_profile(flowline, flow_accum, 
+                                     float(snap_distance))
+    area_sq_mile = drainage_area_at(profiles, np.array(xs_x), np.array(xs_y), 
+                                    reach_names)
+    arcpy.AddMessage("Drainage area interpolation complete")
+
+    # Keep the largest area where a cross section crosses the flowline more
+    # than once
+    xs_area = {}
+    xs_reach = {}
+    for seq, reach_name, area in zip(seqs, reach_names, area_sq_mile.tolist()):
+        if np.isnan(area):
+            continue
+        if seq not in xs_area or area > xs_area[seq]:
+            xs_area[seq] = area
+            xs_reach[seq] = reach_name
 
     # Add a field to to the cross_section fc to hold watershed area
     # Check if the field already exists and if not add it
@@ -83,115 +125,29 @@ def XSWatershedArea(feature_dataset, cross_section, flowline, flow_accum,
     # reach from the flowline feature class
     arcpy.AddField_management(cross_section, "ReachName", "TEXT")
 
-    # Add a field to cross_section fc to hold flowline_elevation
-
-    # Iterate through `cross_section` fc and calculate watershed area
+    # Write the watershed area and ReachName of every cross section
     with arcpy.da.UpdateCursor(in_table = cross_section,
                                field_names = ['Seq',
                                               'Watershed_Area_SqMile',
                                               'ReachName'],
                                sql_clause = (None, 'ORDER BY Seq')) as cursor:
         for row in cursor:
-            # Create a feature layer from the xs_flowline_pt feature class
-            # for the current cross section
-            OID = "Seq = {}".format(str(row[0]))
-            arcpy.management.MakeFeatureLayer(
-                      in_features = xs_flowline_pt,
-                      out_layer = "xs_flowln_pt",
-                      where_clause = OID)
-
-            # Set the stream `ReachName` field
-            whr_cls = "Seq = {}".format(str(row[0]))
-            xs_fl_pts = arcpy.SearchCursor(dataset = "xs_flowln_pt",
-                                           fields = "Seq; ReachName",
-                                           where_clause = whr_cls)
-
-            for xs in xs_fl_pts:
-                seq        = xs.getValue("Seq")
-                reach_name = xs.getValue("ReachName")
-                arcpy.AddMessage("Seq: {0}, ReachName: {1}".format(seq,
-                                 reach_name))
-                row[2] = reach_name
-
-            # Calculate Watershed Area
-            ## Snap pour point to flow accumulation raster
-            snapPour = arcpy.sa.SnapPourPoint(
-                                in_pour_point_data = "xs_flowln_pt",
-                                in_accumulation_raster = FAC,
-                                snap_distance = snap_distance,
-                                pour_point_field = "Seq")
-            arcpy.AddMessage("    Snap complete")
-            
-            ## Sample the flow accum raster to determine # of upstream cells
-            watershed_area = os.path.join(arcpy.env.workspace, "watershed_area")
-            arcpy.sa.Sample(in_rasters = [FAC],
-                            in_location_data = snapPour,
-                            out_table = watershed_area,
-                            resampling_type = "NEAREST",
-                            unique_id_field = "Value")
-            arcpy.AddMessage("    Sample complete")
-
-            flds = arcpy.ListFields(watershed_area)
-            for f in flds:
-                arcpy.AddMessage("        Field: {0}".format(f.name))
-            
-            ## Extract cell count from watershed_area table
-            cell_count = 0
-            FACname     = flds[4].name
-            fields      = flds[1].name + "; " + flds[4].name
-            whereClause = flds[1].name + " = " + str(row[0])
-            counts = arcpy.SearchCursor(dataset = watershed_area,
-                                        fields = fields,
-                                        where_clause = whereClause)
-            for count in counts:
-                cell_count = count.getValue(FACname)
-                arcpy.AddMessage("    Cell Count: " + str(cell_count))
-                # Calculate the area in square miles
-                cell_size = str(
-                            arcpy.GetRasterProperties_management(
-                                  FAC, "CELLSIZEX"))
-                arcpy.AddMessage("    Cell Size: " + cell_size)
-                
-                # Linear unit = meter
-                if spatial_ref.linearUnitName == "Meter":
-                    # 1 sq m = 0.0000003861 sq mile
-                    area_sq_mile = ((float(cell_size) * float(cell_size)) *
-                                    0.0000003861) * cell_count
-                    if area_sq_mile < 0.25:
-                        # Error, valid watershed area should be larger
-                        arcpy.AddMessage("Watershed area is less than one quarter"
-                            " of a square mile. Try increasing the snap distance.")
-                    else:
-                        arcpy.AddMessage("    Area: " + str(area_sq_mile))
-                
-                # Linear unit = feet
-                elif spatial_ref.linearUnitName == "Feet":
-                    # 1 sq ft = 0.00000003587 sq mile
-                    area_sq_mile = ((float(cell_size) * float(cell_size)) *
-                                    0.00000003587) * cell_count
-                    if area_sq_mile < 0.25:
-                        # Error, valid watershed area should be larger
-                        arcpy.AddMessage("Watershed area is less than one quarter"
-                            " of a square mile. Try increasing the snap distance.")
-                    else:
-                        arcpy.AddMessage("    Area: " + str(area_sq_mile))
-                
-                else:
-                    # Error
-                    arcpy.AddError("    Watershed linear unit not recognized."
-                          " Area not calculated")
-                
-                # Write the watershed area to the cross section table
-                row[1] = area_sq_mile
-            # Update cross_section row
+            if row[0] not in xs_area:
+                arcpy.AddMessage("Seq: {0}, no flowline intersection "
+                                 "found".format(row[0]))
+                continue
+            row[1] = xs_area[row[0]]
+            row[2] = xs_reach[row[0]]
+            arcpy.AddMessage("Seq: {0}, ReachName: {1}, Area: {2}".format(
+                             row[0], row[2], row[1]))
+            if row[1] < 0.25:
+                # Error, valid watershed area should be larger
+                arcpy.AddMessage("Watershed area is less than one quarter"
+                    " of a square mile. Try increasing the snap distance.")
             cursor.updateRow(row)
 
     # Return
     arcpy.SetParameter(5, cross_section)
-    
-    # Cleanup
-    arcpy.management.Delete(in_data = xs_flowline_pt)
-    arcpy.management.Delete(in_data = watershed_area)
 
 
 def main():
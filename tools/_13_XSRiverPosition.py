@@ -32,6 +32,7 @@ ____________________________________________________________________________"""
  
 import os
 import arcpy
+from FG_utils import *
 
 def DeleteExistingFields(in_table, field):
     field_names = [f.name for f in arcpy.ListFields(in_table)]
@@ -59,38 +60,35 @@ def XSAssignRiverPosition(feature_dataset, cross_section, flowline_points):
     DeleteExistingFields(cross_section, "POINT_M")
     DeleteExistingFields(cross_section, "Z")
     
-    # Spatial Join the cross sections with the closest flowline point
-    cross_section_flowline_point = os.path.join(feature_dataset, 
-                                                "cross_section_flowline_point")
-    arcpy.SpatialJoin_analysis(target_features = cross_section, 
-                               join_features = flowline_points, 
-                               out_feature_class = cross_section_flowline_point,  
-                               match_option = "CLOSEST")
+    with scratch_workspace() as scratch:
+        # Spatial Join the cross sections with the closest flowline point
+        cross_section_flowline_point = scratch.path(
+                                           "cross_section_flowline_point", 
+                                           size = dataset_bytes(cross_section))
+        arcpy.SpatialJoin_analysis(target_features = cross_section, 
+                                   join_features = flowline_points, 
+                                   out_feature_class = cross_section_flowline_point,  
+                                   match_option = "CLOSEST")
 
-    # Join fields from the `cross_section_flowline_point` table back to the 
-    # `cross_section` feature class
-    arcpy.JoinField_management(in_data = cross_section, 
-                               in_field = "Seq", 
-                               join_table = cross_section_flowline_point, 
-                               join_field = "Seq", 
-                               fields = ["POINT_X", "POINT_Y", "POINT_M", "Z"])
+        # Join fields from the `cross_section_flowline_point` table back to the 
+        # `cross_section` feature class
+        join_table_fields(target = cross_section, 
+                          target_field = "Seq", 
+                          join_table = cross_section_flowline_point, 
+                          join_field = "Seq", 
+                          fields = ["POINT_X", "POINT_Y", "POINT_M", "Z"])
     
-    # Calculate the "km_to_mouth" field
-    arcpy.AddField_management(in_table = cross_section, 
-                              field_name = "km_to_mouth", 
-                              field_type = "DOUBLE")
-    arcpy.CalculateField_management(in_table = cross_section, 
-                                    field = "km_to_mouth",
-                                    expression = "!POINT_M!", 
-                                    expression_type = "PYTHON_9.3")
+        # Calculate the "km_to_mouth" field
+        calculate_table_fields(
+            cross_section, 
+            [("km_to_mouth", lambda c: c["POINT_M"])], 
+            inputs = ["POINT_M"], 
+            new_fields = [FieldDef("km_to_mouth", "Double", 8)])
     
-    # Return
-    arcpy.SetParameter(3, cross_section)
-    add_chart(cross_section)
+        # Return
+        arcpy.SetParameter(3, cross_section)
+        add_chart(cross_section)
 
-    # Cleanup
-    arcpy.Delete_management(in_data = cross_section_flowline_point)
-    return
 
 def add_chart(cross_section):
     if arcpy.GetInstallInfo()['ProductName'] == "ArcGISPro":
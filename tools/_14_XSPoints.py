@@ -52,7 +52,9 @@ TODO:
 ____________________________________________________________________________"""
  
 import os
+import numpy as np
 import arcpy
+from FG_utils import *
 
 def XSCreateStationPoints(feature_dataset, cross_section, dem, dem_units, 
                           detrend_dem, station_distance):
@@ -77,149 +79,93 @@ def XSCreateStationPoints(feature_dataset, cross_section, dem, dem_units,
     # Set cross_section name
     xs_name = arcpy.Describe(cross_section).baseName
     
-    # Add a field to hold the linear referencing route `from_measure`
-    # Check if the field already exists and if not add it
-    field_names = [f.name for f in arcpy.ListFields(cross_section)]
-    if "from_measure" not in field_names:
-        arcpy.AddField_management(in_table = cross_section, 
-                                  field_name = "from_measure", 
-                                  field_type = "DOUBLE")
-
-    # Set the value of the cross section `from_measure` to zero in units meters
-    arcpy.CalculateField_management(in_table = cross_section, 
-                                    field = "from_measure", 
-                                    expression = "0", 
-                                    expression_type = "PYTHON_9.3")
-
-    # Add a field to hold the linear referencing route `to_measure`
-    if "to_measure" not in field_names:
-        arcpy.AddField_management(in_table = cross_section, 
-                                  field_name = "to_measure", 
-                                  field_type = "DOUBLE")
-                                  
-    
-    # Set value of xs `to_measure` to length of xs in units meters
-    arcpy.CalculateField_management(in_table = cross_section, 
-                                    field = "to_measure", 
-                                    expression = "!shape.length@meters!", 
-                                    expression_type = "PYTHON_9.3")
+    # Set the linear referencing route `from_measure` to zero and the 
+    # `to_measure` to the length of each cross section in units meters
+    spatial_ref = arcpy.Describe(cross_section).spatialReference
+    meters_per_unit = spatial_ref.metersPerUnit if spatial_ref.metersPerUnit \
+                      else 1.0
+    calculate_table_fields(
+        cross_section, 
+        [("from_measure", 0.0), 
+         ("to_measure", lambda c: c["SHAPE@LENGTH"] * meters_per_unit)], 
+        inputs = ["SHAPE@LENGTH"], 
+        new_fields = [FieldDef("from_measure", "Double", 8), 
+                      FieldDef("to_measure", "Double", 8)])
                                     
-    # Densify vertices of the cross_section fc 
-    arcpy.AddMessage("Densifying cross section vertices...")
-    xs_densify = os.path.join(feature_dataset, 
-                              xs_name + "_densify")
-    arcpy.CopyFeatures_management(in_features = cross_section, 
-                                  out_feature_class = xs_densify)
-    arcpy.Densify_edit(in_features = xs_densify, 
-                       densification_method = "DISTANCE", 
-                       distance = station_distance)
-
-    # Convert the cross_section fc to a route
-    arcpy.AddMessage("Creating cross section routes...")
-    xs_densify_route = os.path.join(feature_dataset, 
-                                    xs_name + "_densify_route")
-    arcpy.CreateRoutes_lr(in_line_features = xs_densify, 
-                          route_id_field = "Seq", 
-                          out_feature_class = xs_densify_route, 
-                          measure_source = "TWO_FIELDS", 
-                          from_measure_field = "from_measure", 
-                          to_measure_field = "to_measure")
-
-    # Convert cross section feature vertices to points
-    arcpy.AddMessage("Converting cross section vertices to points...")
-    xs_points = os.path.join(feature_dataset, 
-                             xs_name + "_points")
-    arcpy.FeatureVerticesToPoints_management(
-                     in_features = xs_densify_route, 
-                     out_feature_class = xs_points)
-
-    # Add x, y, z, and m values to the `cross_section_points` feature class
-    arcpy.AddGeometryAttributes_management(
-                     Input_Features = xs_points, 
-                     Geometry_Properties = "POINT_X_Y_Z_M", 
-                                           Length_Unit = "METERS")
-
-    # Set the first m-value for each xs to zero (because the `create route` 
-    # tool sets it to NULL). 
-    arcpy.AddMessage("Setting XS NULL m-values to zero...")
-    arcpy.CalculateField_management(in_table = xs_points, 
-                                    field = "POINT_M", 
-                                    expression = "setNull2Zero(!POINT_M!)", 
-                                    code_block = """def setNull2Zero(m):
-                                                        if m is None: 
-                                                            return 0
-                                                        else:
-                                                            return m""",
-                                    expression_type = "PYTHON_9.3")
-
-    # Delete un-needed fields
-    arcpy.DeleteField_management(in_table = xs_points, 
-                                 drop_field = ["ORIG_FID","POINT_Z"])
+    with scratch_workspace() as scratch:
+        # Densify vertices of the cross_section fc 
+        arcpy.AddMessage("Densifying cross section vertices...")
+        xs_densify = scratch.path(xs_name + "_densify", 
+                                  size = dataset_bytes(cross_section))
+        arcpy.CopyFeatures_management(in_features = cross_section, 
+                                      out_feature_class = xs_densify)
+        arcpy.Densify_edit(in_features = xs_densify, 
+                           densification_method = "DISTANCE", 
+                           distance = station_distance)
+
+        # Convert the cross_section fc to a route
+        arcpy.AddMessage("Creating cross section routes...")
+        xs_densify_route = scratch.path(xs_name + "_densify_route", 
+                                        size = dataset_bytes(cross_section))
+        arcpy.CreateRoutes_lr(in_line_features = xs_densify, 
+                              route_id_field = "Seq", 
+                              out_feature_class = xs_densify_route, 
+                              measure_source = "TWO_FIELDS", 
+                              from_measure_field = "from_measure", 
+                              to_measure_field = "to_measure")
+
+        # Convert cross section feature vertices to points
+        arcpy.AddMessage("Converting cross section vertices to points...")
+        xs_points = os.path.join(feature_dataset, 
+                                 xs_name + "_points")
+        arcpy.FeatureVerticesToPoints_management(
+                         in_features = xs_densify_route, 
+                         out_feature_class = xs_points)
+
+        # Add x, y, z, and m values to the `cross_section_points` feature class
+        arcpy.AddGeometryAttributes_management(
+                         Input_Features = xs_points, 
+                         Geometry_Properties = "POINT_X_Y_Z_M", 
+                                               Length_Unit = "METERS")
+
+        # Delete un-needed fields
+        arcpy.DeleteField_management(in_table = xs_points, 
+                                     drop_field = ["ORIG_FID","POINT_Z"])
                                  
-    # Add a field to hold the linear referencing `route_units`
-    arcpy.AddField_management(in_table = xs_points, 
-                              field_name = "POINT_M_units", 
-                              field_type = "TEXT")
-                                  
-    # Set the `route_units` field to "meter"
-    arcpy.CalculateField_management(in_table = xs_points, 
-                                    field = "POINT_M_units", 
-                                    expression = "'m'", 
-                                    expression_type = "PYTHON_9.3")
-
-    # Join fields from the `cross_section` fc to `cross_section_points` fc
-    fields = ["ReachName","Watershed_Area_SqMile","km_to_mouth"]
-    arcpy.JoinField_management(in_data = xs_points, 
-                               in_field = "Seq", 
-                               join_table = cross_section, 
-                               join_field = "Seq", 
-                               fields = fields)
-
-    # Add elevations to the `cross_section_points` feature class
-    arcpy.AddMessage("Adding DEM surface information...")
-    
-    ## DEM
-    arcpy.AddMessage("DEM: {}".format(dem))
-    arcpy.AddSurfaceInformation_3d(in_feature_class = xs_points, 
-                                   in_surface = dem, 
-                                   out_property = "Z",
-                                   z_factor = 1.0)
-
-    ## Change `Z` field name to `DEM_Z`
-    arcpy.AlterField_management(in_table = xs_points, 
-                                field = "Z", 
-                                new_field_name = "DEM_Z")
-
-    ## Create and set the value of the dem_units field
-    arcpy.AddField_management(in_table = xs_points, 
-                              field_name = "dem_units", 
-                              field_type = "TEXT")
-    arcpy.CalculateField_management(in_table = xs_points, 
-                                    field = "dem_units", 
-                                    expression = "'{}'".format(dem_units), 
-                                    expression_type = "PYTHON_9.3")
-    
-    ## Detrend                                
-    if detrend_dem:
-        arcpy.AddMessage("Detrend DEM: {}".format(detrend_dem))
-        ## Add detrended elevations to the `cross_section_points` feature class
-        arcpy.AddSurfaceInformation_3d(in_feature_class = xs_points, 
-                                       in_surface = detrend_dem, 
-                                       out_property = "Z",
-                                       z_factor = 1.0)
+        # Join fields from the `cross_section` fc to `cross_section_points` fc
+        fields = ["ReachName","Watershed_Area_SqMile","km_to_mouth"]
+        join_table_fields(target = xs_points, 
+                          target_field = "Seq", 
+                          join_table = cross_section, 
+                          join_field = "Seq", 
+                          fields = fields)
+
+        # Add elevations to the `cross_section_points` feature class
+        arcpy.AddMessage("Adding DEM surface information...")
     
-        ## Change `Z` field name to `Detrend_DEM_Z`
-        arcpy.AlterField_management(in_table = xs_points, 
-                                    field = "Z", 
-                                    new_field_name = "Detrend_DEM_Z")
+        ## DEM and Detrend sampled in a single pass
+        arcpy.AddMessage("DEM: {}".format(dem))
+        if detrend_dem:
+            arcpy.AddMessage("Detrend DEM: {}".format(detrend_dem))
+        add_elevation(xs_points, dem, detrend_dem)
+
+        # Set the first m-value for each xs to zero (because the `create route` 
+        # tool sets it to NULL), and set the linear referencing `route_units` 
+        # to "meter" and the `dem_units` in one pass
+        arcpy.AddMessage("Setting XS NULL m-values to zero...")
+        calculate_table_fields(
+            xs_points, 
+            [("POINT_M", lambda c: np.where(np.isnan(c["POINT_M"]), 0.0, 
+                                            c["POINT_M"])), 
+             ("POINT_M_units", "m"), 
+             ("dem_units", dem_units)], 
+            inputs = ["POINT_M"], 
+            new_fields = [FieldDef("POINT_M_units", "String", 255), 
+                          FieldDef("dem_units", "String", 255)])
     
-    # Return
-    arcpy.SetParameter(6, xs_points)
-    
-    # Cleanup
-    arcpy.Delete_management(in_data = xs_densify)
-    arcpy.Delete_management(in_data = xs_densify_route)
-    return
+        # Return
+        arcpy.SetParameter(6, xs_points)
+
 
 def main():
     # Call the XSCreateStationPoints function with command line parameters
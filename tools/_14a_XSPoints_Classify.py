@@ -22,7 +22,9 @@ Outputs:
 ____________________________________________________________________________"""
  
 import os
+import numpy as np
 import arcpy
+from FG_utils import *
 
 def XSPointsClassify(feature_dataset, xs_points, channel_polygon, 
                      floodplain_polygon, buffer_distance):
@@ -38,78 +40,60 @@ def XSPointsClassify(feature_dataset, xs_points, channel_polygon,
     arcpy.AddMessage("floodplain_polygon: {}".format(arcpy.Describe(floodplain_polygon).baseName))
     arcpy.AddMessage("buffer distance: {}".format(buffer_distance))
     
-    # Add a field to hold the classification flag fields
-    # Check if the field already exists and if not add it
-    field_names = [f.name for f in arcpy.ListFields(xs_points)]
-    if "channel" not in field_names:
-        arcpy.management.AddField(in_table = xs_points, 
-                                  field_name = "channel", 
-                                  field_type = "SHORT")
+    with scratch_workspace() as scratch:
+        # Buffer floodplain and channel polygon features
+        channel_polygon_buffer = scratch.path(
+                                     "channel_polygon_buffer", 
+                                     size = dataset_bytes(channel_polygon))
+        floodplain_polygon_buffer = scratch.path(
+                                     "floodplain_polygon_buffer", 
+                                     size = dataset_bytes(floodplain_polygon))
+        arcpy.analysis.Buffer(in_features = channel_polygon, 
+                              out_feature_class = channel_polygon_buffer, 
+                              buffer_distance_or_field = buffer_distance)
+        arcpy.analysis.Buffer(in_features = floodplain_polygon, 
+                              out_feature_class = floodplain_polygon_buffer, 
+                              buffer_distance_or_field = buffer_distance)
+        arcpy.AddMessage("Floodplain and channel buffered.")
     
-    arcpy.management.CalculateField(in_table = xs_points, 
-                                    field = "channel", 
-                                    expression = "0", 
-                                    expression_type = "PYTHON3")
+        # Create xs_points feature layer to use for selecting
+        arcpy.MakeFeatureLayer_management(xs_points, "xs_points")
     
-    field_names = [f.name for f in arcpy.ListFields(xs_points)]
-    if "floodplain" not in field_names:
-        arcpy.management.AddField(in_table = xs_points, 
-                                  field_name = "floodplain", 
-                                  field_type = "SHORT")
+        # Select xs_points overlaping floodplain
+        arcpy.management.SelectLayerByLocation(in_layer = "xs_points",
+                                               overlap_type = "INTERSECT", 
+                                               select_features = floodplain_polygon_buffer, 
+                                               selection_type = "NEW_SELECTION")
+        floodplain_oids = [row[0] for row in 
+                           arcpy.da.SearchCursor("xs_points", ["OID@"])]
     
-    arcpy.management.CalculateField(in_table = xs_points, 
-                                    field = "floodplain", 
-                                    expression = "0", 
-                                    expression_type = "PYTHON3")
-    arcpy.AddMessage("Added classification flag fields.")
+        # Select xs_points overlaping channel
+        arcpy.management.SelectLayerByLocation(in_layer = "xs_points",
+                                               overlap_type = "INTERSECT", 
+                                               select_features = channel_polygon_buffer, 
+                                               selection_type = "NEW_SELECTION")
+        channel_oids = [row[0] for row in 
+                        arcpy.da.SearchCursor("xs_points", ["OID@"])]
     
-    # Buffer floodplain and channel polygon features
-    arcpy.analysis.Buffer(in_features = channel_polygon, 
-                          out_feature_class = "channel_polygon_buffer", 
-                          buffer_distance_or_field = buffer_distance)
-    arcpy.analysis.Buffer(in_features = floodplain_polygon, 
-                          out_feature_class = "floodplain_polygon_buffer", 
-                          buffer_distance_or_field = buffer_distance)
-    arcpy.AddMessage("Floodplain and channel buffered.")
+        # Clear layer selection
+        arcpy.management.SelectLayerByAttribute(in_layer_or_view = "xs_points", 
+                                                selection_type = "CLEAR_SELECTION")
     
-    # Create xs_points feature layer to use for selecting
-    arcpy.MakeFeatureLayer_management(xs_points, "xs_points")
-    
-    # Select xs_points overlaping floodplain
-    arcpy.management.SelectLayerByLocation(in_layer = "xs_points",
-                                           overlap_type = "INTERSECT", 
-                                           select_features = "floodplain_polygon_buffer", 
-                                           selection_type = "NEW_SELECTION")
-    
-    # Set floodplain flag
-    arcpy.management.CalculateField(in_table = "xs_points", 
-                                    field = "floodplain", 
-                                    expression = "1", 
-                                    expression_type = "PYTHON3")
-    arcpy.AddMessage("xs_points in floodplain set.")
-    
-    # Select xs_points overlaping channel
-    arcpy.management.SelectLayerByLocation(in_layer = "xs_points",
-                                           overlap_type = "INTERSECT", 
-                                           select_features = "channel_polygon_buffer", 
-                                           selection_type = "NEW_SELECTION")
-    
-    # Set channel flag
-    arcpy.management.CalculateField(in_table = "xs_points", 
-                                    field = "channel", 
-                                    expression = "1", 
-                                    expression_type = "PYTHON3")
-    arcpy.AddMessage("xs_points in channel set.")
-    
-    # Clear layer selection
-    arcpy.management.SelectLayerByAttribute(in_layer_or_view = "xs_points", 
-                                            selection_type = "CLEAR_SELECTION")
-    
-    # Return
-    arcpy.SetParameter(5, xs_points)
-    
-    return
+        # Set the classification flags of every point in one pass, adding 
+        # the flag fields if they do not exist
+        oid = arcpy.Describe(xs_points).OIDFieldName
+        calculate_table_fields(
+            xs_points, 
+            [("floodplain", lambda c: np.isin(c[oid], floodplain_oids) * 1),
+             ("channel", lambda c: np.isin(c[oid], channel_oids) * 1)],
+            new_fields = [FieldDef("channel", "SmallInteger", 2),
+                          FieldDef("floodplain", "SmallInteger", 2)])
+        arcpy.AddMessage("xs_points in floodplain and channel set.")
     
+        # Return
+        arcpy.SetParameter(5, xs_points)
+
+
 def main():
     XSPointsClassify(feature_dataset, xs_points, channel_polygon, 
                      floodplain_polygon, buffer_distance)
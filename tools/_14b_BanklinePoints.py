@@ -136,83 +136,86 @@ def BanklinePoints(feature_dataset, loop_points, banklines, valleyline, dem,
                     snap_environment = snap_string)
     arcpy.AddMessage("loop_points snapped to banklines")
     
-    # Convert banklines to points
-    banklines_points = line_route_points(feature_dataset = feature_dataset,
-                                         line = banklines, 
-                                         station_distance = station_distance, 
-                                         route_id_field = "bank_id",
-                                         fields = ["bank","ReachName"])
-    
-    # Add elevation to banklines_points
-    add_elevation(banklines_points, dem)
-    
-    # Buffer loop_points to use for spatal join
-    loop_points_buffer = os.path.join(feature_dataset, "loop_points_buffer")
-    arcpy.Buffer_analysis(in_features = loop_points, 
-                          out_feature_class = loop_points_buffer, 
-                          buffer_distance_or_field = "1 Meters")
-    
-    # Identify loop_points close to bankline_points and transfer attributes
-    bankline_loop_points = os.path.join(feature_dataset, "bankline_loop_points")
-    arcpy.SpatialJoin_analysis(target_features = banklines_points, 
-                               join_features = loop_points_buffer, 
-                               out_feature_class = bankline_loop_points, 
-                               match_option = "INTERSECT")
-    
-    arcpy.DeleteField_management(in_table = bankline_loop_points, 
-                                 drop_field = ["Join_Count", "TARGET_FID", 
-                                               "ReachName_1"])
-    arcpy.AddMessage("loop_points joined to banklines_points")
-    
-    # Assign loop and bend values to bankline_points
-    assignLoopAndBend(bankline_loop_points, loop_points)
-    
-    # Convert valleyline to points
-    valleyline_points = line_route_points(feature_dataset = feature_dataset,
-                                          line = valleyline,
-                                          station_distance = station_distance,
-                                          route_id_field = "ReachName",
-                                          fields = [])
+    with scratch_workspace() as scratch:
+        # Convert banklines to points
+        banklines_points = scratch.path("banklines_points", 
+                                        size = dataset_bytes(banklines))
+        line_route_points(feature_dataset = feature_dataset,
+                          line = banklines, 
+                          station_distance = station_distance, 
+                          route_id_field = "bank_id",
+                          fields = ["bank","ReachName"],
+                          out_feature_class = banklines_points)
+    
+        # Add elevation to banklines_points
+        add_elevation(banklines_points, dem)
+    
+        # Buffer loop_points to use for spatal join
+        loop_points_buffer = scratch.path("loop_points_buffer", 
+                                          size = dataset_bytes(loop_points))
+        arcpy.Buffer_analysis(in_features = loop_points, 
+                              out_feature_class = loop_points_buffer, 
+                              buffer_distance_or_field = "1 Meters")
+    
+        # Identify loop_points close to bankline_points and transfer attributes
+        bankline_loop_points = scratch.path("bankline_loop_points", 
+                                            size = dataset_bytes(banklines))
+        arcpy.SpatialJoin_analysis(target_features = banklines_points, 
+                                   join_features = loop_points_buffer, 
+                                   out_feature_class = bankline_loop_points, 
+                                   match_option = "INTERSECT")
+    
+        arcpy.DeleteField_management(in_table = bankline_loop_points, 
+                                     drop_field = ["Join_Count", "TARGET_FID", 
+                                                   "ReachName_1"])
+        arcpy.AddMessage("loop_points joined to banklines_points")
+    
+        # Assign loop and bend values to bankline_points
+        assignLoopAndBend(bankline_loop_points, loop_points)
+    
+        # Convert valleyline to points
+        valleyline_points = scratch.path("valleyline_points", 
+                                         size = dataset_bytes(valleyline))
+        line_route_points(feature_dataset = feature_dataset,
+                          line = valleyline,
+                          station_distance = station_distance,
+                          route_id_field = "ReachName",
+                          fields = [],
+                          out_feature_class = valleyline_points)
 
-    # Assign valleyline_points values to bankline_points
-    bankline_points = os.path.join(feature_dataset, "bankline_points")
-    arcpy.SpatialJoin_analysis(target_features = bankline_loop_points,
-                               join_features = valleyline_points,
-                               out_feature_class = bankline_points,
-                               match_option = "CLOSEST")
+        # Assign valleyline_points values to bankline_points
+        bankline_points = os.path.join(feature_dataset, "bankline_points")
+        arcpy.SpatialJoin_analysis(target_features = bankline_loop_points,
+                                   join_features = valleyline_points,
+                                   out_feature_class = bankline_points,
+                                   match_option = "CLOSEST")
 
-    arcpy.DeleteField_management(in_table = bankline_points,
-                                 drop_field = ["Join_Count", "TARGET_FID", 
-                                               "BUFF_DIST", "ORIG_FID",
-                                               "ReachName_1" , "ReachName_12",
-                                               "from_measure", "to_measure",
-                                               "InLine_FID", "SmoLnFlag"])
-    # Set the name of bankline_points coordinates
-    arcpy.AlterField_management(bankline_points,
-                                "POINT_X", 'bank_POINT_X', 'bank_POINT_X')
-    arcpy.AlterField_management(bankline_points,
-                                "POINT_Y", 'bank_POINT_Y', 'bank_POINT_Y')
-    arcpy.AlterField_management(bankline_points,
-                                "POINT_M", 'bank_POINT_M', 'bank_POINT_M')
-    
-    # Set the name of valleyline_points coordinates
-    arcpy.AlterField_management(bankline_points,
-                                "POINT_X_1", 'valley_POINT_X', 'valley_POINT_X')
-    arcpy.AlterField_management(bankline_points,
-                                "POINT_Y_1", 'valley_POINT_Y', 'valley_POINT_Y')
-    arcpy.AlterField_management(bankline_points,
-                                "POINT_M_1", 'valley_POINT_M', 'valley_POINT_M')
+        arcpy.DeleteField_management(in_table = bankline_points,
+                                     drop_field = ["Join_Count", "TARGET_FID", 
+                                                   "BUFF_DIST", "ORIG_FID",
+                                                   "ReachName_1" , "ReachName_12",
+                                                   "from_measure", "to_measure",
+                                                   "InLine_FID", "SmoLnFlag"])
+        # Set the name of bankline_points coordinates
+        arcpy.AlterField_management(bankline_points,
+                                    "POINT_X", 'bank_POINT_X', 'bank_POINT_X')
+        arcpy.AlterField_management(bankline_points,
+                                    "POINT_Y", 'bank_POINT_Y', 'bank_POINT_Y')
+        arcpy.AlterField_management(bankline_points,
+                                    "POINT_M", 'bank_POINT_M', 'bank_POINT_M')
+    
+        # Set the name of valleyline_points coordinates
+        arcpy.AlterField_management(bankline_points,
+                                    "POINT_X_1", 'valley_POINT_X', 'valley_POINT_X')
+        arcpy.AlterField_management(bankline_points,
+                                    "POINT_Y_1", 'valley_POINT_Y', 'valley_POINT_Y')
+        arcpy.AlterField_management(bankline_points,
+                                    "POINT_M_1", 'valley_POINT_M', 'valley_POINT_M')
+
+        # Return
+        arcpy.SetParameter(6, bankline_points)
 
-    # Return
-    arcpy.SetParameter(6, bankline_points)
-    
-    # Cleanup
-    arcpy.Delete_management(banklines_points)
-    arcpy.Delete_management(bankline_loop_points)
-    arcpy.Delete_management(loop_points_buffer)
-    arcpy.Delete_management(valleyline_points)
 
-    
 def main():
     # Call the BanklinePoints function with command line parameters
     BanklinePoints(feature_dataset, loop_points, banklines, valleyline, dem, 
@@ -21,6 +21,7 @@ ____________________________________________________________________________"""
 
 import os 
 import arcpy
+from FG_utils import *
 
 def XSAssignLoops(feature_dataset, cross_section, bankline_points):
     # Set environment variables 
@@ -46,26 +47,25 @@ def XSAssignLoops(feature_dataset, cross_section, bankline_points):
     loop_bl_pts = arcpy.MakeFeatureLayer_management(bankline_points, "loop_bl_pts",
                             where_clause = "loop IS NOT NULL")
     
-    # Spatial Join bankline_points with the closest (within 5m) loop_point
-    xs_fc = os.path.join(feature_dataset, "xs_fc")
-    arcpy.SpatialJoin_analysis(target_features = cross_section, 
-                               join_features = "loop_bl_pts", 
-                               out_feature_class = xs_fc,  
-                               match_option = "CLOSEST",
-                               search_radius = 5)
+    with scratch_workspace() as scratch:
+        # Spatial Join bankline_points with the closest (within 5m) loop_point
+        xs_fc = scratch.path("xs_fc", size = dataset_bytes(cross_section))
+        arcpy.SpatialJoin_analysis(target_features = cross_section, 
+                                   join_features = "loop_bl_pts", 
+                                   out_feature_class = xs_fc,  
+                                   match_option = "CLOSEST",
+                                   search_radius = 5)
                                
-    # Join `xs_fc.loop` and `bend` to the `cross_section` feature class
-    arcpy.JoinField_management(in_data = cross_section,
-                               in_field = "Seq",
-                               join_table = xs_fc,
-                               join_field = "Seq",
-                               fields = ["loop", "bend"])
+        # Join `xs_fc.loop` and `bend` to the `cross_section` feature class
+        join_table_fields(target = cross_section,
+                          target_field = "Seq",
+                          join_table = xs_fc,
+                          join_field = "Seq",
+                          fields = ["loop", "bend"])
     
-    # Return
-    arcpy.SetParameter(3, cross_section)
-    
-    # Cleanup
-    arcpy.Delete_management(xs_fc)
+        # Return
+        arcpy.SetParameter(3, cross_section)
+
 
 def main():
     XSAssignLoops(feature_dataset, cross_section, bankline_points)
@@ -23,6 +23,7 @@ ____________________________________________________________________________"""
 import os
 import arcpy
 from arcpy.sa import *
+from FG_utils import *
 
 def ras_wse(feature_dataset, xs_dims, RAS_depth, RAS_model_name):
     # Check out the extension license 
@@ -56,18 +57,13 @@ def ras_wse(feature_dataset, xs_dims, RAS_depth, RAS_model_name):
     
     # Calculate RAS model WSE
     ras_wse_name = "ras_wse_{}".format(RAS_model_name)
-    field_names = [f.name for f in arcpy.ListFields(xs_dims)]
-    if ras_wse_name not in field_names:
-        arcpy.AddField_management(in_table = xs_dims,
-                                  field_name = ras_wse_name,
-                                  field_type = "DOUBLE")
-                                  
-    expression = "!watersurface_elev! + !{}!".format(depth_field_name)
-    arcpy.AddMessage("expression: {}".format(expression))
-    arcpy.CalculateField_management(in_table = xs_dims, 
-                                    field = ras_wse_name, 
-                                    expression = expression, 
-                                    expression_type = "PYTHON_9.3")
+    arcpy.AddMessage("ras_wse_name: {}".format(ras_wse_name))
+    calculate_table_fields(
+        xs_dims, 
+        [(ras_wse_name, 
+          lambda c: c["watersurface_elev"] + c[depth_field_name])], 
+        inputs = ["watersurface_elev", depth_field_name], 
+        new_fields = [FieldDef(ras_wse_name, "Double", 8)])
 
 def main():
     # Call the ras_wse function with command line parameters
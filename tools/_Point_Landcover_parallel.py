@@ -7,22 +7,268 @@ Usage:
 Calculates the area for each NLCD landcover class for each input point. Writes 
 the values to a set of new fields in the input point feature class. 
 
+All points are snapped to the flow accumulation raster and every watershed is
+labeled in a single pass over the D8 flow direction grid (see
+FG_hydro.label_watersheds). Points whose watersheds are nested inside each
+other share an independent sub-basin. The sub-basins are divided into groups
+of similar size and the NLCD of each group is tabulated by a separate worker
+process, each with its own scratch workspace. The results are merged in group
+and point order, so the output does not depend on the order in which the
+workers finish.
+
 Parameters:
 feature_dataset       -- Path to the feature dataset
 points                -- Path to the points feature class
 point_ID_field        -- Field that contains the point IDs
 nlcd                  -- Path to the NLCD raster
 flow_accum            -- Path to the flow accumulation model
-fdr                   -- Path to the flow direction model
+fdr                   -- Path to the flow direction model (must use D8
+                         method)
 snap_distance         -- The distance the point will be snapped to find the 
                          cell of highest flow accumulation
 
 Outputs:
 Writes the land cover values to a set of new fields in the input point 
-feature class.  
+feature class. The area of each landcover class (in the linear units of the
+NLCD raster) is written to a field named VALUE_<class>.
 ____________________________________________________________________________"""
  
+import os
+import sys
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
 import arcpy
+from FG_raster import *
+from FG_hydro import *
+
+# Number of rows and columns of the flow direction raster read at a time
+FDR_BLOCK_SIZE = 2048
+
+def TabulateBasinGroup(task):
+    """
+    Tabulates the landcover of a group of independent sub-basins.
+
+    Runs in a worker process.
+
+    Args:
+    task              -- tuple (group, zone_grid, zone_info, labels, nlcd,
+                         scratch_root) of the group number, the grid of zone
+                         numbers cropped to the group, its RasterInfo, the
+                         watershed label of each zone, the path to the NLCD
+                         raster and the folder for worker scratch workspaces
+
+    Returns:
+    tuple (group, labels, classes, counts) of the group number, the watershed
+    label of each row of counts, the class values and the cell counts of each
+    class for each watershed label
+    """
+    group, zone_grid, zone_info, labels, nlcd, scratch_root = task
+
+    # Each worker uses its own scratch workspace
+    scratch = os.path.join(scratch_root, "group_{}".format(group))
+    os.makedirs(scratch, exist_ok = True)
+    arcpy.env.scratchWorkspace = scratch
+    arcpy.env.workspace = scratch
+    try:
+        classes, counts = tabulate_zones(zone_grid, zone_info, nlcd,
+                                         len(labels))
+    finally:
+        arcpy.ClearWorkspaceCache_management()
+        shutil.rmtree(scratch, ignore_errors = True)
+    return group, labels, classes, counts[1:]
+
+
+def PointLandcover(feature_dataset, points, point_ID_field, nlcd,
+                   flow_accum, fdr, snap_distance, workers = None):
+    """
+    Calculates the area for each landcover class for each input point using
+    a process pool.
+
+    Args:
+    feature_dataset   -- Path to the feature dataset
+    points            -- Path to the points feature class
+    point_ID_field    -- Field that contains the point IDs
+    nlcd              -- Path to the NLCD raster
+    flow_accum        -- Path to the flow accumulation model
+    fdr               -- Path to the D8 flow direction model
+    snap_distance     -- The distance the point will be snapped to find the
+                         cell of highest flow accumulation
+    workers           -- (int) number of worker processes. Defaults to one
+                         less than the number of CPUs.
+
+    Outputs:
+    VALUE_<class> fields written to the points feature class
+    """
+    # Check out the ArcGIS Spatial Analyst extension license
+    arcpy.CheckOutExtension("Spatial")
+
+    # Set environment variables
+    arcpy.env.overwriteOutput = True
+    arcpy.env.workspace = os.path.dirname(feature_dataset)
+    if not workers:
+        workers = max(multiprocessing.cpu_count() - 1, 1)
+
+    # List parameter values
+    arcpy.AddMessage("Workspace: {}".format(arcpy.env.workspace))
+    arcpy.AddMessage("Points: "
+                     "{}".format(arcpy.Describe(points).baseName))
+    arcpy.AddMessage("Point_ID: {}".format(point_ID_field))
+    arcpy.AddMessage("NLCD: {}".format(arcpy.Describe(nlcd).baseName))
+    arcpy.AddMessage("Flow accumulation: "
+                     "{}".format(arcpy.Describe(flow_accum).baseName))
+    arcpy.AddMessage("Flow direction D8: {}".format(arcpy.Describe(fdr).baseName))
+    arcpy.AddMessage("Snap distance: {}".format(snap_distance))
+    arcpy.AddMessage("Workers: {}".format(workers))
+
+    # Read all points in the coordinate system of the flow direction raster
+    fdr_info = raster_info(fdr)
+    sql_postfix = "ORDER BY {}".format(point_ID_field)
+    pts = [row for row in arcpy.da.SearchCursor(
+                              points, ["OID@", "SHAPE@X", "SHAPE@Y"],
+                              sql_clause = (None, sql_postfix),
+                              spatial_reference = fdr_info.spatial_reference)]
+    pts = np.array(pts, dtype = np.float64).reshape(-1, 3)
+    oids = pts[:, 0].astype(np.int64)
+
+    # Snap all pour points to the flow accumulation raster
+    snap_x, snap_y, fac_value = snap_raster(flow_accum, pts[:, 1], pts[:, 2],
+                                            float(snap_distance))
+    row, col = grid_position(snap_x, snap_y, fdr_info.x_min, fdr_info.y_max,
+                             fdr_info.cell_width, fdr_info.cell_height)
+    row = np.floor(row + 0.5)
+    col = np.floor(col + 0.5)
+    valid = ((row >= 0) & (row < fdr_info.n_rows) &
+             (col >= 0) & (col < fdr_info.n_cols))
+    for oid in oids[~valid]:
+        arcpy.AddWarning("    Point {} could not be snapped to the flow "
+                         "accumulation raster".format(oid))
+    oids = oids[valid]
+    pour_cells = (row[valid] * fdr_info.n_cols + col[valid]).astype(np.int64)
+    arcpy.AddMessage("Snap pour points complete")
+
+    # Read the D8 codes one block at a time into a uint8 grid
+    codes = np.zeros((fdr_info.n_rows, fdr_info.n_cols), dtype = np.uint8)
+    for r in range(0, fdr_info.n_rows, FDR_BLOCK_SIZE):
+        for c in range(0, fdr_info.n_cols, FDR_BLOCK_SIZE):
+            block, r0, c0 = read_window(fdr, fdr_info, r, c, 
+                                        FDR_BLOCK_SIZE, FDR_BLOCK_SIZE)
+            codes[r0:r0 + block.shape[0], 
+                  c0:c0 + block.shape[1]] = np.nan_to_num(block, nan = 0)
+            del block
+    downstream = d8_downstream(codes)
+    shape = codes.shape
+    del codes
+
+    # Label every watershed in one pass over the flow direction grid. Cells
+    # are labeled with the int32 zone number of their point (its position in
+    # the sorted point IDs plus 1), so no separate zone index grid is needed.
+    zone_labels = np.unique(oids)
+    zone_number = (np.searchsorted(zone_labels, oids) + 1).astype(np.int32)
+    label = label_watersheds(downstream, pour_cells, zone_number)
+    parent_number = watershed_parents(downstream, label, pour_cells)
+    del downstream
+    label = label.reshape(shape)
+    parents = np.where(parent_number > 0, 
+                       zone_labels[np.maximum(parent_number, 1) - 1], 0)
+    arcpy.AddMessage("Delineate watersheds complete")
+
+    # Points that snapped to the same cell share the first point's watershed
+    first_label = {}
+    for oid, cell in zip(oids.tolist(), pour_cells.tolist()):
+        first_label.setdefault(cell, oid)
+    same_as = {oid: first_label[cell]
+               for oid, cell in zip(oids.tolist(), pour_cells.tolist())}
+
+    # Divide the independent sub-basins into groups of similar size
+    parent = dict(zip(oids.tolist(), parents.tolist()))
+    zone_parents = np.array([parent[oid] for oid in zone_labels.tolist()])
+    roots = watershed_roots(zone_labels, zone_parents)
+    zone_cells = np.bincount(label.ravel(), 
+                             minlength = len(zone_labels) + 1)[1:]
+    basins, basin_index = np.unique(roots, return_inverse = True)
+    basin_cells = np.bincount(basin_index, weights = zone_cells, 
+                              minlength = len(basins)).astype(np.int64)
+    n_groups = min(int(workers), len(basins))
+    basin_group = partition_basins(basins, basin_cells, n_groups)
+    zone_group = basin_group[basin_index]
+
+    # Crop the labels of each group to the extent of its sub-basins
+    scratch_root = tempfile.mkdtemp(prefix = "point_landcover_",
+                                    dir = arcpy.env.scratchFolder)
+    tasks = []
+    group_of_zone = np.concatenate([[-1], zone_group]).astype(np.int16)
+    cell_group = group_of_zone[label]
+    for group in range(n_groups):
+        group_numbers = np.flatnonzero(zone_group == group) + 1
+        group_labels = zone_labels[group_numbers - 1]
+        in_group = cell_group == group
+        rows = np.flatnonzero(in_group.any(axis = 1))
+        cols = np.flatnonzero(in_group.any(axis = 0))
+        if rows.size == 0:
+            continue
+        window = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+        zone_grid = np.where(in_group[window],
+                             np.searchsorted(group_numbers,
+                                             label[window]) + 1,
+                             0).astype(np.int32)
+        del in_group
+        zone_info = fdr_info._replace(
+                    x_min = fdr_info.x_min + cols[0] * fdr_info.cell_width,
+                    y_max = fdr_info.y_max - rows[0] * fdr_info.cell_height,
+                    n_rows = zone_grid.shape[0],
+                    n_cols = zone_grid.shape[1],
+                    spatial_reference = None)
+        tasks.append((group, zone_grid, zone_info, group_labels, nlcd,
+                      scratch_root))
+    del label, cell_group
+
+    # Tabulate the landcover of each group in a worker process
+    try:
+        if len(tasks) > 1:
+            # Geoprocessing tools run inside ArcGIS Pro, so workers must be
+            # started with the Python interpreter instead of sys.executable
+            if sys.platform == "win32":
+                multiprocessing.set_executable(os.path.join(sys.exec_prefix,
+                                                            "python.exe"))
+            with multiprocessing.Pool(processes = len(tasks)) as pool:
+                results = pool.map(TabulateBasinGroup, tasks)
+        else:
+            results = [TabulateBasinGroup(task) for task in tasks]
+    finally:
+        shutil.rmtree(scratch_root, ignore_errors = True)
+    arcpy.AddMessage("Tabulate landcover area complete")
+
+    # Merge the group results in group order
+    results.sort(key = lambda result: result[0])
+    classes = np.unique(np.concatenate([[]] + [r[2] for r in results]))
+    counts = np.zeros((len(zone_labels), len(classes)))
+    for group, group_labels, group_classes, group_counts in results:
+        rows = np.searchsorted(zone_labels, group_labels)
+        cols = np.searchsorted(classes, group_classes)
+        counts[np.ix_(rows, cols)] = group_counts
+
+    # Each full watershed is its own area plus its nested watersheds
+    lc_counts = accumulate_nested(counts, zone_labels, zone_parents)
+    lc_info = raster_info(nlcd)
+    lc_area = lc_counts * (lc_info.cell_width * lc_info.cell_height)
+
+    # Write the landcover area fields to the points in one pass
+    lc_fields = ["VALUE_{}".format(int(c)) for c in classes.tolist()]
+    existing = [f.name for f in arcpy.ListFields(points)]
+    for field in lc_fields:
+        if field not in existing:
+            arcpy.AddField_management(points, field, "DOUBLE")
+    zone_row = {oid: i for i, oid in enumerate(zone_labels.tolist())}
+    with arcpy.da.UpdateCursor(points, ["OID@"] + lc_fields) as cursor:
+        for row in cursor:
+            if row[0] not in same_as:
+                continue
+            areas = lc_area[zone_row[same_as[row[0]]]]
+            cursor.updateRow([row[0]] + areas.tolist())
+    arcpy.AddMessage("Added landcover fields to points fc")
+
 
 def main():
     # Call the Point Landcover with command line parameters